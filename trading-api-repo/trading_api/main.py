@@ -1,10 +1,17 @@
 from fastapi import Depends, FastAPI
 from fastapi.responses import RedirectResponse
 from starlette import status
+from starlette.concurrency import run_in_threadpool
 from starlette.middleware.cors import CORSMiddleware
 
 from mm.api.routes import avatea
 from trading_api import algorithm_routes_v1, algorithm_routes_v2
+from trading_api.algorithm.services.gas import GasOracle
+from trading_api.algorithm.services.heads import HeadTracker
+from trading_api.algorithm.services.key_index import KeyAliasIndexer
+from trading_api.algorithm.services.kms import KeyManagementService
+from trading_api.algorithm.services.status_writer import TransactionStatusWriter
+from trading_api.algorithm.watcher import ReceiptWatcher
 from trading_api.core.container import Container, di_container
 from trading_api.core.health import handle_health_request
 
@@ -18,6 +25,24 @@ app.mount("/api/v2", algorithm_routes_v2.app, name="api_v2")
 app.mount("/api/avatea", avatea, name="api_avatea")
 
 
+@app.on_event("startup")
+async def start_background_tasks():
+    di_container()[ReceiptWatcher].start()
+    di_container()[HeadTracker].start()
+    di_container()[GasOracle].start()
+    await run_in_threadpool(di_container()[KeyManagementService].warm_up)
+    di_container()[KeyAliasIndexer].start()
+
+
+@app.on_event("shutdown")
+async def stop_background_tasks():
+    await di_container()[ReceiptWatcher].stop()
+    await di_container()[GasOracle].stop()
+    await di_container()[HeadTracker].stop()
+    await di_container()[KeyAliasIndexer].stop()
+    await di_container()[TransactionStatusWriter].flush()
+
+
 @app.get(
     path="/",
 )
@@ -20,6 +20,8 @@ from mm.data.repositories import (
 from mm.data.services import (
     AWSKeyManagementService,
     BlockchainTransactionService,
+    GasLimitModel,
+    GasOracle,
     HTTPWeb3Provider,
     StubKeyManagementService,
     StubTransactionService,
@@ -99,6 +101,9 @@ def build_web3_provider() -> Web3Provider:
         ecr_contract_bsc=os.getenv("ECR_CONTRACT_ADDRESS_BSC", ""),
         ecr_contract_rtn=os.getenv("ECR_CONTRACT_ADDRESS_RTN", ""),
         ecr_contract_info_json_path=Path(os.getenv("ECR_CONTRACT_INFO_JSON_PATH", "")),
+        batch_window_s=int(os.getenv("WEB3_BATCH_WINDOW_MS", "2")) / 1000,
+        hedge_percentile=float(os.getenv("WEB3_HEDGE_PERCENTILE", "95")) / 100,
+        block_refresh_s=int(os.getenv("WEB3_BLOCK_REFRESH_MS", "1000")) / 1000,
     )
 
 
@@ -124,9 +129,29 @@ def build_swap_repository():
     return MongoSwapRepository(client=build_mongo_client(), db_name=DB_NAME)
 
 
+@functools.cache
+def build_gas_limit_model() -> GasLimitModel:
+    return GasLimitModel(
+        percentile=float(os.getenv("GAS_LIMIT_PERCENTILE", "99")) / 100,
+        margin=float(os.getenv("GAS_LIMIT_MARGIN", "1.1")),
+        min_samples=int(os.getenv("GAS_LIMIT_MIN_SAMPLES", "5")),
+    )
+
+
+@functools.cache
+def build_gas_oracle() -> GasOracle:
+    return GasOracle(
+        web3=build_web3_provider(),
+        percentile=float(os.getenv("GAS_ORACLE_PERCENTILE_MM", "50")) / 100,
+        block_count=int(os.getenv("GAS_ORACLE_BLOCK_COUNT", "20")),
+    )
+
+
 @functools.cache
 def build_transaction_service():
-    return BlockchainTransactionService(web3=build_web3_provider())
+    return BlockchainTransactionService(
+        web3=build_web3_provider(), gas_oracle=build_gas_oracle(), gas_limit_model=build_gas_limit_model()
+    )
 
 
 @functools.cache
@@ -136,4 +161,5 @@ def build_key_management_service():
         key_repository=build_wallet_key_repository(),
         region_name="eu-west-1",
         stage=Stage(os.getenv("STAGE", "")),
+        max_pool_connections=int(os.getenv("KMS_MAX_CONNECTIONS", "50")),
     )
@@ -1,3 +1,4 @@
+from .gas import GasLimitModel, GasOracle
 from .key import AWSKeyManagementService, StubKeyManagementService
 from .trade import BlockchainTransactionService, StubTransactionService
 from .web3 import HTTPWeb3Provider
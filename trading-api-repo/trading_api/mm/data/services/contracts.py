@@ -0,0 +1,56 @@
+import json
+import logging
+import threading
+from pathlib import Path
+from typing import Callable, Dict, Iterable, Tuple, Type
+
+from web3 import Web3
+from web3.contract import Contract
+
+from mm.domain.models import ChainId, ContractAddress
+
+logger = logging.getLogger(__name__)
+
+
+class ContractRegistry:
+    """Builds every contract once, from then on the same `Contract` is handed out for a chain, address and artifact."""
+
+    def __init__(self, web3_fn: Callable[[ChainId], Web3]):
+        self.web3_fn = web3_fn
+        self.abis: Dict[Path, list] = {}
+        self.factories: Dict[Tuple[ChainId, Path], Type[Contract]] = {}
+        self.contracts: Dict[Tuple[ChainId, ContractAddress, Path], Contract] = {}
+        self.lock = threading.Lock()
+
+    def get_contract(self, chain: ChainId, address: ContractAddress, artifact: Path) -> Contract:
+        key = (chain, address, artifact)
+        if key not in self.contracts:
+            with self.lock:
+                if key not in self.contracts:
+                    if (chain, artifact) not in self.factories:
+                        abi = self.get_abi(artifact)
+                        self.factories[(chain, artifact)] = self.web3_fn(chain).eth.contract(abi=abi)  # type: ignore
+                    self.contracts[key] = self.factories[(chain, artifact)](address=address)  # type: ignore
+
+        return self.contracts[key]
+
+    def get_abi(self, artifact: Path) -> list:
+        if artifact not in self.abis:
+            self.abis[artifact] = load_abi(artifact)
+
+        return self.abis[artifact]
+
+    def preload(self, artifacts: Iterable[Path]):
+        for artifact in artifacts:
+            try:
+                self.get_abi(artifact)
+            except OSError as e:
+                logger.warning(f"Contract artifact not found, trying again when it's used. {artifact=} {e=}")
+
+
+def load_abi(path: Path) -> list:
+    with open(path) as f:
+        info_json = json.load(f)
+        abi = info_json["abi"]
+
+    return abi
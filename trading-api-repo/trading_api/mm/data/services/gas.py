@@ -0,0 +1,135 @@
+import logging
+import threading
+import time
+from collections import deque
+from typing import Deque, Dict, List, Optional, Tuple
+
+from mm.domain.models import ChainId
+from mm.domain.services import Web3Provider
+
+logger = logging.getLogger(__name__)
+
+# The chain, the contract function and the lengths of its list arguments, e.g. the number of beneficiaries.
+GasShape = Tuple[ChainId, str, Tuple[int, ...]]
+
+
+class GasOracle:
+    """Serves gas prices based on the transactions included in recent blocks, sampled in a background thread.
+
+    The first request for a chain starts a thread that reads every new block with its transactions, checking for one
+    each `poll_interval_s`. The price is the `percentile` of the gas prices in the last `block_count` blocks. Until
+    there are samples the node's gas price is used.
+    """
+
+    def __init__(
+        self, web3: Web3Provider, percentile: float = 0.5, block_count: int = 20, poll_interval_s: float = 1.0
+    ):
+        self.web3 = web3
+        self.percentile = percentile
+        self.block_count = block_count
+        self.poll_interval_s = poll_interval_s
+        self.samples: Dict[ChainId, Deque[List[int]]] = {}
+        self.prices: Dict[ChainId, int] = {}
+        self.threads: Dict[ChainId, threading.Thread] = {}
+        self.lock = threading.Lock()
+        self.sampled = 0
+        self.fallbacks = 0
+
+    def get_gas_price(self, chain: ChainId) -> int:
+        self._start(chain)
+        gas_price = self.prices.get(chain)
+        if gas_price is not None:
+            return gas_price
+
+        self.fallbacks += 1
+        return self.web3.get_web3(chain).eth.gas_price
+
+    def _start(self, chain: ChainId):
+        with self.lock:
+            if chain in self.threads:
+                return
+            self.threads[chain] = threading.Thread(target=self._run, args=(chain,), name=f"gas-{chain}", daemon=True)
+        self.threads[chain].start()
+
+    def _run(self, chain: ChainId):
+        last_block = None
+        while True:
+            try:
+                w3 = self.web3.get_web3(chain)
+                block_number = w3.eth.block_number
+                first_block = block_number - self.block_count + 1 if last_block is None else last_block + 1
+                for number in range(max(first_block, 0), block_number + 1):
+                    self.sample(chain, number)
+                    last_block = number
+            except Exception as e:
+                logger.warning(f"Error sampling gas prices. {chain=} {e=}", exc_info=True)
+
+            time.sleep(self.poll_interval_s)
+
+    def sample(self, chain: ChainId, block_number: int):
+        block = self.web3.get_web3(chain).eth.get_block(block_number, full_transactions=True)
+        # System transactions, like the validator rewards on BSC, are free.
+        gas_prices = [int(transaction["gasPrice"]) for transaction in block["transactions"]]
+        gas_prices = [gas_price for gas_price in gas_prices if gas_price > 0]
+
+        samples = self.samples.setdefault(chain, deque(maxlen=self.block_count))
+        samples.append(gas_prices)
+        self.sampled += 1
+
+        all_gas_prices = sorted(gas_price for block in samples for gas_price in block)
+        if not all_gas_prices:
+            self.prices.pop(chain, None)
+            return
+
+        self.prices[chain] = all_gas_prices[min(int(len(all_gas_prices) * self.percentile), len(all_gas_prices) - 1)]
+
+    def get_metrics(self) -> dict:
+        metrics = {"sampled": self.sampled, "fallbacks": self.fallbacks}
+        for chain, gas_price in self.prices.items():
+            metrics[f"{chain.value}.gwei"] = gas_price / 1e9
+
+        return metrics
+
+
+class GasLimitModel:
+    """Serves gas limits learned from the gas used by earlier transactions of the same shape.
+
+    The gas used by the last `max_samples` successful transactions of every shape is kept in memory. Once a shape has
+    `min_samples`, its gas limit is the `percentile` of those with a `margin` on top, until then there is no limit.
+    """
+
+    def __init__(self, percentile: float = 0.99, margin: float = 1.1, min_samples: int = 5, max_samples: int = 100):
+        self.percentile = percentile
+        self.margin = margin
+        self.min_samples = min_samples
+        self.max_samples = max_samples
+        self.samples: Dict[GasShape, Deque[int]] = {}
+        self.limits: Dict[GasShape, int] = {}
+        self.lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+
+    def get_gas_limit(self, shape: GasShape) -> Optional[int]:
+        gas_limit = self.limits.get(shape)
+        if gas_limit is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        return gas_limit
+
+    def record(self, shape: GasShape, gas_used: int):
+        with self.lock:
+            samples = self.samples.setdefault(shape, deque(maxlen=self.max_samples))
+            samples.append(gas_used)
+            self.recorded += 1
+            if len(samples) < self.min_samples:
+                return
+
+            gas_used_sorted = sorted(samples)
+            gas_used = gas_used_sorted[min(int(len(samples) * self.percentile), len(samples) - 1)]
+            self.limits[shape] = int(gas_used * self.margin)
+
+    def get_metrics(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "recorded": self.recorded, "shapes": len(self.limits)}
@@ -1,10 +1,12 @@
 import logging
+import threading
 import uuid
 from collections import namedtuple
-from typing import Tuple
+from typing import Dict, Tuple
 
 import asn1
 from boto3 import Session
+from botocore.config import Config
 from Crypto.Hash import keccak
 from cytoolz import dissoc, merge, pipe
 from cytoolz.curried import partial
@@ -16,11 +18,13 @@ from eth_account._utils.legacy_transactions import (
     encode_transaction,
 )
 from eth_account._utils.validation import LEGACY_TRANSACTION_FORMATTERS
+from eth_keys import keys
+from eth_keys.exceptions import BadSignature
 from eth_typing import HexStr
 from eth_utils.curried import apply_formatters_to_dict
 from hexbytes import HexBytes
 from web3 import Web3
-from web3.contract import Contract
+from web3.constants import ADDRESS_ZERO
 
 from mm import Stage
 from mm.domain.models import ChainId, KeyAddressPair, SignedTransaction, Transaction
@@ -60,26 +64,48 @@ SignedMaterial = namedtuple("SignedMaterial", ["signature", "message_hash", "rsv
 
 
 class AWSKeyManagementServiceClient:
-    def __init__(self, region_name: str, key_manager_username: str = None, key_manager_password: str = None):
+    """Builds the boto3 KMS client once, every `with` block after that gets the same client.
+
+    Building a client resolves the credentials, loads the service model and sets up the endpoint, and every client has
+    its own connection pool. boto3 clients are thread safe, so signing from many threads shares the client and reuses
+    its kept-alive connections.
+    """
+
+    def __init__(
+        self,
+        region_name: str,
+        key_manager_username: str = None,
+        key_manager_password: str = None,
+        max_pool_connections: int = 50,
+    ):
         self.client = None
         self.key_manager_username = key_manager_username
         self.key_manager_password = key_manager_password
         self.region_name = region_name
+        self.max_pool_connections = max_pool_connections
+        self.lock = threading.Lock()
 
     def __enter__(self):
+        if self.client is None:
+            with self.lock:
+                if self.client is None:
+                    self.client = self._build_client()
+
+        return self.client
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    def _build_client(self):
+        config = Config(max_pool_connections=self.max_pool_connections)
         if self.key_manager_password is not None and self.key_manager_username is not None:
-            self.client = Session(
+            return Session(
                 aws_access_key_id=self.key_manager_username,
                 aws_secret_access_key=self.key_manager_password,
                 region_name=self.region_name,
-            ).client("kms")
-            return self.client
+            ).client("kms", config=config)
 
-        self.client = Session(region_name=self.region_name).client("kms")
-        return self.client
-
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        self.client = None
+        return Session(region_name=self.region_name).client("kms", config=config)
 
 
 class AWSKeyManagementService(KeyManagementService):
@@ -104,16 +130,26 @@ class AWSKeyManagementService(KeyManagementService):
         stage: Stage,
         key_manager_username: str = None,
         key_manager_password: str = None,
+        max_pool_connections: int = 50,
     ):
+        """
+
+        :param max_pool_connections: Connections to KMS kept open, signing beyond that many at once has to wait.
+        """
         self.key_repository = key_repository
         self.web3_provider = web3_provider
         self.stage = stage
         self.key_manager_username = key_manager_username
         self.key_manager_password = key_manager_password
         self.region_name = region_name
+        # A key keeps its public key, the mapping is never invalidated. Signing takes the key alias from the pair.
+        self.key_infos: Dict[str, PublicKey] = {}
+        self.kms_client = AWSKeyManagementServiceClient(
+            region_name, key_manager_username, key_manager_password, max_pool_connections
+        )
 
     def __client(self) -> AWSKeyManagementServiceClient:
-        return AWSKeyManagementServiceClient(self.region_name, self.key_manager_username, self.key_manager_password)
+        return self.kms_client
 
     def sign_transaction(self, transaction: Transaction, pair: KeyAddressPair, chain: ChainId) -> SignedTransaction:
         if pair.spec is None:
@@ -199,9 +235,7 @@ class AWSKeyManagementService(KeyManagementService):
                     KeyId=f"alias/{key_id}", Message=message, MessageType="DIGEST", SigningAlgorithm="ECDSA_SHA_256"
                 )["Signature"]
 
-                recovered_address, rsv = self._recover_rsv_from_transaction(
-                    address, message, signature, self.web3_provider.get_ecr_contract(chain=chain)
-                )
+                recovered_address, rsv = self._recover_rsv_from_transaction(address, message, signature)
                 recovered_address = Web3.toChecksumAddress(recovered_address)
 
                 assert recovered_address == address, f"{recovered_address=} and {address=} don't match"
@@ -230,6 +264,9 @@ class AWSKeyManagementService(KeyManagementService):
             raise e
 
     def key_alias_to_key_info(self, key_alias: str) -> PublicKey:
+        if key_alias in self.key_infos:
+            return self.key_infos[key_alias]
+
         try:
             with self.__client() as client:
                 der = client.get_public_key(
@@ -238,13 +275,15 @@ class AWSKeyManagementService(KeyManagementService):
 
                 pub_key = self._decode_der_to_key(der)
                 address = self._key2address(pub_key)
-                return PublicKey(der, address, pub_key)
+                self.key_infos[key_alias] = PublicKey(der, address, pub_key)
+
+                return self.key_infos[key_alias]
         except Exception as e:
             logger.error(f"failed fetching {key_alias=}: {e} ({e.__class__})")
             raise e
 
     def _recover_rsv_from_transaction(
-        self, contract_address: str, transaction_hash: bytes, transaction_signature: bytes, ecr_contract: Contract
+        self, contract_address: str, transaction_hash: bytes, transaction_signature: bytes
     ) -> Tuple[HexStr, RSV]:
 
         logger.info(f"TxHash: {transaction_hash=}")
@@ -253,22 +292,22 @@ class AWSKeyManagementService(KeyManagementService):
         r, s = self._find_r_s_from_signature(transaction_signature)
         logger.info(f"Found values: {r=} {s=}")
 
-        recovered_address, v = self._find_right_pubkey((r, s), transaction_hash, contract_address, ecr_contract)
+        recovered_address, v = self._find_right_pubkey((r, s), transaction_hash, contract_address)
         logger.info(f"Found values r,s,v {r=} {s=} {v=}")
 
         return recovered_address, RSV(r, s, v)
 
     def _find_right_pubkey(
-        self, rs: Tuple[int, int], transaction_hash: bytes, contract_address: str, ecr_contract: Contract
+        self, rs: Tuple[int, int], transaction_hash: bytes, contract_address: str
     ) -> Tuple[HexStr, int]:
         v = 27
-        address = self._recover_address((*rs, v), transaction_hash, ecr_contract)
+        address = self._recover_address((*rs, v), transaction_hash)
         if address == contract_address:
             logger.debug(f"adress with v=27 equals original_adress {address=} {contract_address=}")
             return address, v
 
         v = 28
-        address = self._recover_address((*rs, v), transaction_hash, ecr_contract)
+        address = self._recover_address((*rs, v), transaction_hash)
         assert address == contract_address, "original adresss wasn't recovered"
         logger.debug(
             f"adress with v=28 equals original_adress {address=} {contract_address=}",
@@ -276,20 +315,17 @@ class AWSKeyManagementService(KeyManagementService):
 
         return address, v
 
-    def _recover_address(self, rsv: Tuple[int, int, int], transaction_hash: bytes, ecr_contract: Contract) -> HexStr:
-        ec_recover_args = (
-            transaction_hash,
-            rsv[2],
-            self._to_32byte_hex(rsv[0]),
-            self._to_32byte_hex(rsv[1]),
-        )
-
-        result_pub_key: str = ecr_contract.functions.ecr(*ec_recover_args).call()
-        logger.info(f"{ec_recover_args=}")
-        logger.info(f"contract.functions.ecr(*ec_recover_args).call()={result_pub_key} {type(result_pub_key)=}")
-        recovered_address = Web3.toHex(hexstr=result_pub_key)  # type: ignore
-        recovered_address = Web3.toChecksumAddress(recovered_address)
-        logger.info(f"Recovered address={recovered_address} {rsv[2]=}")
+    @staticmethod
+    def _recover_address(rsv: Tuple[int, int, int], transaction_hash: bytes) -> HexStr:
+        """Recovers the address that signed the hash, the way the `ecrecover` precompile does but without a node."""
+        r, s, v = rsv
+        try:
+            signature = keys.Signature(vrs=(v - 27, r, s))
+            recovered_address = signature.recover_public_key_from_msg_hash(transaction_hash).to_checksum_address()
+        except BadSignature:
+            # The precompile returns the zero address for signatures that don't recover.
+            recovered_address = ADDRESS_ZERO
+        logger.info(f"Recovered address={recovered_address} {v=}")
 
         return recovered_address
 
@@ -388,10 +424,6 @@ class AWSKeyManagementService(KeyManagementService):
 
                 input_stream.leave()
 
-    @staticmethod
-    def _to_32byte_hex(val):
-        return Web3.toHex(Web3.toBytes(val).rjust(32, b"\0"))
-
     @staticmethod
     def _decode_signature(input_stream, return_values=None):
         """Decode ASN.1 data and find the values r and s."""
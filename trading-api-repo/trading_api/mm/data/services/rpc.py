@@ -0,0 +1,378 @@
+import json
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent import futures
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Deque, Dict, List, Optional, Sequence, Tuple, TypeVar
+
+import requests
+from web3 import Web3
+from web3._utils.encoding import Web3JsonEncoder
+from web3._utils.request import make_post_request
+from web3.providers.base import JSONBaseProvider
+from web3.providers.rpc import HTTPProvider
+from web3.types import RPCEndpoint, RPCResponse
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Errors that say something about the node rather than about the request, the request is sent to the next node.
+FAILOVER_ERRORS = (requests.RequestException, json.JSONDecodeError)
+# Requests that can safely be sent to two nodes at once, they are hedged instead of batched.
+HEDGED_METHODS = {"eth_sendRawTransaction", "eth_call", "eth_getTransactionReceipt"}
+KNOWN_TRANSACTION_ERRORS = ("already known", "known transaction")
+
+
+class Endpoint:
+    """A single RPC node, with its latency and error rate tracked as exponentially weighted moving averages."""
+
+    def __init__(self, uri: str, ewma_alpha: float):
+        self.uri = uri
+        self.ewma_alpha = ewma_alpha
+        self.latency_s: Optional[float] = None
+        self.error_rate = 0.0
+        self.failed_at: Optional[float] = None
+        self.requests = 0
+        self.errors = 0
+
+    def observe(self, latency_s: float, ok: bool):
+        self.requests += 1
+        self.error_rate += self.ewma_alpha * ((0.0 if ok else 1.0) - self.error_rate)
+        if ok:
+            self.latency_s = (
+                latency_s if self.latency_s is None else self.latency_s + self.ewma_alpha * (latency_s - self.latency_s)
+            )
+        else:
+            self.errors += 1
+            self.failed_at = time.monotonic()
+
+    def is_healthy(self, cooldown_s: float) -> bool:
+        return self.failed_at is None or time.monotonic() - self.failed_at > cooldown_s
+
+    def expected_latency_s(self) -> float:
+        # Every failed attempt costs another round trip, so flaky nodes are slower than they look.
+        return (self.latency_s or 0.0) / max(1.0 - self.error_rate, 0.01)
+
+
+class EndpointPool:
+    """The RPC nodes of one chain, requests go to the fastest healthy node and fail over to the next one.
+
+    Nodes are ranked by their latency, adjusted for their error rate. Nodes nobody sent a request to yet rank first, so
+    every node gets measured. A node that failed is only tried as a last resort, until `cooldown_s` after the failure.
+
+    Hedged requests are sent to the second best node as well when the best one didn't answer within the
+    `hedge_percentile` of the latencies seen lately, the first answer is taken. Only use them for idempotent requests.
+    """
+
+    def __init__(
+        self,
+        uris: Sequence[str],
+        ewma_alpha: float = 0.2,
+        cooldown_s: float = 5.0,
+        hedge_percentile: float = 0.95,
+        min_hedge_delay_s: float = 0.05,
+        default_hedge_delay_s: float = 1.0,
+    ):
+        if not uris:
+            raise ValueError("An endpoint pool needs at least one endpoint.")
+
+        self.endpoints = [Endpoint(uri, ewma_alpha) for uri in uris]
+        self.cooldown_s = cooldown_s
+        self.hedge_percentile = hedge_percentile
+        self.min_hedge_delay_s = min_hedge_delay_s
+        self.default_hedge_delay_s = default_hedge_delay_s
+        self.latencies: Deque[float] = deque(maxlen=1000)
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.executor: Optional[ThreadPoolExecutor] = None
+
+    def ranked(self) -> List[Endpoint]:
+        healthy = [e for e in self.endpoints if e.is_healthy(self.cooldown_s)]
+        unhealthy = [e for e in self.endpoints if e not in healthy]
+
+        return sorted(healthy, key=Endpoint.expected_latency_s) + sorted(unhealthy, key=lambda e: e.failed_at or 0.0)
+
+    def hedge_delay_s(self) -> float:
+        if len(self.latencies) < 20:
+            return self.default_hedge_delay_s
+
+        latencies = sorted(self.latencies)
+        percentile = latencies[min(int(len(latencies) * self.hedge_percentile), len(latencies) - 1)]
+
+        return max(percentile, self.min_hedge_delay_s)
+
+    def request(self, send: Callable[[Endpoint], T]) -> T:
+        error: Optional[Exception] = None
+        for endpoint in self.ranked():
+            try:
+                return self._attempt(endpoint, send)
+            except FAILOVER_ERRORS as e:
+                error = e
+
+        raise error  # type: ignore
+
+    def hedged_request(self, send: Callable[[Endpoint], RPCResponse]) -> RPCResponse:
+        ranked = self.ranked()
+        if len(ranked) < 2 or not self.hedge_percentile:
+            return self.request(send)
+
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="rpc-hedge")
+
+        primary = self.executor.submit(self._attempt, ranked[0], send)
+        done, _ = futures.wait([primary], timeout=self.hedge_delay_s())
+        if not done:
+            self.hedges += 1
+            hedge = self.executor.submit(self._attempt, ranked[1], send)
+            attempts = {primary, hedge}
+            while attempts:
+                done, attempts = futures.wait(attempts, return_when=futures.FIRST_COMPLETED)
+                for attempt in sorted(done, key=lambda a: a is hedge):
+                    # Wait for the other node when this one answered with an error, it may have accepted the request.
+                    if attempt.exception() is None and ("error" not in attempt.result() or not attempts):
+                        self.hedge_wins += attempt is hedge
+                        return attempt.result()
+        elif primary.exception() is None:
+            return primary.result()
+
+        return self.request(send)
+
+    def get_metrics(self) -> Dict[str, float]:
+        # Endpoints are reported by position, their URIs can contain API keys.
+        metrics: Dict[str, float] = {
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "hedge_delay_ms": self.hedge_delay_s() * 1000,
+        }
+        for i, endpoint in enumerate(self.endpoints):
+            metrics[f"{i}.latency_ms"] = (endpoint.latency_s or 0.0) * 1000
+            metrics[f"{i}.error_rate"] = endpoint.error_rate
+            metrics[f"{i}.requests"] = endpoint.requests
+            metrics[f"{i}.errors"] = endpoint.errors
+            metrics[f"{i}.healthy"] = float(endpoint.is_healthy(self.cooldown_s))
+
+        return metrics
+
+    def _attempt(self, endpoint: Endpoint, send: Callable[[Endpoint], T]) -> T:
+        started = time.monotonic()
+        try:
+            response = send(endpoint)
+        except FAILOVER_ERRORS as e:
+            self._failed(endpoint, started, e)
+            raise
+
+        self._succeeded(endpoint, started)
+        return response
+
+    def _succeeded(self, endpoint: Endpoint, started: float):
+        latency_s = time.monotonic() - started
+        endpoint.observe(latency_s, ok=True)
+        self.latencies.append(latency_s)
+
+    @staticmethod
+    def _failed(endpoint: Endpoint, started: float, e: Exception):
+        endpoint.observe(time.monotonic() - started, ok=False)
+        logger.warning(f"RPC endpoint failed, trying the next one. error_rate={endpoint.error_rate:.2f} {e=}")
+
+
+class CallCache:
+    """Results of `eth_call`s against the latest block, they can only change when a new block comes in.
+
+    Calls are keyed by their transaction and the block number, and sent pinned to that block, so the result really
+    belongs to it. The latest block number is taken from the `eth_blockNumber` responses that pass by, and looked up
+    when we haven't seen one for `block_refresh_s`. All results are dropped once a newer block shows up.
+    """
+
+    def __init__(self, block_refresh_s: float = 1.0, max_size: int = 10_000):
+        self.block_refresh_s = block_refresh_s
+        self.max_size = max_size
+        self.block_number: Optional[int] = None
+        self.block_seen_at = -math.inf
+        self.results: "OrderedDict[Tuple[str, int], RPCResponse]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def call(self, transaction: dict, request: Callable[[str, list], RPCResponse]) -> RPCResponse:
+        if time.monotonic() - self.block_seen_at > self.block_refresh_s:
+            self.observe_block(request("eth_blockNumber", []))
+        if self.block_number is None:
+            # We couldn't get a block number yet, there is nothing to pin the call to.
+            self.misses += 1
+            return request("eth_call", [transaction, "latest"])
+
+        key = (json.dumps(transaction, sort_keys=True, cls=Web3JsonEncoder), self.block_number)
+        if key in self.results:
+            self.hits += 1
+            return self.results[key]
+
+        self.misses += 1
+        response = request("eth_call", [transaction, hex(key[1])])  # type: ignore
+        if "error" in response:
+            # E.g. the node isn't at that block yet.
+            return request("eth_call", [transaction, "latest"])
+
+        if key[1] == self.block_number:
+            self.results[key] = response  # type: ignore
+            while len(self.results) > self.max_size:
+                self.results.popitem(last=False)
+
+        return response
+
+    def observe_block(self, response: RPCResponse):
+        if "result" not in response:
+            return
+
+        block_number = int(response["result"], 16)
+        self.block_seen_at = time.monotonic()
+        if self.block_number is None or block_number > self.block_number:
+            self.block_number = block_number
+            self.results.clear()
+
+    def get_metrics(self) -> Dict[str, float]:
+        return {"call_hits": self.hits, "call_misses": self.misses, "block_number": self.block_number or 0}
+
+
+class Batch:
+    """Requests collected by the thread that opened the batch, the other threads wait until it sent them."""
+
+    def __init__(self):
+        self.requests: List[dict] = []
+        self.responses: List[RPCResponse] = []
+        self.error: Optional[Exception] = None
+        self.sent = threading.Event()
+
+
+class PooledHTTPProvider(JSONBaseProvider):
+    """Synchronous provider sending every request through an `EndpointPool`.
+
+    Like `HTTPProvider` it keeps a keep-alive session per node, and retries requests when all nodes failed. With a
+    `batch_window_s` the requests other threads make within that window go out together as one JSON-RPC batch.
+    Idempotent requests are hedged instead, see `EndpointPool`. Calls against the latest block are served from the
+    `call_cache` if there is one.
+    """
+
+    _middlewares = HTTPProvider._middlewares
+
+    def __init__(
+        self,
+        pool: EndpointPool,
+        timeout_s: float = 10.0,
+        batch_window_s: float = 0.0,
+        max_batch_size: int = 100,
+        call_cache: Optional[CallCache] = None,
+    ):
+        self.pool = pool
+        self.call_cache = call_cache
+        self.timeout_s = timeout_s
+        self.batch_window_s = batch_window_s
+        self.max_batch_size = max_batch_size
+        self.batch: Optional[Batch] = None
+        self.batch_lock = threading.Lock()
+        super().__init__()
+
+    def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        if self.call_cache is None:
+            return self._request(method, params)
+        if method == "eth_call" and list(params[1:]) in ([], ["latest"]):
+            return self.call_cache.call(params[0], self._request)  # type: ignore
+
+        response = self._request(method, params)
+        if method == "eth_blockNumber":
+            self.call_cache.observe_block(response)
+
+        return response
+
+    def _request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        request = make_rpc_request(method, params, next(self.request_counter))
+        if method in HEDGED_METHODS:
+            request_data = encode_rpc_requests([request])
+            # Checked per node, so a node that already knows the transaction doesn't make us wait for the other one.
+            return self.pool.hedged_request(
+                lambda endpoint: accept_known_transaction(request, self._post(endpoint, request_data))
+            )
+        if self.batch_window_s <= 0:
+            return self._send([request])[0]
+
+        with self.batch_lock:
+            batch = self.batch
+            opened = batch is None
+            if batch is None:
+                batch = self.batch = Batch()
+            position = len(batch.requests)
+            batch.requests.append(request)
+            if len(batch.requests) >= self.max_batch_size:
+                self.batch = None
+
+        if opened:
+            time.sleep(self.batch_window_s)
+            with self.batch_lock:
+                if self.batch is batch:
+                    self.batch = None
+            try:
+                batch.responses = self._send(batch.requests)
+            except Exception as e:
+                batch.error = e
+            batch.sent.set()
+        else:
+            batch.sent.wait()
+
+        if batch.error is not None:
+            raise batch.error
+
+        return batch.responses[position]
+
+    def _send(self, requests: List[dict]) -> List[RPCResponse]:
+        request_data = encode_rpc_requests(requests)
+        response = self.pool.request(lambda endpoint: self._post(endpoint, request_data))
+
+        return match_rpc_responses(requests, response)
+
+    def _post(self, endpoint: Endpoint, request_data: bytes) -> Any:
+        raw_response = make_post_request(
+            endpoint.uri, request_data, headers={"Content-Type": "application/json"}, timeout=self.timeout_s
+        )
+
+        # Decoded per node, so a node answering with an error page counts as a failure of that node.
+        return self.decode_rpc_response(raw_response)
+
+
+def make_rpc_request(method: RPCEndpoint, params: Any, request_id: int) -> dict:
+    return {"jsonrpc": "2.0", "method": method, "params": params or [], "id": request_id}
+
+
+def accept_known_transaction(request: dict, response: RPCResponse) -> RPCResponse:
+    """A transaction a node already has was sent before, e.g. by a hedged request, so that counts as sent."""
+    error = response.get("error")
+    message = str(error.get("message") if isinstance(error, dict) else error).lower()
+    if request["method"] != "eth_sendRawTransaction" or not any(m in message for m in KNOWN_TRANSACTION_ERRORS):
+        return response
+
+    return {"jsonrpc": "2.0", "id": request["id"], "result": Web3.keccak(hexstr=request["params"][0]).hex()}
+
+
+def encode_rpc_requests(requests: List[dict]) -> bytes:
+    """A single request is sent as is, more of them as a batch."""
+    return json.dumps(requests[0] if len(requests) == 1 else requests, cls=Web3JsonEncoder).encode()
+
+
+def match_rpc_responses(requests: List[dict], response: Any) -> List[RPCResponse]:
+    """Put the responses in the order of the requests, nodes can answer a batch in any order."""
+    if isinstance(response, dict):
+        # The response to a single request, or a node rejecting the whole batch.
+        return [response if len(requests) == 1 else {**response, "id": request["id"]} for request in requests]
+
+    responses = {r.get("id"): r for r in response}
+    missing = {"code": -32603, "message": "No response to this request in the batch."}
+
+    return [
+        responses.get(request["id"], {"jsonrpc": "2.0", "id": request["id"], "error": missing}) for request in requests
+    ]
+
+
+def parse_endpoint_uris(uris: str) -> List[str]:
+    """Endpoints are configured as a comma separated list of URIs."""
+    return [uri.strip() for uri in uris.split(",") if uri.strip()]
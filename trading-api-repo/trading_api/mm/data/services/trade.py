@@ -1,14 +1,18 @@
 import logging
 import math
+import time
+from collections import OrderedDict
 from decimal import Decimal
-from typing import List
+from typing import Dict, Iterable, List, Optional, Tuple
 
 from hexbytes import HexBytes
 from web3 import Web3
-from web3.contract import Contract, ContractFunction
+from web3.contract import Contract
 from web3.exceptions import TransactionNotFound
 from web3.types import Nonce, Wei
 
+from mm.data.services.calldata import build_transaction
+from mm.data.services.gas import GasLimitModel, GasOracle, GasShape
 from mm.domain.exceptions import BlockchainError
 from mm.domain.models import (
     Amounts,
@@ -61,9 +65,25 @@ class StubTransactionService(TransactionService):
 class BlockchainTransactionService(TransactionService):
     estimated_gas_factor = 20
     estimated_gas_price_factor = 1.2
-
-    def __init__(self, web3: Web3Provider):
+    # A transaction this many blocks deep is final, its status is kept in memory for good.
+    confirmations = 15
+    # Statuses that can still change are kept for about one block interval.
+    pending_status_ttl_s = 3.0
+    status_cache_size = 10_000
+
+    def __init__(
+        self,
+        web3: Web3Provider,
+        gas_oracle: Optional[GasOracle] = None,
+        gas_limit_model: Optional[GasLimitModel] = None,
+    ):
         self.web3 = web3
+        self.gas_oracle = gas_oracle
+        self.gas_limit_model = gas_limit_model
+        self.statuses: "OrderedDict[Tuple[ChainId, TransactionHash], Tuple[float, TransactionStatus]]" = OrderedDict()
+        self.status_hits = 0
+        self.status_misses = 0
+        self.chain_ids: Dict[ChainId, int] = {}
 
     def create_trade_transaction(self, pair: KeyAddressPair, trade: Trade) -> Transaction:
         logger.info(f"Building transaction: {pair=} {trade=})")
@@ -72,20 +92,14 @@ class BlockchainTransactionService(TransactionService):
 
             contract = get_contract(self.web3, pair.contract, pair.chain)
 
-            tx_func = get_trading_function(trade, contract)
+            fn_name = get_trading_function_name(trade)
             tx_args = (
                 _to_wei(w3, trade.amounts),
                 trade.addresses,
                 _to_raw_amount(trade.slippage),
                 trade.exchange.value,
             )
-            tx = tx_func(*tx_args).buildTransaction(
-                {
-                    "gas": Wei(self.estimated_gas_factor * w3.eth.estimate_gas({})),
-                    "gasPrice": Wei(int(self.estimated_gas_price_factor * w3.eth.gas_price)),
-                    "nonce": Nonce(w3.eth.get_transaction_count(pair.wallet)),
-                }
-            )
+            tx = self._build_transaction(pair, contract, fn_name, tx_args)
 
         except Exception as e:
             logger.error(e)
@@ -102,20 +116,14 @@ class BlockchainTransactionService(TransactionService):
 
             contract = get_contract(self.web3, pair.contract, pair.chain)
 
-            tx_func = get_swapping_function(contract)
+            fn_name = "swap"
             tx_args = (
                 _to_wei(w3, swap.amounts),
                 swap.addresses,
                 swap.seller,
                 swap.exchange.value,
             )
-            tx = tx_func(*tx_args).buildTransaction(
-                {
-                    "gas": Wei(self.estimated_gas_factor * w3.eth.estimate_gas({})),
-                    "gasPrice": Wei(int(self.estimated_gas_price_factor * w3.eth.gas_price)),
-                    "nonce": Nonce(w3.eth.get_transaction_count(pair.wallet)),
-                }
-            )
+            tx = self._build_transaction(pair, contract, fn_name, tx_args)
 
         except Exception as e:
             logger.error(e)
@@ -132,7 +140,7 @@ class BlockchainTransactionService(TransactionService):
 
             contract = get_contract(self.web3, pair.contract, pair.chain)
 
-            tx_func = get_staking_function(contract)
+            fn_name = "stakeInLiquidityMaker"
             tx_args = (
                 _to_wei(w3, stake.amounts_base),
                 stake.addresses_base,
@@ -141,13 +149,7 @@ class BlockchainTransactionService(TransactionService):
                 _to_raw_amount(stake.slippage),
                 stake.exchange.value,
             )
-            tx = tx_func(*tx_args).buildTransaction(
-                {
-                    "gas": Wei(self.estimated_gas_factor * w3.eth.estimate_gas({})),
-                    "gasPrice": Wei(int(self.estimated_gas_price_factor * w3.eth.gas_price)),
-                    "nonce": Nonce(w3.eth.get_transaction_count(pair.wallet)),
-                }
-            )
+            tx = self._build_transaction(pair, contract, fn_name, tx_args)
 
         except Exception as e:
             logger.error(e)
@@ -161,19 +163,11 @@ class BlockchainTransactionService(TransactionService):
         logger.info(f"Building transaction: {pair=} {release=})")
 
         try:
-            w3 = self.web3.get_web3(pair.chain)
-
             contract = get_contract(self.web3, pair.contract, pair.chain)
 
-            tx_func = get_release_for_function(contract)
+            fn_name = "releaseFor"
             tx_args = (release.addresses,)
-            tx = tx_func(*tx_args).buildTransaction(
-                {
-                    "gas": Wei(self.estimated_gas_factor * w3.eth.estimate_gas({})),
-                    "gasPrice": Wei(int(self.estimated_gas_price_factor * w3.eth.gas_price)),
-                    "nonce": Nonce(w3.eth.get_transaction_count(pair.wallet)),
-                }
-            )
+            tx = self._build_transaction(pair, contract, fn_name, tx_args)
 
         except Exception as e:
             logger.error(e)
@@ -183,6 +177,56 @@ class BlockchainTransactionService(TransactionService):
 
         return Transaction(tx)
 
+    def _build_transaction(self, pair: KeyAddressPair, contract: Contract, fn_name: str, args: tuple) -> dict:
+        """Builds the transaction with a precompiled call data encoder, the same one web3's `buildTransaction` gives."""
+        w3 = self.web3.get_web3(pair.chain)
+
+        return build_transaction(
+            contract,
+            fn_name,
+            args,
+            {
+                "gas": self._gas_limit(pair, contract, fn_name, args),
+                "gasPrice": self._gas_price(pair.chain),
+                "chainId": self._chain_id(pair.chain),
+                "nonce": Nonce(w3.eth.get_transaction_count(pair.wallet)),
+            },
+        )
+
+    def _gas_limit(self, pair: KeyAddressPair, contract: Contract, fn_name: str, args: tuple) -> Wei:
+        """Returns the gas limit for a contract call.
+
+        With a gas limit model, calls of a shape that was sent before get the learned limit, for others the gas of the
+        actual call is estimated. When that fails, or without a model, it's a multiple of the gas of an empty transaction.
+        """
+        w3 = self.web3.get_web3(pair.chain)
+        if self.gas_limit_model is not None:
+            gas_limit = self.gas_limit_model.get_gas_limit(get_gas_shape(pair.chain, fn_name, args))
+            if gas_limit is not None:
+                return Wei(gas_limit)
+
+            try:
+                call = contract.get_function_by_name(fn_name)(*args)
+                return Wei(int(self.gas_limit_model.margin * call.estimateGas({"from": pair.wallet})))
+            except Exception as e:
+                logger.warning(f"Error estimating the gas of a transaction. {pair=} {e=}")
+
+        return Wei(self.estimated_gas_factor * w3.eth.estimate_gas({}))
+
+    def _chain_id(self, chain: ChainId) -> int:
+        if chain not in self.chain_ids:
+            self.chain_ids[chain] = self.web3.get_web3(chain).eth.chain_id
+
+        return self.chain_ids[chain]
+
+    def _gas_price(self, chain: ChainId) -> Wei:
+        if self.gas_oracle is None:
+            gas_price = self.web3.get_web3(chain).eth.gas_price
+        else:
+            gas_price = self.gas_oracle.get_gas_price(chain)
+
+        return Wei(int(self.estimated_gas_price_factor * gas_price))
+
     def send(self, transaction: SignedTransaction) -> TransactionHash:
         logger.info(f"Sending transaction to blockchain {transaction=})")
         try:
@@ -199,25 +243,62 @@ class BlockchainTransactionService(TransactionService):
         return TransactionHash(tx_hash)
 
     def get_status(self, hash: TransactionHash, chain: ChainId) -> TransactionStatus:
+        key = (chain, hash)
+        if key in self.statuses and self.statuses[key][0] > time.monotonic():
+            self.status_hits += 1
+            self.statuses.move_to_end(key)
+            return self.statuses[key][1]
+
+        self.status_misses += 1
+        status, final = self._get_status(hash, chain)
+        self.statuses[key] = (math.inf if final else time.monotonic() + self.pending_status_ttl_s, status)
+        self.statuses.move_to_end(key)
+        while len(self.statuses) > self.status_cache_size:
+            self.statuses.popitem(last=False)
+
+        return status
+
+    def _get_status(self, hash: TransactionHash, chain: ChainId) -> Tuple[TransactionStatus, bool]:
         logger.info(f"Retrieving transaction status from blockchain {hash=} {chain=})")
         try:
             w3 = self.web3.get_web3(chain=chain)
 
             tx_receipt = w3.eth.get_transaction_receipt(HexBytes(hash))
+            final = w3.eth.block_number - tx_receipt["blockNumber"] >= self.confirmations
 
         except TransactionNotFound as e:
             logger.info(e)
-            return TransactionStatus.TRANSACTION_IN_PROGRESS
+            return TransactionStatus.TRANSACTION_IN_PROGRESS, False
         except Exception as e:
             logger.error(e)
             raise BlockchainError.from_transaction_receipt(hash)
 
-        logger.info(f"Retrieved transaction status from blockchain {tx_receipt=})")
+        logger.info(f"Retrieved transaction status from blockchain {tx_receipt=} {final=})")
 
         if tx_receipt["status"] == 0:
-            return TransactionStatus.TRANSACTION_FAILED
+            return TransactionStatus.TRANSACTION_FAILED, final
 
-        return TransactionStatus.TRANSACTION_SUCCESSFUL
+        self._record_gas_used(hash, chain, tx_receipt)
+
+        return TransactionStatus.TRANSACTION_SUCCESSFUL, final
+
+    def _record_gas_used(self, hash: TransactionHash, chain: ChainId, tx_receipt):
+        # Only the first time we see the transaction succeed, the shape comes from its call data.
+        cached = self.statuses.get((chain, hash))
+        if self.gas_limit_model is None or (cached and cached[1] == TransactionStatus.TRANSACTION_SUCCESSFUL):
+            return
+
+        try:
+            tx = self.web3.get_web3(chain=chain).eth.get_transaction(HexBytes(hash))
+            contract = get_contract(self.web3, tx_receipt["to"], chain)
+            func, args = contract.decode_function_input(tx["input"])
+            self.gas_limit_model.record(get_gas_shape(chain, func.fn_name, args.values()), tx_receipt["gasUsed"])
+        except Exception as e:
+            logger.warning(f"Error recording gas used. {hash=} {e=}")
+
+
+def get_gas_shape(chain: ChainId, fn_name: str, args: Iterable) -> GasShape:
+    return chain, fn_name, tuple(len(arg) for arg in args if isinstance(arg, (list, tuple)))
 
 
 def _to_wei(w3: Web3, amounts: Amounts) -> list[Wei]:
@@ -232,20 +313,8 @@ def get_contract(web3: Web3Provider, contract_address: ContractAddress, chain: C
     return web3.get_contract(contract_address, chain)
 
 
-def get_trading_function(trade: Trade, contract: Contract) -> ContractFunction:
+def get_trading_function_name(trade: Trade) -> str:
     if trade.type == TradeType.BUY:
-        return contract.functions.buy
-
-    return contract.functions.sell
-
-
-def get_swapping_function(contract: Contract) -> ContractFunction:
-    return contract.functions.swap
-
-
-def get_staking_function(contract: Contract) -> ContractFunction:
-    return contract.functions.stakeInLiquidityMaker
-
+        return "buy"
 
-def get_release_for_function(contract: Contract) -> ContractFunction:
-    return contract.functions.releaseFor
+    return "sell"
@@ -1,4 +1,3 @@
-import json
 import logging
 from decimal import Decimal
 from pathlib import Path
@@ -8,6 +7,8 @@ from web3 import Web3
 from web3.contract import Contract
 
 from mm import API_ROOT_PATH
+from mm.data.services.contracts import ContractRegistry
+from mm.data.services.rpc import CallCache, EndpointPool, PooledHTTPProvider, parse_endpoint_uris
 from mm.domain.models import ChainId, ContractAddress, ContractVersion
 from mm.domain.services import Web3Provider
 
@@ -25,6 +26,9 @@ class HTTPWeb3Provider(Web3Provider):
         ecr_contract_bsc: ContractAddress,
         ecr_contract_rtn: ContractAddress,
         ecr_contract_info_json_path: Path,
+        batch_window_s: float = 0.0,
+        hedge_percentile: float = 0.95,
+        block_refresh_s: float = 1.0,
     ):
         self.ecr_contract_info_json_path = ecr_contract_info_json_path
         self._http_rtn_web3: Optional[Web3] = None
@@ -34,29 +38,21 @@ class HTTPWeb3Provider(Web3Provider):
         self._web3_bsc_uri = web3_bsc_uri
         self._ecr_contract_bsc = ecr_contract_bsc
         self._ecr_contract_rtn = ecr_contract_rtn
+        self._batch_window_s = batch_window_s
+        self._hedge_percentile = hedge_percentile
+        self._block_refresh_s = block_refresh_s
+        self.contracts = ContractRegistry(self.get_web3)
+        self.contracts.preload(
+            [ecr_contract_info_json_path] + [get_market_maker_artifact(version) for version in ContractVersion]
+        )
 
     def get_ecr_contract(self, chain: ChainId) -> Contract:
-        address, abi = self._load_ecr_contract_details(chain)
-
-        return self.get_web3(chain=chain).eth.contract(address=address, abi=abi)  # type: ignore
+        return self.contracts.get_contract(chain, self._ecr_contract_address(chain), self.ecr_contract_info_json_path)
 
     def get_contract(
         self, contract: ContractAddress, chain: ChainId, version: ContractVersion = ContractVersion.V1_0
     ) -> Contract:
-        abi = load_abi(
-            Path(
-                API_ROOT_PATH
-                / ".contracts"
-                / "mm"
-                / version.value
-                / "artifacts"
-                / "contracts"
-                / "MarketMaker.sol"
-                / "MarketMaker.json"
-            )
-        )
-
-        return self.get_web3(chain=chain).eth.contract(address=contract, abi=abi)  # type: ignore
+        return self.contracts.get_contract(chain, contract, get_market_maker_artifact(version))
 
     def get_web3(self, chain: ChainId) -> Web3:
         if chain == chain.BSC:
@@ -68,31 +64,63 @@ class HTTPWeb3Provider(Web3Provider):
 
     def rtn_web3(self) -> Web3:
         if self._http_rtn_web3 is None:
-            self._http_rtn_web3 = Web3(Web3.HTTPProvider(self._web3_rtn_uri))
+            self._http_rtn_web3 = Web3(
+                PooledHTTPProvider(
+                    self._endpoint_pool(self._web3_rtn_uri),
+                    batch_window_s=self._batch_window_s,
+                    call_cache=CallCache(self._block_refresh_s) if self._block_refresh_s > 0 else None,
+                )
+            )
             return self._http_rtn_web3
 
         return self._http_rtn_web3
 
     def bsc_web3(self) -> Web3:
         if self._http_bsc_web3 is None:
-            self._http_bsc_web3 = Web3(Web3.HTTPProvider(self._web3_bsc_uri))
+            self._http_bsc_web3 = Web3(
+                PooledHTTPProvider(
+                    self._endpoint_pool(self._web3_bsc_uri),
+                    batch_window_s=self._batch_window_s,
+                    call_cache=CallCache(self._block_refresh_s) if self._block_refresh_s > 0 else None,
+                )
+            )
             return self._http_bsc_web3
 
         return self._http_bsc_web3
 
-    def _load_ecr_contract_details(self, chain) -> tuple[ContractAddress, dict]:
-        abi = load_abi(self.ecr_contract_info_json_path)
+    def get_metrics(self) -> dict:
+        metrics = {}
+        for chain, w3 in ((ChainId.BSC, self._http_bsc_web3), (ChainId.RTN, self._http_rtn_web3)):
+            if w3 is None:
+                continue
+
+            chain_metrics = w3.provider.pool.get_metrics()  # type: ignore
+            if w3.provider.call_cache is not None:  # type: ignore
+                chain_metrics.update(w3.provider.call_cache.get_metrics())  # type: ignore
+            metrics.update({f"{chain.name}.{name}": value for name, value in chain_metrics.items()})
+
+        return metrics
+
+    def _endpoint_pool(self, uris: str) -> EndpointPool:
+        return EndpointPool(parse_endpoint_uris(uris), hedge_percentile=self._hedge_percentile)
+
+    def _ecr_contract_address(self, chain) -> ContractAddress:
         if chain == chain.BSC:
-            return self._ecr_contract_bsc, abi
+            return self._ecr_contract_bsc
         if chain == chain.RTN:
-            return self._ecr_contract_rtn, abi
+            return self._ecr_contract_rtn
 
         raise ValueError(f"ChainId {chain} is not implemented.")
 
 
-def load_abi(path: Path) -> dict:
-    with open(path) as f:
-        info_json = json.load(f)
-        abi = info_json["abi"]
-
-    return abi
+def get_market_maker_artifact(version: ContractVersion) -> Path:
+    return Path(
+        API_ROOT_PATH
+        / ".contracts"
+        / "mm"
+        / version.value
+        / "artifacts"
+        / "contracts"
+        / "MarketMaker.sol"
+        / "MarketMaker.json"
+    )
@@ -0,0 +1,94 @@
+"""Per-request cost of getting a contract.
+
+Gets the trading contract tools for many quote requests, once the way `HttpWeb3Provider` did before, opening and
+parsing the artifact and building a `Contract` for every request, and once from its `ContractRegistry`. The artifact is
+a generated one with as many functions as the trading contracts, no node is needed.
+
+Usage: python -m tests.benchmarks.bench_contracts [--requests 2000] [--functions 40]
+"""
+
+import argparse
+import json
+import logging
+import os
+import tempfile
+import time
+from pathlib import Path
+from typing import Callable
+
+from web3.contract import Contract
+
+from tests.utils import ADDR1, make_algorithm
+from trading_api import EnvVar, get_env_force
+from trading_api.algorithm.models.algorithm import Algorithm
+from trading_api.algorithm.models.crypto import ContractDetails
+from trading_api.algorithm.services.web3 import HttpWeb3Provider
+
+
+def make_artifact(path: Path, nr_functions: int):
+    abi = [
+        {
+            "name": f"function{i}",
+            "type": "function",
+            "stateMutability": "nonpayable",
+            "inputs": [
+                {"name": "amount", "type": "uint256"},
+                {"name": "addresses", "type": "address[]"},
+                {"name": "symbol", "type": "string"},
+            ],
+            "outputs": [{"name": "", "type": "uint256"}],
+        }
+        for i in range(nr_functions)
+    ]
+    with open(path, "w") as f:
+        json.dump({"contractName": "TradingContractTools", "abi": abi, "bytecode": "0x" + "60" * 12_000}, f)
+
+
+def get_trading_contract_tools_per_request(provider: HttpWeb3Provider, algorithm: Algorithm) -> Contract:
+    """How `HttpWeb3Provider.get_trading_contract_tools` got the contract before the registry, kept for comparison."""
+    abi = provider.load_abi(Path(get_env_force(EnvVar.TRADING_CONTRACT_TOOLS_JSON_PATH)))
+    address = get_env_force(EnvVar.TRADING_CONTRACT_TOOLS_ADDRESS_RTN)
+
+    return provider.get_web3(chain=algorithm.chain_id).eth.contract(address=address, abi=abi)  # type: ignore
+
+
+def run(get_contract: Callable[[HttpWeb3Provider, Algorithm], Contract], provider: HttpWeb3Provider, nr_requests: int):
+    algorithm = make_algorithm()
+    start = time.perf_counter()
+    for _ in range(nr_requests):
+        get_contract(provider, algorithm).functions.function0(1, [ADDR1], "BTC")
+    elapsed = time.perf_counter() - start
+
+    return elapsed / nr_requests * 1e6
+
+
+def main(nr_requests: int, nr_functions: int):
+    with tempfile.TemporaryDirectory() as directory:
+        artifact = Path(directory) / "TradingContractTools.json"
+        make_artifact(artifact, nr_functions)
+        os.environ[EnvVar.TRADING_CONTRACT_TOOLS_JSON_PATH.value] = str(artifact)
+        os.environ[EnvVar.TRADING_CONTRACT_TOOLS_ADDRESS_RTN.value] = ADDR1
+
+        ecr_contract = ContractDetails(address=ADDR1, abi={})
+        provider = HttpWeb3Provider("http://localhost:8545", "http://localhost:8545", ecr_contract, ecr_contract)
+        provider.contracts.preload([artifact])
+
+        results = {
+            "per request": run(get_trading_contract_tools_per_request, provider, nr_requests),
+            "registry": run(HttpWeb3Provider.get_trading_contract_tools, provider, nr_requests),
+        }
+
+    print(f"requests={nr_requests} functions={nr_functions}")
+    for name, us_per_request in results.items():
+        print(f"{name:>11}: {us_per_request:10.1f} us/request")
+    print(f"    speedup: {results['per request'] / results['registry']:10.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--functions", type=int, default=40)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    main(args.requests, args.functions)
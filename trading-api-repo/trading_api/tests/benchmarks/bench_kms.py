@@ -0,0 +1,89 @@
+"""Signing throughput against a local KMS.
+
+Signs transactions with `AWSKeyManagementService`, once building a KMS client for every call like `KMSClient` did
+before, and once with the client it builds once and shares between threads. KMS is a moto server on localhost, so the
+numbers leave out the TLS handshakes a client per call also paid against AWS. The keys live in moto's memory only.
+
+Requires moto, which isn't part of the Pipfile: pip install "moto[server]"
+
+Usage: python -m tests.benchmarks.bench_kms [--signatures 200] [--threads 8]
+"""
+
+import argparse
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import ec, utils
+from moto.kms.utils import ECDSAPrivateKey
+from moto.server import ThreadedMotoServer
+
+from trading_api import Stage
+from trading_api.algorithm.models.crypto import ChainId
+from trading_api.algorithm.repositories.key import InMemoryKeyRepository
+from trading_api.algorithm.services.kms import AWSKeyManagementService, KMSClient
+
+
+class PerCallKMSClient(KMSClient):
+    """How `KMSClient` worked before, a new session and client for every `with` block, kept for comparison."""
+
+    def __enter__(self):
+        return self._build_client()
+
+
+def sign_digest(self, message: bytes, signing_algorithm: str) -> bytes:
+    """moto hashes the message again, KMS signs it as is with `MessageType="DIGEST"`."""
+    return self.private_key.sign(message, ec.ECDSA(utils.Prehashed(hashes.SHA256())))
+
+
+def run(kms: AWSKeyManagementService, address: str, nr_signatures: int, nr_threads: int) -> float:
+    def sign(nonce: int):
+        transaction = {"to": address, "value": 1, "gas": 21_000, "gasPrice": 10**9, "nonce": nonce, "chainId": 56}
+        kms.sign_transaction(transaction, address, ChainId.BSC)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=nr_threads) as executor:
+        list(executor.map(sign, range(nr_signatures)))
+
+    return nr_signatures / (time.perf_counter() - start)
+
+
+def main(nr_signatures: int, nr_threads: int):
+    ECDSAPrivateKey.sign = sign_digest
+    server = ThreadedMotoServer(port=0, verbose=False)
+    server.start()
+    host, port = server.get_host_and_port()
+    os.environ.update(
+        AWS_ENDPOINT_URL=f"http://{host}:{port}", AWS_ACCESS_KEY_ID="testing", AWS_SECRET_ACCESS_KEY="testing"
+    )
+
+    try:
+        kms = AWSKeyManagementService(None, InMemoryKeyRepository(), "eu-west-1", Stage.Test)  # type: ignore
+        address = kms.create_new_key().address
+
+        results = {}
+        for name, client in (
+            ("client per call", PerCallKMSClient("eu-west-1")),
+            ("shared client", KMSClient("eu-west-1", max_pool_connections=nr_threads)),
+        ):
+            kms.kms_client = client
+            results[name] = run(kms, address, nr_signatures, nr_threads)
+    finally:
+        server.stop()
+
+    print(f"signatures={nr_signatures} threads={nr_threads}")
+    for name, signatures_per_second in results.items():
+        print(f"{name:>15}: {signatures_per_second:10.1f} signatures/s")
+    print(f"{'speedup':>15}: {results['shared client'] / results['client per call']:10.1f}x")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--signatures", type=int, default=200)
+    parser.add_argument("--threads", type=int, default=8)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    main(args.signatures, args.threads)
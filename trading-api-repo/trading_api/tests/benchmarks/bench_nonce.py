@@ -0,0 +1,81 @@
+"""Contention benchmark for nonce allocation.
+
+Allocates nonces for many concurrent trades on a handful of controller wallets, once with the previous
+lock/GET/SET/DEL protocol and once with the Lua allocation script used by `RedisNonceRepository`. Requires a
+running Redis, the keys used are removed afterwards.
+
+Usage: REDIS_URL=redis://localhost:6379 python -m tests.benchmarks.bench_nonce [--trades 1000] [--wallets 4]
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+from typing import Awaitable, Callable, List
+
+from eth_account import Account
+from eth_typing import ChecksumAddress
+from redis.asyncio import Redis
+
+from tests.utils import to_checksum_address
+from trading_api import EnvVar, get_env_force
+from trading_api.algorithm.repositories.nonce import Nonce, RedisNonceRepository, get_nonce_key
+
+
+class SpinLockNonceAllocator:
+    """The allocation protocol `RedisNonceRepository` used before the Lua script, kept for comparison."""
+
+    def __init__(self, connection_url: str):
+        self.redis = Redis.from_url(connection_url)
+
+    async def get_nonce(self, wallet: ChecksumAddress, web3_nonce: Nonce) -> Nonce:
+        lock_key = f"NONCE-LOCK-{wallet}"
+        while not await self.redis.set(lock_key, "LOCKED", nx=True, px=500):
+            await asyncio.sleep(0.1)
+
+        value = await self.redis.get(get_nonce_key(wallet))
+        nonce = web3_nonce if value is None else int(value)
+        await self.redis.set(get_nonce_key(wallet), nonce + 1)
+        await self.redis.delete(lock_key)
+
+        return nonce
+
+
+async def run(get_nonce: Callable[[ChecksumAddress, Nonce], Awaitable[Nonce]], trades: List[ChecksumAddress]) -> float:
+    """Allocates a nonce per trade, `trades` has the controller wallet of each trade."""
+    start = time.perf_counter()
+    nonces = await asyncio.gather(*(get_nonce(wallet, 0) for wallet in trades))
+    elapsed = time.perf_counter() - start
+
+    assert len(set(zip(trades, nonces))) == len(trades)
+
+    return len(trades) / elapsed
+
+
+async def main(nr_trades: int, nr_wallets: int):
+    connection_url = get_env_force(EnvVar.REDIS_URL)
+    wallets = [to_checksum_address(Account.create().address) for _ in range(nr_wallets)]
+    trades = [wallets[i % nr_wallets] for i in range(nr_trades)]
+
+    spin_lock = SpinLockNonceAllocator(connection_url)
+    repository = RedisNonceRepository(connection_url)
+
+    results = {}
+    for name, get_nonce in (("spin lock", spin_lock.get_nonce), ("lua script", repository.get_nonce)):
+        results[name] = await run(get_nonce, trades)
+        for wallet in wallets:
+            await repository.reset_nonce(wallet)
+
+    print(f"trades={nr_trades} wallets={nr_wallets}")
+    for name, allocations_per_second in results.items():
+        print(f"{name:>10}: {allocations_per_second:10.1f} allocations/s")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--trades", type=int, default=1000)
+    parser.add_argument("--wallets", type=int, default=4)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    asyncio.run(main(args.trades, args.wallets))
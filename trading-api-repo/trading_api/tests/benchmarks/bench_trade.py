@@ -0,0 +1,168 @@
+"""Throughput benchmark for the trade execution path.
+
+Runs `handle_trade_request` for many algorithms concurrently on a single event loop, against in-memory repositories
+and a web3 provider that adds a fixed latency to every JSON-RPC call. The "blocking" run emulates the previous,
+synchronous implementation by sleeping on the event loop thread, the "async" run awaits the latency.
+
+Usage: python -m tests.benchmarks.bench_trade [--requests 200] [--latency-ms 50]
+"""
+
+import argparse
+import asyncio
+import logging
+import time
+from decimal import Decimal
+
+from eth_account import Account
+from eth_account.signers.local import LocalAccount
+from eth_typing import ChecksumAddress
+from hexbytes import HexBytes
+from web3 import Web3
+from web3.contract import Contract
+
+from tests.utils import make_algorithm, to_checksum_address
+from trading_api.algorithm.models.algorithm import Algorithm, AlgorithmId, AlgorithmIsLocked
+from trading_api.algorithm.models.crypto import ChainId
+from trading_api.algorithm.models.trade import BuyTrade, Slippage
+from trading_api.algorithm.repositories.algorithm import InMemoryAlgorithmRepository
+from trading_api.algorithm.repositories.lock import InMemoryAlgorithmLockRepository
+from trading_api.algorithm.repositories.nonce import InMemoryNonceRepository
+from trading_api.algorithm.repositories.transaction import InMemoryTransactionRepository
+from trading_api.algorithm.repositories.wallet import InMemoryWalletLeaseRepository
+from trading_api.algorithm.services.kms import LocalKeyManagementService
+from trading_api.algorithm.services.sequencer import TransactionSequencer
+from trading_api.algorithm.services.web3 import Web3Provider
+from trading_api.algorithm.trade import handle_trade_request
+
+TRADING_ABI = [
+    {
+        "name": name,
+        "type": "function",
+        "stateMutability": "nonpayable",
+        "inputs": [{"name": "amount", "type": "uint256"}, {"name": "slippage", "type": "uint256"}],
+        "outputs": [],
+    }
+    for name in ("buy", "sell")
+]
+
+
+class LatencyEth:
+    def __init__(self, latency: float, blocking: bool):
+        self._latency = latency
+        self._blocking = blocking
+        self._tx_count = 0
+
+    async def _round_trip(self):
+        if self._blocking:
+            time.sleep(self._latency)
+        else:
+            await asyncio.sleep(self._latency)
+
+    @property
+    async def chain_id(self) -> int:
+        await self._round_trip()
+        return 1337
+
+    @property
+    async def gas_price(self) -> int:
+        await self._round_trip()
+        return 5_000_000_000
+
+    async def get_transaction_count(self, address: ChecksumAddress) -> int:
+        await self._round_trip()
+        return 0
+
+    async def estimate_gas(self, transaction: dict) -> int:
+        await self._round_trip()
+        return 21_000
+
+    async def send_raw_transaction(self, raw_transaction: bytes) -> HexBytes:
+        await self._round_trip()
+        return HexBytes(Web3.keccak(raw_transaction))
+
+
+class LatencyWeb3:
+    def __init__(self, latency: float, blocking: bool):
+        self.eth = LatencyEth(latency, blocking)
+
+
+class LatencyWeb3Provider(Web3Provider):
+    def __init__(self, latency: float, blocking: bool):
+        self._w3 = Web3()
+        self._async_w3 = LatencyWeb3(latency, blocking)
+        self._account = Account.create()
+
+    def get_web3(self, chain: ChainId) -> Web3:
+        return self._w3
+
+    def get_async_web3(self, chain: ChainId) -> Web3:
+        return self._async_w3  # type: ignore
+
+    def get_trading_contract(self, algorithm: Algorithm) -> Contract:
+        return self._w3.eth.contract(address=algorithm.trading_contract_address, abi=TRADING_ABI)  # type: ignore
+
+    def get_trading_contract_tools(self, algorithm: Algorithm) -> Contract:
+        raise NotImplementedError
+
+    def get_ecr_contract(self, chain: ChainId) -> Contract:
+        raise NotImplementedError
+
+    def get_account(self, algorithm_public_address: ChecksumAddress) -> LocalAccount:
+        return self._account
+
+
+async def run(nr_requests: int, latency: float, blocking: bool) -> float:
+    web3_provider = LatencyWeb3Provider(latency, blocking)
+    km_service = LocalKeyManagementService(web3_provider)
+    lock_repository = InMemoryAlgorithmLockRepository()
+    transaction_repository = InMemoryTransactionRepository()
+    algorithm_repository = InMemoryAlgorithmRepository()
+    nonce_repository = InMemoryNonceRepository()
+    sequencer = TransactionSequencer(lease_repository=InMemoryWalletLeaseRepository())
+
+    addresses = [to_checksum_address(Account.create().address) for _ in range(nr_requests)]
+
+    async def trade(address: ChecksumAddress):
+        return await handle_trade_request(
+            trade_request=BuyTrade(
+                algorithm_id=AlgorithmId(public_address=address),
+                slippage=Slippage(amount=Decimal("0.01")),
+                relative_amount=Decimal("0.1"),
+            ),
+            algorithm=make_algorithm(trading_contract_address=address, controller_wallet_address=address),
+            lock_repository=lock_repository,
+            web3_provider=web3_provider,
+            km_service=km_service,
+            trading_transaction_repository=transaction_repository,
+            algorithm_repository=algorithm_repository,
+            nonce_repository=nonce_repository,
+            sequencer=sequencer,
+        )
+
+    start = time.perf_counter()
+    responses = await asyncio.gather(*(trade(address) for address in addresses))
+    elapsed = time.perf_counter() - start
+
+    assert all(isinstance(response, AlgorithmIsLocked) for response in responses), responses
+
+    return nr_requests / elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    args = parser.parse_args()
+
+    logging.disable(logging.INFO)
+    latency = args.latency_ms / 1000
+    blocking = asyncio.run(run(args.requests, latency, blocking=True))
+    non_blocking = asyncio.run(run(args.requests, latency, blocking=False))
+
+    print(f"requests={args.requests} rpc-latency={args.latency_ms}ms")
+    print(f"blocking (before): {blocking:10.1f} req/s")
+    print(f"async    (after):  {non_blocking:10.1f} req/s  ({non_blocking / blocking:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
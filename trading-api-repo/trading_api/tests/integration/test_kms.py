@@ -1,3 +1,4 @@
+import asyncio
 import logging
 from typing import Iterator
 
@@ -168,8 +169,8 @@ def test_buy_request_kms(app_inst, contract_account, http_w3: HttpWeb3Provider,
     # http_w3.set_contract_address(trading_contract_address=trading_contract.address)
 
     with pytest.raises(ValueError) as exc_info:
-        transaction, nonce = send_trade_to_blockchain(
-            trade_request, algorithm=algorithm, web3_provider=http_w3, km_service=km_service
+        transaction, nonce = asyncio.run(
+            send_trade_to_blockchain(trade_request, algorithm=algorithm, web3_provider=http_w3, km_service=km_service)
         )
 
         assert "revert Not enough funds to trade" in str(exc_info.value)
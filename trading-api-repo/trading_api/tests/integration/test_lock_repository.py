@@ -102,3 +102,38 @@ def test_persist_transaction_hashes(algorithm_lock_repository):
 
     retrieved_hash_two = repository.get_algorithm_transaction_hash(algorithm_id=algorithm_two)
     assert retrieved_hash_two.value == transaction_hash_two.value
+
+
+def test_remove_lock_only_for_its_transaction(algorithm_lock_repository):
+    repository = algorithm_lock_repository
+    algorithm_one = AlgorithmId(public_address="123456")
+    transaction_hash = TransactionHash(value="ABCDEFEG#9023480234")
+    next_transaction_hash = TransactionHash(value="DEFOIEHFJOIEHI#9438590324509")
+
+    repository.get_algorithm_lock(algorithm_one)
+    repository.persist_algorithm_transaction(
+        algorithm_transaction=AlgorithmTransaction(algorithm_id=algorithm_one, transaction_hash=next_transaction_hash)
+    )
+
+    assert not repository.remove_algorithm_lock_for_transaction(algorithm_one, transaction_hash)
+    assert isinstance(repository.get_algorithm_lock(algorithm_one), AlgorithmWasLocked)
+
+    assert repository.remove_algorithm_lock_for_transaction(algorithm_one, next_transaction_hash)
+    assert isinstance(repository.get_algorithm_lock(algorithm_one), NewAlgorithmLock)
+
+
+def test_released_transaction_does_not_release_the_next_lock(algorithm_lock_repository):
+    repository = algorithm_lock_repository
+    algorithm_one = AlgorithmId(public_address="123456")
+    transaction_hash = TransactionHash(value="ABCDEFEG#9023480234")
+
+    repository.get_algorithm_lock(algorithm_one)
+    repository.persist_algorithm_transaction(
+        algorithm_transaction=AlgorithmTransaction(algorithm_id=algorithm_one, transaction_hash=transaction_hash)
+    )
+    assert repository.remove_algorithm_lock_for_transaction(algorithm_one, transaction_hash)
+
+    # The next trade took the lock, but didn't store its transaction yet.
+    assert isinstance(repository.get_algorithm_lock(algorithm_one), NewAlgorithmLock)
+    assert not repository.remove_algorithm_lock_for_transaction(algorithm_one, transaction_hash)
+    assert isinstance(repository.get_algorithm_lock(algorithm_one), AlgorithmWasLocked)
@@ -0,0 +1,27 @@
+import asyncio
+
+from tests.utils import ADDR2
+from trading_api import EnvVar, get_env_force
+from trading_api.algorithm.repositories.nonce import RedisNonceRepository
+
+
+def test_concurrent_nonces_are_unique(app_inst):
+    async def allocate():
+        repository = RedisNonceRepository(connection_url=get_env_force(EnvVar.REDIS_URL))
+        await repository.reset_nonce(ADDR2)
+        return await asyncio.gather(*(repository.get_nonce(ADDR2, web3_nonce=10) for _ in range(100)))
+
+    assert sorted(asyncio.run(allocate())) == list(range(10, 110))
+
+
+def test_reserve_nonces_catches_up_with_chain(app_inst):
+    async def reserve():
+        repository = RedisNonceRepository(connection_url=get_env_force(EnvVar.REDIS_URL))
+        await repository.reset_nonce(ADDR2)
+        return (
+            await repository.reserve_nonces(ADDR2, web3_nonce=1, count=5),
+            await repository.get_nonce(ADDR2, web3_nonce=1),
+            await repository.get_nonce(ADDR2, web3_nonce=20),
+        )
+
+    assert asyncio.run(reserve()) == (range(1, 6), 6, 20)
@@ -0,0 +1,33 @@
+import asyncio
+import uuid
+
+from tests.unit.test_watcher import UNKNOWN_HASH, make_pending
+from tests.utils import make_sell_trade
+from trading_api import EnvVar, get_env_force
+from trading_api.algorithm.models.crypto import ChainId
+from trading_api.algorithm.models.trade import SellTrade
+from trading_api.algorithm.repositories.pending import RedisPendingTransactionRepository, get_stream_key
+
+
+def test_pending_transactions_survive_a_crashed_consumer(app_inst):
+    crashed, worker = str(uuid.uuid4()), str(uuid.uuid4())
+    pending = make_pending(UNKNOWN_HASH).copy(update={"trade": make_sell_trade()})
+
+    async def run():
+        repository = RedisPendingTransactionRepository(connection_url=get_env_force(EnvVar.REDIS_URL))
+        await repository.redis.delete(get_stream_key(ChainId.RTN))
+        entry_id = await repository.add(pending)
+        claimed = await repository.claim(ChainId.RTN, crashed, min_idle_ms=60_000, count=10)
+        not_idle = await repository.claim(ChainId.RTN, worker, min_idle_ms=60_000, count=10)
+        reclaimed = await repository.claim(ChainId.RTN, worker, min_idle_ms=0, count=10)
+        await repository.ack(ChainId.RTN, entry_id)
+        after_ack = await repository.claim(ChainId.RTN, worker, min_idle_ms=0, count=10)
+
+        return entry_id, claimed, not_idle, reclaimed, after_ack
+
+    entry_id, claimed, not_idle, reclaimed, after_ack = asyncio.run(run())
+
+    assert [entry for entry, _ in claimed] == [entry for entry, _ in reclaimed] == [entry_id]
+    assert claimed[0][1].transaction_hash == pending.transaction_hash
+    assert isinstance(claimed[0][1].trade, SellTrade)
+    assert not_idle == after_ack == []
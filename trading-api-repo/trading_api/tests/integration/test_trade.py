@@ -1,3 +1,4 @@
+import asyncio
 from decimal import Decimal
 from typing import Iterable
 from unittest import mock
@@ -10,8 +11,6 @@ from tests.utils import get_access_header, load_stub, make_algorithm_db
 from trading_api.algorithm.lock import create_algorithm_transaction
 from trading_api.algorithm.models.algorithm import AlgorithmId, AlgorithmWasLocked
 from trading_api.algorithm.models.trade import (
-    BuyTrade,
-    Slippage,
     TradeStatus,
     TradeSuccessfulResponse,
     TradingTransaction,
@@ -73,12 +72,7 @@ def test_buy_request_create_transaction(
     send.return_value = create_algorithm_transaction(algorithm_id=algorithm_id, transaction_hash=HexBytes("0x7b")), 42
     nonce_repo: NonceRepository = app_inst.container[NonceRepository]
 
-    trade = BuyTrade(
-        algorithm_id=AlgorithmId(public_address=address),
-        slippage=Slippage(amount=Decimal("0.05")),
-        relative_amount=Decimal("0.5"),
-    )
-    assert nonce_repo.get_nonce(trade, web3_nonce=1) == 1
+    assert asyncio.run(nonce_repo.get_nonce(address, web3_nonce=1)) == 1
 
     response = app_inst.client.post("/api/v1/buy", json=trade_request, headers=access_header)
 
@@ -103,7 +97,7 @@ def test_buy_request_create_transaction(
     assert event.trading_contract_address == "0x7E5F4552091A69125d5DfCb7b8C2659029395Bdf"
     assert event.relative_amount == Decimal("0.5")
     assert event.slippage_amount == Decimal("0.05")
-    assert nonce_repo.get_nonce(trade, web3_nonce=1) == 1
+    assert asyncio.run(nonce_repo.get_nonce(address, web3_nonce=1)) == 1
 
 
 @pytest.mark.skip("flaky")
@@ -132,12 +126,7 @@ def test_buy_request_nonce(
     send.return_value = create_algorithm_transaction(algorithm_id=algorithm_id, transaction_hash=HexBytes("0x7b")), 42
     nonce_repo: NonceRepository = app_inst.container[NonceRepository]
 
-    trade = BuyTrade(
-        algorithm_id=AlgorithmId(public_address=address),
-        slippage=Slippage(amount=Decimal("0.05")),
-        relative_amount=Decimal("0.5"),
-    )
-    assert nonce_repo.get_nonce(trade, web3_nonce=1) == 1
+    assert asyncio.run(nonce_repo.get_nonce(address, web3_nonce=1)) == 1
 
     response = app_inst.client.post("/api/v1/buy", json=trade_request, headers=access_header)
 
@@ -158,4 +147,4 @@ def test_buy_request_nonce(
     event = events[0]
     assert isinstance(event, TradingTransaction)
     assert event.status == TradeStatus.TRADE_SUCCESSFUL
-    assert nonce_repo.get_nonce(trade, web3_nonce=1) == 3
+    assert asyncio.run(nonce_repo.get_nonce(address, web3_nonce=1)) == 3
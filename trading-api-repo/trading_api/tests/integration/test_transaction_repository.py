@@ -73,6 +73,26 @@ def test_update_transaction_status(
     assert retrieved_tx_updated.updated_at == expected_update_dt
 
 
+def test_update_transaction_statuses(
+    transaction_repository: MongoTransactionRepository, persist_transaction_for_other_contract
+):
+    expected_update_dt = datetime.fromtimestamp(100, timezone.utc)
+    transaction = make_transaction()
+    transaction_repository.persist_transaction(trading_transaction=transaction)
+
+    transaction_repository.update_transaction_statuses(
+        [
+            (TransactionHash(value=transaction.transaction_hash), TradeStatus.TRADE_SUCCESSFUL, expected_update_dt),
+            (TransactionHash(value="0x" + "11" * 32), TradeStatus.TRADE_FAILED, expected_update_dt),
+        ]
+    )
+
+    transactions = list(transaction_repository.get_trading_transactions(algorithm=AlgorithmId(public_address=ADDR2)))
+    assert len(transactions) == 1
+    assert transactions[0].status == TradeStatus.TRADE_SUCCESSFUL
+    assert transactions[0].updated_at == expected_update_dt
+
+
 def test_update_transaction(transaction_repository: MongoTransactionRepository, persist_transaction_for_other_contract):
     expected_dt = datetime.fromtimestamp(0, timezone.utc)
     expected_update_dt = datetime.fromtimestamp(100, timezone.utc)
@@ -0,0 +1,40 @@
+import pytest
+from web3 import Web3
+
+from mm.data.services.calldata import build_transaction
+
+
+def make_function(name: str, *types: str) -> dict:
+    inputs = [{"name": f"arg{i}", "type": type_} for i, type_ in enumerate(types)]
+    return {"name": name, "type": "function", "stateMutability": "nonpayable", "inputs": inputs, "outputs": []}
+
+
+# The argument types of the functions `BlockchainTransactionService` calls.
+MM_ABI = [
+    make_function("buy", "uint256[]", "address[]", "uint256", "string"),
+    make_function("sell", "uint256[]", "address[]", "uint256", "string"),
+    make_function("swap", "uint256[]", "address[]", "address", "string"),
+    make_function("stakeInLiquidityMaker", "uint256[]", "address[]", "uint256[]", "address[]", "uint256", "string"),
+    make_function("releaseFor", "address[]"),
+]
+
+ADDR1, ADDR2, ADDR3 = (Web3.toChecksumAddress("0x" + f"{i}" * 40) for i in range(1, 4))
+
+
+@pytest.mark.parametrize(
+    "fn_name, args",
+    [
+        ("buy", ([10**18, 2 * 10**18], [ADDR1, ADDR2], 10**16, "PANCAKESWAP")),
+        ("sell", ([], [], 0, "PANCAKESWAP")),
+        ("swap", ([10**18], [ADDR1], ADDR2, "PANCAKESWAP")),
+        ("stakeInLiquidityMaker", ([1, 2], [ADDR1, ADDR2], [3], [ADDR3], 10**16, "PANCAKESWAP")),
+        ("releaseFor", ([ADDR1, ADDR2, ADDR3],)),
+    ],
+)
+def test_call_data_same_as_web3(fn_name, args):
+    contract = Web3().eth.contract(address=ADDR3, abi=MM_ABI)
+    transaction = {"gas": 500_000, "gasPrice": 6 * 10**9, "chainId": 56, "nonce": 1}
+
+    assert build_transaction(contract, fn_name, args, transaction) == contract.get_function_by_name(fn_name)(
+        *args
+    ).buildTransaction(transaction)
@@ -0,0 +1,79 @@
+from decimal import Decimal
+from unittest.mock import MagicMock
+
+from web3 import Web3
+
+from mm.data.services import BlockchainTransactionService, GasLimitModel
+from mm.domain.models import ChainId, Exchange, Trade, TradeType, TransactionStatus
+from tests.unit.mm.utils import make_pair
+from tests.unit.test_multicall import ONE_ETHER_CODE, deploy_code
+
+MM_ABI = [
+    {
+        "name": "buy",
+        "type": "function",
+        "stateMutability": "nonpayable",
+        "inputs": [
+            {"name": "amounts", "type": "uint256[]"},
+            {"name": "addresses", "type": "address[]"},
+            {"name": "slippage", "type": "uint256"},
+            {"name": "exchange", "type": "string"},
+        ],
+        "outputs": [],
+    }
+]
+
+
+def input_middleware(make_request, w3):
+    """Name the call data of a transaction the way a node does, eth-tester leaves it `data`."""
+
+    def middleware(method, params):
+        response = make_request(method, params)
+        if method == "eth_getTransactionByHash":
+            return {**response, "result": {**response["result"], "input": response["result"]["data"]}}
+
+        return response
+
+    return middleware
+
+
+def make_service(w3: Web3, gas_limit_model: GasLimitModel) -> BlockchainTransactionService:
+    web3 = MagicMock()
+    web3.get_web3.return_value = w3
+    web3.get_contract.side_effect = lambda address, chain: w3.eth.contract(address=address, abi=MM_ABI)
+
+    return BlockchainTransactionService(web3, gas_limit_model=gas_limit_model)
+
+
+def make_buy(addresses) -> Trade:
+    return Trade(
+        type=TradeType.BUY,
+        amounts=[Decimal("1")] * len(addresses),
+        addresses=addresses,
+        slippage=Decimal("0.01"),
+        exchange=Exchange.PANCAKESWAP,
+    )
+
+
+def test_gas_limit_learned_from_successful_transactions(tester_provider):
+    w3 = Web3(tester_provider)
+    w3.middleware_onion.add(input_middleware)
+    pair = make_pair(wallet=w3.eth.accounts[0], contract=deploy_code(w3, ONE_ETHER_CODE))
+    model = GasLimitModel(margin=1, min_samples=1)
+    service = make_service(w3, model)
+    one_beneficiary, two_beneficiaries = make_buy(w3.eth.accounts[1:2]), make_buy(w3.eth.accounts[1:3])
+
+    tx = service.create_trade_transaction(pair, one_beneficiary)
+    tx_hash = w3.eth.send_transaction({**tx, "from": pair.wallet}).hex()
+    # The estimate of the actual call, not a multiple of an empty transaction.
+    assert tx["gas"] < service.estimated_gas_factor * w3.eth.estimate_gas({})
+
+    # Recorded once, also when the status is retrieved again.
+    service.pending_status_ttl_s = 0
+    assert service.get_status(tx_hash, ChainId.RTN) == TransactionStatus.TRANSACTION_SUCCESSFUL
+    assert service.get_status(tx_hash, ChainId.RTN) == TransactionStatus.TRANSACTION_SUCCESSFUL
+
+    gas_used = w3.eth.get_transaction_receipt(tx_hash)["gasUsed"]
+    assert service.create_trade_transaction(pair, one_beneficiary)["gas"] == gas_used
+    assert service.create_trade_transaction(pair, two_beneficiaries)["gas"] != gas_used
+    assert model.get_metrics() == {"hits": 1, "misses": 2, "recorded": 1, "shapes": 1}
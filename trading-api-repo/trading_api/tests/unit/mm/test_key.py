@@ -0,0 +1,30 @@
+from unittest.mock import MagicMock, patch
+
+from eth_account import Account
+
+from mm import Stage
+from mm.data.services.key import AWSKeyManagementService
+from mm.domain.models import ChainId
+from tests.unit.mm.utils import make_pair
+from tests.unit.test_kms import ADDRESS, PRIVATE_KEY, kms_sign
+
+
+def test_sign_transaction_recovers_v_locally():
+    web3_provider = MagicMock()
+    kms = AWSKeyManagementService(web3_provider, MagicMock(), "eu-west-1", Stage.DEVELOPMENT)
+    pair = make_pair(wallet=ADDRESS, contract=ADDRESS)
+    transaction = {"to": ADDRESS, "value": 1, "gas": 21_000, "gasPrice": 10**9, "nonce": 0}
+
+    with patch("mm.data.services.key.Session") as session:
+        for high_s in (False, True):
+            session.return_value.client.return_value.sign.side_effect = lambda Message, **kwargs: {
+                "Signature": kms_sign(Message, high_s)
+            }
+            signed = kms.sign_transaction(transaction, pair, ChainId.BSC)
+
+            assert (
+                signed.eth.rawTransaction
+                == Account.sign_transaction(transaction, PRIVATE_KEY.to_bytes()).rawTransaction
+            )
+
+    web3_provider.get_ecr_contract.assert_not_called()
@@ -1,4 +1,10 @@
+from unittest.mock import MagicMock
+
+from web3.exceptions import TransactionNotFound
+
 from mm.data.repositories import InMemoryTradeRepository, InMemoryWalletKeyRepository
+from mm.data.services import BlockchainTransactionService
+from mm.domain.models import ChainId, TransactionStatus
 from mm.domain.repositories import TradeRepository, WalletKeyRepository
 from tests.unit.mm.utils import assert_status_code, make_pair, make_trade
 
@@ -22,3 +28,32 @@ def test_retrieve_transaction_status(mm_app_unit):
 
     assert_status_code(200, response)
     assert response.json()["message"] == "TRANSACTION_SUCCESSFUL"
+
+
+def test_final_transaction_status_is_cached():
+    web3 = MagicMock()
+    w3 = web3.get_web3.return_value
+    w3.eth.get_transaction_receipt.return_value = {"status": 1, "blockNumber": 10}
+    w3.eth.block_number = 100
+    service = BlockchainTransactionService(web3)
+    tx_hash = "0x1111111111111111111111111111111111111111111111111111111111111111"
+
+    statuses = [service.get_status(tx_hash, ChainId.BSC) for _ in range(3)]
+
+    assert statuses == [TransactionStatus.TRANSACTION_SUCCESSFUL] * 3
+    assert w3.eth.get_transaction_receipt.call_count == 1
+    assert (service.status_hits, service.status_misses) == (2, 1)
+
+
+def test_pending_transaction_status_expires():
+    web3 = MagicMock()
+    w3 = web3.get_web3.return_value
+    w3.eth.get_transaction_receipt.side_effect = TransactionNotFound("Not found.")
+    service = BlockchainTransactionService(web3)
+    service.pending_status_ttl_s = 0
+    tx_hash = "0x1111111111111111111111111111111111111111111111111111111111111111"
+
+    statuses = [service.get_status(tx_hash, ChainId.BSC) for _ in range(2)]
+
+    assert statuses == [TransactionStatus.TRANSACTION_IN_PROGRESS] * 2
+    assert w3.eth.get_transaction_receipt.call_count == 2
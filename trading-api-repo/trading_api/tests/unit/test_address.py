@@ -1,8 +1,17 @@
+import json
+
 from web3 import Web3
 
 from tests.utils import ADDR1, ADDR2, ADDR3, KEY_ALIAS1, KEY_ALIAS2, make_algorithm_db
-from trading_api.algorithm.models.address import AddressKeyPair, KeyedAddressPair
-from trading_api.system.address import create_keyed_address_pairs, new_address
+from trading_api.algorithm.models.address import AddressKeyPair, AddressListResponse, KeyedAddressPair
+from trading_api.algorithm.repositories.algorithm import AlgorithmRepository
+from trading_api.algorithm.services.kms import KeyManagementService
+from trading_api.system.address import (
+    create_keyed_address_pairs,
+    handle_address_list_request,
+    new_address,
+    stream_address_list,
+)
 
 
 def test_new_address(km_service):
@@ -33,3 +42,58 @@ def test_create_address_pairs():
     assert keyed_address_pairs[1].key_alias == KEY_ALIAS2
     assert keyed_address_pairs[1].pair.trading_contract_address is None
     assert keyed_address_pairs[1].pair.controller_wallet_address == ADDR3
+
+
+def test_list_addresses_paginated(app_inst, system_access_header):
+    km_service = app_inst.container[KeyManagementService]
+    addresses = sorted(new_address(km_service).pair.controller_wallet_address for _ in range(5))
+    app_inst.container[AlgorithmRepository].upsert_algorithm(make_algorithm_db(controller_wallet_address=addresses[2]))
+
+    response = app_inst.client.get("/api/v2/wallets/?skip=1&limit=2", headers=system_access_header)
+
+    assert response.status_code == 200
+    address_pairs = response.json()["address_pairs"]
+    assert [address_pair["pair"]["controller_wallet_address"] for address_pair in address_pairs] == addresses[1:3]
+    assert address_pairs[0]["pair"]["trading_contract_address"] is None
+    assert address_pairs[1]["pair"]["trading_contract_address"] == ADDR1
+
+
+def test_list_addresses_streamed(app_inst, system_access_header):
+    km_service = app_inst.container[KeyManagementService]
+    addresses = sorted(new_address(km_service).pair.controller_wallet_address for _ in range(5))
+    app_inst.container[AlgorithmRepository].upsert_algorithm(make_algorithm_db(controller_wallet_address=addresses[4]))
+
+    response = app_inst.client.get("/api/v2/wallets/", headers=system_access_header)
+    streamed = "".join(stream_address_list(km_service, app_inst.container[AlgorithmRepository], skip=0, batch_size=2))
+
+    assert response.status_code == 200
+    assert response.json() == json.loads(streamed)
+    assert AddressListResponse.parse_raw(streamed) == handle_address_list_request(
+        km_service, app_inst.container[AlgorithmRepository]
+    )
+    assert [address_pair["pair"]["controller_wallet_address"] for address_pair in response.json()["address_pairs"]] == (
+        addresses
+    )
+    assert response.json()["address_pairs"][4]["pair"]["trading_contract_address"] == ADDR1
+
+
+def test_list_addresses_rejects_invalid_pages(app_inst, system_access_header):
+    for query in ["skip=-1&limit=2", "skip=0&limit=0"]:
+        response = app_inst.client.get(f"/api/v2/wallets/?{query}", headers=system_access_header)
+
+        assert response.status_code == 422
+
+
+def test_list_addresses_streamed_past_the_last_wallet(app_inst, algorithm_repository):
+    km_service = app_inst.container[KeyManagementService]
+    addresses = sorted(new_address(km_service).pair.controller_wallet_address for _ in range(5))
+    stream = stream_address_list(km_service, algorithm_repository, skip=1, batch_size=2)
+    streamed = [next(stream), next(stream)]
+    # A wallet ordered before the streamed ones is added while streaming, it doesn't push the next pages back.
+    km_service.keys["added"] = Web3.toChecksumAddress("0x" + "0" * 40)
+    streamed.extend(stream)
+
+    assert [
+        address_pair.pair.controller_wallet_address
+        for address_pair in AddressListResponse.parse_raw("".join(streamed)).address_pairs
+    ] == addresses[1:]
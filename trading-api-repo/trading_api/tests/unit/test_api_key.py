@@ -57,14 +57,16 @@ def test_buy_v2_request_with_incorrect_api_key_in_url_is_unauthorized(app_inst):
     assert response.status_code == HTTPStatus.UNAUTHORIZED
 
 
+@mock.patch("trading_api.algorithm.trade.get_gas_parameters")
 @mock.patch("trading_api.algorithm.trade.is_trade_possible")
 @mock.patch("trading_api.algorithm.trade.send_trade_to_blockchain")
 @mock.patch("trading_api.algorithm.status.retrieve_trade_status")
 @mock.patch("trading_api.algorithm.trade.get_web3_nonce")
 def test_buy_v2_request_with_correct_api_key_in_url_is_authorized(
-    nonce: MagicMock, retrieve: MagicMock, send: MagicMock, possible: MagicMock, app_inst
+    nonce: MagicMock, retrieve: MagicMock, send: MagicMock, possible: MagicMock, gas: MagicMock, app_inst
 ):
     nonce.return_value = 1
+    gas.return_value = 21_000, 5_000_000_000, 1337
     send.return_value = make_algorithm_transaction(), 1
     retrieve.return_value = TradeStatus.TRADE_SUCCESSFUL
     app_inst.container[AlgorithmRepository].upsert_algorithm(default_user_v2())
@@ -90,14 +92,16 @@ def test_sell_v2_request_with_incorrect_api_key_in_url_is_unauthorized(app_inst)
     assert response.status_code == HTTPStatus.UNAUTHORIZED
 
 
+@mock.patch("trading_api.algorithm.trade.get_gas_parameters")
 @mock.patch("trading_api.algorithm.trade.is_trade_possible")
 @mock.patch("trading_api.algorithm.trade.send_trade_to_blockchain")
 @mock.patch("trading_api.algorithm.status.retrieve_trade_status")
 @mock.patch("trading_api.algorithm.trade.get_web3_nonce")
 def test_sell_v2_request_with_correct_api_key_in_url_is_authorized(
-    nonce: MagicMock, retrieve: MagicMock, send: MagicMock, possible: MagicMock, app_inst
+    nonce: MagicMock, retrieve: MagicMock, send: MagicMock, possible: MagicMock, gas: MagicMock, app_inst
 ):
     nonce.return_value = 1
+    gas.return_value = 21_000, 5_000_000_000, 1337
     send.return_value = make_algorithm_transaction(), 42
     retrieve.return_value = TradeStatus.TRADE_SUCCESSFUL
     app_inst.container[AlgorithmRepository].upsert_algorithm(default_user_v2())
@@ -0,0 +1,99 @@
+from decimal import Decimal
+
+import pytest
+from web3 import Web3
+
+from tests.unit.test_gas_limit import TRADE, TRADING_ABI, TradingWeb3Provider, make_v2_algorithm
+from tests.utils import ADDR1, ADDR2, make_algorithm
+from trading_api.algorithm.models.trade import SellTrade
+from trading_api.algorithm.services.calldata import build_transaction, get_call_encoder
+from trading_api.algorithm.trade import build_trade_transaction, get_trade_call, get_trade_call_data
+
+TRADING_ABI_V1 = [
+    {
+        "name": name,
+        "type": "function",
+        "stateMutability": "nonpayable",
+        "inputs": [{"name": "amount", "type": "uint256"}, {"name": "slippage", "type": "uint256"}],
+        "outputs": [],
+    }
+    for name in ("buy", "sell")
+]
+
+OTHER_TYPES_ABI = [
+    {
+        "name": "other",
+        "type": "function",
+        "stateMutability": "nonpayable",
+        "inputs": [
+            {"name": "flag", "type": "bool"},
+            {"name": "key", "type": "bytes32"},
+            {"name": "data", "type": "bytes"},
+            {"name": "amounts", "type": "uint8[2]"},
+            {
+                "name": "pair",
+                "type": "tuple",
+                "components": [{"name": "a", "type": "address"}, {"name": "b", "type": "string"}],
+            },
+        ],
+        "outputs": [],
+    }
+]
+
+TRANSACTION = {"gas": 300_000, "gasPrice": 5 * 10**9, "chainId": 56, "nonce": 7}
+
+
+@pytest.mark.parametrize(
+    "abi, fn_name, args",
+    [
+        (TRADING_ABI_V1, "buy", (10**17, 10**16)),
+        (TRADING_ABI_V1, "sell", (0, 2**256 - 1)),
+        (TRADING_ABI, "buy", (10**17, 10**16, "BTC")),
+        (TRADING_ABI, "sell", (10**17, 10**16, "")),
+        (TRADING_ABI, "sell", (1, 2, "A symbol longer than one word of thirty-two bytes, ünicode too")),
+        (OTHER_TYPES_ABI, "other", (True, b"\1" * 32, b"\2" * 40, [1, 2], (ADDR1, "BTC"))),
+    ],
+)
+def test_call_data_same_as_web3(abi, fn_name, args):
+    contract = Web3().eth.contract(address=ADDR2, abi=abi)
+
+    transaction = build_transaction(contract, fn_name, args, TRANSACTION)
+
+    assert transaction == contract.get_function_by_name(fn_name)(*args).buildTransaction(TRANSACTION)
+
+
+def test_invalid_arguments():
+    contract = Web3().eth.contract(address=ADDR2, abi=TRADING_ABI)
+    encoder = get_call_encoder(contract, "buy")
+
+    assert get_call_encoder(contract, "buy") is encoder
+    for args in [(-1, 0, "BTC"), (2**256, 0, "BTC"), (Decimal(1), 0, "BTC"), (1, 0)]:
+        with pytest.raises((ValueError, TypeError)):
+            encoder.encode(*args)
+    with pytest.raises(ValueError):
+        get_call_encoder(contract, "swap")
+
+
+@pytest.mark.parametrize(
+    "trade, algorithm",
+    [
+        (TRADE, make_v2_algorithm(ADDR1)),
+        (
+            SellTrade(algorithm_id=TRADE.algorithm_id, slippage=TRADE.slippage, relative_amount=Decimal("0.5")),
+            make_algorithm(),
+        ),
+    ],
+)
+def test_trade_transaction_same_as_web3(trade, algorithm):
+    abi = TRADING_ABI if algorithm.trading_contract.version.value >= "2.0" else TRADING_ABI_V1
+    provider = TradingWeb3Provider(Web3())
+    contract = provider._w3.eth.contract(address=algorithm.trading_contract_address, abi=abi)
+    provider.get_trading_contract = lambda algorithm: contract  # type: ignore
+
+    transaction = build_trade_transaction(trade, algorithm, provider, TRANSACTION)
+
+    assert transaction == get_trade_call(trade, algorithm, provider).buildTransaction(TRANSACTION)
+    assert (
+        get_trade_call_data(trade, algorithm, provider)
+        == get_trade_call(trade, algorithm, provider)._encode_transaction_data()
+    )
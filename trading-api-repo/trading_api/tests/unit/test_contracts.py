@@ -0,0 +1,65 @@
+import json
+from unittest.mock import patch
+
+from web3 import Web3
+
+from tests.unit.test_gas_limit import TRADING_ABI
+from tests.utils import ADDR1, ADDR2, make_algorithm
+from trading_api.algorithm.models.crypto import ChainId
+from trading_api.algorithm.services import contracts
+from trading_api.algorithm.services.contracts import ContractRegistry
+from trading_api.algorithm.services.web3 import HttpWeb3Provider
+
+
+def write_artifact(path, abi=TRADING_ABI):
+    with open(path, "w") as f:
+        json.dump({"abi": abi, "bytecode": "0x"}, f)
+
+    return path
+
+
+def test_contracts_are_built_once(tester_provider, tmp_path):
+    w3 = Web3(tester_provider)
+    artifact = write_artifact(tmp_path / "TradingContract.json")
+    registry = ContractRegistry(lambda chain: w3)
+
+    with patch.object(contracts, "load_abi", wraps=contracts.load_abi) as load_abi:
+        contract = registry.get_contract(ChainId.RTN, ADDR1, artifact)
+        assert registry.get_contract(ChainId.RTN, ADDR1, artifact) is contract
+        other_address = registry.get_contract(ChainId.RTN, ADDR2, artifact)
+        other_chain = registry.get_contract(ChainId.BSC, ADDR1, artifact)
+
+    assert load_abi.call_count == 1
+    assert contract.address == other_chain.address == ADDR1
+    assert other_address.address == ADDR2
+    assert other_chain is not contract
+    assert contract.functions.buy(1, 2, "BTC").fn_name == "buy"
+    assert registry.get_metrics() == {"abis": 1, "contracts": 3, "hits": 1, "misses": 3}
+
+
+def test_preload_skips_missing_artifacts(tester_provider, tmp_path):
+    w3 = Web3(tester_provider)
+    artifact = write_artifact(tmp_path / "TradingContract.json")
+    missing = tmp_path / "Missing.json"
+    registry = ContractRegistry(lambda chain: w3)
+
+    registry.preload([artifact, missing])
+    assert registry.abis == {artifact: TRADING_ABI}
+
+    write_artifact(missing, abi=[])
+    assert registry.get_contract(ChainId.RTN, ADDR1, missing).abi == []
+
+
+def test_web3_provider_reuses_trading_contracts(tester_provider, tmp_path):
+    w3 = Web3(tester_provider)
+    algorithm = make_algorithm()
+    provider = HttpWeb3Provider("http://localhost", "http://localhost", None, None)  # type: ignore
+    provider._http_rtn_web3 = w3
+    provider.contracts.preload([write_artifact(tmp_path / "TradingContract.json")])
+
+    with patch.object(type(algorithm.trading_contract), "location", tmp_path / "TradingContract.json"):
+        contract = provider.get_trading_contract(algorithm)
+        assert provider.get_trading_contract(algorithm) is contract
+
+    assert contract.address == algorithm.trading_contract_address
+    assert provider.get_metrics()["contracts.hits"] == 1
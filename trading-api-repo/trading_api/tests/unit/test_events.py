@@ -0,0 +1,51 @@
+import asyncio
+import json
+from unittest.mock import AsyncMock
+
+from tests.unit.test_watcher import UNKNOWN_HASH
+from tests.utils import ADDR1, ADDR2, make_buy_trade, make_sell_trade_v2
+from trading_api.algorithm.events import publish_trade_event, stream_trade_events
+from trading_api.algorithm.models.crypto import TransactionHash
+from trading_api.algorithm.models.trade import TradeEventType
+from trading_api.algorithm.services.events import InMemoryTradeEventBroker
+
+TRANSACTION_HASH = TransactionHash(value=UNKNOWN_HASH)
+
+
+def test_stream_trade_events_of_an_algorithm():
+    broker = InMemoryTradeEventBroker()
+    trade, other_trade = make_sell_trade_v2(), make_buy_trade(ADDR2)
+
+    async def stream():
+        events = stream_trade_events(broker, trade.algorithm_id.public_address, keep_alive_s=0.05)
+        first = asyncio.create_task(events.__anext__())
+        await asyncio.sleep(0.01)  # Let the stream subscribe.
+        await publish_trade_event(broker, TradeEventType.TRADE_SUBMITTED, other_trade, TRANSACTION_HASH)
+        await publish_trade_event(broker, TradeEventType.TRADE_SUBMITTED, trade, TRANSACTION_HASH)
+        result = [await first, await events.__anext__()]
+        await events.aclose()
+
+        return result
+
+    submitted, keep_alive = asyncio.run(stream())
+
+    event, data = submitted.splitlines()[:2]
+    assert event == "event: TRADE_SUBMITTED"
+    assert json.loads(data.removeprefix("data: "))["symbol"] == "BTC"
+    assert keep_alive == ": keep-alive\n\n"
+    assert broker.subscribers == {f"TRADE-EVENTS-{trade.algorithm_id.public_address}": []}
+
+
+def test_failing_broker_does_not_fail_the_trade():
+    broker = AsyncMock(spec=InMemoryTradeEventBroker)
+    broker.publish.side_effect = ConnectionError("Redis unavailable.")
+
+    asyncio.run(publish_trade_event(broker, TradeEventType.TRADE_MINED, make_buy_trade(), TRANSACTION_HASH))
+
+    broker.publish.assert_awaited_once()
+
+
+def test_events_require_the_algorithms_address(app_inst, access_header_v2):
+    response = app_inst.client.get(f"/api/v2/algorithms/{ADDR1}/events", headers=access_header_v2)
+
+    assert response.status_code == 401
@@ -1,7 +1,23 @@
+import asyncio
 import os
+import time
+from typing import List
+from unittest import mock
 
-from trading_api.algorithm.models.crypto import ChainId
-from trading_api.algorithm.trade import estimated_gas_factor_for_chain
+import pytest
+from web3 import Web3
+
+from mm.data.services import GasOracle as MMGasOracle
+from mm.domain.models import ChainId as MMChainId
+from tests.utils import make_algorithm, make_buy_trade_v2
+from trading_api.algorithm.models.crypto import BlockHead, ChainId
+from trading_api.algorithm.models.trade import GasPrices, GasUrgency
+from trading_api.algorithm.repositories.gas import InMemoryGasPriceRepository
+from trading_api.algorithm.repositories.head import InMemoryBlockHeadRepository
+from trading_api.algorithm.services.gas import GasOracle, parse_percentiles
+from trading_api.algorithm.services.heads import HeadTracker
+from trading_api.algorithm.services.web3 import InMemoryWeb3Provider
+from trading_api.algorithm.trade import estimated_gas_factor_for_chain, get_gas_parameters
 
 
 def test_get_estimated_gas_RNB():
@@ -17,3 +33,168 @@ def test_get_estimated_gas_RNB():
     del os.environ["ESTIMATED_GAS_FACTOR"]
     assert estimated_gas_factor_for_chain(ChainId.RTN) == 20
     assert estimated_gas_factor_for_chain("unknownchain") == 15
+
+
+def gas_price_middleware(make_request, w3):
+    """Name the gas price of full transactions in a block the way a node does, eth-tester leaves it `gas_price`."""
+
+    def middleware(method, params):
+        response = make_request(method, params)
+        if method == "eth_getBlockByNumber" and params[1]:
+            transactions = [
+                {**transaction, "gasPrice": transaction["gas_price"]}
+                for transaction in response["result"]["transactions"]
+            ]
+            return {**response, "result": {**response["result"], "transactions": transactions}}
+
+        return response
+
+    return middleware
+
+
+@pytest.fixture
+def w3(w3):
+    w3.middleware_onion.add(gas_price_middleware)
+
+    return w3
+
+
+def send_transactions(w3: Web3, gas_prices_gwei: List[int]):
+    for gas_price in gas_prices_gwei:
+        w3.eth.send_transaction(
+            {"to": w3.eth.accounts[1], "from": w3.eth.coinbase, "value": 1, "gasPrice": gas_price * 10**9}
+        )
+
+
+def make_head(w3: Web3) -> BlockHead:
+    block = w3.eth.get_block("latest")
+    return BlockHead(chain_id=ChainId.RTN, number=block["number"], timestamp=block["timestamp"], gas_price=1)
+
+
+def make_oracle(w3: Web3, head_repository=None, price_repository=None, **kwargs) -> GasOracle:
+    provider = InMemoryWeb3Provider(w3, None, None, None)
+    head_tracker = HeadTracker(
+        lambda: provider, head_repository or InMemoryBlockHeadRepository(), ws_uris={}, poll_interval_s=0.01
+    )
+
+    return GasOracle(lambda: provider, head_tracker, price_repository or InMemoryGasPriceRepository(), **kwargs)
+
+
+def make_prices(gas_price: int, sampled_at: float = None) -> GasPrices:
+    return GasPrices(
+        chain_id=ChainId.RTN,
+        block_number=1,
+        sampled_at=time.time() if sampled_at is None else sampled_at,
+        prices={urgency: gas_price for urgency in GasUrgency},
+    )
+
+
+def test_gas_price_per_urgency_from_recent_blocks(w3):
+    oracle = make_oracle(w3, block_count=4)
+
+    async def sample():
+        for gas_price in [1, 2, 3, 4, 5, 6, 7, 8]:
+            send_transactions(w3, [gas_price])
+            await oracle.sample(make_head(w3))
+
+        return [await oracle.get_gas_price(ChainId.RTN, urgency) for urgency in GasUrgency]
+
+    # Only the last four blocks are kept.
+    assert asyncio.run(sample()) == [6 * 10**9, 7 * 10**9, 8 * 10**9, 8 * 10**9]
+    assert oracle.get_metrics()["RTN.standard_gwei"] == 7
+    assert oracle.fallbacks == 0
+
+
+def test_gas_price_without_samples(w3):
+    oracle = make_oracle(w3)
+
+    assert asyncio.run(oracle.get_gas_price(ChainId.RTN)) == w3.eth.gas_price
+
+    oracle.head_tracker.get_tracker(ChainId.RTN)._update(make_head(w3))
+    assert asyncio.run(oracle.get_gas_price(ChainId.RTN)) == 1
+    assert oracle.fallbacks == 2
+
+
+def test_stale_gas_prices_are_not_used(w3):
+    oracle = make_oracle(w3, max_price_age_s=30)
+    oracle.prices[ChainId.RTN] = make_prices(5, sampled_at=time.time() - 60)
+    tracker = oracle.head_tracker.get_tracker(ChainId.RTN)
+    tracker._update(make_head(w3))
+    tracker.latest_seen_at -= 60
+
+    assert asyncio.run(oracle.get_gas_price(ChainId.RTN)) == w3.eth.gas_price
+    assert oracle.fallbacks == 1
+
+
+def test_gas_prices_are_sampled_on_new_heads(w3):
+    oracle = make_oracle(w3)
+
+    async def run():
+        tasks = [asyncio.create_task(oracle.head_tracker.get_tracker(ChainId.RTN).run())]
+        tasks.append(asyncio.create_task(oracle.run(ChainId.RTN)))
+        await asyncio.sleep(0.05)
+        send_transactions(w3, [3])
+        await asyncio.sleep(0.1)
+        for task in tasks:
+            task.cancel()
+
+        return await oracle.get_gas_price(ChainId.RTN, GasUrgency.URGENT)
+
+    assert asyncio.run(run()) == 3 * 10**9
+
+
+@mock.patch("trading_api.algorithm.services.web3.InMemoryAsyncEth.gas_price", new_callable=mock.PropertyMock)
+def test_gas_parameters_take_the_gas_price_from_the_oracle(gas_price, w3):
+    oracle = make_oracle(w3)
+    oracle.prices[ChainId.RTN] = make_prices(5)
+    trade = make_buy_trade_v2().copy(update={"urgency": GasUrgency.FAST})
+
+    _, price, _ = asyncio.run(get_gas_parameters(trade, make_algorithm(), oracle.web3_provider_fn(), oracle))
+
+    assert price == 5
+    gas_price.assert_not_called()
+
+
+def test_only_the_leader_samples_gas_prices(w3):
+    head_repository, price_repository = InMemoryBlockHeadRepository(), InMemoryGasPriceRepository()
+    first, second = (make_oracle(w3, head_repository, price_repository) for _ in range(2))
+
+    async def run():
+        tasks = []
+        for oracle in (first, second):
+            tasks.append(asyncio.create_task(oracle.head_tracker.get_tracker(ChainId.RTN).run()))
+            tasks.append(asyncio.create_task(oracle.run(ChainId.RTN)))
+        await asyncio.sleep(0.05)
+        for gas_price in (3, 4):
+            send_transactions(w3, [gas_price])
+            await asyncio.sleep(0.1)
+        for task in tasks:
+            task.cancel()
+
+        return [await oracle.get_gas_price(ChainId.RTN, GasUrgency.URGENT) for oracle in (first, second)]
+
+    prices = asyncio.run(run())
+
+    leader, follower = sorted([first, second], key=lambda oracle: oracle.sampled)[::-1]
+    assert follower.sampled == 0 and leader.sampled >= 2
+    assert leader.prices[ChainId.RTN] == price_repository.latest[ChainId.RTN]
+    # The follower may read the prices before the leader sampled the last block.
+    assert set(prices) <= {3 * 10**9, 4 * 10**9}
+
+
+def test_parse_percentiles():
+    assert parse_percentiles("low=10, FAST=90") == {GasUrgency.LOW: 0.1, GasUrgency.FAST: 0.9}
+    assert parse_percentiles("") == {}
+
+
+def test_mm_gas_price_from_recent_blocks(w3):
+    web3_provider = mock.MagicMock()
+    web3_provider.get_web3.return_value = w3
+    send_transactions(w3, [2, 4, 6])
+    oracle = MMGasOracle(web3_provider, percentile=0.5, poll_interval_s=0.01)
+
+    # The first request starts sampling, until then it's the node's gas price.
+    assert oracle.get_gas_price(MMChainId.RTN) == w3.eth.gas_price
+    time.sleep(0.2)
+
+    assert oracle.get_gas_price(MMChainId.RTN) == 4 * 10**9
@@ -0,0 +1,184 @@
+import asyncio
+from decimal import Decimal
+from unittest.mock import AsyncMock
+
+from web3 import Web3
+
+from tests.unit.test_multicall import ONE_ETHER_CODE, REVERT_CODE, deploy_code
+from tests.unit.test_watcher import make_pending, make_watcher, send_transaction, watch
+from tests.utils import ADDR1, make_algorithm, make_buy_trade_v2, make_sell_trade
+from trading_api.algorithm.models.algorithm import Algorithm, AlgorithmId, TradingContract, TradingContractVersion
+from trading_api.algorithm.models.crypto import ChainId
+from trading_api.algorithm.models.trade import BuyTradeV2, GasShape, Slippage, TradeType
+from trading_api.algorithm.repositories.gas import InMemoryGasUsageRepository
+from trading_api.algorithm.services.gas_limit import GasLimitModel, get_gas_shape
+from trading_api.algorithm.services.web3 import InMemoryWeb3Provider
+from trading_api.algorithm.trade import get_gas_limit
+
+TRADING_ABI = [
+    {
+        "name": name,
+        "type": "function",
+        "stateMutability": "nonpayable",
+        "inputs": [
+            {"name": "amount", "type": "uint256"},
+            {"name": "slippage", "type": "uint256"},
+            {"name": "symbol", "type": "string"},
+        ],
+        "outputs": [],
+    }
+    for name in ("buy", "sell")
+]
+
+TRADE = BuyTradeV2(
+    algorithm_id=AlgorithmId(public_address=ADDR1),
+    slippage=Slippage(amount=Decimal("0.01")),
+    relative_amount=Decimal("0.1"),
+    symbol="BTC",
+)
+
+SHAPE = GasShape(chain_id=ChainId.RTN, contract_version=TradingContractVersion.V2_0, trade_type=TradeType.BUY)
+
+
+class TradingWeb3Provider(InMemoryWeb3Provider):
+    def __init__(self, w3: Web3):
+        super().__init__(w3, None, None, None)  # type: ignore
+
+    def get_trading_contract(self, algorithm: Algorithm):
+        return self._w3.eth.contract(address=algorithm.trading_contract_address, abi=TRADING_ABI)
+
+
+def make_v2_algorithm(trading_contract_address: str) -> Algorithm:
+    return make_algorithm(
+        trading_contract_address=trading_contract_address,
+        trading_contract=TradingContract(version=TradingContractVersion.V2_0),
+    )
+
+
+def record(model: GasLimitModel, shape: GasShape, samples):
+    async def record_all():
+        for gas_used in samples:
+            await model.record(shape, gas_used)
+
+    asyncio.run(record_all())
+
+
+def test_gas_limit_from_the_gas_used_by_earlier_trades():
+    model = GasLimitModel(InMemoryGasUsageRepository(), percentile=0.9, margin=1.5, min_samples=3)
+
+    record(model, SHAPE, [100_000, 120_000])
+    assert asyncio.run(model.get_gas_limit(SHAPE)) is None
+
+    record(model, SHAPE, [110_000])
+    assert asyncio.run(model.get_gas_limit(SHAPE)) == 180_000
+    assert model.get_metrics() == {"hits": 1, "misses": 1, "recorded": 3, "out_of_gas": 0, "shapes": 1}
+
+
+def test_gas_limit_from_recent_trades_only():
+    model = GasLimitModel(InMemoryGasUsageRepository(max_samples=2), percentile=0.0, margin=1, min_samples=1)
+
+    record(model, SHAPE, [50_000, 100_000, 120_000])
+
+    assert asyncio.run(model.get_gas_limit(SHAPE)) == 100_000
+
+
+def test_gas_limits_are_shared_after_a_refresh():
+    usage_repository = InMemoryGasUsageRepository()
+    worker = GasLimitModel(usage_repository, min_samples=1)
+    other_worker = GasLimitModel(usage_repository, min_samples=1, refresh_s=0)
+    stale = GasLimitModel(usage_repository, min_samples=1, refresh_s=60)
+    assert asyncio.run(other_worker.get_gas_limit(SHAPE)) is None
+    assert asyncio.run(stale.get_gas_limit(SHAPE)) is None
+
+    record(worker, SHAPE, [100_000])
+
+    assert asyncio.run(other_worker.get_gas_limit(SHAPE)) == 110_000
+    assert asyncio.run(stale.get_gas_limit(SHAPE)) is None
+
+
+def test_gas_shape():
+    algorithm = make_v2_algorithm("0x" + "11" * 20)
+
+    assert get_gas_shape(make_buy_trade_v2(symbol="btc"), algorithm) == SHAPE.copy(update={"symbol": "BTC"})
+    assert get_gas_shape(make_sell_trade(), make_algorithm()) == GasShape(
+        chain_id=ChainId.RTN, contract_version=TradingContractVersion.V1_0, trade_type=TradeType.SELL
+    )
+
+
+def test_unseen_shape_estimates_the_actual_call(tester_provider):
+    w3 = Web3(tester_provider)
+    algorithm = make_v2_algorithm(deploy_code(w3, ONE_ETHER_CODE))
+    provider = TradingWeb3Provider(w3)
+    model = GasLimitModel(InMemoryGasUsageRepository(), margin=1.5, min_samples=1)
+    gas_limit = asyncio.run(get_gas_limit(TRADE, algorithm, provider, model))
+
+    call = provider.get_trading_contract(algorithm).functions.buy(10**17, int(TRADE.slippage.raw_amount), "BTC")
+    assert gas_limit == int(1.5 * call.estimateGas({"from": algorithm.controller_wallet_address}))
+    assert gas_limit < w3.eth.estimate_gas({}) * 20
+
+    record(model, get_gas_shape(TRADE, algorithm), [30_000])
+    assert asyncio.run(get_gas_limit(TRADE, algorithm, provider, model)) == 45_000
+
+
+def test_failing_estimate_falls_back_to_the_gas_factor(tester_provider):
+    w3 = Web3(tester_provider)
+    algorithm = make_v2_algorithm(deploy_code(w3, REVERT_CODE))
+    model = GasLimitModel(InMemoryGasUsageRepository())
+
+    gas_limit = asyncio.run(get_gas_limit(TRADE, algorithm, TradingWeb3Provider(w3), model))
+
+    assert gas_limit == 20 * w3.eth.estimate_gas({})
+
+
+def test_watcher_records_the_gas_used_by_successful_trades(tester_provider):
+    w3 = Web3(tester_provider)
+    model = GasLimitModel(InMemoryGasUsageRepository(), margin=1, min_samples=1)
+    watcher = make_watcher(w3, AsyncMock(), gas_limit_model=model)
+    watch(watcher, make_pending(send_transaction(w3)).copy(update={"gas_shape": SHAPE}))
+    # Trades sent before they had a shape are skipped.
+    watch(watcher, make_pending(send_transaction(w3)))
+
+    asyncio.run(watcher.poll())
+
+    assert model.recorded == 1
+    assert asyncio.run(model.get_gas_limit(SHAPE)) == 21_000
+
+
+def test_watcher_records_the_gas_used_once_the_trade_is_finalized(tester_provider):
+    w3 = Web3(tester_provider)
+    model = GasLimitModel(InMemoryGasUsageRepository(), margin=1, min_samples=1)
+    finalize = AsyncMock(side_effect=[ConnectionError("Redis is down"), None])
+    watcher = make_watcher(w3, finalize, gas_limit_model=model)
+    watch(watcher, make_pending(send_transaction(w3)).copy(update={"gas_shape": SHAPE}))
+
+    asyncio.run(watcher.poll())
+    assert model.recorded == 0
+
+    send_transaction(w3)
+    asyncio.run(watcher.poll())
+    assert model.recorded == 1
+
+
+def send_call(w3: Web3, to: str, gas: int) -> str:
+    return w3.eth.send_transaction({"to": to, "from": w3.eth.coinbase, "gas": gas}).hex()
+
+
+def test_watcher_drops_the_learned_gas_limit_of_trades_that_ran_out_of_gas(tester_provider):
+    w3 = Web3(tester_provider)
+    model = GasLimitModel(InMemoryGasUsageRepository(), margin=1, min_samples=1)
+    record(model, SHAPE, [21_000])
+    watcher = make_watcher(w3, AsyncMock(), gas_limit_model=model)
+    out_of_gas = send_call(w3, deploy_code(w3, ONE_ETHER_CODE), gas=21_010)
+    reverted = send_call(w3, deploy_code(w3, REVERT_CODE), gas=100_000)
+    watch(watcher, make_pending(reverted).copy(update={"gas_shape": SHAPE}))
+
+    asyncio.run(watcher.poll())
+    # A revert doesn't say anything about the gas limit.
+    assert asyncio.run(model.get_gas_limit(SHAPE)) == 21_000
+
+    watch(watcher, make_pending(out_of_gas).copy(update={"gas_shape": SHAPE}))
+    send_transaction(w3)
+    asyncio.run(watcher.poll())
+
+    assert asyncio.run(model.get_gas_limit(SHAPE)) is None
+    assert model.out_of_gas == 1
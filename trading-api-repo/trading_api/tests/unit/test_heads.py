@@ -0,0 +1,166 @@
+import asyncio
+
+from aiohttp import web
+from web3 import Web3
+
+from tests.unit.test_watcher import send_transaction
+from trading_api.algorithm.models.crypto import ChainId
+from trading_api.algorithm.repositories.head import InMemoryBlockHeadRepository
+from trading_api.algorithm.services.heads import HeadTracker, get_block_number
+from trading_api.algorithm.services.web3 import InMemoryWeb3Provider
+
+
+def make_tracker(w3: Web3, head_repository: InMemoryBlockHeadRepository, **kwargs) -> HeadTracker:
+    kwargs = {"ws_uris": {}, "poll_interval_s": 0.01, "lease_timeout_ms": 200, **kwargs}
+    return HeadTracker(lambda: InMemoryWeb3Provider(w3, None, None, None), head_repository, **kwargs)
+
+
+def run(tracker: HeadTracker) -> asyncio.Task:
+    return asyncio.create_task(tracker.get_tracker(ChainId.RTN).run())
+
+
+def test_one_worker_follows_the_node(tester_provider):
+    w3 = Web3(tester_provider)
+    head_repository = InMemoryBlockHeadRepository()
+    first, second = make_tracker(w3, head_repository), make_tracker(w3, head_repository)
+
+    async def follow():
+        tasks = [run(first), run(second)]
+        await asyncio.sleep(0.1)
+        send_transaction(w3)
+        await asyncio.sleep(0.1)
+        for task in tasks:
+            task.cancel()
+
+    asyncio.run(follow())
+
+    leader, follower = sorted([first, second], key=lambda tracker: tracker.get_tracker(ChainId.RTN).leading)[::-1]
+    assert leader.latest(ChainId.RTN) == follower.latest(ChainId.RTN)
+    assert leader.latest(ChainId.RTN).number == w3.eth.block_number
+    assert leader.latest(ChainId.RTN).gas_price == w3.eth.gas_price
+    assert leader.latest(ChainId.RTN).base_fee is not None
+    assert leader.get_metrics()["RTN.node_heads"] == 2
+    assert follower.get_metrics() == {
+        "RTN.block_number": 1,
+        "RTN.leading": 0,
+        "RTN.stale": 0,
+        "RTN.heads": 2,
+        "RTN.node_heads": 0,
+    }
+
+
+def test_follower_takes_over_from_a_stopped_leader(tester_provider):
+    w3 = Web3(tester_provider)
+    head_repository = InMemoryBlockHeadRepository()
+    leader, follower = make_tracker(w3, head_repository), make_tracker(w3, head_repository)
+
+    async def take_over():
+        leading = run(leader)
+        await asyncio.sleep(0.05)
+        following = run(follower)
+        await asyncio.sleep(0.05)
+        leading.cancel()
+        await asyncio.sleep(0.5)
+        send_transaction(w3)
+        await asyncio.sleep(0.1)
+        following.cancel()
+
+    asyncio.run(take_over())
+
+    assert follower.get_tracker(ChainId.RTN).leading
+    assert follower.latest(ChainId.RTN).number == w3.eth.block_number
+
+
+def test_stalled_tracker_has_no_latest_block_number(tester_provider):
+    w3 = Web3(tester_provider)
+    tracker = make_tracker(w3, InMemoryBlockHeadRepository(), max_head_age_s=0.05)
+
+    async def stall():
+        task = run(tracker)
+        await asyncio.sleep(0.03)
+        tracked = tracker.latest_number(ChainId.RTN)
+        # The tracker stops, e.g. its leader died without releasing the lease.
+        task.cancel()
+        await asyncio.sleep(0.1)
+        send_transaction(w3)
+
+        aw3 = InMemoryWeb3Provider(w3, None, None, None).get_async_web3(chain=ChainId.RTN)
+
+        return tracked, tracker.latest_number(ChainId.RTN), await get_block_number(aw3, ChainId.RTN, tracker)
+
+    assert asyncio.run(stall()) == (0, None, 1)
+    assert tracker.get_metrics()["RTN.stale"] == 1
+
+
+def test_subscribers_get_new_heads(tester_provider):
+    w3 = Web3(tester_provider)
+    tracker = make_tracker(w3, InMemoryBlockHeadRepository())
+
+    async def subscribe():
+        task = run(tracker)
+        async with tracker.subscribe(ChainId.RTN) as next_head:
+            first = await next_head(1)
+            send_transaction(w3)
+            second = await next_head(1)
+        task.cancel()
+
+        return first, second
+
+    first, second = asyncio.run(subscribe())
+
+    assert (first.number, second.number) == (0, 1)
+    assert tracker.get_tracker(ChainId.RTN).subscribers == []
+
+
+def test_heads_from_websocket_subscription(tester_provider):
+    w3 = Web3(tester_provider)
+    header = {"number": "0x2a", "timestamp": "0x6000", "baseFeePerGas": "0x3b9aca00"}
+
+    async def node(request):
+        websocket = web.WebSocketResponse()
+        await websocket.prepare(request)
+        subscribe_request = await websocket.receive_json()
+        assert subscribe_request["params"] == ["newHeads"]
+        await websocket.send_json({"jsonrpc": "2.0", "id": subscribe_request["id"], "result": "0x1"})
+        await websocket.send_json({"method": "eth_subscription", "params": {"subscription": "0x1", "result": header}})
+        await websocket.receive()
+
+        return websocket
+
+    async def subscribe():
+        app = web.Application()
+        app.router.add_get("/", node)
+        runner = web.AppRunner(app)
+        await runner.setup()
+        site = web.TCPSite(runner, "127.0.0.1", 0)
+        await site.start()
+        port = site._server.sockets[0].getsockname()[1]  # type: ignore
+
+        tracker = make_tracker(w3, InMemoryBlockHeadRepository(), ws_uris={ChainId.RTN: f"ws://127.0.0.1:{port}/"})
+        task = run(tracker)
+        async with tracker.subscribe(ChainId.RTN) as next_head:
+            head = await next_head(1)
+        task.cancel()
+        await runner.cleanup()
+
+        return head
+
+    head = asyncio.run(subscribe())
+
+    assert (head.number, head.timestamp, head.base_fee, head.gas_price) == (42, 0x6000, 10**9, w3.eth.gas_price)
+
+
+def test_polling_when_the_websocket_fails(tester_provider):
+    w3 = Web3(tester_provider)
+    tracker = make_tracker(w3, InMemoryBlockHeadRepository(), ws_uris={ChainId.RTN: "ws://127.0.0.1:1"})
+
+    async def subscribe():
+        task = run(tracker)
+        async with tracker.subscribe(ChainId.RTN) as next_head:
+            head = await next_head(1)
+        task.cancel()
+
+        return head
+
+    assert asyncio.run(subscribe()).number == w3.eth.block_number
+    assert tracker.get_tracker(ChainId.RTN).ws_retry_at > 0
@@ -0,0 +1,245 @@
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock, patch
+
+import asn1
+import pytest
+from eth_account import Account
+from eth_keys import keys
+from web3 import Web3
+
+from tests.unit.test_multicall import deploy_code
+from trading_api import Stage
+from trading_api.algorithm.models.address import AddressKeyPair
+from trading_api.algorithm.models.crypto import ChainId
+from trading_api.algorithm.repositories.key import InMemoryKeyRepository
+from trading_api.algorithm.services.kms import AWSKeyManagementService
+
+SECP256K1_N = int("fffffffffffffffffffffffffffffffebaaedce6af48a03bbfd25e8cd0364141", 16)
+
+# Passes its call data, minus the selector, to the ecrecover precompile: ecr(bytes32 hash, uint8 v, bytes32 r, bytes32 s).
+ECR_CODE = "6080600460003760206000608060006001" + "5afa50" + "60206000f3"
+ECR_ABI = [
+    {
+        "name": "ecr",
+        "type": "function",
+        "stateMutability": "view",
+        "inputs": [
+            {"name": "hash", "type": "bytes32"},
+            {"name": "v", "type": "uint8"},
+            {"name": "r", "type": "bytes32"},
+            {"name": "s", "type": "bytes32"},
+        ],
+        "outputs": [{"name": "", "type": "address"}],
+    }
+]
+
+PRIVATE_KEY = keys.PrivateKey(b"\x01" * 32)
+ADDRESS = PRIVATE_KEY.public_key.to_checksum_address()
+# SubjectPublicKeyInfo of the key, as KMS returns it.
+PUBLIC_KEY_DER = (
+    bytes.fromhex("3056301006072a8648ce3d020106052b8104000a034200") + b"\x04" + PRIVATE_KEY.public_key.to_bytes()
+)
+
+
+def kms_sign(message_hash: bytes, high_s: bool = False) -> bytes:
+    """Signs like KMS does, a DER encoded signature whose s can be on either half of the curve."""
+    signature = PRIVATE_KEY.sign_msg_hash(message_hash)
+    s = SECP256K1_N - signature.s if high_s else signature.s
+
+    encoder = asn1.Encoder()
+    encoder.start()
+    encoder.enter(asn1.Numbers.Sequence)
+    encoder.write(signature.r, asn1.Numbers.Integer)
+    encoder.write(s, asn1.Numbers.Integer)
+    encoder.leave()
+
+    return encoder.output()
+
+
+def make_kms(web3_provider=None) -> AWSKeyManagementService:
+    return AWSKeyManagementService(web3_provider, InMemoryKeyRepository(), "eu-west-1", Stage.Test)  # type: ignore
+
+
+@pytest.mark.parametrize("high_s", [False, True])
+def test_sign_transaction_recovers_v_locally(high_s):
+    web3_provider = MagicMock()
+    kms = make_kms(web3_provider)
+    kms.key_repository.add_address_key(AddressKeyPair(controller_wallet_address=ADDRESS, key_alias="key"))
+    transaction = {"to": ADDRESS, "value": 1, "gas": 21_000, "gasPrice": 10**9, "nonce": 0, "chainId": 56}
+
+    with patch("trading_api.algorithm.services.kms.Session") as session:
+        session.return_value.client.return_value.sign.side_effect = lambda Message, **kwargs: {
+            "Signature": kms_sign(Message, high_s)
+        }
+        signed = kms.sign_transaction(transaction, ADDRESS, ChainId.BSC)
+
+    # The chain id isn't part of what KMS signs.
+    transaction.pop("chainId")
+    assert signed.rawTransaction == Account.sign_transaction(transaction, PRIVATE_KEY.to_bytes()).rawTransaction
+    # No calls to the ECR contract.
+    web3_provider.get_ecr_contract.assert_not_called()
+
+
+def test_recovered_address_same_as_on_chain(tester_provider):
+    w3 = Web3(tester_provider)
+    ecr_contract = w3.eth.contract(address=deploy_code(w3, ECR_CODE), abi=ECR_ABI)
+    kms = make_kms()
+
+    for i in range(10):
+        message_hash = Web3.keccak(i)
+        r, s = kms._find_r_s_from_signature(kms_sign(message_hash, high_s=bool(i % 2)))
+        for v in (27, 28):
+            on_chain = ecr_contract.functions.ecr(message_hash, v, r.to_bytes(32, "big"), s.to_bytes(32, "big")).call()
+            assert kms._recover_address((r, s, v), message_hash) == on_chain
+
+        assert kms._find_right_pubkey((r, s), message_hash, ADDRESS)[0] == ADDRESS
+
+
+def test_kms_client_is_built_once():
+    kms = make_kms()
+    kms.key_repository.add_address_key(AddressKeyPair(controller_wallet_address=ADDRESS, key_alias="key"))
+    transactions = [{"to": ADDRESS, "value": 1, "gas": 21_000, "gasPrice": 10**9, "nonce": i} for i in range(20)]
+
+    with patch("trading_api.algorithm.services.kms.Session") as session:
+        session.return_value.client.return_value.sign.side_effect = lambda Message, **kwargs: {
+            "Signature": kms_sign(Message)
+        }
+        with ThreadPoolExecutor(max_workers=4) as executor:
+            list(
+                executor.map(lambda transaction: kms.sign_transaction(transaction, ADDRESS, ChainId.BSC), transactions)
+            )
+
+    session.assert_called_once_with(region_name="eu-west-1")
+    assert session.return_value.client.call_args.kwargs["config"].max_pool_connections == 50
+    assert session.return_value.client.return_value.sign.call_count == 20
+
+
+def test_signing_needs_no_key_lookups_after_warm_up():
+    kms = make_kms()
+    kms.key_repository.add_address_key(AddressKeyPair(controller_wallet_address=ADDRESS, key_alias="key"))
+    kms.warm_up()
+    kms.key_repository = MagicMock()
+    transaction = {"to": ADDRESS, "value": 1, "gas": 21_000, "gasPrice": 10**9, "nonce": 0}
+
+    with patch("trading_api.algorithm.services.kms.Session") as session:
+        session.return_value.client.return_value.sign.side_effect = lambda Message, **kwargs: {
+            "Signature": kms_sign(Message)
+        }
+        kms.sign_transaction(transaction, ADDRESS, ChainId.BSC)
+        kms.sign_transaction(transaction, ADDRESS, ChainId.BSC)
+
+    assert kms.key_repository.mock_calls == []
+    assert session.return_value.client.return_value.sign.call_args.kwargs["KeyId"] == "alias/key"
+
+
+def test_key_alias_lookups_are_cached():
+    kms = make_kms()
+    kms.key_repository = MagicMock(wraps=kms.key_repository)
+    kms.key_repository.add_address_key(AddressKeyPair(controller_wallet_address=ADDRESS, key_alias="key"))
+
+    with patch("trading_api.algorithm.services.kms.Session") as session:
+        session.return_value.client.return_value.get_public_key.return_value = {"PublicKey": PUBLIC_KEY_DER}
+        for _ in range(3):
+            assert kms.address_to_key_alias(ADDRESS) == "key"
+            assert kms.key_alias_to_key_info("key").address == ADDRESS
+
+    kms.key_repository.get_key_alias_by_address.assert_called_once_with(ADDRESS)
+    session.return_value.client.return_value.get_public_key.assert_called_once_with(KeyId="alias/key")
+
+
+def make_kms_client(aliases: dict) -> MagicMock:
+    """A KMS client with a key per alias, `aliases` maps each alias to whether its key is enabled."""
+    client = MagicMock()
+    client.list_aliases.return_value = {
+        "Aliases": [{"AliasName": f"alias/{alias}"} for alias in aliases],
+        "Truncated": False,
+    }
+    client.describe_key.side_effect = lambda KeyId: {"KeyMetadata": {"Enabled": aliases[KeyId.replace("alias/", "")]}}
+    client.get_public_key.return_value = {"PublicKey": PUBLIC_KEY_DER}
+
+    return client
+
+
+def test_missing_key_alias_is_found_through_the_index():
+    kms = make_kms()
+    for i in range(5):
+        kms.key_repository.add_address_key(
+            AddressKeyPair(controller_wallet_address=f"0x{i:040x}", key_alias=f"controller-wallet/test/{i}")
+        )
+    aliases = {f"controller-wallet/test/{i}": True for i in range(5)}
+    aliases.update({"controller-wallet/test/new": True, "controller-wallet/test/deleted": False, "other": True})
+
+    with patch("trading_api.algorithm.services.kms.Session") as session:
+        client = session.return_value.client.return_value = make_kms_client(aliases)
+        assert kms.address_to_key_alias(ADDRESS) == "controller-wallet/test/new"
+
+    # Only the keys that weren't indexed yet are looked up.
+    assert sorted(call.kwargs["KeyId"] for call in client.describe_key.call_args_list) == [
+        "alias/controller-wallet/test/deleted",
+        "alias/controller-wallet/test/new",
+    ]
+    client.get_public_key.assert_called_once_with(KeyId="alias/controller-wallet/test/new")
+    assert kms.key_repository.get_key_alias_by_address(ADDRESS) == "controller-wallet/test/new"
+
+
+def test_key_alias_missing_from_kms():
+    kms = make_kms()
+
+    with patch("trading_api.algorithm.services.kms.Session") as session:
+        session.return_value.client.return_value = make_kms_client({"controller-wallet/test/deleted": False})
+        with pytest.raises(ValueError):
+            kms.address_to_key_alias(ADDRESS)
+
+    assert ADDRESS not in kms.key_aliases
+
+
+def test_index_passes_only_add_new_keys():
+    kms = make_kms()
+    aliases = {"controller-wallet/test/a": True}
+
+    with patch("trading_api.algorithm.services.kms.Session") as session:
+        client = session.return_value.client.return_value = make_kms_client(aliases)
+        assert kms.index_key_aliases() == 1
+        assert kms.index_key_aliases() == 0
+
+    assert client.list_aliases.call_count == 2
+    client.describe_key.assert_called_once_with(KeyId="alias/controller-wallet/test/a")
+    assert list(kms.key_repository.all_address_keys()) == [
+        AddressKeyPair(controller_wallet_address=ADDRESS, key_alias="controller-wallet/test/a")
+    ]
+
+
+def test_index_passes_skip_rejected_keys():
+    kms = make_kms()
+    aliases = {"controller-wallet/test/disabled": False}
+
+    with patch("trading_api.algorithm.services.kms.Session") as session:
+        client = session.return_value.client.return_value = make_kms_client(aliases)
+        assert kms.index_key_aliases() == 0
+        assert kms.index_key_aliases() == 0
+
+    client.describe_key.assert_called_once_with(KeyId="alias/controller-wallet/test/disabled")
+    client.get_public_key.assert_not_called()
+
+
+def test_keyed_addresses_are_listed_from_the_index():
+    kms = make_kms()
+    private_keys = {f"controller-wallet/test/{i}": keys.PrivateKey(bytes([i + 1]) * 32) for i in range(3)}
+    der_prefix = bytes.fromhex("3056301006072a8648ce3d020106052b8104000a034200")
+
+    with patch("trading_api.algorithm.services.kms.Session") as session:
+        client = session.return_value.client.return_value = make_kms_client(dict.fromkeys(private_keys, True))
+        client.get_public_key.side_effect = lambda KeyId: {
+            "PublicKey": der_prefix + b"\x04" + private_keys[KeyId.replace("alias/", "")].public_key.to_bytes()
+        }
+        for _ in range(3):
+            assert sorted(kms.all_keyed_addresses(), key=lambda pair: pair.key_alias) == [
+                AddressKeyPair(controller_wallet_address=key.public_key.to_checksum_address(), key_alias=alias)
+                for alias, key in private_keys.items()
+            ]
+        by_address = sorted(kms.all_keyed_addresses(), key=lambda pair: pair.controller_wallet_address)
+        assert kms.keyed_addresses(skip=1, limit=1) == by_address[1:2]
+
+    # Only the first listing builds the index, from then on the background indexer keeps it up to date.
+    assert client.list_aliases.call_count == 1
+    assert client.get_public_key.call_count == 3
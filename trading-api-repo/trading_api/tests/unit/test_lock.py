@@ -1,3 +1,5 @@
+import asyncio
+
 import pytest
 from hexbytes import HexBytes
 
@@ -39,12 +41,14 @@ def test_retrieve_lock_symbol(trade, expected):
 
 def test_retrieve_lock(lock_repository, in_memory_w3, transaction_repository, algorithm_repository):
     trade = make_buy_trade()
-    lock = retrieve_lock(
-        lock_repository,
-        trade=trade,
-        web3_provider=in_memory_w3,
-        trading_transaction_repository=transaction_repository,
-        algorithm_repository=algorithm_repository,
+    lock = asyncio.run(
+        retrieve_lock(
+            lock_repository,
+            trade=trade,
+            web3_provider=in_memory_w3,
+            trading_transaction_repository=transaction_repository,
+            algorithm_repository=algorithm_repository,
+        )
     )
 
     assert isinstance(lock, NewAlgorithmLock)
@@ -65,12 +69,14 @@ def test_algorithm_is_locked(
     lock_repository.get_algorithm_lock(algorithm_id)
     lock_repository.persist_algorithm_transaction(algorithm_transaction=transaction)
 
-    lock = retrieve_lock(
-        lock_repository,
-        trade=trade,
-        web3_provider=in_memory_w3,
-        trading_transaction_repository=transaction_repository,
-        algorithm_repository=algorithm_repository,
+    lock = asyncio.run(
+        retrieve_lock(
+            lock_repository,
+            trade=trade,
+            web3_provider=in_memory_w3,
+            trading_transaction_repository=transaction_repository,
+            algorithm_repository=algorithm_repository,
+        )
     )
 
     assert isinstance(lock, AlgorithmWasLocked)
@@ -109,12 +115,14 @@ def test_algorithm_is_locked_but_unlocked(
     lock_repository.get_algorithm_lock(algorithm_id)
     lock_repository.persist_algorithm_transaction(algorithm_transaction=transaction)
 
-    lock = retrieve_lock(
-        lock_repository,
-        trade=trade,
-        web3_provider=in_memory_w3,
-        trading_transaction_repository=transaction_repository,
-        algorithm_repository=algorithm_repository,
+    lock = asyncio.run(
+        retrieve_lock(
+            lock_repository,
+            trade=trade,
+            web3_provider=in_memory_w3,
+            trading_transaction_repository=transaction_repository,
+            algorithm_repository=algorithm_repository,
+        )
     )
 
     assert isinstance(lock, NewAlgorithmLock)
@@ -0,0 +1,164 @@
+import asyncio
+
+import pytest
+from eth_utils import encode_hex, to_bytes
+from web3 import Web3
+
+from tests.utils import ADDR2, make_algorithm_db
+from trading_api.algorithm.models.crypto import ChainId
+from trading_api.algorithm.repositories.algorithm import AlgorithmRepository
+from trading_api.algorithm.services.multicall import (
+    AGGREGATE3_SELECTOR,
+    MULTICALL3_ADDRESS,
+    MulticallAggregator,
+    MulticallError,
+)
+from trading_api.algorithm.services.web3 import InMemoryAsyncWeb3, InMemoryWeb3Provider, Web3Provider
+
+# Runtime code returning 1 ether for any call, and runtime code that always reverts.
+ONE_ETHER_CODE = "670de0b6b3a764000060005260206000f3"
+REVERT_CODE = "60006000fd"
+
+PRICE_ABI = [
+    {
+        "inputs": [{"name": "tradingContract", "type": "address"}, {"name": "symbol", "type": "string"}],
+        "name": "getTokenPrice",
+        "outputs": [{"name": "", "type": "uint256"}],
+        "stateMutability": "view",
+        "type": "function",
+    },
+    {
+        "inputs": [],
+        "name": "getTotalSupply",
+        "outputs": [{"name": "", "type": "uint256"}],
+        "stateMutability": "view",
+        "type": "function",
+    },
+]
+
+
+def deploy_code(w3: Web3, runtime_code: str) -> str:
+    size = len(runtime_code) // 2
+    init_code = f"60{size:02x}80600b6000396000f3{runtime_code}"
+    tx_hash = w3.eth.send_transaction({"from": w3.eth.accounts[0], "data": init_code})
+
+    return w3.eth.get_transaction_receipt(tx_hash)["contractAddress"]
+
+
+class StandInAggregator(InMemoryAsyncWeb3):
+    """Executes `aggregate3` calls on the local chain the way the Multicall3 contract would, counting the calls."""
+
+    def __init__(self, w3: Web3):
+        super().__init__(w3)
+        self.aggregates = 0
+        eth_call = self.eth.call
+
+        async def call(transaction, block_identifier="latest"):
+            if transaction["to"] != MULTICALL3_ADDRESS:
+                return await eth_call(transaction, block_identifier)
+
+            self.aggregates += 1
+            data = to_bytes(hexstr=transaction["data"])
+            assert data[:4] == AGGREGATE3_SELECTOR
+            (calls,) = w3.codec.decode_abi(["(address,bool,bytes)[]"], data[4:])
+
+            results = []
+            for target, allow_failure, call_data in calls:
+                try:
+                    results.append(
+                        (True, bytes(w3.eth.call({"to": w3.toChecksumAddress(target), "data": encode_hex(call_data)})))
+                    )
+                except Exception:
+                    assert allow_failure
+                    results.append((False, b""))
+
+            return w3.codec.encode_abi(["(bool,bytes)[]"], [results])
+
+        self.eth.call = call
+
+
+class StandInWeb3Provider(InMemoryWeb3Provider):
+    def __init__(self, w3: Web3, trading_contract_tools=None):
+        super().__init__(w3, None, trading_contract_tools, None)  # type: ignore
+        self.async_web3 = StandInAggregator(w3)
+
+    def get_trading_contract(self, algorithm):
+        return self._w3.eth.contract(address=algorithm.trading_contract_address, abi=PRICE_ABI)
+
+    def get_async_web3(self, chain: ChainId) -> Web3:
+        return self.async_web3  # type: ignore
+
+
+@pytest.fixture
+def chain_w3(tester_provider):
+    return Web3(tester_provider)
+
+
+@pytest.fixture
+def prices(chain_w3):
+    return chain_w3.eth.contract(address=deploy_code(chain_w3, ONE_ETHER_CODE), abi=PRICE_ABI)
+
+
+@pytest.fixture
+def reverting(chain_w3):
+    return chain_w3.eth.contract(address=deploy_code(chain_w3, REVERT_CODE), abi=PRICE_ABI)
+
+
+def test_calls_are_aggregated_and_decoded_in_order(chain_w3, prices, reverting):
+    provider = StandInWeb3Provider(chain_w3)
+    multicall = MulticallAggregator(lambda: provider, {ChainId.RTN: MULTICALL3_ADDRESS}, batch_size=2)
+    functions = [
+        prices.functions.getTotalSupply(),
+        reverting.functions.getTotalSupply(),
+        prices.functions.getTotalSupply(),
+    ]
+
+    results = asyncio.run(multicall.call(ChainId.RTN, functions))
+
+    assert results[0] == results[2] == 10**18
+    assert isinstance(results[1], MulticallError)
+    assert provider.async_web3.aggregates == 2
+    assert multicall.get_metrics() == {"calls": 3, "aggregates": 2, "failed": 1}
+
+
+def test_chain_without_aggregator_calls_each_function(chain_w3, prices, reverting):
+    provider = StandInWeb3Provider(chain_w3)
+    multicall = MulticallAggregator(lambda: provider, {ChainId.RTN: ""})
+
+    results = asyncio.run(
+        multicall.call(ChainId.RTN, [prices.functions.getTotalSupply(), reverting.functions.getTotalSupply()])
+    )
+
+    assert results[0] == 10**18
+    assert isinstance(results[1], Exception)
+    assert provider.async_web3.aggregates == 0
+
+
+def test_price_quotes_in_one_request(app_inst, access_header_v2, chain_w3, prices):
+    provider = StandInWeb3Provider(chain_w3, trading_contract_tools=prices)
+    app_inst.container[Web3Provider] = provider
+    app_inst.container[MulticallAggregator] = MulticallAggregator(lambda: provider, {ChainId.RTN: MULTICALL3_ADDRESS})
+    response = app_inst.client.get(
+        f"/api/v2/algorithms/{ADDR2}/quotes?symbols=btc&symbols=ETH&symbols=BTC", headers=access_header_v2
+    )
+
+    assert response.status_code == 200
+    assert response.json() == {"quotes": [{"symbol": "BTC", "price": 1}, {"symbol": "ETH", "price": 1}], "failed": []}
+    assert provider.async_web3.aggregates == 1
+
+
+def test_algorithm_balances_in_one_request(app_inst, system_access_header, chain_w3, prices, reverting):
+    provider = StandInWeb3Provider(chain_w3)
+    app_inst.container[Web3Provider] = provider
+    app_inst.container[MulticallAggregator] = MulticallAggregator(lambda: provider, {ChainId.RTN: MULTICALL3_ADDRESS})
+    algorithm_repository = app_inst.container[AlgorithmRepository]
+    algorithm_repository.upsert_algorithm(make_algorithm_db(prices.address))
+    algorithm_repository.upsert_algorithm(make_algorithm_db(reverting.address))
+
+    response = app_inst.client.get("/api/v2/balances", headers=system_access_header)
+
+    assert response.status_code == 200
+    balances = {b["algorithm_id"]["public_address"]: b["supply"] for b in response.json()["balances"]}
+    assert balances[prices.address] == {"amount": 10**18}
+    assert balances[reverting.address] is None
+    assert provider.async_web3.aggregates == 1
@@ -0,0 +1,53 @@
+import asyncio
+
+import pytest
+
+from tests.utils import ADDR1, ADDR2
+from trading_api.algorithm.repositories.nonce import InMemoryNonceRepository
+
+
+def test_get_nonce_increments():
+    repository = InMemoryNonceRepository()
+
+    async def get_nonces():
+        return [await repository.get_nonce(ADDR1, web3_nonce=5) for _ in range(3)]
+
+    assert asyncio.run(get_nonces()) == [5, 6, 7]
+
+
+def test_get_nonce_never_behind_chain():
+    repository = InMemoryNonceRepository()
+
+    async def get_nonces():
+        return await repository.get_nonce(ADDR1, web3_nonce=1), await repository.get_nonce(ADDR1, web3_nonce=10)
+
+    assert asyncio.run(get_nonces()) == (1, 10)
+
+
+def test_reserve_nonces_per_wallet():
+    repository = InMemoryNonceRepository()
+
+    async def reserve():
+        return (
+            await repository.reserve_nonces(ADDR1, web3_nonce=3, count=4),
+            await repository.reserve_nonces(ADDR2, web3_nonce=0, count=2),
+            await repository.get_nonce(ADDR1, web3_nonce=3),
+        )
+
+    assert asyncio.run(reserve()) == (range(3, 7), range(0, 2), 7)
+
+
+def test_reset_nonce():
+    repository = InMemoryNonceRepository()
+
+    async def reset():
+        await repository.reserve_nonces(ADDR1, web3_nonce=3, count=4)
+        await repository.reset_nonce(ADDR1)
+        return await repository.get_nonce(ADDR1, web3_nonce=3)
+
+    assert asyncio.run(reset()) == 3
+
+
+def test_reserve_no_nonces():
+    with pytest.raises(ValueError):
+        asyncio.run(InMemoryNonceRepository().reserve_nonces(ADDR1, web3_nonce=0, count=0))
@@ -0,0 +1,81 @@
+import asyncio
+from unittest import mock
+
+import pytest
+from web3 import Web3
+from web3.exceptions import TimeExhausted
+
+from tests.unit.test_watcher import UNKNOWN_HASH, send_transaction
+from trading_api.algorithm.models.crypto import BlockHead, ChainId, TransactionHash
+from trading_api.algorithm.repositories.head import InMemoryBlockHeadRepository
+from trading_api.algorithm.services.heads import HeadTracker
+from trading_api.algorithm.services.notifier import ReceiptNotifier
+from trading_api.algorithm.services.web3 import InMemoryWeb3Provider, get_transaction_receipts
+
+
+def make_notifier(w3: Web3) -> ReceiptNotifier:
+    return ReceiptNotifier(lambda: InMemoryWeb3Provider(w3, None, None, None), poll_interval_s=0.01)
+
+
+def test_waiters_share_receipt_lookups(tester_provider):
+    w3 = Web3(tester_provider)
+    notifier = make_notifier(w3)
+    transaction = TransactionHash(value=send_transaction(w3))
+
+    async def wait():
+        return await asyncio.gather(*(notifier.wait_for_receipt(ChainId.RTN, transaction, 1) for _ in range(10)))
+
+    with mock.patch(
+        "trading_api.algorithm.services.notifier.get_transaction_receipts", side_effect=get_transaction_receipts
+    ) as get_receipts:
+        receipts = asyncio.run(wait())
+
+    get_receipts.assert_awaited_once()
+    assert {receipt["status"] for receipt in receipts} == {1}
+    assert notifier.waiters[ChainId.RTN] == {}
+
+
+@mock.patch("trading_api.algorithm.services.notifier.get_transaction_receipts")
+def test_waiter_is_notified_on_a_new_block(get_receipts, tester_provider):
+    w3 = Web3(tester_provider)
+    notifier = make_notifier(w3)
+    get_receipts.side_effect = [[None], [{"status": 1}]]
+
+    async def wait():
+        waiting = asyncio.create_task(notifier.wait_for_receipt(ChainId.RTN, TransactionHash(value=UNKNOWN_HASH), 1))
+        await asyncio.sleep(0.1)
+        lookups_before_block = get_receipts.await_count
+        send_transaction(w3)
+
+        return lookups_before_block, await waiting
+
+    assert asyncio.run(wait()) == (1, {"status": 1})
+
+
+def test_waiting_times_out(tester_provider):
+    notifier = make_notifier(Web3(tester_provider))
+
+    with pytest.raises(TimeExhausted):
+        asyncio.run(notifier.wait_for_receipt(ChainId.RTN, TransactionHash(value=UNKNOWN_HASH), 0.1))
+
+    assert notifier.waiters[ChainId.RTN] == {}
+
+
+def test_block_number_is_taken_from_the_head_tracker(tester_provider):
+    w3 = Web3(tester_provider)
+    head_tracker = HeadTracker(lambda: InMemoryWeb3Provider(w3, None, None, None), InMemoryBlockHeadRepository(), {})
+    head_tracker.get_tracker(ChainId.RTN)._update(
+        BlockHead(chain_id=ChainId.RTN, number=w3.eth.block_number + 1, timestamp=0, gas_price=1)
+    )
+    notifier = ReceiptNotifier(
+        lambda: InMemoryWeb3Provider(w3, None, None, None), poll_interval_s=0.01, head_tracker=head_tracker
+    )
+    transaction = TransactionHash(value=send_transaction(w3))
+
+    with mock.patch(
+        "trading_api.algorithm.services.web3.InMemoryAsyncEth.block_number", new_callable=mock.PropertyMock
+    ) as block_number:
+        receipt = asyncio.run(notifier.wait_for_receipt(ChainId.RTN, transaction, 1))
+
+    assert receipt["status"] == 1
+    block_number.assert_not_called()
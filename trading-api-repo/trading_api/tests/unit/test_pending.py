@@ -0,0 +1,50 @@
+import asyncio
+
+from tests.unit.test_watcher import UNKNOWN_HASH, make_pending
+from trading_api.algorithm.models.crypto import ChainId
+from trading_api.algorithm.repositories.pending import InMemoryPendingTransactionRepository
+
+
+def test_claimed_transactions_are_owned_by_one_consumer():
+    repository = InMemoryPendingTransactionRepository()
+    pending = make_pending(UNKNOWN_HASH)
+    entry_id = asyncio.run(repository.add(pending))
+
+    first = asyncio.run(repository.claim(ChainId.RTN, "worker-1", min_idle_ms=60_000, count=10))
+    second = asyncio.run(repository.claim(ChainId.RTN, "worker-2", min_idle_ms=60_000, count=10))
+
+    assert first == [(entry_id, pending)]
+    assert second == []
+    assert asyncio.run(repository.claim(ChainId.BSC, "worker-2", min_idle_ms=60_000, count=10)) == []
+
+
+def test_idle_transactions_are_reclaimed():
+    repository = InMemoryPendingTransactionRepository()
+    entry_id = asyncio.run(repository.add(make_pending(UNKNOWN_HASH)))
+    asyncio.run(repository.claim(ChainId.RTN, "worker-1", min_idle_ms=0, count=10))
+
+    reclaimed = asyncio.run(repository.claim(ChainId.RTN, "worker-2", min_idle_ms=0, count=10))
+
+    assert [entry for entry, _ in reclaimed] == [entry_id]
+    assert repository.owners[entry_id][0] == "worker-2"
+
+
+def test_acked_transactions_are_removed():
+    repository = InMemoryPendingTransactionRepository()
+    entry_id = asyncio.run(repository.add(make_pending(UNKNOWN_HASH)))
+    asyncio.run(repository.claim(ChainId.RTN, "worker-1", min_idle_ms=0, count=10))
+
+    asyncio.run(repository.ack(ChainId.RTN, entry_id))
+
+    assert asyncio.run(repository.claim(ChainId.RTN, "worker-2", min_idle_ms=0, count=10)) == []
+
+
+def test_reclaimed_transactions_are_not_kept_alive():
+    repository = InMemoryPendingTransactionRepository()
+    entry_id = asyncio.run(repository.add(make_pending(UNKNOWN_HASH)))
+    asyncio.run(repository.claim(ChainId.RTN, "worker-1", min_idle_ms=0, count=10))
+    asyncio.run(repository.claim(ChainId.RTN, "worker-2", min_idle_ms=0, count=10))
+
+    assert asyncio.run(repository.keep_alive(ChainId.RTN, "worker-1", [entry_id])) == []
+    assert asyncio.run(repository.keep_alive(ChainId.RTN, "worker-2", [entry_id])) == [entry_id]
+    assert repository.owners[entry_id][0] == "worker-2"
@@ -0,0 +1,65 @@
+import asyncio
+
+from web3 import Web3
+
+from tests.unit.test_watcher import UNKNOWN_HASH, send_transaction
+from trading_api.algorithm.models.crypto import ChainId, TransactionHash
+from trading_api.algorithm.services.receipts import ReceiptCache
+from trading_api.algorithm.services.web3 import InMemoryWeb3Provider
+
+
+def get_receipt(cache: ReceiptCache, w3: Web3, transaction_hash: str):
+    async_w3 = InMemoryWeb3Provider(w3, None, None, None).get_async_web3(ChainId.RTN)
+
+    return asyncio.run(cache.get_transaction_receipt(async_w3, ChainId.RTN, TransactionHash(value=transaction_hash)))
+
+
+def test_final_receipts_are_cached(tester_provider):
+    w3 = Web3(tester_provider)
+    cache = ReceiptCache(confirmations=0)
+    transaction_hash = send_transaction(w3)
+
+    receipts = [get_receipt(cache, w3, transaction_hash) for _ in range(3)]
+
+    assert [receipt["status"] for receipt in receipts] == [1, 1, 1]
+    assert cache.get_metrics() == {"local_hits": 2, "shared_hits": 0, "misses": 1, "hit_rate": 2 / 3, "size": 1}
+
+
+def test_pending_lookups_expire_after_a_block_interval(tester_provider):
+    w3 = Web3(tester_provider)
+    cache = ReceiptCache(pending_ttl_s=0)
+
+    assert get_receipt(cache, w3, UNKNOWN_HASH) is None
+    assert get_receipt(cache, w3, UNKNOWN_HASH) is None
+    assert cache.misses == 2
+
+
+def test_receipts_that_are_not_final_expire(tester_provider):
+    w3 = Web3(tester_provider)
+    cache = ReceiptCache(confirmations=15, pending_ttl_s=0)
+    transaction_hash = send_transaction(w3)
+
+    get_receipt(cache, w3, transaction_hash)
+    get_receipt(cache, w3, transaction_hash)
+
+    assert cache.misses == 2
+
+
+def test_least_recently_used_receipts_are_evicted(tester_provider):
+    w3 = Web3(tester_provider)
+    cache = ReceiptCache(max_size=1, confirmations=0)
+    first, second = send_transaction(w3), send_transaction(w3)
+
+    get_receipt(cache, w3, first)
+    get_receipt(cache, w3, second)
+    get_receipt(cache, w3, first)
+
+    assert cache.misses == 3
+    assert cache.get_metrics()["size"] == 1
+
+
+def test_show_metrics(app_inst, system_access_header):
+    response = app_inst.client.get("/api/v2/metrics", headers=system_access_header)
+
+    assert response.status_code == 200
+    assert response.json()["ReceiptCache"]["hit_rate"] == 0.0
@@ -0,0 +1,426 @@
+import asyncio
+import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List
+
+import aiohttp
+import pytest
+import requests
+from web3 import Web3
+from web3.eth import AsyncEth
+from web3.exceptions import TransactionNotFound
+
+from mm.data.services import rpc as mm_rpc
+from trading_api.algorithm.models.crypto import BlockHead, ChainId
+from trading_api.algorithm.repositories.head import InMemoryBlockHeadRepository
+from trading_api.algorithm.services import rpc as trading_rpc
+from trading_api.algorithm.services.heads import HeadTracker
+from trading_api.algorithm.services.rpc import (
+    CallCache,
+    EndpointPool,
+    PooledAsyncHTTPProvider,
+    PooledHTTPProvider,
+    match_rpc_responses,
+    parse_endpoint_uris,
+)
+from trading_api.algorithm.services.web3 import HttpWeb3Provider
+
+
+class StandInNode:
+    """Local JSON-RPC node answering every request after `latency_s`, or with a 503 while it is `down`."""
+
+    def __init__(self, latency_s: float = 0.0, block_number: int = 1):
+        self.latency_s = latency_s
+        self.results: Dict[str, object] = {"eth_blockNumber": hex(block_number), "eth_chainId": "0x1"}
+        self.errors: Dict[str, dict] = {}
+        self.down = False
+        self.requests: List[dict] = []
+        self.posts = 0
+        node = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+                node.posts += 1
+                time.sleep(node.latency_s)
+                if node.down:
+                    self.send_response(503)
+                    self.end_headers()
+                    return
+
+                if isinstance(body, list):
+                    # Nodes don't have to answer a batch in order.
+                    response = [node.answer(request) for request in reversed(body)]
+                else:
+                    response = node.answer(body)
+                payload = json.dumps(response).encode()
+                self.send_response(200)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(payload)))
+                self.end_headers()
+                self.wfile.write(payload)
+
+            def log_message(self, *args):
+                pass
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.uri = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def answer(self, request: dict) -> dict:
+        self.requests.append(request)
+        if request["method"] in self.errors:
+            return {"jsonrpc": "2.0", "id": request["id"], "error": self.errors[request["method"]]}
+
+        return {"jsonrpc": "2.0", "id": request["id"], "result": self.results.get(request["method"])}
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+@pytest.fixture
+def nodes():
+    started: List[StandInNode] = []
+
+    def start(*latencies_s: float) -> List[StandInNode]:
+        started.extend(StandInNode(latency_s) for latency_s in latencies_s)
+        return started[-len(latencies_s) :]
+
+    yield start
+
+    for node in started:
+        node.stop()
+
+
+def test_reads_go_to_the_fastest_node(nodes):
+    slow, fast = nodes(0.05, 0.0)
+    pool = EndpointPool([slow.uri, fast.uri])
+    w3 = Web3(PooledHTTPProvider(pool))
+
+    for _ in range(10):
+        assert w3.eth.block_number == 1
+
+    # Both get measured once, after that the fast node gets everything.
+    assert len(slow.requests) == 1
+    assert len(fast.requests) == 9
+    assert pool.get_metrics()["0.latency_ms"] > pool.get_metrics()["1.latency_ms"]
+
+
+def test_fails_over_to_the_next_node(nodes):
+    fast, slow = nodes(0.0, 0.02)
+    pool = EndpointPool([fast.uri, slow.uri])
+    w3 = Web3(PooledHTTPProvider(pool))
+    w3.eth.block_number, w3.eth.block_number
+
+    fast.down = True
+    assert w3.eth.block_number == 1
+    assert w3.eth.block_number == 1
+
+    metrics = pool.get_metrics()
+    assert metrics["0.errors"] == 1
+    assert metrics["0.healthy"] == 0.0
+    assert len(slow.requests) == 3
+
+
+def test_failed_nodes_get_another_chance_after_the_cooldown(nodes):
+    fast, slow = nodes(0.0, 0.02)
+    pool = EndpointPool([fast.uri, slow.uri], cooldown_s=0.0)
+    w3 = Web3(PooledHTTPProvider(pool))
+
+    fast.down = True
+    w3.eth.block_number
+    fast.down = False
+    w3.eth.block_number
+
+    assert len(fast.requests) == 1
+
+
+def test_raises_when_all_nodes_fail(nodes):
+    (node,) = nodes(0.0)
+    node.down = True
+    w3 = Web3(PooledHTTPProvider(EndpointPool([node.uri])))
+
+    with pytest.raises(requests.HTTPError):
+        w3.eth.block_number
+
+
+def test_slow_nodes_time_out_and_fail_over(nodes):
+    stuck, healthy = nodes(1.0, 0.0)
+    w3 = Web3(
+        PooledAsyncHTTPProvider(EndpointPool([stuck.uri, healthy.uri]), timeout_s=0.1),
+        modules={"eth": (AsyncEth,)},
+        middlewares=[],
+    )
+
+    async def block_numbers():
+        return [await w3.eth.block_number for _ in range(3)]  # type: ignore
+
+    assert asyncio.run(block_numbers()) == [1, 1, 1]
+    assert len(healthy.requests) == 3
+
+
+def test_batches_go_through_the_pool(nodes):
+    down, up = nodes(0.0, 0.0)
+    down.down = True
+    provider = PooledAsyncHTTPProvider(EndpointPool([down.uri, up.uri]))
+
+    batch = [{"jsonrpc": "2.0", "id": i, "method": "eth_chainId", "params": []} for i in range(3)]
+    responses = asyncio.run(provider.make_batch_request(batch))
+
+    assert [response["result"] for response in responses] == ["0x1"] * 3
+
+
+def test_mm_provider_routes_to_the_fastest_node(nodes):
+    slow, fast = nodes(0.05, 0.0)
+    slow.down = True
+    w3 = Web3(mm_rpc.PooledHTTPProvider(mm_rpc.EndpointPool([slow.uri, fast.uri])))
+
+    for _ in range(5):
+        assert w3.eth.block_number == 1
+
+    assert len(slow.requests) == 0
+    assert len(fast.requests) == 5
+
+
+def test_chain_id_is_asked_once_per_chain(nodes):
+    (node,) = nodes(0.0)
+    provider = HttpWeb3Provider(node.uri, node.uri, None, None)  # type: ignore
+
+    async def read():
+        return [await provider.get_chain_id(ChainId.RTN) for _ in range(3)]
+
+    assert asyncio.run(read()) == [1, 1, 1]
+    assert [request["method"] for request in node.requests] == ["eth_chainId"]
+
+
+def test_parse_endpoint_uris():
+    assert parse_endpoint_uris("http://a:8545, http://b:8545,") == ["http://a:8545", "http://b:8545"]
+    assert parse_endpoint_uris("http://a:8545") == ["http://a:8545"]
+
+
+def test_concurrent_requests_go_out_as_one_batch(nodes):
+    (node,) = nodes(0.0)
+    provider = PooledAsyncHTTPProvider(EndpointPool([node.uri]), batch_window_s=0.01)
+    w3 = Web3(provider, modules={"eth": (AsyncEth,)}, middlewares=[])
+
+    async def read():
+        return await asyncio.gather(w3.eth.block_number, w3.eth.chain_id, w3.eth.block_number)  # type: ignore
+
+    assert asyncio.run(read()) == [1, 1, 1]
+    assert node.posts == 1
+    assert provider.get_metrics() == {"batches": 1, "batched_requests": 3, "batch_size": 3.0}
+
+
+def test_failed_batches_fail_every_request(nodes):
+    (node,) = nodes(0.0)
+    node.down = True
+    w3 = Web3(
+        PooledAsyncHTTPProvider(EndpointPool([node.uri]), batch_window_s=0.01),
+        modules={"eth": (AsyncEth,)},
+        middlewares=[],
+    )
+
+    async def read():
+        return await asyncio.gather(w3.eth.block_number, w3.eth.chain_id, return_exceptions=True)  # type: ignore
+
+    assert [type(result) for result in asyncio.run(read())] == [aiohttp.ClientResponseError] * 2
+    assert node.posts == 1
+
+
+@pytest.mark.parametrize(
+    "make_provider",
+    [
+        lambda uri: PooledHTTPProvider(EndpointPool([uri]), batch_window_s=0.05),
+        lambda uri: mm_rpc.PooledHTTPProvider(mm_rpc.EndpointPool([uri]), batch_window_s=0.05),
+    ],
+)
+def test_requests_of_concurrent_threads_go_out_as_one_batch(nodes, make_provider):
+    (node,) = nodes(0.0)
+    w3 = Web3(make_provider(node.uri))
+
+    with ThreadPoolExecutor(max_workers=4) as executor:
+        block_numbers = list(executor.map(lambda _: w3.eth.block_number, range(4)))
+
+    assert block_numbers == [1, 1, 1, 1]
+    assert node.posts == 1
+    assert len(node.requests) == 4
+
+
+def test_match_rpc_responses():
+    requests = [{"id": 1}, {"id": 2}, {"id": 3}]
+    rejected = {"jsonrpc": "2.0", "id": None, "error": {"code": -32600, "message": "Batches are not supported."}}
+
+    matched = match_rpc_responses(requests, [{"id": 3, "result": "c"}, {"id": 1, "result": "a"}])
+
+    assert [response.get("result") for response in matched] == ["a", None, "c"]
+    assert "error" in matched[1]
+    assert [response["id"] for response in match_rpc_responses(requests, rejected)] == [1, 2, 3]
+
+
+CALL = {"to": "0x0000000000000000000000000000000000000001", "data": "0x"}
+
+
+def test_slow_reads_are_hedged_to_the_next_node(nodes):
+    slow, fast = nodes(0.5, 0.0)
+    for node in (slow, fast):
+        node.results["eth_call"] = "0x01"
+    pool = EndpointPool([slow.uri, fast.uri], default_hedge_delay_s=0.05)
+    w3 = Web3(PooledAsyncHTTPProvider(pool), modules={"eth": (AsyncEth,)}, middlewares=[])
+
+    started = time.monotonic()
+    assert asyncio.run(w3.eth.call(CALL)) == b"\x01"  # type: ignore
+
+    assert time.monotonic() - started < 0.5
+    assert pool.get_metrics()["hedges"] == 1
+    assert pool.get_metrics()["hedge_wins"] == 1
+
+
+@pytest.mark.parametrize("make_pool", [EndpointPool, mm_rpc.EndpointPool])
+def test_slow_sends_are_hedged_to_the_next_node(nodes, make_pool):
+    slow, fast = nodes(0.5, 0.0)
+    pool = make_pool([slow.uri, fast.uri], default_hedge_delay_s=0.05)
+    provider_type = PooledHTTPProvider if make_pool is EndpointPool else mm_rpc.PooledHTTPProvider
+    w3 = Web3(provider_type(pool))
+    slow.results["eth_sendRawTransaction"] = Web3.keccak(hexstr="0x1234").hex()
+    # The slow node gets the transaction first, so the fast node may already know it.
+    fast.errors["eth_sendRawTransaction"] = {"code": -32000, "message": "already known"}
+
+    transaction_hash = w3.eth.send_raw_transaction("0x1234")
+
+    assert transaction_hash == Web3.keccak(hexstr="0x1234")
+    assert (pool.hedges, pool.hedge_wins) == (1, 1)
+
+
+def test_fast_reads_are_not_hedged(nodes):
+    fast, other = nodes(0.0, 0.0)
+    fast.results["eth_getTransactionReceipt"] = None
+    pool = EndpointPool([fast.uri, other.uri], default_hedge_delay_s=0.5)
+    w3 = Web3(PooledHTTPProvider(pool))
+
+    with pytest.raises(TransactionNotFound):
+        w3.eth.get_transaction_receipt("0x" + "00" * 32)
+
+    assert pool.hedges == 0
+    assert len(other.requests) == 0
+
+
+def test_hedge_delay_follows_the_latency_percentile():
+    pool = EndpointPool(["http://a:8545"], hedge_percentile=0.9, min_hedge_delay_s=0.0, default_hedge_delay_s=1.0)
+    assert pool.hedge_delay_s() == 1.0
+
+    pool.latencies.extend(i / 100 for i in range(100))
+
+    assert pool.hedge_delay_s() == 0.9
+
+
+def calls(node: StandInNode) -> List[list]:
+    return [request["params"] for request in node.requests if request["method"] == "eth_call"]
+
+
+@pytest.mark.parametrize("rpc", [trading_rpc, mm_rpc])
+def test_calls_are_cached_until_the_next_block(nodes, rpc):
+    (node,) = nodes(0.0)
+    node.results["eth_call"] = "0x01"
+    w3 = Web3(rpc.PooledHTTPProvider(rpc.EndpointPool([node.uri]), call_cache=rpc.CallCache(block_refresh_s=60)))
+
+    assert [w3.eth.call(CALL) for _ in range(3)] == [b"\x01"] * 3
+    node.results["eth_blockNumber"] = "0x2"
+    assert w3.eth.block_number == 2
+    w3.eth.call(CALL)
+
+    # Pinned to the block the result is cached for.
+    assert [params[1] for params in calls(node)] == ["0x1", "0x2"]
+    assert w3.provider.call_cache.get_metrics() == {"call_hits": 2, "call_misses": 2, "block_number": 2}
+
+
+def test_calls_take_the_block_number_from_the_tracked_heads(nodes):
+    (node,) = nodes(0.0)
+    node.results["eth_call"] = "0x01"
+    head = {"number": 5}
+    w3 = Web3(
+        PooledHTTPProvider(EndpointPool([node.uri]), call_cache=CallCache(block_number_fn=lambda: head["number"]))
+    )
+
+    w3.eth.call(CALL), w3.eth.call(CALL)
+    head["number"] = 6
+    w3.eth.call(CALL)
+
+    assert "eth_blockNumber" not in [request["method"] for request in node.requests]
+    assert [params[1] for params in calls(node)] == ["0x5", "0x6"]
+
+
+def test_calls_stop_taking_the_block_number_from_a_stalled_tracker(nodes):
+    (node,) = nodes(0.0)
+    node.results.update({"eth_call": "0x01", "eth_blockNumber": "0x9"})
+    head_tracker = HeadTracker(lambda: None, InMemoryBlockHeadRepository(), {}, max_head_age_s=60)
+    tracker = head_tracker.get_tracker(ChainId.RTN)
+    tracker._update(BlockHead(chain_id=ChainId.RTN, number=5, timestamp=0, gas_price=1))
+    call_cache = CallCache(block_refresh_s=0, block_number_fn=partial(head_tracker.latest_number, ChainId.RTN))
+    w3 = Web3(PooledHTTPProvider(EndpointPool([node.uri]), call_cache=call_cache))
+
+    w3.eth.call(CALL)
+    # No new head came in for longer than `max_head_age_s`.
+    tracker.latest_seen_at -= 120
+    w3.eth.call(CALL)
+
+    assert [params[1] for params in calls(node)] == ["0x5", "0x9"]
+
+
+@pytest.mark.parametrize("rpc", [trading_rpc, mm_rpc])
+def test_calls_without_a_block_number_go_to_the_latest_block(nodes, rpc):
+    (node,) = nodes(0.0)
+    node.results["eth_call"] = "0x01"
+    node.errors["eth_blockNumber"] = {"code": -32000, "message": "internal error"}
+    w3 = Web3(rpc.PooledHTTPProvider(rpc.EndpointPool([node.uri]), call_cache=rpc.CallCache()))
+
+    assert w3.eth.call(CALL) == b"\x01"
+    assert [params[1] for params in calls(node)] == ["latest"]
+
+
+def test_async_calls_without_a_block_number_go_to_the_latest_block(nodes):
+    (node,) = nodes(0.0)
+    node.results["eth_call"] = "0x01"
+    node.errors["eth_blockNumber"] = {"code": -32000, "message": "internal error"}
+    w3 = Web3(
+        PooledAsyncHTTPProvider(EndpointPool([node.uri]), call_cache=CallCache()),
+        modules={"eth": (AsyncEth,)},
+        middlewares=[],
+    )
+
+    assert asyncio.run(w3.eth.call(CALL)) == b"\x01"  # type: ignore
+    assert [params[1] for params in calls(node)] == ["latest"]
+
+
+def test_concurrent_identical_calls_share_one_request(nodes):
+    (node,) = nodes(0.05)
+    node.results["eth_call"] = "0x01"
+    cache = CallCache()
+    w3 = Web3(
+        PooledAsyncHTTPProvider(EndpointPool([node.uri]), call_cache=cache),
+        modules={"eth": (AsyncEth,)},
+        middlewares=[],
+    )
+
+    async def read():
+        await w3.eth.block_number  # type: ignore
+        return await asyncio.gather(*(w3.eth.call(CALL) for _ in range(5)))  # type: ignore
+
+    assert asyncio.run(read()) == [b"\x01"] * 5
+    assert len(calls(node)) == 1
+    assert (cache.hits, cache.misses) == (4, 1)
+
+
+def test_calls_fall_back_to_the_latest_block(nodes):
+    (node,) = nodes(0.0)
+    node.errors["eth_call"] = {"code": -32000, "message": "header not found"}
+    w3 = Web3(PooledHTTPProvider(EndpointPool([node.uri]), call_cache=CallCache()))
+
+    with pytest.raises(ValueError):
+        w3.eth.call(CALL)
+
+    assert [params[1] for params in calls(node)] == ["0x1", "latest"]
@@ -0,0 +1,98 @@
+import asyncio
+
+import pytest
+
+from tests.utils import ADDR1, ADDR2
+from trading_api.algorithm.repositories.wallet import InMemoryWalletLeaseRepository, get_lease_key
+from trading_api.algorithm.services.sequencer import TransactionSequencer, WalletLeaseTimeout
+
+
+def make_sequencer(lease_repository=None, **kwargs) -> TransactionSequencer:
+    return TransactionSequencer(lease_repository=lease_repository or InMemoryWalletLeaseRepository(), **kwargs)
+
+
+async def send(sequencer: TransactionSequencer, wallet, events: list, name: str):
+    async with sequencer.sequence(wallet):
+        events.append(f"start-{name}")
+        await asyncio.sleep(0.01)
+        events.append(f"end-{name}")
+
+
+def test_same_wallet_is_serialized():
+    sequencer = make_sequencer()
+    events: list = []
+
+    async def run():
+        await asyncio.gather(*(send(sequencer, ADDR1, events, str(i)) for i in range(3)))
+
+    asyncio.run(run())
+
+    assert events == ["start-0", "end-0", "start-1", "end-1", "start-2", "end-2"]
+
+
+def test_different_wallets_run_in_parallel():
+    sequencer = make_sequencer()
+    events: list = []
+
+    async def run():
+        await asyncio.gather(send(sequencer, ADDR1, events, "1"), send(sequencer, ADDR2, events, "2"))
+
+    asyncio.run(run())
+
+    assert events[:2] == ["start-1", "start-2"]
+
+
+def test_wallet_is_serialized_across_workers():
+    lease_repository = InMemoryWalletLeaseRepository()
+    worker_1, worker_2 = make_sequencer(lease_repository), make_sequencer(lease_repository)
+    events: list = []
+
+    async def run():
+        await asyncio.gather(send(worker_1, ADDR1, events, "1"), send(worker_2, ADDR1, events, "2"))
+
+    asyncio.run(run())
+
+    assert events == ["start-1", "end-1", "start-2", "end-2"]
+    assert lease_repository.leases == {}
+
+
+def test_lease_timeout():
+    lease_repository = InMemoryWalletLeaseRepository()
+    sequencer = make_sequencer(lease_repository, acquire_timeout_s=0.05)
+
+    async def run():
+        await lease_repository.acquire(ADDR1, owner="other-worker", lease_timeout_ms=1000)
+        async with sequencer.sequence(ADDR1):
+            pass
+
+    with pytest.raises(WalletLeaseTimeout):
+        asyncio.run(run())
+
+
+def test_lease_is_renewed_while_held():
+    sequencer = make_sequencer(lease_timeout_ms=30)
+
+    async def run():
+        async with sequencer.sequence(ADDR1) as lease:
+            acquired_expires_at = lease.expires_at
+            await asyncio.sleep(0.05)
+            lease.ensure_held()
+
+            return lease.expires_at > acquired_expires_at
+
+    assert asyncio.run(run()) is True
+
+
+def test_lost_lease_is_not_held():
+    lease_repository = InMemoryWalletLeaseRepository()
+    sequencer = make_sequencer(lease_repository, lease_timeout_ms=30)
+
+    async def run():
+        async with sequencer.sequence(ADDR1) as lease:
+            # It expired, and another worker took it.
+            lease_repository.leases[get_lease_key(ADDR1)] = "other-worker"
+            await asyncio.sleep(0.02)
+            lease.ensure_held()
+
+    with pytest.raises(WalletLeaseTimeout):
+        asyncio.run(run())
@@ -0,0 +1,62 @@
+import asyncio
+from datetime import datetime, timezone
+from unittest.mock import MagicMock
+
+import pytest
+
+from trading_api.algorithm.models.crypto import TransactionHash
+from trading_api.algorithm.models.trade import TradeStatus
+from trading_api.algorithm.repositories.transaction import InMemoryTransactionRepository
+from trading_api.algorithm.services.status_writer import TransactionStatusWriter
+
+HASH1 = TransactionHash(value="0x5c504ed432cb51138bcf09aa5e8a410dd4a1e204ef84bfed1be16dfba1b22060")
+HASH2 = TransactionHash(value="0x1111111111111111111111111111111111111111111111111111111111111111")
+NOW = datetime.now(timezone.utc)
+
+
+def test_only_transitions_are_written():
+    transaction_repository = MagicMock(spec=InMemoryTransactionRepository)
+    writer = TransactionStatusWriter(transaction_repository, flush_interval_s=0.01)
+
+    async def poll():
+        for _ in range(5):
+            await writer.update_status(HASH1, TradeStatus.TRADE_IN_PROGRESS_OR_NOT_FOUND, NOW)
+        await writer.update_status(HASH1, TradeStatus.TRADE_SUCCESSFUL, NOW)
+        await writer.update_status(HASH2, TradeStatus.TRADE_FAILED, NOW)
+        await writer.update_status(HASH1, TradeStatus.TRADE_SUCCESSFUL, NOW)
+        await asyncio.sleep(0.05)
+
+    asyncio.run(poll())
+
+    transaction_repository.update_transaction_statuses.assert_called_once_with(
+        [(HASH1, TradeStatus.TRADE_SUCCESSFUL, NOW), (HASH2, TradeStatus.TRADE_FAILED, NOW)]
+    )
+    assert writer.get_metrics() == {"skipped": 6, "written": 2, "flushes": 1, "buffered": 0}
+
+
+def test_flush_writes_right_away():
+    transaction_repository = MagicMock(spec=InMemoryTransactionRepository)
+    writer = TransactionStatusWriter(transaction_repository, flush_interval_s=60)
+
+    async def finalize():
+        await writer.update_status(HASH1, TradeStatus.TRADE_SUCCESSFUL, NOW)
+        await writer.flush()
+
+    asyncio.run(finalize())
+
+    transaction_repository.update_transaction_statuses.assert_called_once()
+
+
+def test_failed_flush_keeps_the_updates():
+    transaction_repository = MagicMock(spec=InMemoryTransactionRepository)
+    transaction_repository.update_transaction_statuses.side_effect = ConnectionError("Mongo unavailable.")
+    writer = TransactionStatusWriter(transaction_repository, flush_interval_s=60)
+
+    async def finalize():
+        await writer.update_status(HASH1, TradeStatus.TRADE_FAILED, NOW)
+        with pytest.raises(ConnectionError):
+            await writer.flush()
+
+    asyncio.run(finalize())
+
+    assert writer.buffer == {HASH1.value: (TradeStatus.TRADE_FAILED, NOW)}
@@ -28,10 +28,13 @@ def test_user_not_authorized(app_inst):
     assert response.status_code == 401
 
 
+@mock.patch("trading_api.algorithm.trade.get_gas_parameters")
 @mock.patch("trading_api.algorithm.trade.send_trade_to_blockchain")
 @mock.patch("trading_api.algorithm.status.retrieve_trade_status")
 @mock.patch("trading_api.algorithm.trade.get_web3_nonce")
-def test_buy_request(nonce: MagicMock, retrieve: MagicMock, send: MagicMock, app_inst, access_header_v1):
+def test_buy_request(
+    nonce: MagicMock, retrieve: MagicMock, send: MagicMock, gas: MagicMock, app_inst, access_header_v1
+):
     pub_address = "0x7E5F4552091A69125d5DfCb7b8C2659029395Bdf"
     send.return_value = (
         create_algorithm_transaction(AlgorithmId(public_address=pub_address), HexBytes("0x7b")),
@@ -39,6 +42,7 @@ def test_buy_request(nonce: MagicMock, retrieve: MagicMock, send: MagicMock, app
     )
     retrieve.return_value = TradeStatus.TRADE_SUCCESSFUL
     nonce.return_value = 1
+    gas.return_value = 21_000, 5_000_000_000, 1337
     lock_repository = app_inst.container[AlgorithmLockRepository]
     algo_repository: AlgorithmRepository = app_inst.container[AlgorithmRepository]
 
@@ -119,14 +123,18 @@ def test_buy_request_from_other_trading_contract_raises_conflict(contract_accoun
     assert response.status_code == 409
 
 
+@mock.patch("trading_api.algorithm.trade.get_gas_parameters")
 @mock.patch("trading_api.algorithm.trade.send_trade_to_blockchain")
 @mock.patch("trading_api.algorithm.status.retrieve_trade_status")
 @mock.patch("trading_api.algorithm.trade.get_web3_nonce")
-def test_sell_request(nonce: MagicMock, retrieve: MagicMock, send: MagicMock, app_inst, access_header_v1):
+def test_sell_request(
+    nonce: MagicMock, retrieve: MagicMock, send: MagicMock, gas: MagicMock, app_inst, access_header_v1
+):
     algorithm_id = AlgorithmId(public_address="0x7E5F4552091A69125d5DfCb7b8C2659029395Bdf")
     send.return_value = create_algorithm_transaction(algorithm_id=algorithm_id, transaction_hash=HexBytes("0x7b")), 1
     retrieve.return_value = TradeStatus.TRADE_SUCCESSFUL
     nonce.return_value = 1
+    gas.return_value = 21_000, 5_000_000_000, 1337
 
     trade_request = load_stub("body-for-algorithm-trade.json")
 
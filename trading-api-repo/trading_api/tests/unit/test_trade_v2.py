@@ -1,11 +1,15 @@
+import asyncio
 from decimal import Decimal
 from typing import Iterable
 from unittest import mock
-from unittest.mock import MagicMock
+from unittest.mock import AsyncMock, MagicMock
+
+from hexbytes import HexBytes
 
 from tests.utils import (
     ADDR1,
     ADDR2,
+    ADDR3,
     load_stub,
     make_algorithm,
     make_algorithm_transaction,
@@ -20,28 +24,42 @@ from trading_api.algorithm.models.algorithm import (
     TradingContract,
     TradingContractVersion,
 )
-from trading_api.algorithm.models.trade import TradeStatus, TradeType
+from trading_api.algorithm.models.trade import PreFlight, TradeStatus, TradeType
 from trading_api.algorithm.repositories.lock import SYMBOL_V1, AlgorithmLockRepository, NewAlgorithmLock
+from trading_api.algorithm.repositories.nonce import InMemoryNonceRepository
 from trading_api.algorithm.repositories.transaction import TransactionRepository
+from trading_api.algorithm.repositories.wallet import InMemoryWalletLeaseRepository, get_lease_key
+from trading_api.algorithm.services.sequencer import TransactionSequencer
 from trading_api.algorithm.trade import (
+    fetch_pre_flight,
     get_trade_type,
     get_trading_check_function,
     get_trading_function,
     is_multi_token_trade,
     is_trade_possible,
+    send_sequenced_trade,
+    send_trade_to_blockchain,
 )
 
 
+@mock.patch("trading_api.algorithm.trade.get_gas_parameters")
 @mock.patch("trading_api.algorithm.trade.is_trade_possible")
 @mock.patch("trading_api.algorithm.trade.send_trade_to_blockchain")
 @mock.patch("trading_api.algorithm.status.retrieve_trade_status")
 @mock.patch("trading_api.algorithm.trade.get_web3_nonce")
 def test_buy_v2_request(
-    nonce: MagicMock, retrieve: MagicMock, send: MagicMock, possible: MagicMock, app_inst, access_header_v2
+    nonce: MagicMock,
+    retrieve: MagicMock,
+    send: MagicMock,
+    possible: MagicMock,
+    gas: MagicMock,
+    app_inst,
+    access_header_v2,
 ):
     send.return_value = make_algorithm_transaction(hash_value=ADDR1), 42
     retrieve.return_value = TradeStatus.TRADE_SUCCESSFUL
     nonce.return_value = 1
+    gas.return_value = 21_000, 5_000_000_000, 1337
     lock_repository = app_inst.container[AlgorithmLockRepository]
     trade_request = load_stub("body-for-algorithm-trade-buy-v2.json")
 
@@ -65,16 +83,24 @@ def test_buy_v2_request(
     assert len(lock_repository.algorithm_transactions) == 1
 
 
+@mock.patch("trading_api.algorithm.trade.get_gas_parameters")
 @mock.patch("trading_api.algorithm.trade.is_trade_possible")
 @mock.patch("trading_api.algorithm.trade.send_trade_to_blockchain")
 @mock.patch("trading_api.algorithm.status.retrieve_trade_status")
 @mock.patch("trading_api.algorithm.trade.get_web3_nonce")
 def test_buy_v2_request_lowercase_tade_type(
-    nonce: MagicMock, retrieve: MagicMock, send: MagicMock, possible: MagicMock, app_inst, access_header_v2
+    nonce: MagicMock,
+    retrieve: MagicMock,
+    send: MagicMock,
+    possible: MagicMock,
+    gas: MagicMock,
+    app_inst,
+    access_header_v2,
 ):
     send.return_value = make_algorithm_transaction(hash_value=ADDR1), 42
     retrieve.return_value = TradeStatus.TRADE_SUCCESSFUL
     nonce.return_value = 1
+    gas.return_value = 21_000, 5_000_000_000, 1337
     algorithm_id = AlgorithmId(public_address=ADDR2)
     trade_request = load_stub("body-for-algorithm-trade-buy-v2-lowercase-trade-type.json")
 
@@ -96,17 +122,25 @@ def test_buy_request_mixed_case_tade_type(app_inst, access_header_v2):
     assert response.status_code == 422
 
 
+@mock.patch("trading_api.algorithm.trade.get_gas_parameters")
 @mock.patch("trading_api.algorithm.trade.is_trade_possible")
 @mock.patch("trading_api.algorithm.trade.send_trade_to_blockchain")
 @mock.patch("trading_api.algorithm.status.retrieve_trade_status")
 @mock.patch("trading_api.algorithm.trade.get_web3_nonce")
 def test_sell_v2_request(
-    nonce: MagicMock, retrieve: MagicMock, send: MagicMock, possible: MagicMock, app_inst, access_header_v2
+    nonce: MagicMock,
+    retrieve: MagicMock,
+    send: MagicMock,
+    possible: MagicMock,
+    gas: MagicMock,
+    app_inst,
+    access_header_v2,
 ):
     send.return_value = make_algorithm_transaction(hash_value=ADDR1), 42
     retrieve.return_value = TradeStatus.TRADE_SUCCESSFUL
     algorithm_id = AlgorithmId(public_address=ADDR2)
     nonce.return_value = 1
+    gas.return_value = 21_000, 5_000_000_000, 1337
     trade_request = load_stub("body-for-algorithm-trade-sell-v2.json")
 
     response = app_inst.client.post(f"/api/v2/algorithms/{ADDR2}/trade", json=trade_request, headers=access_header_v2)
@@ -138,17 +172,25 @@ def test_sell_v2_request(
     assert event.symbol == "BTC"
 
 
+@mock.patch("trading_api.algorithm.trade.get_gas_parameters")
 @mock.patch("trading_api.algorithm.trade.is_trade_possible")
 @mock.patch("trading_api.algorithm.trade.send_trade_to_blockchain")
 @mock.patch("trading_api.algorithm.status.retrieve_trade_status")
 @mock.patch("trading_api.algorithm.trade.get_web3_nonce")
 def test_sell_v2_request_lowercase_tade_type(
-    nonce: MagicMock, retrieve: MagicMock, send: MagicMock, possible: MagicMock, app_inst, access_header_v2
+    nonce: MagicMock,
+    retrieve: MagicMock,
+    send: MagicMock,
+    possible: MagicMock,
+    gas: MagicMock,
+    app_inst,
+    access_header_v2,
 ):
     send.return_value = make_algorithm_transaction(hash_value=ADDR1), 42
     retrieve.return_value = TradeStatus.TRADE_SUCCESSFUL
     algorithm_id = AlgorithmId(public_address=ADDR2)
     nonce.return_value = 1
+    gas.return_value = 21_000, 5_000_000_000, 1337
     trade_request = load_stub("body-for-algorithm-trade-sell-v2-lowercase-trade-type.json")
 
     response = app_inst.client.post(f"/api/v2/algorithms/{ADDR2}/trade", json=trade_request, headers=access_header_v2)
@@ -166,8 +208,8 @@ def test_is_possible_trade(in_memory_w3):
     sell = make_sell_trade()
     algorithm = make_algorithm(trading_contract=TradingContract(version=TradingContractVersion.V2_0))
 
-    assert is_trade_possible(buy, algorithm, in_memory_w3) is True
-    assert is_trade_possible(sell, algorithm, in_memory_w3) is True
+    assert asyncio.run(is_trade_possible(buy, algorithm, in_memory_w3)) is True
+    assert asyncio.run(is_trade_possible(sell, algorithm, in_memory_w3)) is True
 
 
 @mock.patch("trading_api.algorithm.trade.is_trade_possible")
@@ -180,6 +222,128 @@ def test_trade_is_not_possible(possible: MagicMock, app_inst, access_header_v2):
     assert response.status_code == 400
 
 
+@mock.patch("trading_api.algorithm.trade.get_gas_parameters")
+@mock.patch("trading_api.algorithm.trade.get_web3_nonce")
+@mock.patch("trading_api.algorithm.trade.is_trade_possible")
+def test_fetch_pre_flight(possible: MagicMock, nonce: MagicMock, gas: MagicMock):
+    possible.return_value = True
+    gas.return_value = 21_000, 5_000_000_000, 1337
+
+    pre_flight = asyncio.run(fetch_pre_flight(make_buy_trade_v2(), make_algorithm(), None))
+
+    assert pre_flight.trade_possible is True
+    # Only read once the wallet is owned.
+    assert pre_flight.web3_nonce is None
+    nonce.assert_not_called()
+    assert (pre_flight.gas_limit, pre_flight.gas_price, pre_flight.chain_id) == (21_000, 5_000_000_000, 1337)
+
+
+@mock.patch("trading_api.algorithm.trade.get_gas_parameters")
+@mock.patch("trading_api.algorithm.trade.get_web3_nonce")
+@mock.patch("trading_api.algorithm.trade.is_trade_possible")
+def test_fetch_pre_flight_trade_not_possible_ignores_other_errors(
+    possible: MagicMock, nonce: MagicMock, gas: MagicMock
+):
+    possible.return_value = False
+    nonce.side_effect = ValueError("Node unavailable.")
+    gas.side_effect = ValueError("Node unavailable.")
+
+    pre_flight = asyncio.run(fetch_pre_flight(make_buy_trade_v2(), make_algorithm(), None))
+
+    assert pre_flight.trade_possible is False
+
+
+@mock.patch("trading_api.algorithm.trade.send_trade_to_blockchain")
+@mock.patch("trading_api.algorithm.trade.get_web3_nonce")
+def test_sequenced_trade_reads_the_chain_nonce_while_owning_the_wallet(nonce: MagicMock, send: MagicMock):
+    lease_repository = InMemoryWalletLeaseRepository()
+    leases_at_read = []
+
+    async def read_nonce(*args):
+        leases_at_read.append(list(lease_repository.leases))
+        return 7
+
+    nonce.side_effect = read_nonce
+    send.return_value = make_algorithm_transaction(hash_value=ADDR1), 7
+    algorithm = make_algorithm()
+    pre_flight = PreFlight(trade_possible=True, gas_limit=21_000, gas_price=5_000_000_000, chain_id=1337)
+
+    asyncio.run(
+        send_sequenced_trade(
+            make_buy_trade_v2(),
+            algorithm,
+            web3_provider=None,
+            km_service=None,
+            nonce_repository=InMemoryNonceRepository(),
+            sequencer=TransactionSequencer(lease_repository=lease_repository),
+            pre_flight=pre_flight,
+        )
+    )
+
+    assert leases_at_read == [[get_lease_key(algorithm.controller_wallet_address)]]
+    assert send.call_args.kwargs["pre_flight"].web3_nonce == 7
+    assert send.call_args.kwargs["nonce_counter"] == 7
+
+
+@mock.patch("trading_api.algorithm.trade.send_trade_to_blockchain")
+@mock.patch("trading_api.algorithm.trade.get_web3_nonce")
+def test_algorithms_of_one_wallet_share_its_nonce_counter(nonce: MagicMock, send: MagicMock):
+    nonce.return_value = 7
+    send.return_value = make_algorithm_transaction(hash_value=ADDR1), 7
+    nonce_repository = InMemoryNonceRepository()
+    sequencer = TransactionSequencer(lease_repository=InMemoryWalletLeaseRepository())
+    pre_flight = PreFlight(trade_possible=True, gas_limit=21_000, gas_price=5_000_000_000, chain_id=1337)
+
+    async def send_trades():
+        for trading_contract_address in (ADDR1, ADDR3):
+            await send_sequenced_trade(
+                make_buy_trade_v2(trading_contract_address),
+                make_algorithm(trading_contract_address=trading_contract_address, controller_wallet_address=ADDR2),
+                web3_provider=None,
+                km_service=None,
+                nonce_repository=nonce_repository,
+                sequencer=sequencer,
+                pre_flight=pre_flight,
+            )
+
+    asyncio.run(send_trades())
+
+    assert [c.kwargs["nonce_counter"] for c in send.call_args_list] == [7, 8]
+
+
+@mock.patch("trading_api.algorithm.trade.build_trade_transaction")
+@mock.patch("trading_api.algorithm.trade.get_web3_nonce")
+def test_refused_nonce_is_not_sent_again(nonce: MagicMock, build: MagicMock):
+    nonce.return_value = 7
+    build.side_effect = lambda trade, algorithm, web3_provider, transaction: transaction
+    web3_provider = MagicMock()
+    send_raw_transaction = web3_provider.get_async_web3.return_value.eth.send_raw_transaction = AsyncMock(
+        side_effect=[ValueError("replacement transaction underpriced"), HexBytes("0x7b")]
+    )
+    km_service = MagicMock()
+    algorithm = make_algorithm()
+    nonce_repository = InMemoryNonceRepository()
+    pre_flight = PreFlight(trade_possible=True, web3_nonce=7, gas_limit=21_000, gas_price=1, chain_id=1337)
+
+    async def send():
+        nonce_counter = await nonce_repository.get_nonce(algorithm.controller_wallet_address, web3_nonce=7)
+        return await send_trade_to_blockchain(
+            make_buy_trade_v2(),
+            algorithm,
+            web3_provider=web3_provider,
+            km_service=km_service,
+            nonce_counter=nonce_counter,
+            pre_flight=pre_flight,
+            nonce_repository=nonce_repository,
+        )
+
+    _, sent_nonce = asyncio.run(send())
+
+    assert send_raw_transaction.await_count == 2
+    assert [c.kwargs["transaction"]["nonce"] for c in km_service.sign_transaction.call_args_list] == [7, 8]
+    assert sent_nonce == 8
+
+
 def test_is_multi_token_trade():
     trades = make_buy_trade_v2(), make_sell_trade_v2()
 
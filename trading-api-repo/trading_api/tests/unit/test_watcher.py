@@ -0,0 +1,290 @@
+import asyncio
+import json
+from datetime import datetime, timedelta, timezone
+from unittest import mock
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+from hexbytes import HexBytes
+from web3 import Web3
+
+from tests.utils import ADDR2, make_algorithm, make_buy_trade
+from trading_api.algorithm.models.algorithm import AlgorithmTransaction
+from trading_api.algorithm.models.crypto import ChainId, TransactionHash
+from trading_api.algorithm.models.trade import PendingTransaction, TradeEventType, TradeStatus
+from trading_api.algorithm.repositories.lock import InMemoryAlgorithmLockRepository
+from trading_api.algorithm.repositories.nonce import InMemoryNonceRepository
+from trading_api.algorithm.repositories.pending import InMemoryPendingTransactionRepository
+from trading_api.algorithm.repositories.transaction import InMemoryTransactionRepository
+from trading_api.algorithm.services.events import InMemoryTradeEventBroker
+from trading_api.algorithm.services.rpc import EndpointPool, PooledAsyncHTTPProvider
+from trading_api.algorithm.services.status_writer import TransactionStatusWriter
+from trading_api.algorithm.services.web3 import InMemoryWeb3Provider, get_transaction_receipts
+from trading_api.algorithm.watcher import ChainReceiptWatcher, ReceiptWatcher, finalize_trade, watch_trade
+
+UNKNOWN_HASH = "0x5c504ed432cb51138bcf09aa5e8a410dd4a1e204ef84bfed1be16dfba1b22060"
+
+
+def make_pending(transaction_hash: str, submitted_at: datetime = None) -> PendingTransaction:
+    return PendingTransaction(
+        trade=make_buy_trade(),
+        transaction_hash=TransactionHash(value=transaction_hash),
+        chain_id=ChainId.RTN,
+        submitted_at=submitted_at or datetime.now(timezone.utc),
+        controller_wallet_address=ADDR2,
+    )
+
+
+def lock_trade(lock_repository: InMemoryAlgorithmLockRepository, pending: PendingTransaction):
+    lock_repository.get_algorithm_lock(pending.trade.algorithm_id)
+    lock_repository.persist_algorithm_transaction(
+        AlgorithmTransaction(algorithm_id=pending.trade.algorithm_id, transaction_hash=pending.transaction_hash)
+    )
+
+
+def make_watcher(w3: Web3, finalize: AsyncMock, consumer: str = "worker-1", **kwargs) -> ChainReceiptWatcher:
+    return ChainReceiptWatcher(
+        ChainId.RTN,
+        InMemoryWeb3Provider(w3, None, None, None),
+        finalize=finalize,
+        pending_repository=kwargs.pop("pending_repository", InMemoryPendingTransactionRepository()),
+        consumer=consumer,
+        **kwargs,
+    )
+
+
+def watch(watcher: ChainReceiptWatcher, pending: PendingTransaction):
+    asyncio.run(watcher.pending_repository.add(pending))
+
+
+def send_transaction(w3: Web3) -> str:
+    tx_hash = w3.eth.send_transaction({"to": w3.eth.accounts[1], "from": w3.eth.coinbase, "value": 12345})
+    return tx_hash.hex()
+
+
+def test_watcher_resolves_mined_transactions(tester_provider):
+    w3 = Web3(tester_provider)
+    finalize = AsyncMock()
+    watcher = make_watcher(w3, finalize)
+    mined, unknown = make_pending(send_transaction(w3)), make_pending(UNKNOWN_HASH)
+    watch(watcher, mined)
+    watch(watcher, unknown)
+
+    asyncio.run(watcher.poll())
+
+    finalize.assert_awaited_once_with(mined, TradeStatus.TRADE_SUCCESSFUL)
+    assert list(watcher.pending.values()) == [unknown]
+    assert list(watcher.pending_repository.entries[ChainId.RTN].values()) == [unknown]
+
+
+def test_watcher_waits_for_a_new_block(tester_provider):
+    w3 = Web3(tester_provider)
+    finalize = AsyncMock()
+    watcher = make_watcher(w3, finalize)
+    watch(watcher, make_pending(UNKNOWN_HASH))
+    asyncio.run(watcher.poll())
+
+    with mock.patch("trading_api.algorithm.watcher.get_transaction_receipts") as get_receipts:
+        asyncio.run(watcher.poll())
+
+    get_receipts.assert_not_called()
+
+
+def test_watcher_gives_up_on_old_transactions(tester_provider):
+    w3 = Web3(tester_provider)
+    finalize = AsyncMock()
+    watcher = make_watcher(w3, finalize, pending_timeout_s=60)
+    pending = make_pending(UNKNOWN_HASH, submitted_at=datetime.now(timezone.utc) - timedelta(minutes=2))
+    watch(watcher, pending)
+
+    asyncio.run(watcher.poll())
+
+    finalize.assert_awaited_once_with(pending, TradeStatus.TRADE_IN_PROGRESS_OR_NOT_FOUND)
+    assert watcher.pending == {}
+    assert watcher.pending_repository.entries[ChainId.RTN] == {}
+
+
+def test_watcher_keeps_transactions_it_could_not_finalize(tester_provider):
+    w3 = Web3(tester_provider)
+    finalize = AsyncMock(side_effect=ValueError("Database unavailable."))
+    watcher = make_watcher(w3, finalize)
+    watch(watcher, make_pending(send_transaction(w3)))
+
+    asyncio.run(watcher.poll())
+
+    assert len(watcher.pending) == 1
+    assert len(watcher.pending_repository.entries[ChainId.RTN]) == 1
+
+
+def test_watcher_reclaims_transactions_of_a_crashed_worker(tester_provider):
+    w3 = Web3(tester_provider)
+    finalize = AsyncMock()
+    pending_repository = InMemoryPendingTransactionRepository()
+    crashed = make_watcher(w3, finalize, "worker-1", pending_repository=pending_repository, claim_timeout_ms=0)
+    watcher = make_watcher(w3, finalize, "worker-2", pending_repository=pending_repository, claim_timeout_ms=0)
+    with mock.patch("trading_api.algorithm.watcher.get_transaction_receipts") as get_receipts:
+        get_receipts.side_effect = ConnectionError("Node unavailable.")
+        watch(crashed, make_pending(send_transaction(w3)))
+        with pytest.raises(ConnectionError):
+            asyncio.run(crashed.poll())
+
+    asyncio.run(watcher.poll())
+
+    finalize.assert_awaited_once()
+    assert pending_repository.entries[ChainId.RTN] == {}
+
+
+def test_watcher_drops_transactions_reclaimed_by_another_worker(tester_provider):
+    w3 = Web3(tester_provider)
+    finalize = AsyncMock()
+    pending_repository = InMemoryPendingTransactionRepository()
+    slow = make_watcher(w3, finalize, "worker-1", pending_repository=pending_repository, claim_timeout_ms=0)
+    watcher = make_watcher(w3, AsyncMock(), "worker-2", pending_repository=pending_repository, claim_timeout_ms=0)
+    watch(slow, make_pending(UNKNOWN_HASH))
+    asyncio.run(slow._claim())
+    asyncio.run(watcher._claim())
+
+    watch(slow, make_pending(send_transaction(w3)))
+    slow.claim_timeout_ms = 60_000
+    asyncio.run(slow.poll())
+
+    # Only the transaction it still owns is finalized.
+    finalize.assert_awaited_once()
+    assert slow.pending == {}
+    assert list(watcher.pending) == list(pending_repository.entries[ChainId.RTN])
+
+
+def test_receipt_watcher_queues_transactions(tester_provider):
+    w3 = Web3(tester_provider)
+    pending_repository = InMemoryPendingTransactionRepository()
+    receipt_watcher = ReceiptWatcher(
+        lambda: InMemoryWeb3Provider(w3, None, None, None), finalize=AsyncMock(), pending_repository=pending_repository
+    )
+    pending = make_pending(UNKNOWN_HASH)
+
+    asyncio.run(receipt_watcher.watch(pending))
+
+    assert list(pending_repository.entries[ChainId.RTN].values()) == [pending]
+
+
+def test_watch_trade_does_not_fail_the_sent_trade():
+    pending_repository = InMemoryPendingTransactionRepository()
+    pending_repository.add = AsyncMock(side_effect=ConnectionError("Redis is down"))
+    receipt_watcher = ReceiptWatcher(lambda: None, finalize=AsyncMock(), pending_repository=pending_repository)
+    broker = InMemoryTradeEventBroker()
+    transaction_hash = TransactionHash(value=UNKNOWN_HASH)
+
+    asyncio.run(watch_trade(receipt_watcher, broker, make_buy_trade(), make_algorithm(), transaction_hash))
+
+    pending_repository.add.assert_awaited_once()
+
+
+def test_finalize_successful_trade():
+    lock_repository, nonce_repository = InMemoryAlgorithmLockRepository(), InMemoryNonceRepository()
+    transaction_repository = MagicMock(spec=InMemoryTransactionRepository)
+    status_writer = TransactionStatusWriter(transaction_repository)
+    pending = make_pending(UNKNOWN_HASH)
+    lock_trade(lock_repository, pending)
+    asyncio.run(nonce_repository.get_nonce(ADDR2, web3_nonce=3))
+
+    broker = MagicMock(spec=InMemoryTradeEventBroker)
+
+    asyncio.run(
+        finalize_trade(
+            pending,
+            TradeStatus.TRADE_SUCCESSFUL,
+            status_writer,
+            lock_repository,
+            nonce_repository,
+            broker,
+        )
+    )
+
+    transaction_repository.update_transaction_statuses.assert_called_once()
+    assert lock_repository.algorithm_locks == {}
+    assert asyncio.run(nonce_repository.get_nonce(ADDR2, web3_nonce=3)) == 4
+    assert [c.args[0].event for c in broker.publish.await_args_list] == [
+        TradeEventType.TRADE_MINED,
+        TradeEventType.LOCK_RELEASED,
+    ]
+
+
+def test_finalize_keeps_lock_of_next_trade():
+    lock_repository, nonce_repository = InMemoryAlgorithmLockRepository(), InMemoryNonceRepository()
+    status_writer = TransactionStatusWriter(MagicMock(spec=InMemoryTransactionRepository))
+    pending, next_pending = make_pending(UNKNOWN_HASH), make_pending("0x" + "ab" * 32)
+    # The next trade request released the lock of the first trade, and locked it for its own.
+    lock_trade(lock_repository, next_pending)
+    broker = MagicMock(spec=InMemoryTradeEventBroker)
+
+    for _ in range(2):
+        asyncio.run(
+            finalize_trade(
+                pending, TradeStatus.TRADE_SUCCESSFUL, status_writer, lock_repository, nonce_repository, broker
+            )
+        )
+
+    assert len(lock_repository.algorithm_locks) == 1
+    assert TradeEventType.LOCK_RELEASED not in [c.args[0].event for c in broker.publish.await_args_list]
+
+
+def test_late_finalize_keeps_lock_of_next_trade_before_it_is_sent():
+    lock_repository, nonce_repository = InMemoryAlgorithmLockRepository(), InMemoryNonceRepository()
+    status_writer = TransactionStatusWriter(MagicMock(spec=InMemoryTransactionRepository))
+    pending = make_pending(UNKNOWN_HASH)
+    lock_trade(lock_repository, pending)
+    broker = MagicMock(spec=InMemoryTradeEventBroker)
+
+    async def finalize():
+        await finalize_trade(
+            pending, TradeStatus.TRADE_SUCCESSFUL, status_writer, lock_repository, nonce_repository, broker
+        )
+
+    asyncio.run(finalize())
+    # The next trade locked the algorithm, and is still sending its transaction when the finalization is redelivered.
+    lock_repository.get_algorithm_lock(pending.trade.algorithm_id)
+    asyncio.run(finalize())
+
+    assert len(lock_repository.algorithm_locks) == 1
+
+
+def test_finalize_unknown_trade_keeps_lock():
+    lock_repository, nonce_repository = InMemoryAlgorithmLockRepository(), InMemoryNonceRepository()
+    transaction_repository = MagicMock(spec=InMemoryTransactionRepository)
+    status_writer = TransactionStatusWriter(transaction_repository)
+    pending = make_pending(UNKNOWN_HASH)
+    lock_repository.get_algorithm_lock(pending.trade.algorithm_id)
+    asyncio.run(nonce_repository.get_nonce(ADDR2, web3_nonce=3))
+    broker = MagicMock(spec=InMemoryTradeEventBroker)
+
+    asyncio.run(
+        finalize_trade(
+            pending,
+            TradeStatus.TRADE_IN_PROGRESS_OR_NOT_FOUND,
+            status_writer,
+            lock_repository,
+            nonce_repository,
+            broker,
+        )
+    )
+
+    transaction_repository.update_transaction_statuses.assert_not_called()
+    assert len(lock_repository.algorithm_locks) == 1
+    assert asyncio.run(nonce_repository.get_nonce(ADDR2, web3_nonce=3)) == 3
+    broker.publish.assert_not_awaited()
+
+
+@mock.patch("trading_api.algorithm.services.rpc.async_make_post_request")
+def test_get_transaction_receipts_in_one_batch(post: AsyncMock):
+    post.return_value = json.dumps(
+        [
+            {"jsonrpc": "2.0", "id": 1, "result": None},
+            {"jsonrpc": "2.0", "id": 0, "result": {"status": "0x1", "blockNumber": "0x10", "logs": []}},
+        ]
+    ).encode()
+    w3 = Web3(PooledAsyncHTTPProvider(EndpointPool(["http://localhost:8545"])))
+
+    receipts = asyncio.run(get_transaction_receipts(w3, [HexBytes(UNKNOWN_HASH), HexBytes("0x01")]))
+
+    assert post.await_count == 1
+    assert receipts == [{"status": 1, "blockNumber": 16, "logs": []}, None]
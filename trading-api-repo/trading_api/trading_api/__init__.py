@@ -39,11 +39,17 @@ class EnvNotSetException(Exception):
 
 
 class EnvVar(Enum):
-    TASK_CHECK_TX_STATUS_SLEEP_TIME = "TASK_CHECK_TX_STATUS_SLEEP_TIME"
+    RECEIPT_WATCHER_POLL_INTERVAL = "RECEIPT_WATCHER_POLL_INTERVAL"
+    RECEIPT_WATCHER_TIMEOUT = "RECEIPT_WATCHER_TIMEOUT"
+    RECEIPT_NOTIFIER_POLL_INTERVAL = "RECEIPT_NOTIFIER_POLL_INTERVAL"
+    PENDING_TRANSACTION_CLAIM_TIMEOUT_MS = "PENDING_TRANSACTION_CLAIM_TIMEOUT_MS"
+    TRANSACTION_STATUS_FLUSH_INTERVAL = "TRANSACTION_STATUS_FLUSH_INTERVAL"
     ECR_CONTRACT_INFO_JSON_PATH = "ECR_CONTRACT_INFO_JSON_PATH"
     ECR_CONTRACT_ADDRESS_RTN = "ECR_CONTRACT_ADDRESS_RTN"
     ECR_CONTRACT_ADDRESS_BSC = "ECR_CONTRACT_ADDRESS_BSC"
     REGION_NAME = "REGION_NAME"
+    KMS_MAX_CONNECTIONS = "KMS_MAX_CONNECTIONS"
+    KEY_INDEX_INTERVAL_S = "KEY_INDEX_INTERVAL_S"
     PRIVATE_KEY = "PRIVATE_KEY"
     ACCESS_TOKEN_EXPIRE_MINUTES = "ACCESS_TOKEN_EXPIRE_MINUTES"
     SECRET_KEY = "SECRET_KEY"
@@ -57,6 +63,20 @@ class EnvVar(Enum):
     ESTIMATED_GAS_PRICE_FACTOR_RTN = "ESTIMATED_GAS_PRICE_FACTOR_RTN"
     WEB3_PROVIDER_ENDPOINT_BSC = "WEB3_PROVIDER_ENDPOINT_BSC"
     WEB3_PROVIDER_ENDPOINT_RTN = "WEB3_PROVIDER_ENDPOINT_RTN"
+    WEB3_BATCH_WINDOW_MS = "WEB3_BATCH_WINDOW_MS"
+    WEB3_HEDGE_PERCENTILE = "WEB3_HEDGE_PERCENTILE"
+    WEB3_BLOCK_REFRESH_MS = "WEB3_BLOCK_REFRESH_MS"
+    WEB3_WEBSOCKET_ENDPOINT_BSC = "WEB3_WEBSOCKET_ENDPOINT_BSC"
+    WEB3_WEBSOCKET_ENDPOINT_RTN = "WEB3_WEBSOCKET_ENDPOINT_RTN"
+    BLOCK_HEAD_POLL_INTERVAL_MS = "BLOCK_HEAD_POLL_INTERVAL_MS"
+    BLOCK_HEAD_LEASE_TIMEOUT_MS = "BLOCK_HEAD_LEASE_TIMEOUT_MS"
+    BLOCK_HEAD_MAX_AGE_MS = "BLOCK_HEAD_MAX_AGE_MS"
+    GAS_ORACLE_BLOCK_COUNT = "GAS_ORACLE_BLOCK_COUNT"
+    GAS_ORACLE_PERCENTILES = "GAS_ORACLE_PERCENTILES"
+    GAS_ORACLE_MAX_PRICE_AGE_MS = "GAS_ORACLE_MAX_PRICE_AGE_MS"
+    GAS_LIMIT_PERCENTILE = "GAS_LIMIT_PERCENTILE"
+    GAS_LIMIT_MARGIN = "GAS_LIMIT_MARGIN"
+    GAS_LIMIT_MIN_SAMPLES = "GAS_LIMIT_MIN_SAMPLES"
     USE_WEB3_ENDPOINT = "USE_WEB3_ENDPOINT"
     JWT_SYSTEM_PASSWORD = "JWT_SYSTEM_PASSWORD"
     JWT_SYSTEM_USERNAME = "JWT_SYSTEM_USERNAME"
@@ -67,9 +87,12 @@ class EnvVar(Enum):
     MONGO_CONNECTION = "MONGO_CONNECTION"
     REDIS_URL = "REDIS_URL"
     REDIS_LOCK_TIMEOUT_MS = "REDIS_LOCK_TIMEOUT_MS"
+    WALLET_LEASE_TIMEOUT_MS = "WALLET_LEASE_TIMEOUT_MS"
     TRADING_CONTRACT_TOOLS_JSON_PATH = "TRADING_CONTRACT_TOOLS_JSON_PATH"
     TRADING_CONTRACT_TOOLS_ADDRESS_BSC = "TRADING_CONTRACT_TOOLS_ADDRESS_BSC"
     TRADING_CONTRACT_TOOLS_ADDRESS_RTN = "TRADING_CONTRACT_TOOLS_ADDRESS_RTN"
+    MULTICALL_ADDRESS_BSC = "MULTICALL_ADDRESS_BSC"
+    MULTICALL_ADDRESS_RTN = "MULTICALL_ADDRESS_RTN"
 
 
 def set_defaults():
@@ -0,0 +1,46 @@
+import logging
+from datetime import datetime, timezone
+from typing import AsyncIterator
+
+from eth_typing import ChecksumAddress
+
+from trading_api.algorithm.lock import get_lock_symbol
+from trading_api.algorithm.models.crypto import TransactionHash
+from trading_api.algorithm.models.trade import Trade, TradeEvent, TradeEventType
+from trading_api.algorithm.services.events import TradeEventBroker
+
+logger = logging.getLogger(__name__)
+
+
+async def publish_trade_event(
+    broker: TradeEventBroker, event: TradeEventType, trade: Trade, transaction_hash: TransactionHash
+):
+    """Events are best effort, a failing broker must not fail the trade."""
+    try:
+        await broker.publish(
+            TradeEvent(
+                event=event,
+                algorithm_id=trade.algorithm_id,
+                transaction_hash=transaction_hash,
+                symbol=get_lock_symbol(trade),
+                created_at=datetime.now(timezone.utc),
+            )
+        )
+    except Exception as e:
+        logger.warning(f"Error publishing trade event. {event=} {transaction_hash=} {e=}", exc_info=True)
+
+
+async def stream_trade_events(
+    broker: TradeEventBroker, address: ChecksumAddress, keep_alive_s: float = 15.0
+) -> AsyncIterator[str]:
+    """Formats the events of an algorithm as server-sent events.
+
+    A comment is sent when nothing happened for `keep_alive_s`, so proxies in between keep the connection open.
+    """
+    async with broker.subscribe(address) as next_event:
+        while True:
+            event = await next_event(keep_alive_s)
+            if event is None:
+                yield ": keep-alive\n\n"
+            else:
+                yield f"event: {event.event.value}\ndata: {event.json()}\n\n"
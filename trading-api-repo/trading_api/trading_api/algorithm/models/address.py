@@ -2,6 +2,7 @@ from typing import List, Optional
 
 from eth_typing import ChecksumAddress
 from pydantic import BaseModel
+from pymongo import ASCENDING
 
 
 class AddressKeyPair(BaseModel):
@@ -11,6 +12,10 @@ class AddressKeyPair(BaseModel):
     def filter_query(self) -> dict:
         return {"controller_wallet_address": self.controller_wallet_address}
 
+    @staticmethod
+    def indexes() -> List:
+        return [[("controller_wallet_address", ASCENDING)], [("key_alias", ASCENDING)]]
+
 
 class AddressPair(BaseModel):
     controller_wallet_address: ChecksumAddress
@@ -1,8 +1,9 @@
 import enum
-from typing import Optional
+from typing import List, Optional
 
 from eth_typing import ChecksumAddress
 from pydantic import BaseModel, validator
+from pymongo import ASCENDING
 from web3 import Web3
 
 from trading_api import API_ROOT_PATH
@@ -71,6 +72,10 @@ class AlgorithmInDB(BaseModel):
     def filter_query(self) -> dict:
         return {"trading_contract_address": self.trading_contract_address}
 
+    @staticmethod
+    def indexes() -> List:
+        return [[("controller_wallet_address", ASCENDING)]]
+
 
 class RegisterAlgorithm(BaseModel):
     trading_contract_address: ChecksumAddress
@@ -1,5 +1,6 @@
 import enum
 from collections import namedtuple
+from typing import Optional
 
 from pydantic import BaseModel
 
@@ -18,3 +19,11 @@ class TransactionHash(BaseModel):
 
 class PublicKey(BaseModel):
     value: str
+
+
+class BlockHead(BaseModel):
+    chain_id: ChainId
+    number: int
+    timestamp: int
+    base_fee: Optional[int] = None
+    gas_price: int
@@ -1,5 +1,5 @@
 from decimal import Decimal
-from typing import Union
+from typing import List, Union
 
 from pydantic import BaseModel
 
@@ -12,3 +12,11 @@ class PriceQuote(BaseModel):
 
 
 PriceQuoteResponse = Union[PriceQuote, BlockChainError]
+
+
+class PriceQuoteList(BaseModel):
+    quotes: List[PriceQuote]
+    failed: List[str] = []
+
+
+PriceQuoteListResponse = Union[PriceQuoteList, BlockChainError]
@@ -1,14 +1,19 @@
 import enum
 from datetime import datetime
 from decimal import Context, Decimal
-from typing import List, Optional, Union
+from typing import Dict, List, Optional, Union
 
 from eth_typing import ChecksumAddress
 from pydantic import BaseModel, validator
 from pymongo import ASCENDING, DESCENDING
 
-from trading_api.algorithm.models.algorithm import AlgorithmId, AlgorithmIsLocked, AlgorithmWasLocked
-from trading_api.algorithm.models.crypto import TransactionHash
+from trading_api.algorithm.models.algorithm import (
+    AlgorithmId,
+    AlgorithmIsLocked,
+    AlgorithmWasLocked,
+    TradingContractVersion,
+)
+from trading_api.algorithm.models.crypto import ChainId, TransactionHash
 
 BC_INT_PRECISION = 18  # Needs to be an integer for the `prec` parameter in `Context`.
 BC_INT_OFFSET = Decimal("10") ** BC_INT_PRECISION
@@ -27,6 +32,13 @@ class Slippage(BaseModel):
         return Context(prec=BC_INT_PRECISION).create_decimal(BC_INT_OFFSET - (BC_INT_OFFSET * self.amount))
 
 
+class GasUrgency(str, enum.Enum):
+    LOW = "LOW"
+    STANDARD = "STANDARD"
+    FAST = "FAST"
+    URGENT = "URGENT"
+
+
 class BuyTrade(BaseModel):
     algorithm_id: AlgorithmId
     slippage: Slippage
@@ -38,6 +50,7 @@ class BuyTradeV2(BaseModel):
     slippage: Slippage
     relative_amount: Decimal
     symbol: str
+    urgency: GasUrgency = GasUrgency.STANDARD
 
 
 class SellTrade(BaseModel):
@@ -51,6 +64,7 @@ class SellTradeV2(BaseModel):
     slippage: Slippage
     relative_amount: Decimal
     symbol: str
+    urgency: GasUrgency = GasUrgency.STANDARD
 
 
 MultiTokenTrade = Union[BuyTradeV2, SellTradeV2]
@@ -58,6 +72,44 @@ MultiTokenTrade = Union[BuyTradeV2, SellTradeV2]
 Trade = Union[MultiTokenTrade, BuyTrade, SellTrade]
 
 
+class TradeType(str, enum.Enum):
+    SELL = "SELL"
+    BUY = "BUY"
+
+
+class GasShape(BaseModel):
+    """The properties of a trade its gas usage depends on, trades of the same shape use about the same gas."""
+
+    chain_id: ChainId
+    contract_version: TradingContractVersion
+    trade_type: TradeType
+    symbol: Optional[str] = None
+
+    class Config:
+        frozen = True
+
+
+class GasPrices(BaseModel):
+    """The gas price per urgency, sampled from the recent blocks up to `block_number` at `sampled_at` (unix time)."""
+
+    chain_id: ChainId
+    block_number: int
+    sampled_at: float
+    prices: Dict[GasUrgency, int]
+
+
+class PendingTransaction(BaseModel):
+    """A sent trade of which we don't know the outcome yet."""
+
+    trade: Trade
+    transaction_hash: TransactionHash
+    chain_id: ChainId
+    submitted_at: datetime
+    gas_shape: Optional[GasShape] = None
+    # Trades sent by an older version don't have it.
+    controller_wallet_address: Optional[ChecksumAddress] = None
+
+
 class TradeRequest(BaseModel):
     trade: Trade
 
@@ -73,6 +125,19 @@ class StatusRequest(BaseModel):
         return timeout_value
 
 
+class PreFlight(BaseModel):
+    """Chain state needed to submit a trade, read concurrently before signing.
+
+    The chain nonce is only read once the controller wallet is owned, it's None until then.
+    """
+
+    trade_possible: bool
+    web3_nonce: Optional[int] = None
+    gas_limit: int
+    gas_price: int
+    chain_id: int
+
+
 class InsufficientFunds(BaseModel):
     algorithm_id: AlgorithmId
     reason: str = "Not enough funds in algorithm contract to trade."
@@ -90,6 +155,23 @@ class TradeStatus(str, enum.Enum):
     TRADE_SUCCESSFUL = "TRADE_SUCCESSFUL"
 
 
+class TradeEventType(str, enum.Enum):
+    TRADE_SUBMITTED = "TRADE_SUBMITTED"
+    TRADE_MINED = "TRADE_MINED"
+    TRADE_FAILED = "TRADE_FAILED"
+    LOCK_RELEASED = "LOCK_RELEASED"
+
+
+class TradeEvent(BaseModel):
+    """A step in the lifecycle of a trade, streamed to the algorithm."""
+
+    event: TradeEventType
+    algorithm_id: AlgorithmId
+    transaction_hash: TransactionHash
+    symbol: str
+    created_at: datetime
+
+
 class TradeInProgressOrNotFoundResponse(BaseModel):
     code: TradeStatus = TradeStatus.TRADE_IN_PROGRESS_OR_NOT_FOUND
     message: str = "Trade is in progress or cannot be found."
@@ -105,11 +187,6 @@ class TradeSuccessfulResponse(BaseModel):
     message: str = "Trade successful."
 
 
-class TradeType(str, enum.Enum):
-    SELL = "SELL"
-    BUY = "BUY"
-
-
 class TradeTypeLower(str, enum.Enum):
     SELL = "sell"
     BUY = "buy"
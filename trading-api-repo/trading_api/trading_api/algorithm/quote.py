@@ -1,13 +1,15 @@
 import logging
 from decimal import Decimal
+from typing import List
 
 from eth_typing import ChecksumAddress
 from eth_utils import from_wei
 from web3.contract import Contract
 
 from trading_api.algorithm.models.algorithm import Algorithm, AlgorithmId
-from trading_api.algorithm.models.quote import PriceQuote, PriceQuoteResponse
+from trading_api.algorithm.models.quote import PriceQuote, PriceQuoteList, PriceQuoteListResponse, PriceQuoteResponse
 from trading_api.algorithm.models.trade import BlockChainError
+from trading_api.algorithm.services.multicall import MulticallAggregator
 from trading_api.algorithm.services.web3 import Web3Provider
 
 logger = logging.getLogger(__name__)
@@ -24,6 +26,30 @@ def handle_price_quote_request(symbol: str, algorithm: Algorithm, w3: Web3Provid
     return PriceQuote(symbol=symbol.upper(), price=price)
 
 
+async def handle_price_quote_list_request(
+    symbols: List[str], algorithm: Algorithm, w3: Web3Provider, multicall: MulticallAggregator
+) -> PriceQuoteListResponse:
+    """Quote all symbols with a single `eth_call`, symbols the contract can't quote are listed as failed."""
+    contract = w3.get_trading_contract_tools(algorithm=algorithm)
+    symbols = list(dict.fromkeys(symbol.upper() for symbol in symbols))
+    functions = [contract.functions.getTokenPrice(algorithm.trading_contract_address, symbol) for symbol in symbols]
+
+    try:
+        prices = await multicall.call(algorithm.chain_id, functions)
+    except Exception as e:
+        return handle_blockchain_error(e, algorithm.trading_contract_address)
+
+    quotes, failed = [], []
+    for symbol, price in zip(symbols, prices):
+        if isinstance(price, Exception):
+            logger.warning(f"Error requesting price quote. {algorithm.trading_contract_address=} {symbol=} {price=}")
+            failed.append(symbol)
+        else:
+            quotes.append(PriceQuote(symbol=symbol, price=Decimal(from_wei(price, "ether"))))
+
+    return PriceQuoteList(quotes=quotes, failed=failed)
+
+
 def handle_blockchain_error(error: Exception, trading_contract_address: ChecksumAddress) -> BlockChainError:
     logger.error(f"Error requesting price quote. {trading_contract_address=}  {error=}")
 
@@ -1,5 +1,5 @@
 from abc import ABC, abstractmethod
-from typing import Dict, Iterator, Optional
+from typing import Collection, Dict, Iterator, Optional
 
 from pymongo import MongoClient
 
@@ -24,6 +24,10 @@ class AlgorithmRepository(ABC):
     def all_algorithms(self) -> Iterator[AlgorithmInDB]:
         pass
 
+    @abstractmethod
+    def get_algorithms_by_controller_wallets(self, addresses: Collection[str]) -> Iterator[AlgorithmInDB]:
+        pass
+
 
 class InMemoryAlgorithmRepository(AlgorithmRepository):
     memory: Dict[str, AlgorithmInDB]
@@ -44,6 +48,10 @@ class InMemoryAlgorithmRepository(AlgorithmRepository):
     def all_algorithms(self) -> Iterator[AlgorithmInDB]:
         yield from self.memory.values()
 
+    def get_algorithms_by_controller_wallets(self, addresses: Collection[str]) -> Iterator[AlgorithmInDB]:
+        addresses = set(addresses)
+        yield from (algorithm for algorithm in self.memory.values() if algorithm.controller_wallet_address in addresses)
+
 
 class MongoAlgorithmRepository(BaseRepository, AlgorithmRepository):
     def __init__(self, client: MongoClient, db_name: str):
@@ -59,3 +67,8 @@ class MongoAlgorithmRepository(BaseRepository, AlgorithmRepository):
 
     def all_algorithms(self) -> Iterator[AlgorithmInDB]:
         yield from self._all_models()  # type: ignore
+
+    def get_algorithms_by_controller_wallets(self, addresses: Collection[str]) -> Iterator[AlgorithmInDB]:
+        yield from self._models_by_key_value(
+            key="controller_wallet_address", value={"$in": list(addresses)}
+        )  # type: ignore
@@ -0,0 +1,121 @@
+from abc import ABC, abstractmethod
+from collections import deque
+from typing import Deque, Dict, List, Optional
+
+from redis.asyncio import Redis
+
+from trading_api.algorithm.models.crypto import ChainId
+from trading_api.algorithm.models.trade import GasPrices, GasShape
+
+
+class GasUsageRepository(ABC):
+    """Keeps the gas used by the last `max_samples` mined trades of every shape, shared by all workers."""
+
+    def __init__(self, max_samples: int = 100):
+        self.max_samples = max_samples
+
+    @abstractmethod
+    async def add(self, shape: GasShape, gas_used: int) -> None:
+        pass
+
+    @abstractmethod
+    async def get(self, shape: GasShape) -> List[int]:
+        """Returns the gas used by the most recent trades first."""
+        pass
+
+    @abstractmethod
+    async def clear(self, shape: GasShape) -> None:
+        pass
+
+
+class RedisGasUsageRepository(GasUsageRepository):
+    # Shapes that don't trade anymore, e.g. a delisted symbol, are forgotten after a while.
+    ttl_s = 30 * 24 * 60 * 60
+
+    def __init__(self, connection_url: str, max_samples: int = 100):
+        super().__init__(max_samples)
+        self.redis = Redis.from_url(connection_url)
+
+    async def add(self, shape: GasShape, gas_used: int) -> None:
+        key = get_gas_usage_key(shape)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.lpush(key, gas_used)
+            pipe.ltrim(key, 0, self.max_samples - 1)
+            pipe.expire(key, self.ttl_s)
+            await pipe.execute()
+
+    async def get(self, shape: GasShape) -> List[int]:
+        return [int(gas_used) for gas_used in await self.redis.lrange(get_gas_usage_key(shape), 0, -1)]
+
+    async def clear(self, shape: GasShape) -> None:
+        await self.redis.delete(get_gas_usage_key(shape))
+
+
+class InMemoryGasUsageRepository(GasUsageRepository):
+    memory: Dict[GasShape, Deque[int]]
+
+    def __init__(self, max_samples: int = 100):
+        super().__init__(max_samples)
+        self.memory = {}
+
+    async def add(self, shape: GasShape, gas_used: int) -> None:
+        self.memory.setdefault(shape, deque(maxlen=self.max_samples)).appendleft(gas_used)
+
+    async def get(self, shape: GasShape) -> List[int]:
+        return list(self.memory.get(shape, []))
+
+    async def clear(self, shape: GasShape) -> None:
+        self.memory.pop(shape, None)
+
+
+class GasPriceRepository(ABC):
+    """Shares the gas prices sampled by the worker that leads the block heads of a chain with the other workers."""
+
+    @abstractmethod
+    async def publish(self, prices: GasPrices) -> None:
+        pass
+
+    @abstractmethod
+    async def get_latest(self, chain: ChainId) -> Optional[GasPrices]:
+        pass
+
+
+class RedisGasPriceRepository(GasPriceRepository):
+    # Prices nobody samples anymore are gone after a while, readers check `sampled_at` for how recent they are.
+    ttl_s = 60 * 60
+
+    def __init__(self, connection_url: str):
+        self.redis = Redis.from_url(connection_url)
+
+    async def publish(self, prices: GasPrices) -> None:
+        await self.redis.set(get_gas_prices_key(prices.chain_id), prices.json(), ex=self.ttl_s)
+
+    async def get_latest(self, chain: ChainId) -> Optional[GasPrices]:
+        data = await self.redis.get(get_gas_prices_key(chain))
+        if data is None:
+            return None
+
+        return GasPrices.parse_raw(data)
+
+
+class InMemoryGasPriceRepository(GasPriceRepository):
+    latest: Dict[ChainId, GasPrices]
+
+    def __init__(self):
+        self.latest = {}
+
+    async def publish(self, prices: GasPrices) -> None:
+        self.latest[prices.chain_id] = prices
+
+    async def get_latest(self, chain: ChainId) -> Optional[GasPrices]:
+        return self.latest.get(chain)
+
+
+def get_gas_usage_key(shape: GasShape) -> str:
+    return (
+        f"GAS-USED-{shape.chain_id.value}-{shape.contract_version.value}-{shape.trade_type.value}-{shape.symbol or ''}"
+    )
+
+
+def get_gas_prices_key(chain: ChainId) -> str:
+    return f"GAS-PRICES-{chain.value}"
@@ -0,0 +1,150 @@
+import asyncio
+import logging
+import time
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from typing import AsyncContextManager, AsyncIterator, Awaitable, Callable, Dict, List, Optional, Tuple
+
+from redis.asyncio import Redis
+
+from trading_api.algorithm.models.crypto import BlockHead, ChainId
+
+logger = logging.getLogger(__name__)
+
+# Waits up to the given number of seconds for the next head, returns `None` when none came in.
+NextHead = Callable[[float], Awaitable[Optional[BlockHead]]]
+
+# Extend the lease when we own it already, else take it when nobody does.
+ACQUIRE_LEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+if redis.call('SET', KEYS[1], ARGV[1], 'NX', 'PX', ARGV[2]) then
+    return 1
+end
+return 0
+"""
+
+
+class BlockHeadRepository(ABC):
+    """Shares the latest block head of every chain between workers.
+
+    A worker that holds the lease on a chain follows the node and publishes the heads, the others subscribe to them.
+    """
+
+    @abstractmethod
+    async def acquire(self, chain: ChainId, owner: str, lease_timeout_ms: int) -> bool:
+        """Take the lease on the chain, or extend it when `owner` holds it already."""
+
+    @abstractmethod
+    async def publish(self, head: BlockHead) -> None:
+        pass
+
+    @abstractmethod
+    async def get_latest(self, chain: ChainId) -> Optional[BlockHead]:
+        pass
+
+    @abstractmethod
+    def subscribe(self, chain: ChainId) -> AsyncContextManager[NextHead]:
+        pass
+
+
+class RedisBlockHeadRepository(BlockHeadRepository):
+    def __init__(self, connection_url: str):
+        self.redis = Redis.from_url(connection_url)
+        self.acquire_lease = self.redis.register_script(ACQUIRE_LEASE_SCRIPT)
+
+    async def acquire(self, chain: ChainId, owner: str, lease_timeout_ms: int) -> bool:
+        return bool(await self.acquire_lease(keys=[get_lease_key(chain)], args=[owner, lease_timeout_ms]))
+
+    async def publish(self, head: BlockHead) -> None:
+        data = head.json()
+        async with self.redis.pipeline(transaction=False) as pipe:
+            pipe.set(get_latest_key(head.chain_id), data)
+            pipe.publish(get_channel_key(head.chain_id), data)
+            await pipe.execute()
+
+    async def get_latest(self, chain: ChainId) -> Optional[BlockHead]:
+        data = await self.redis.get(get_latest_key(chain))
+        if data is None:
+            return None
+
+        return BlockHead.parse_raw(data)
+
+    @asynccontextmanager
+    async def subscribe(self, chain: ChainId) -> AsyncIterator[NextHead]:
+        pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        await pubsub.subscribe(get_channel_key(chain))
+
+        async def next_head(timeout_s: float) -> Optional[BlockHead]:
+            # `get_message` also returns early for the (ignored) subscribe confirmations, so wait out the deadline.
+            deadline = time.monotonic() + timeout_s
+            while (remaining := deadline - time.monotonic()) > 0:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=remaining)
+                if message is not None:
+                    return BlockHead.parse_raw(message["data"])
+
+            return None
+
+        try:
+            yield next_head
+        finally:
+            await pubsub.unsubscribe()
+            await pubsub.aclose()
+
+
+class InMemoryBlockHeadRepository(BlockHeadRepository):
+    leases: Dict[ChainId, Tuple[str, float]]
+    latest: Dict[ChainId, BlockHead]
+    subscribers: Dict[ChainId, List[asyncio.Queue]]
+
+    def __init__(self):
+        self.leases = {}
+        self.latest = {}
+        self.subscribers = {}
+
+    async def acquire(self, chain: ChainId, owner: str, lease_timeout_ms: int) -> bool:
+        now = time.monotonic()
+        current_owner, expires_at = self.leases.get(chain, (owner, now))
+        if current_owner != owner and expires_at > now:
+            return False
+
+        self.leases[chain] = (owner, now + lease_timeout_ms / 1000)
+        return True
+
+    async def publish(self, head: BlockHead) -> None:
+        self.latest[head.chain_id] = head
+        for queue in self.subscribers.get(head.chain_id, []):
+            queue.put_nowait(head)
+
+    async def get_latest(self, chain: ChainId) -> Optional[BlockHead]:
+        return self.latest.get(chain)
+
+    @asynccontextmanager
+    async def subscribe(self, chain: ChainId) -> AsyncIterator[NextHead]:
+        queue: asyncio.Queue = asyncio.Queue()
+        subscribers = self.subscribers.setdefault(chain, [])
+        subscribers.append(queue)
+
+        async def next_head(timeout_s: float) -> Optional[BlockHead]:
+            try:
+                return await asyncio.wait_for(queue.get(), timeout=timeout_s)
+            except asyncio.TimeoutError:
+                return None
+
+        try:
+            yield next_head
+        finally:
+            subscribers.remove(queue)
+
+
+def get_lease_key(chain: ChainId) -> str:
+    return f"BLOCK-HEAD-LEASE-{chain.value}"
+
+
+def get_latest_key(chain: ChainId) -> str:
+    return f"BLOCK-HEAD-{chain.value}"
+
+
+def get_channel_key(chain: ChainId) -> str:
+    return f"BLOCK-HEADS-{chain.value}"
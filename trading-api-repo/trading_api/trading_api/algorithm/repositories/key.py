@@ -1,8 +1,9 @@
 import logging
 from abc import ABC, abstractmethod
-from typing import Optional
+from typing import Iterator, List, Optional
 
-from pymongo import MongoClient
+from eth_typing import ChecksumAddress
+from pymongo import ASCENDING, MongoClient
 
 from trading_api.algorithm.models.address import AddressKeyPair
 from trading_api.core.repositories.mongo import BaseRepository
@@ -29,6 +30,20 @@ class KeyRepository(ABC):
     def get_address_by_key_alias(self, key_alias: str) -> Optional[str]:
         pass
 
+    @abstractmethod
+    def all_address_keys(self) -> Iterator[AddressKeyPair]:
+        pass
+
+    @abstractmethod
+    def address_keys(
+        self, skip: int = 0, limit: Optional[int] = None, after: Optional[ChecksumAddress] = None
+    ) -> List[AddressKeyPair]:
+        """A page of the controller wallets, ordered by their address so the pages don't overlap.
+
+        With `after` the page starts past that address, so the next page is read without skipping the previous ones.
+        """
+        pass
+
 
 class InMemoryKeyRepository(KeyRepository):
     def __init__(self, *args, **kwargs):
@@ -53,6 +68,20 @@ class InMemoryKeyRepository(KeyRepository):
 
         return None
 
+    def all_address_keys(self) -> Iterator[AddressKeyPair]:
+        for address, key_alias in self.storage.items():
+            yield AddressKeyPair(controller_wallet_address=address, key_alias=key_alias)
+
+    def address_keys(
+        self, skip: int = 0, limit: Optional[int] = None, after: Optional[ChecksumAddress] = None
+    ) -> List[AddressKeyPair]:
+        pairs = sorted(
+            (pair for pair in self.all_address_keys() if after is None or pair.controller_wallet_address > after),
+            key=lambda pair: pair.controller_wallet_address,
+        )
+
+        return pairs[skip : None if limit is None else skip + limit]
+
 
 class MongoKeyRepository(BaseRepository, KeyRepository):
     def __init__(self, client: MongoClient, db_name: str):
@@ -81,3 +110,18 @@ class MongoKeyRepository(BaseRepository, KeyRepository):
             return None
 
         return pair.controller_wallet_address
+
+    def all_address_keys(self) -> Iterator[AddressKeyPair]:
+        yield from self._all_models()  # type: ignore
+
+    def address_keys(
+        self, skip: int = 0, limit: Optional[int] = None, after: Optional[ChecksumAddress] = None
+    ) -> List[AddressKeyPair]:
+        return list(
+            self._all_models_paginated(
+                skip,
+                limit,
+                sort_query=[("controller_wallet_address", ASCENDING)],
+                filter_query=None if after is None else {"controller_wallet_address": {"$gt": after}},
+            )
+        )  # type: ignore
@@ -19,6 +19,24 @@ logger = logging.getLogger(__name__)
 
 SYMBOL_V1 = "DEFAULT"  # If we are dealing with a V1 trade we set the symbol to this const.
 
+# Taking the lock clears the transaction of the previous trade, so releasing it for that transaction can't release the
+# lock of the new trade before its transaction is stored.
+ACQUIRE_LOCK_SCRIPT = """
+if redis.call('SET', KEYS[1], 'LOCKED', 'NX', 'PX', ARGV[1]) then
+    redis.call('DEL', KEYS[2])
+    return 1
+end
+return 0
+"""
+
+# Only delete the lock when it's still held for the transaction, the next trade could have taken it in the meantime.
+RELEASE_LOCK_SCRIPT = """
+if redis.call('GET', KEYS[2]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
 
 class AlgorithmLockRepository(abc.ABC):
     @abc.abstractmethod
@@ -29,6 +47,13 @@ class AlgorithmLockRepository(abc.ABC):
     def remove_algorithm_lock(self, algorithm_id: AlgorithmId, symbol=SYMBOL_V1) -> None:
         pass
 
+    @abc.abstractmethod
+    def remove_algorithm_lock_for_transaction(
+        self, algorithm_id: AlgorithmId, transaction_hash: TransactionHash, symbol=SYMBOL_V1
+    ) -> bool:
+        """Removes the lock only when it's held for this transaction, returns whether it was removed."""
+        pass
+
     @abc.abstractmethod
     def get_algorithm_lock(
         self, algorithm_id: AlgorithmId, symbol=SYMBOL_V1
@@ -55,6 +80,8 @@ class RedisLockRepository(AlgorithmLockRepository):
         self.__lock_timeout_ms = lock_timeout_ms
         self.__base_key = "algorithm-locks:"
         self.__transaction_base_key = "algorithm-transactions:"
+        self.acquire_lock = self.redis.register_script(ACQUIRE_LOCK_SCRIPT)
+        self.release_lock = self.redis.register_script(RELEASE_LOCK_SCRIPT)
 
     def is_healthy(self) -> bool:
         try:
@@ -65,10 +92,17 @@ class RedisLockRepository(AlgorithmLockRepository):
     def remove_algorithm_lock(self, algorithm_id: AlgorithmId, symbol=SYMBOL_V1) -> None:
         self.redis.delete(self.__algorithm_key(algorithm_id, symbol))
 
+    def remove_algorithm_lock_for_transaction(
+        self, algorithm_id: AlgorithmId, transaction_hash: TransactionHash, symbol=SYMBOL_V1
+    ) -> bool:
+        keys = [self.__algorithm_key(algorithm_id, symbol), self.__algorithm_transaction_key(algorithm_id, symbol)]
+
+        return bool(self.release_lock(keys=keys, args=[transaction_hash.value]))
+
     def get_algorithm_lock(
         self, algorithm_id: AlgorithmId, symbol=SYMBOL_V1
     ) -> Union[NewAlgorithmLock, AlgorithmWasLocked]:
-        obtained_lock = self.__obtain_lock(self.__algorithm_key(algorithm_id, symbol))
+        obtained_lock = self.__obtain_lock(algorithm_id, symbol)
         logger.debug(f"Tried to obtain lock: {algorithm_id=} {symbol=}\t{obtained_lock=}")
 
         if not obtained_lock:
@@ -102,11 +136,10 @@ class RedisLockRepository(AlgorithmLockRepository):
             transaction_hash=algorithm_transaction.transaction_hash,
         )
 
-    def __obtain_lock(self, key):
-        if not self.redis.exists(key):
-            return bool(self.redis.set(key, "LOCKED", px=self.__lock_timeout_ms))
+    def __obtain_lock(self, algorithm_id: AlgorithmId, symbol: str) -> bool:
+        keys = [self.__algorithm_key(algorithm_id, symbol), self.__algorithm_transaction_key(algorithm_id, symbol)]
 
-        return False
+        return bool(self.acquire_lock(keys=keys, args=[self.__lock_timeout_ms]))
 
     def __algorithm_key(self, algorithm_id: AlgorithmId, symbol: str) -> str:
         return f"{self.__base_key}{algorithm_id.public_address}{symbol}"
@@ -127,7 +160,20 @@ class InMemoryAlgorithmLockRepository(AlgorithmLockRepository):
         return True
 
     def remove_algorithm_lock(self, algorithm_id: AlgorithmId, symbol="DEFAULT") -> None:
-        del self.algorithm_locks[self.lock_key(algorithm_id.public_address, symbol)]
+        self.algorithm_locks.pop(self.lock_key(algorithm_id.public_address, symbol), None)
+
+    def remove_algorithm_lock_for_transaction(
+        self, algorithm_id: AlgorithmId, transaction_hash: TransactionHash, symbol=SYMBOL_V1
+    ) -> bool:
+        key = self.lock_key(algorithm_id.public_address, symbol)
+        algorithm_transaction = self.algorithm_transactions.get(key)
+        if key not in self.algorithm_locks or algorithm_transaction is None:
+            return False
+        if algorithm_transaction.transaction_hash.value != transaction_hash.value:
+            return False
+
+        del self.algorithm_locks[key]
+        return True
 
     def get_algorithm_lock(
         self, algorithm_id: AlgorithmId, symbol=SYMBOL_V1
@@ -137,9 +183,14 @@ class InMemoryAlgorithmLockRepository(AlgorithmLockRepository):
         if lock is None:
             new_lock = NewAlgorithmLock(algorithm_id=algorithm_id, symbol=symbol)
             self.algorithm_locks[key] = new_lock
+            self.algorithm_transactions.pop(key, None)
             return new_lock
 
-        return AlgorithmWasLocked(lock=lock, transaction_hash=self.algorithm_transactions[key].transaction_hash)
+        algorithm_transaction = self.algorithm_transactions.get(key)
+        return AlgorithmWasLocked(
+            lock=lock,
+            transaction_hash=None if algorithm_transaction is None else algorithm_transaction.transaction_hash,
+        )
 
     def persist_algorithm_transaction(
         self, algorithm_transaction: AlgorithmTransaction, symbol=SYMBOL_V1
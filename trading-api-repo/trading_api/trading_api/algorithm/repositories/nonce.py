@@ -1,100 +1,94 @@
 import logging
-import time
-import uuid
 from abc import ABC, abstractmethod
 from typing import Optional
 
-from redis import Redis
-
-from trading_api.algorithm.models.trade import Trade
+from eth_typing import ChecksumAddress
+from redis.asyncio import Redis
 
 logger = logging.getLogger(__name__)
 
 Nonce = int
 OptNonce = Optional[int]
 
+# Allocates `ARGV[2]` consecutive nonces in one atomic step and returns the first one.
+# The counter never falls behind the nonce reported by the chain (`ARGV[1]`), e.g. after transactions sent outside
+# of this service, or after the counter has been reset.
+ALLOCATE_NONCES_SCRIPT = """
+local nonce = tonumber(redis.call('GET', KEYS[1]))
+local web3_nonce = tonumber(ARGV[1])
+if nonce == nil or nonce < web3_nonce then
+    nonce = web3_nonce
+end
+redis.call('SET', KEYS[1], nonce + tonumber(ARGV[2]))
+return nonce
+"""
+
 
 class NonceRepository(ABC):
+    """Hands out nonces per controller wallet, the algorithms that trade from the same wallet share its counter."""
+
     @abstractmethod
-    def get_nonce(self, trade: Trade, web3_nonce: Nonce) -> Nonce:
+    async def get_nonce(self, wallet: ChecksumAddress, web3_nonce: Nonce) -> Nonce:
         pass
 
     @abstractmethod
-    def reset_nonce(self, trade: Trade):
+    async def reserve_nonces(self, wallet: ChecksumAddress, web3_nonce: Nonce, count: int) -> range:
+        """Reserve `count` consecutive nonces, for sending a batch of transactions."""
+        pass
+
+    @abstractmethod
+    async def reset_nonce(self, wallet: ChecksumAddress):
         pass
 
 
 class RedisNonceRepository(NonceRepository):
     def __init__(self, connection_url: str):
         self.redis = Redis.from_url(connection_url)
+        self.allocate_nonces = self.redis.register_script(ALLOCATE_NONCES_SCRIPT)
 
-    def reset_nonce(self, trade: Trade):
-        logger.info(f"Resetting nonce for {get_nonce_key(trade)=}")
-        self.redis.delete(get_nonce_key(trade))
-
-    def get_nonce(self, trade: Trade, web3_nonce: Nonce) -> Nonce:
-        # Get a lock for the nonce counter resource
-        lock_key = get_lock_key(trade)
-        self.obtain_lock(lock_key)
+    async def reset_nonce(self, wallet: ChecksumAddress):
+        logger.info(f"Resetting nonce for {get_nonce_key(wallet)=}")
+        await self.redis.delete(get_nonce_key(wallet))
 
-        nonce = self.get_nonce_counter(get_nonce_key(trade), web3_nonce)
+    async def get_nonce(self, wallet: ChecksumAddress, web3_nonce: Nonce) -> Nonce:
+        nonces = await self.reserve_nonces(wallet, web3_nonce, count=1)
 
-        # Release lock for the nonce counter resource
-        self.release_lock(lock_key)
+        return nonces.start
 
-        # return nonce
-        logger.info(f"Retrieved nonce for {get_nonce_key(trade)=} {nonce=}")
+    async def reserve_nonces(self, wallet: ChecksumAddress, web3_nonce: Nonce, count: int) -> range:
+        if count < 1:
+            raise ValueError(f"Can't reserve less than one nonce, {count=}.")
 
-        return nonce
+        start = int(await self.allocate_nonces(keys=[get_nonce_key(wallet)], args=[web3_nonce, count]))
+        logger.info(f"Retrieved nonce for {get_nonce_key(wallet)=} nonce={start} {count=}")
 
-    def obtain_lock(self, key: str):
-        while True:
-            result = self.redis.set(key, "LOCKED", nx=True, px=500)
-            if result is not None:
-                return
-
-            time.sleep(0.1)
-
-    def get_nonce_counter(self, key: str, current_nonce: Nonce) -> Nonce:
-        """Get our nonce counter
-        Increment the nonce counter as we don't want the next client to use the same counter
-        """
-        value = self.redis.get(key)
-        nonce = current_nonce
-        if value is not None:
-            nonce = int(value)
-
-        self.redis.set(key, nonce + 1)
-
-        return nonce
-
-    def release_lock(self, key: str):
-        return self.redis.delete(key)
+        return range(start, start + count)
 
 
 class InMemoryNonceRepository(NonceRepository):
     def __init__(self):
         self.memory = {}
 
-    def reset_nonce(self, trade: Trade):
-        key = get_nonce_key(trade)
+    async def reset_nonce(self, wallet: ChecksumAddress):
+        key = get_nonce_key(wallet)
         if key in self.memory:
             del self.memory[key]
 
-    def get_nonce(self, trade: Trade, web3_nonce: Nonce) -> Nonce:
-        key = get_nonce_key(trade)
-        if key not in self.memory:
-            self.memory[key] = web3_nonce + 1
-            return web3_nonce
+    async def get_nonce(self, wallet: ChecksumAddress, web3_nonce: Nonce) -> Nonce:
+        nonces = await self.reserve_nonces(wallet, web3_nonce, count=1)
+
+        return nonces.start
 
-        nonce = self.memory[key]
-        self.memory[key] = nonce + 1
-        return self.memory[web3_nonce]
+    async def reserve_nonces(self, wallet: ChecksumAddress, web3_nonce: Nonce, count: int) -> range:
+        if count < 1:
+            raise ValueError(f"Can't reserve less than one nonce, {count=}.")
 
+        key = get_nonce_key(wallet)
+        start = max(self.memory.get(key, web3_nonce), web3_nonce)
+        self.memory[key] = start + count
 
-def get_lock_key(trade: Trade) -> str:
-    return f"NONCE-LOCK-{trade.algorithm_id.public_address}"
+        return range(start, start + count)
 
 
-def get_nonce_key(trade: Trade) -> str:
-    return f"NONCE-COUNTER-{trade.algorithm_id.public_address}"
+def get_nonce_key(wallet: ChecksumAddress) -> str:
+    return f"NONCE-COUNTER-WALLET-{wallet}"
@@ -0,0 +1,185 @@
+import itertools
+import logging
+import time
+from abc import ABC, abstractmethod
+from typing import Dict, List, Tuple
+
+from redis.asyncio import Redis
+from redis.exceptions import ResponseError
+
+from trading_api.algorithm.models.crypto import ChainId
+from trading_api.algorithm.models.trade import BuyTrade, BuyTradeV2, PendingTransaction, SellTrade, SellTradeV2
+
+logger = logging.getLogger(__name__)
+
+EntryId = str
+CONSUMER_GROUP = "receipt-watchers"
+PAYLOAD_FIELD = b"pending"
+TRADE_TYPE_FIELD = b"trade_type"
+# Buy and sell trades have the same fields, so the type of trade is stored next to the JSON payload.
+TRADE_TYPES = {trade_type.__name__: trade_type for trade_type in (BuyTrade, BuyTradeV2, SellTrade, SellTradeV2)}
+
+# Only reset the idle time of entries the consumer still owns, another consumer could have reclaimed them meanwhile.
+KEEP_ALIVE_SCRIPT = """
+local owned = {}
+for i = 3, #ARGV do
+    if #redis.call('XPENDING', KEYS[1], ARGV[1], ARGV[i], ARGV[i], 1, ARGV[2]) > 0 then
+        redis.call('XCLAIM', KEYS[1], ARGV[1], ARGV[2], 0, ARGV[i], 'JUSTID')
+        table.insert(owned, ARGV[i])
+    end
+end
+return owned
+"""
+
+
+class PendingTransactionRepository(ABC):
+    """Durable queue of sent transactions that are waiting for their receipt, shared by all API workers.
+
+    An entry is owned by one consumer (worker) at a time, from `claim` until it is `ack`-ed. A consumer has to
+    `keep_alive` the entries it owns, when it stops doing so, e.g. because the worker crashed, other consumers can
+    claim them after `min_idle_ms`.
+    """
+
+    @abstractmethod
+    async def add(self, pending: PendingTransaction) -> EntryId:
+        pass
+
+    @abstractmethod
+    async def claim(
+        self, chain: ChainId, consumer: str, min_idle_ms: int, count: int
+    ) -> List[Tuple[EntryId, PendingTransaction]]:
+        """Claim up to `count` new entries and entries that were idle for at least `min_idle_ms`."""
+        pass
+
+    @abstractmethod
+    async def keep_alive(self, chain: ChainId, consumer: str, entry_ids: List[EntryId]) -> List[EntryId]:
+        """Keep alive the entries the consumer still owns, and return them."""
+        pass
+
+    @abstractmethod
+    async def ack(self, chain: ChainId, entry_id: EntryId) -> None:
+        pass
+
+
+class RedisPendingTransactionRepository(PendingTransactionRepository):
+    """Keeps a Redis stream per chain, read by a single consumer group."""
+
+    def __init__(self, connection_url: str):
+        self.redis = Redis.from_url(connection_url)
+        self.groups: set = set()
+        self.keep_alive_entries = self.redis.register_script(KEEP_ALIVE_SCRIPT)
+
+    async def add(self, pending: PendingTransaction) -> EntryId:
+        entry_id = await self.redis.xadd(
+            get_stream_key(pending.chain_id),
+            {PAYLOAD_FIELD: pending.json(), TRADE_TYPE_FIELD: type(pending.trade).__name__},
+        )
+
+        return entry_id.decode()
+
+    async def claim(
+        self, chain: ChainId, consumer: str, min_idle_ms: int, count: int
+    ) -> List[Tuple[EntryId, PendingTransaction]]:
+        key = get_stream_key(chain)
+        await self._create_group(key)
+
+        new = await self.redis.xreadgroup(CONSUMER_GROUP, consumer, streams={key: ">"}, count=count)
+        # Redis 7 appends the ids of deleted entries to the reply, so only take the claimed entries.
+        stale = (await self.redis.xautoclaim(key, CONSUMER_GROUP, consumer, min_idle_ms, count=count))[1]
+
+        entries = [entry for _, messages in new for entry in messages] + stale
+        if stale:
+            logger.warning(f"Reclaimed idle pending transactions. {chain=} {consumer=} {len(stale)=}")
+
+        return [
+            (entry_id.decode(), parse_pending_transaction(fields))
+            for entry_id, fields in entries
+            if fields  # Entries deleted while they were pending show up without fields.
+        ]
+
+    async def keep_alive(self, chain: ChainId, consumer: str, entry_ids: List[EntryId]) -> List[EntryId]:
+        if not entry_ids:
+            return []
+
+        owned = await self.keep_alive_entries(keys=[get_stream_key(chain)], args=[CONSUMER_GROUP, consumer, *entry_ids])
+
+        return [entry_id.decode() for entry_id in owned]
+
+    async def ack(self, chain: ChainId, entry_id: EntryId) -> None:
+        key = get_stream_key(chain)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.xack(key, CONSUMER_GROUP, entry_id)
+            pipe.xdel(key, entry_id)
+            await pipe.execute()
+
+    async def _create_group(self, key: str):
+        if key in self.groups:
+            return
+
+        try:
+            # Start from the beginning of the stream, so entries added before the group existed are not lost.
+            await self.redis.xgroup_create(key, CONSUMER_GROUP, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self.groups.add(key)
+
+
+class InMemoryPendingTransactionRepository(PendingTransactionRepository):
+    entries: Dict[ChainId, Dict[EntryId, PendingTransaction]]
+    owners: Dict[EntryId, Tuple[str, float]]
+
+    def __init__(self):
+        self.entries = {}
+        self.owners = {}
+        self.ids = itertools.count()
+
+    async def add(self, pending: PendingTransaction) -> EntryId:
+        entry_id = f"{next(self.ids)}-0"
+        self.entries.setdefault(pending.chain_id, {})[entry_id] = pending
+
+        return entry_id
+
+    async def claim(
+        self, chain: ChainId, consumer: str, min_idle_ms: int, count: int
+    ) -> List[Tuple[EntryId, PendingTransaction]]:
+        now = time.monotonic()
+        claimed = []
+        for entry_id, pending in self.entries.get(chain, {}).items():
+            if len(claimed) == count:
+                break
+
+            if entry_id in self.owners:
+                _, last_seen = self.owners[entry_id]
+                if (now - last_seen) * 1000 < min_idle_ms:
+                    continue
+
+            self.owners[entry_id] = (consumer, now)
+            claimed.append((entry_id, pending))
+
+        return claimed
+
+    async def keep_alive(self, chain: ChainId, consumer: str, entry_ids: List[EntryId]) -> List[EntryId]:
+        now = time.monotonic()
+        owned = []
+        for entry_id in entry_ids:
+            if entry_id in self.entries.get(chain, {}) and self.owners.get(entry_id, (None,))[0] == consumer:
+                self.owners[entry_id] = (consumer, now)
+                owned.append(entry_id)
+
+        return owned
+
+    async def ack(self, chain: ChainId, entry_id: EntryId) -> None:
+        self.entries.get(chain, {}).pop(entry_id, None)
+        self.owners.pop(entry_id, None)
+
+
+def parse_pending_transaction(fields: Dict[bytes, bytes]) -> PendingTransaction:
+    pending = PendingTransaction.parse_raw(fields[PAYLOAD_FIELD])
+    trade_type = TRADE_TYPES[fields[TRADE_TYPE_FIELD].decode()]
+
+    return pending.copy(update={"trade": trade_type(**pending.trade.dict())})
+
+
+def get_stream_key(chain: ChainId) -> str:
+    return f"PENDING-TRANSACTIONS-{chain.value}"
@@ -1,16 +1,19 @@
 import datetime
+import logging
 from abc import ABC, abstractmethod
 from collections import defaultdict
-from typing import Iterable, Iterator
+from typing import Iterable, Iterator, List, Tuple
 
 import pymongo
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne
 
 from trading_api.algorithm.models.algorithm import AlgorithmId
 from trading_api.algorithm.models.crypto import TransactionHash
 from trading_api.algorithm.models.trade import TradeStatus, TradingTransaction
 from trading_api.core.repositories.mongo import BaseRepository, BaseRepositoryInterface
 
+logger = logging.getLogger(__name__)
+
 
 class TransactionRepository(BaseRepositoryInterface, ABC):
     @abstractmethod
@@ -39,6 +42,10 @@ class TransactionRepository(BaseRepositoryInterface, ABC):
     ):
         pass
 
+    @abstractmethod
+    def update_transaction_statuses(self, updates: List[Tuple[TransactionHash, TradeStatus, datetime.datetime]]):
+        pass
+
     @abstractmethod
     def get_transaction_count(self, algorithm: AlgorithmId) -> int:
         pass
@@ -58,6 +65,21 @@ class MongoTransactionRepository(BaseRepository, TransactionRepository):
 
         self._update_one(filter_query, update_dict, upsert=False)
 
+    def update_transaction_statuses(self, updates: List[Tuple[TransactionHash, TradeStatus, datetime.datetime]]):
+        if not updates:
+            return
+
+        operations = [
+            UpdateOne(
+                {"transaction_hash": transaction_hash.value},
+                self._op_set({"status": trade_status.value, "updated_at": timestamp}),
+                upsert=False,
+            )
+            for transaction_hash, trade_status, timestamp in updates
+        ]
+        r = self.collection.bulk_write(operations, ordered=False)
+        logger.debug(f"Mongodb bulk_write: {len(operations)=} {r.matched_count=} {r.modified_count=}")
+
     def update_transaction(self, trading_transaction: TradingTransaction):
         transaction_dict = trading_transaction.dict()
         del transaction_dict["created_at"]
@@ -100,6 +122,9 @@ class InMemoryTransactionRepository(TransactionRepository):
     ):
         pass
 
+    def update_transaction_statuses(self, updates: List[Tuple[TransactionHash, TradeStatus, datetime.datetime]]):
+        pass
+
     def persist_transaction(self, trading_transaction: TradingTransaction):
         self.memory[trading_transaction.trading_contract_address].append(trading_transaction)
 
@@ -0,0 +1,86 @@
+import logging
+from abc import ABC, abstractmethod
+from typing import Dict
+
+from eth_typing import ChecksumAddress
+from redis.asyncio import Redis
+
+logger = logging.getLogger(__name__)
+
+# Only delete the lease when we still own it, it could have expired and been taken by another worker in the meantime.
+RELEASE_LEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('DEL', KEYS[1])
+end
+return 0
+"""
+
+# Likewise only extend the lease while we still own it.
+EXTEND_LEASE_SCRIPT = """
+if redis.call('GET', KEYS[1]) == ARGV[1] then
+    return redis.call('PEXPIRE', KEYS[1], ARGV[2])
+end
+return 0
+"""
+
+
+class WalletLeaseRepository(ABC):
+    """Grants one owner (worker) at a time the right to send transactions for a controller wallet."""
+
+    @abstractmethod
+    async def acquire(self, wallet: ChecksumAddress, owner: str, lease_timeout_ms: int) -> bool:
+        pass
+
+    @abstractmethod
+    async def extend(self, wallet: ChecksumAddress, owner: str, lease_timeout_ms: int) -> bool:
+        """Restart the timeout of a lease, returns False when the owner lost it."""
+        pass
+
+    @abstractmethod
+    async def release(self, wallet: ChecksumAddress, owner: str) -> None:
+        pass
+
+
+class RedisWalletLeaseRepository(WalletLeaseRepository):
+    def __init__(self, connection_url: str):
+        self.redis = Redis.from_url(connection_url)
+        self.release_lease = self.redis.register_script(RELEASE_LEASE_SCRIPT)
+        self.extend_lease = self.redis.register_script(EXTEND_LEASE_SCRIPT)
+
+    async def acquire(self, wallet: ChecksumAddress, owner: str, lease_timeout_ms: int) -> bool:
+        return bool(await self.redis.set(get_lease_key(wallet), owner, nx=True, px=lease_timeout_ms))
+
+    async def extend(self, wallet: ChecksumAddress, owner: str, lease_timeout_ms: int) -> bool:
+        return bool(await self.extend_lease(keys=[get_lease_key(wallet)], args=[owner, lease_timeout_ms]))
+
+    async def release(self, wallet: ChecksumAddress, owner: str) -> None:
+        released = await self.release_lease(keys=[get_lease_key(wallet)], args=[owner])
+        if not released:
+            logger.warning(f"Wallet lease expired before it was released. {wallet=} {owner=}")
+
+
+class InMemoryWalletLeaseRepository(WalletLeaseRepository):
+    leases: Dict[str, str]
+
+    def __init__(self):
+        self.leases = {}
+
+    async def acquire(self, wallet: ChecksumAddress, owner: str, lease_timeout_ms: int) -> bool:
+        key = get_lease_key(wallet)
+        if key in self.leases:
+            return False
+
+        self.leases[key] = owner
+        return True
+
+    async def extend(self, wallet: ChecksumAddress, owner: str, lease_timeout_ms: int) -> bool:
+        return self.leases.get(get_lease_key(wallet)) == owner
+
+    async def release(self, wallet: ChecksumAddress, owner: str) -> None:
+        key = get_lease_key(wallet)
+        if self.leases.get(key) == owner:
+            del self.leases[key]
+
+
+def get_lease_key(wallet: ChecksumAddress) -> str:
+    return f"WALLET-LEASE-{wallet}"
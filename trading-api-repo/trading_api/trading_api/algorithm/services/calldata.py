@@ -0,0 +1,129 @@
+import functools
+from typing import Any, Callable, Dict, List, Sequence, Tuple, Type
+
+from eth_abi.registry import registry
+from eth_utils import function_abi_to_4byte_selector, to_bytes
+from web3.contract import Contract
+
+UINT256_MAX = 2**256 - 1
+WORD = 32
+
+
+class CallEncoder:
+    """Encodes the call data of one contract function, the way web3 does but without resolving the function every call.
+
+    The 4-byte selector and an encoder per argument are worked out once from the ABI of the function. The types used by
+    the trading functions are encoded by hand, any other type by the eth-abi encoder for that type.
+    """
+
+    def __init__(self, abi: dict):
+        self.fn_name: str = abi["name"]
+        self.selector: bytes = function_abi_to_4byte_selector(abi)
+        self.types: List[str] = [collapse_type(argument) for argument in abi["inputs"]]
+        self.encoders: List[Tuple[bool, Callable[[Any], bytes]]] = [get_type_encoder(type_) for type_ in self.types]
+
+    def encode(self, *args) -> bytes:
+        if len(args) != len(self.encoders):
+            raise TypeError(f"{self.fn_name} takes {len(self.encoders)} arguments, got {len(args)}.")
+
+        encoded = [(dynamic, encoder(arg)) for (dynamic, encoder), arg in zip(self.encoders, args)]
+        # Dynamic arguments take a word in the head for their offset, static tuples and arrays can take more than one.
+        offset = sum(WORD if dynamic else len(value) for dynamic, value in encoded)
+        head, tail = [], []
+        for dynamic, value in encoded:
+            if dynamic:
+                head.append(encode_uint256(offset))
+                tail.append(value)
+                offset += len(value)
+            else:
+                head.append(value)
+
+        return self.selector + b"".join(head) + b"".join(tail)
+
+
+def build_transaction(contract: Contract, fn_name: str, args: Sequence, transaction: dict) -> dict:
+    """Builds a contract transaction without RPC calls, `transaction` needs the chain id, gas, gas price and nonce.
+
+    It's the same dict web3's `buildTransaction` gives for them.
+    """
+    return {
+        **get_transaction_template(transaction["chainId"], contract.address),
+        **transaction,
+        "data": encode_call(contract, fn_name, args),
+    }
+
+
+def encode_call(contract: Contract, fn_name: str, args: Sequence) -> str:
+    """The hex call data of a contract function, the same as web3's `ContractFunction._encode_transaction_data`."""
+    return "0x" + get_call_encoder(contract, fn_name).encode(*args).hex()
+
+
+@functools.lru_cache(maxsize=1024)
+def get_transaction_template(chain_id: int, address: str) -> dict:
+    return {"value": 0, "chainId": chain_id, "to": address}
+
+
+def get_call_encoder(contract: Contract, fn_name: str) -> CallEncoder:
+    # Contracts are built once per chain, address and artifact, so the same class comes back for every request.
+    return _get_call_encoder(type(contract), fn_name)
+
+
+@functools.lru_cache(maxsize=256)
+def _get_call_encoder(contract_class: Type[Contract], fn_name: str) -> CallEncoder:
+    abis = [abi for abi in contract_class.abi if abi.get("type") == "function" and abi.get("name") == fn_name]
+    if len(abis) != 1:
+        raise ValueError(f"Expected one function {fn_name} in the contract ABI, found {len(abis)}.")
+
+    return CallEncoder(abis[0])
+
+
+def collapse_type(argument: dict) -> str:
+    if argument["type"].startswith("tuple"):
+        components = ",".join(collapse_type(component) for component in argument["components"])
+        return f"({components}){argument['type'][len('tuple'):]}"
+
+    return argument["type"]
+
+
+def get_type_encoder(type_: str) -> Tuple[bool, Callable[[Any], bytes]]:
+    """Returns whether the type is dynamic, and its encoder."""
+    if type_ in STATIC_ENCODERS:
+        return False, STATIC_ENCODERS[type_]
+    if type_ == "string":
+        return True, encode_string
+    if type_.endswith("[]") and type_[:-2] in STATIC_ENCODERS:
+        return True, functools.partial(encode_array, STATIC_ENCODERS[type_[:-2]])
+
+    encoder = registry.get_encoder(type_)
+
+    return encoder.is_dynamic, encoder
+
+
+def encode_uint256(value: int) -> bytes:
+    if not isinstance(value, int) or isinstance(value, bool) or not 0 <= value <= UINT256_MAX:
+        raise ValueError(f"Value {value!r} is not a uint256.")
+
+    return value.to_bytes(WORD, "big")
+
+
+def encode_address(value: str) -> bytes:
+    address = to_bytes(hexstr=value)
+    if len(address) != 20:
+        raise ValueError(f"Value {value!r} is not an address.")
+
+    return address.rjust(WORD, b"\0")
+
+
+def encode_string(value: str) -> bytes:
+    encoded = value.encode("utf-8")
+    # Like eth-abi, an empty string is padded to a word as well.
+    padding = -len(encoded) % WORD if encoded else WORD
+
+    return encode_uint256(len(encoded)) + encoded + b"\0" * padding
+
+
+def encode_array(encode_item: Callable[[Any], bytes], values: Sequence) -> bytes:
+    return encode_uint256(len(values)) + b"".join(encode_item(value) for value in values)
+
+
+STATIC_ENCODERS: Dict[str, Callable[[Any], bytes]] = {"uint256": encode_uint256, "address": encode_address}
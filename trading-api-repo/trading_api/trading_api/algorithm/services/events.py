@@ -0,0 +1,89 @@
+import asyncio
+import logging
+import time
+from abc import ABC, abstractmethod
+from contextlib import asynccontextmanager
+from typing import AsyncContextManager, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from eth_typing import ChecksumAddress
+from redis.asyncio import Redis
+
+from trading_api.algorithm.models.trade import TradeEvent
+
+logger = logging.getLogger(__name__)
+
+# Waits up to the given number of seconds for the next event, returns `None` when none came in.
+NextEvent = Callable[[float], Awaitable[Optional[TradeEvent]]]
+
+
+class TradeEventBroker(ABC):
+    """Delivers trade lifecycle events to the subscribers of an algorithm, on any API node."""
+
+    @abstractmethod
+    async def publish(self, event: TradeEvent) -> None:
+        pass
+
+    @abstractmethod
+    def subscribe(self, address: ChecksumAddress) -> AsyncContextManager[NextEvent]:
+        pass
+
+
+class RedisTradeEventBroker(TradeEventBroker):
+    def __init__(self, connection_url: str):
+        self.redis = Redis.from_url(connection_url)
+
+    async def publish(self, event: TradeEvent) -> None:
+        await self.redis.publish(get_channel_key(event.algorithm_id.public_address), event.json())
+
+    @asynccontextmanager
+    async def subscribe(self, address: ChecksumAddress) -> AsyncIterator[NextEvent]:
+        pubsub = self.redis.pubsub(ignore_subscribe_messages=True)
+        await pubsub.subscribe(get_channel_key(address))
+
+        async def next_event(timeout_s: float) -> Optional[TradeEvent]:
+            # `get_message` also returns early for the (ignored) subscribe confirmations, so wait out the deadline.
+            deadline = time.monotonic() + timeout_s
+            while (remaining := deadline - time.monotonic()) > 0:
+                message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=remaining)
+                if message is not None:
+                    return TradeEvent.parse_raw(message["data"])
+
+            return None
+
+        try:
+            yield next_event
+        finally:
+            await pubsub.unsubscribe()
+            await pubsub.aclose()
+
+
+class InMemoryTradeEventBroker(TradeEventBroker):
+    subscribers: Dict[str, List[asyncio.Queue]]
+
+    def __init__(self):
+        self.subscribers = {}
+
+    async def publish(self, event: TradeEvent) -> None:
+        for queue in self.subscribers.get(get_channel_key(event.algorithm_id.public_address), []):
+            queue.put_nowait(event)
+
+    @asynccontextmanager
+    async def subscribe(self, address: ChecksumAddress) -> AsyncIterator[NextEvent]:
+        queue: asyncio.Queue = asyncio.Queue()
+        subscribers = self.subscribers.setdefault(get_channel_key(address), [])
+        subscribers.append(queue)
+
+        async def next_event(timeout_s: float) -> Optional[TradeEvent]:
+            try:
+                return await asyncio.wait_for(queue.get(), timeout=timeout_s)
+            except asyncio.TimeoutError:
+                return None
+
+        try:
+            yield next_event
+        finally:
+            subscribers.remove(queue)
+
+
+def get_channel_key(address: ChecksumAddress) -> str:
+    return f"TRADE-EVENTS-{address}"
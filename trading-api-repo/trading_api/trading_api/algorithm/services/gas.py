@@ -0,0 +1,151 @@
+import asyncio
+import logging
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, List, Optional
+
+from trading_api.algorithm.models.crypto import BlockHead, ChainId
+from trading_api.algorithm.models.trade import GasPrices, GasUrgency
+from trading_api.algorithm.repositories.gas import GasPriceRepository
+from trading_api.algorithm.services.heads import HeadTracker
+from trading_api.algorithm.services.web3 import Web3Provider
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_PERCENTILES = {
+    GasUrgency.LOW: 0.25,
+    GasUrgency.STANDARD: 0.5,
+    GasUrgency.FAST: 0.75,
+    GasUrgency.URGENT: 0.95,
+}
+
+
+class GasOracle:
+    """Serves gas prices based on the transactions included in recent blocks, sampled in the background.
+
+    Only the worker that leads the block heads of a chain in the `HeadTracker` samples it: on every new head the block
+    is read with its transactions, and the gas prices of the last `block_count` blocks are kept. The price for an
+    urgency is the configured percentile of those, calculated once per block and shared through the
+    `GasPriceRepository`, the other workers read them on every new head. So asking for a price doesn't wait on the
+    node. Prices older than `max_price_age_s` aren't used, e.g. when the sampling stopped: until there are recent ones
+    the gas price of the latest head is used, and the node is only asked when there is no recent head either.
+    """
+
+    def __init__(
+        self,
+        web3_provider_fn: Callable[[], Optional[Web3Provider]],
+        head_tracker: HeadTracker,
+        price_repository: GasPriceRepository,
+        percentiles: Optional[Dict[GasUrgency, float]] = None,
+        block_count: int = 20,
+        head_timeout_s: float = 60.0,
+        max_price_age_s: float = 30.0,
+    ):
+        self.web3_provider_fn = web3_provider_fn
+        self.head_tracker = head_tracker
+        self.price_repository = price_repository
+        self.percentiles = {**DEFAULT_PERCENTILES, **(percentiles or {})}
+        self.block_count = block_count
+        self.head_timeout_s = head_timeout_s
+        self.max_price_age_s = max_price_age_s
+        self.samples: Dict[ChainId, Deque[List[int]]] = {}
+        self.prices: Dict[ChainId, GasPrices] = {}
+        self.tasks: Dict[ChainId, asyncio.Task] = {}
+        self.sampled = 0
+        self.fallbacks = 0
+
+    async def get_gas_price(self, chain: ChainId, urgency: GasUrgency = GasUrgency.STANDARD) -> int:
+        prices = self.prices.get(chain)
+        if prices is not None and time.time() - prices.sampled_at <= self.max_price_age_s:
+            return prices.prices[urgency]
+
+        self.fallbacks += 1
+        head = self.head_tracker.latest(chain)
+        if head is not None:
+            return head.gas_price
+
+        w3 = self.web3_provider_fn().get_async_web3(chain=chain)  # type: ignore
+        return int(await w3.eth.gas_price)  # type: ignore
+
+    async def run(self, chain: ChainId):
+        while True:
+            try:
+                async with self.head_tracker.subscribe(chain) as next_head:
+                    while True:
+                        head = await next_head(self.head_timeout_s)
+                        if head is None:
+                            continue
+                        if self.head_tracker.get_tracker(chain).leading:
+                            await self.sample(head)
+                        else:
+                            await self.refresh(chain)
+            except Exception as e:
+                logger.warning(f"Error sampling gas prices. chain={chain} {e=}", exc_info=True)
+                await asyncio.sleep(1)
+
+    async def sample(self, head: BlockHead):
+        w3 = self.web3_provider_fn().get_async_web3(chain=head.chain_id)  # type: ignore
+        block = await w3.eth.get_block(head.number, full_transactions=True)  # type: ignore
+        # System transactions, like the validator rewards on BSC, are free.
+        gas_prices = [int(transaction["gasPrice"]) for transaction in block["transactions"]]
+        gas_prices = [gas_price for gas_price in gas_prices if gas_price > 0]
+
+        samples = self.samples.setdefault(head.chain_id, deque(maxlen=self.block_count))
+        samples.append(gas_prices)
+        self.sampled += 1
+
+        prices = self._get_prices(head)
+        if prices is not None:
+            self.prices[head.chain_id] = prices
+            await self.price_repository.publish(prices)
+
+    async def refresh(self, chain: ChainId):
+        """Takes the prices sampled by the leader."""
+        prices = await self.price_repository.get_latest(chain)
+        if prices is not None:
+            self.prices[chain] = prices
+
+    def _get_prices(self, head: BlockHead) -> Optional[GasPrices]:
+        gas_prices = sorted(gas_price for block in self.samples[head.chain_id] for gas_price in block)
+        if not gas_prices:
+            return None
+
+        return GasPrices(
+            chain_id=head.chain_id,
+            block_number=head.number,
+            sampled_at=time.time(),
+            prices={
+                urgency: gas_prices[min(int(len(gas_prices) * percentile), len(gas_prices) - 1)]
+                for urgency, percentile in self.percentiles.items()
+            },
+        )
+
+    def start(self):
+        for chain in ChainId:
+            if chain not in self.tasks:
+                self.tasks[chain] = asyncio.create_task(self.run(chain))
+
+    async def stop(self):
+        for task in self.tasks.values():
+            task.cancel()
+        await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+        self.tasks = {}
+
+    def get_metrics(self) -> dict:
+        metrics = {"sampled": self.sampled, "fallbacks": self.fallbacks}
+        for chain, prices in self.prices.items():
+            metrics[f"{chain.value}.price_age_s"] = time.time() - prices.sampled_at
+            for urgency, gas_price in prices.prices.items():
+                metrics[f"{chain.value}.{urgency.value.lower()}_gwei"] = gas_price / 1e9
+
+        return metrics
+
+
+def parse_percentiles(value: str) -> Dict[GasUrgency, float]:
+    """Parse percentiles per urgency, for example `LOW=25,STANDARD=50`."""
+    percentiles = {}
+    for item in filter(None, value.split(",")):
+        urgency, percentile = item.split("=")
+        percentiles[GasUrgency(urgency.strip().upper())] = float(percentile) / 100
+
+    return percentiles
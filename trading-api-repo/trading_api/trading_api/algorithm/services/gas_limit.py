@@ -0,0 +1,89 @@
+import time
+from typing import Dict, List, Optional, Tuple
+
+from trading_api.algorithm.models.algorithm import Algorithm
+from trading_api.algorithm.models.trade import BuyTrade, BuyTradeV2, GasShape, SellTradeV2, Trade, TradeType
+from trading_api.algorithm.repositories.gas import GasUsageRepository
+
+
+class GasLimitModel:
+    """Serves gas limits learned from the gas used by earlier trades of the same shape.
+
+    The receipt watcher records the gas used by every successful trade. Once a shape has `min_samples`, its gas limit is
+    the `percentile` of the recorded gas used with a `margin` on top. Limits are kept in memory and reloaded from the
+    `GasUsageRepository` every `refresh_s`, which picks up the trades recorded by other workers. For shapes without
+    enough samples there is no limit, the caller estimates the gas of the actual call instead. A trade that ran out of
+    gas drops what was learned for its shape, it's learned again from the trades sent with estimated limits.
+    """
+
+    def __init__(
+        self,
+        usage_repository: GasUsageRepository,
+        percentile: float = 0.99,
+        margin: float = 1.1,
+        min_samples: int = 5,
+        refresh_s: float = 60.0,
+    ):
+        self.usage_repository = usage_repository
+        self.percentile = percentile
+        self.margin = margin
+        self.min_samples = min_samples
+        self.refresh_s = refresh_s
+        self.limits: Dict[GasShape, Tuple[float, Optional[int]]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.recorded = 0
+        self.out_of_gas = 0
+
+    async def get_gas_limit(self, shape: GasShape) -> Optional[int]:
+        if shape not in self.limits or self.limits[shape][0] < time.monotonic():
+            await self._load(shape)
+
+        gas_limit = self.limits[shape][1]
+        if gas_limit is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+
+        return gas_limit
+
+    async def record(self, shape: GasShape, gas_used: int):
+        await self.usage_repository.add(shape, gas_used)
+        self.recorded += 1
+        await self._load(shape)
+
+    async def record_out_of_gas(self, shape: GasShape):
+        await self.usage_repository.clear(shape)
+        self.out_of_gas += 1
+        await self._load(shape)
+
+    async def _load(self, shape: GasShape):
+        samples = await self.usage_repository.get(shape)
+        self.limits[shape] = (time.monotonic() + self.refresh_s, self._to_gas_limit(samples))
+
+    def _to_gas_limit(self, samples: List[int]) -> Optional[int]:
+        if len(samples) < self.min_samples:
+            return None
+
+        samples = sorted(samples)
+        gas_used = samples[min(int(len(samples) * self.percentile), len(samples) - 1)]
+
+        return int(gas_used * self.margin)
+
+    def get_metrics(self) -> dict:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "recorded": self.recorded,
+            "out_of_gas": self.out_of_gas,
+            "shapes": sum(1 for _, gas_limit in self.limits.values() if gas_limit is not None),
+        }
+
+
+def get_gas_shape(trade: Trade, algorithm: Algorithm) -> GasShape:
+    return GasShape(
+        chain_id=algorithm.chain_id,
+        contract_version=algorithm.trading_contract.version,
+        trade_type=TradeType.BUY if isinstance(trade, (BuyTrade, BuyTradeV2)) else TradeType.SELL,
+        symbol=trade.symbol.upper() if isinstance(trade, (BuyTradeV2, SellTradeV2)) else None,
+    )
@@ -0,0 +1,259 @@
+import asyncio
+import logging
+import math
+import time
+import uuid
+from contextlib import asynccontextmanager
+from typing import Any, AsyncContextManager, AsyncIterator, Callable, Dict, List, Optional
+
+import aiohttp
+
+from trading_api.algorithm.models.crypto import BlockHead, ChainId
+from trading_api.algorithm.repositories.head import BlockHeadRepository, NextHead
+from trading_api.algorithm.services.web3 import Web3Provider
+
+logger = logging.getLogger(__name__)
+
+
+class ChainHeadTracker:
+    """Follows the block heads of one chain, and hands them to the subscribers in this process.
+
+    One worker at a time holds the lease on the chain and follows the node: over a WebSocket `newHeads` subscription
+    when there is a `ws_uri`, else by polling the latest block every `poll_interval_s`. It publishes every new head
+    through the `BlockHeadRepository`, where the other workers pick it up. When no head came in for `lease_timeout_ms`,
+    a follower tries to take over. A failing WebSocket is replaced by polling for `ws_retry_s`. The latest head is
+    stale once it's older than `max_head_age_s`, e.g. when the leader stopped without releasing its lease.
+    """
+
+    def __init__(
+        self,
+        chain: ChainId,
+        web3_provider: Web3Provider,
+        head_repository: BlockHeadRepository,
+        owner: str,
+        ws_uri: Optional[str] = None,
+        poll_interval_s: float = 1.0,
+        lease_timeout_ms: int = 5_000,
+        ws_retry_s: float = 60.0,
+        max_head_age_s: float = 15.0,
+    ):
+        self.chain = chain
+        self.web3_provider = web3_provider
+        self.head_repository = head_repository
+        self.owner = owner
+        self.ws_uri = ws_uri
+        self.poll_interval_s = poll_interval_s
+        self.lease_timeout_ms = lease_timeout_ms
+        self.ws_retry_s = ws_retry_s
+        self.max_head_age_s = max_head_age_s
+        self.ws_retry_at = 0.0
+        self.latest: Optional[BlockHead] = None
+        self.latest_seen_at = -math.inf
+        self.subscribers: List[asyncio.Queue] = []
+        self.leading = False
+        self.heads = 0
+        self.node_heads = 0
+
+    async def run(self):
+        while True:
+            try:
+                if await self.head_repository.acquire(self.chain, self.owner, self.lease_timeout_ms):
+                    self.leading = True
+                    await self._lead()
+                else:
+                    self.leading = False
+                    await self._follow()
+            except Exception as e:
+                logger.warning(f"Error tracking block heads. chain={self.chain} {e=}", exc_info=True)
+                self.leading = False
+                await asyncio.sleep(self.poll_interval_s)
+
+    @asynccontextmanager
+    async def subscribe(self) -> AsyncIterator[NextHead]:
+        queue: asyncio.Queue = asyncio.Queue()
+        self.subscribers.append(queue)
+
+        async def next_head(timeout_s: float) -> Optional[BlockHead]:
+            try:
+                return await asyncio.wait_for(queue.get(), timeout=timeout_s)
+            except asyncio.TimeoutError:
+                return None
+
+        try:
+            yield next_head
+        finally:
+            self.subscribers.remove(queue)
+
+    async def _lead(self):
+        use_ws = bool(self.ws_uri) and time.monotonic() >= self.ws_retry_at
+        heads = self._subscribe_node() if use_ws else self._poll_node()
+        try:
+            # Both sources yield at least every `poll_interval_s`, `None` when there was no new head.
+            async for head in heads:
+                if head is not None and self._is_new(head.number):
+                    self.node_heads += 1
+                    await self.head_repository.publish(head)
+                    self._update(head)
+                if not await self.head_repository.acquire(self.chain, self.owner, self.lease_timeout_ms):
+                    return
+        except Exception as e:
+            if not use_ws:
+                raise
+            logger.warning(f"Block head subscription failed, polling instead. chain={self.chain} {e=}")
+            self.ws_retry_at = time.monotonic() + self.ws_retry_s
+        finally:
+            await heads.aclose()
+
+    async def _follow(self):
+        async with self.head_repository.subscribe(self.chain) as next_head:
+            latest = await self.head_repository.get_latest(self.chain)
+            if latest is not None:
+                self._update(latest)
+
+            # Once the leader went quiet for a whole lease, try to take over.
+            while (head := await next_head(self.lease_timeout_ms / 1000)) is not None:
+                self._update(head)
+
+    async def _poll_node(self) -> AsyncIterator[Optional[BlockHead]]:
+        w3 = self.web3_provider.get_async_web3(chain=self.chain)
+        # Go back to the WebSocket once it's due for a retry.
+        while not self.ws_uri or time.monotonic() < self.ws_retry_at:
+            block = await w3.eth.get_block("latest")  # type: ignore
+            yield await self._to_head(w3, block) if self._is_new(block["number"]) else None
+            await asyncio.sleep(self.poll_interval_s)
+
+    async def _subscribe_node(self) -> AsyncIterator[Optional[BlockHead]]:
+        w3 = self.web3_provider.get_async_web3(chain=self.chain)
+        async with aiohttp.ClientSession() as session:
+            async with session.ws_connect(self.ws_uri) as ws:  # type: ignore
+                await ws.send_json({"jsonrpc": "2.0", "id": 1, "method": "eth_subscribe", "params": ["newHeads"]})
+                while True:
+                    try:
+                        message = await ws.receive(timeout=self.poll_interval_s)
+                    except asyncio.TimeoutError:
+                        yield None
+                        continue
+
+                    if message.type != aiohttp.WSMsgType.TEXT:
+                        raise ConnectionError(f"Block head subscription closed. {message.type=}")
+
+                    data = message.json()
+                    if "error" in data:
+                        raise ConnectionError(f"Block head subscription refused. error={data['error']}")
+                    if data.get("method") == "eth_subscription":
+                        header = data["params"]["result"]
+                        yield await self._to_head(w3, header) if self._is_new(to_int(header["number"])) else None
+
+    async def _to_head(self, w3, header: Dict[str, Any]) -> BlockHead:
+        base_fee = header.get("baseFeePerGas")
+        return BlockHead(
+            chain_id=self.chain,
+            number=to_int(header["number"]),
+            timestamp=to_int(header["timestamp"]),
+            base_fee=None if base_fee is None else to_int(base_fee),
+            gas_price=await w3.eth.gas_price,
+        )
+
+    def is_stale(self) -> bool:
+        return time.monotonic() - self.latest_seen_at > self.max_head_age_s
+
+    def _is_new(self, number: int) -> bool:
+        return self.latest is None or number > self.latest.number
+
+    def _update(self, head: BlockHead):
+        if not self._is_new(head.number):
+            return
+
+        self.latest = head
+        self.latest_seen_at = time.monotonic()
+        self.heads += 1
+        for queue in self.subscribers:
+            queue.put_nowait(head)
+
+
+class HeadTracker:
+    """Keeps a `ChainHeadTracker` per chain, running as a task on the event loop once started.
+
+    Features that need the latest block read it from here, or subscribe to the new heads, instead of asking the node.
+    Until a tracker has seen a head, e.g. when it isn't started, or when its head went stale, they ask the node
+    themselves.
+    """
+
+    def __init__(
+        self,
+        web3_provider_fn: Callable[[], Optional[Web3Provider]],
+        head_repository: BlockHeadRepository,
+        ws_uris: Dict[ChainId, str],
+        **tracker_kwargs,
+    ):
+        self.web3_provider_fn = web3_provider_fn
+        self.head_repository = head_repository
+        self.ws_uris = ws_uris
+        self.tracker_kwargs = tracker_kwargs
+        self.owner = str(uuid.uuid4())
+        self.trackers: Dict[ChainId, ChainHeadTracker] = {}
+        self.tasks: Dict[ChainId, asyncio.Task] = {}
+
+    def get_tracker(self, chain: ChainId) -> ChainHeadTracker:
+        if chain not in self.trackers:
+            self.trackers[chain] = ChainHeadTracker(
+                chain,
+                self.web3_provider_fn(),  # type: ignore
+                head_repository=self.head_repository,
+                owner=self.owner,
+                ws_uri=self.ws_uris.get(chain) or None,
+                **self.tracker_kwargs,
+            )
+
+        return self.trackers[chain]
+
+    def latest(self, chain: ChainId) -> Optional[BlockHead]:
+        tracker = self.get_tracker(chain)
+        return None if tracker.is_stale() else tracker.latest
+
+    def latest_number(self, chain: ChainId) -> Optional[int]:
+        # Also read from the threads of sync requests, so don't create a tracker here.
+        tracker = self.trackers.get(chain)
+        if tracker is None or tracker.latest is None or tracker.is_stale():
+            return None
+
+        return tracker.latest.number
+
+    def subscribe(self, chain: ChainId) -> AsyncContextManager[NextHead]:
+        return self.get_tracker(chain).subscribe()
+
+    def start(self):
+        for chain in ChainId:
+            if chain not in self.tasks:
+                self.tasks[chain] = asyncio.create_task(self.get_tracker(chain).run())
+
+    async def stop(self):
+        for task in self.tasks.values():
+            task.cancel()
+        await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+        self.tasks = {}
+
+    def get_metrics(self) -> dict:
+        metrics = {}
+        for chain, tracker in self.trackers.items():
+            metrics[f"{chain.value}.block_number"] = tracker.latest.number if tracker.latest else 0
+            metrics[f"{chain.value}.leading"] = int(tracker.leading)
+            metrics[f"{chain.value}.stale"] = int(tracker.is_stale())
+            metrics[f"{chain.value}.heads"] = tracker.heads
+            metrics[f"{chain.value}.node_heads"] = tracker.node_heads
+
+        return metrics
+
+
+async def get_block_number(w3, chain: ChainId, head_tracker: Optional[HeadTracker]) -> int:
+    """The latest block number the `HeadTracker` saw, or the one of the node while it has no recent head."""
+    block_number = None if head_tracker is None else head_tracker.latest_number(chain)
+    if block_number is None:
+        block_number = await w3.eth.block_number  # type: ignore
+
+    return block_number
+
+
+def to_int(value) -> int:
+    # Heads from a WebSocket subscription hold hex strings, web3 already converted the polled ones.
+    return int(value, 16) if isinstance(value, str) else value
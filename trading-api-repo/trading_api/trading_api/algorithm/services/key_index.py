@@ -0,0 +1,47 @@
+import asyncio
+import logging
+from typing import Callable, Optional
+
+from starlette.concurrency import run_in_threadpool
+
+from trading_api.algorithm.services.kms import KeyManagementService
+
+logger = logging.getLogger(__name__)
+
+
+class KeyAliasIndexer:
+    """Keeps the key repository, the index from controller wallet address to key alias, complete in the background.
+
+    Keys are added to the repository when they're created, keys created elsewhere or whose write failed are added by
+    the next pass, every `interval_s`. A pass only looks up the keys that are new since the previous one, and finding
+    the key of a wallet is a lookup in the repository instead of going through every key in KMS.
+    """
+
+    def __init__(self, kms_fn: Callable[[], KeyManagementService], interval_s: float = 300.0):
+        self.kms_fn = kms_fn
+        self.interval_s = interval_s
+        self.task: Optional[asyncio.Task] = None
+        self.passes = 0
+        self.indexed = 0
+
+    async def run(self):
+        while True:
+            try:
+                self.indexed += await run_in_threadpool(self.kms_fn().index_key_aliases)
+                self.passes += 1
+            except Exception as e:
+                logger.warning(f"Error indexing the key aliases. {e=}", exc_info=True)
+            await asyncio.sleep(self.interval_s)
+
+    def start(self):
+        if self.task is None:
+            self.task = asyncio.create_task(self.run())
+
+    async def stop(self):
+        if self.task is not None:
+            self.task.cancel()
+            await asyncio.gather(self.task, return_exceptions=True)
+            self.task = None
+
+    def get_metrics(self) -> dict:
+        return {"passes": self.passes, "indexed": self.indexed}
@@ -1,12 +1,14 @@
 import logging
+import threading
 import uuid
 from abc import ABC, abstractmethod
 from collections import namedtuple
 from concurrent.futures import ThreadPoolExecutor
-from typing import Iterator, Tuple, Union
+from typing import Collection, Dict, Iterator, List, Optional, Set, Tuple, Union
 
 import asn1
 from boto3 import Session
+from botocore.config import Config
 from Crypto.Hash import keccak
 from cytoolz import dissoc, merge, pipe
 from cytoolz.curried import partial
@@ -19,11 +21,13 @@ from eth_account._utils.legacy_transactions import (
 )
 from eth_account._utils.validation import LEGACY_TRANSACTION_FORMATTERS
 from eth_account.datastructures import SignedTransaction
+from eth_keys import keys
+from eth_keys.exceptions import BadSignature
 from eth_typing import ChecksumAddress, HexStr
 from eth_utils.curried import apply_formatters_to_dict
 from hexbytes import HexBytes
 from web3 import Web3
-from web3.contract import Contract
+from web3.constants import ADDRESS_ZERO
 
 from trading_api import Stage
 from trading_api.algorithm.models.address import AddressKeyPair
@@ -40,26 +44,48 @@ SignedMaterial = namedtuple("SignedMaterial", ["signature", "message_hash", "rsv
 
 
 class KMSClient:
-    def __init__(self, region_name: str, key_manager_username: str = None, key_manager_password: str = None):
+    """Builds the boto3 KMS client once, every `with` block after that gets the same client.
+
+    Building a client resolves the credentials, loads the service model and sets up the endpoint, and every client has
+    its own connection pool. boto3 clients are thread safe, so signing from many threads shares the client and reuses
+    its kept-alive connections.
+    """
+
+    def __init__(
+        self,
+        region_name: str,
+        key_manager_username: str = None,
+        key_manager_password: str = None,
+        max_pool_connections: int = 50,
+    ):
         self.client = None
         self.key_manager_username = key_manager_username
         self.key_manager_password = key_manager_password
         self.region_name = region_name
+        self.max_pool_connections = max_pool_connections
+        self.lock = threading.Lock()
 
     def __enter__(self):
+        if self.client is None:
+            with self.lock:
+                if self.client is None:
+                    self.client = self._build_client()
+
+        return self.client
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        pass
+
+    def _build_client(self):
+        config = Config(max_pool_connections=self.max_pool_connections)
         if self.key_manager_password is not None and self.key_manager_username is not None:
-            self.client = Session(
+            return Session(
                 aws_access_key_id=self.key_manager_username,
                 aws_secret_access_key=self.key_manager_password,
                 region_name=self.region_name,
-            ).client("kms")
-            return self.client
+            ).client("kms", config=config)
 
-        self.client = Session(region_name=self.region_name).client("kms")
-        return self.client
-
-    def __exit__(self, exc_type, exc_val, exc_tb):
-        self.client = None
+        return Session(region_name=self.region_name).client("kms", config=config)
 
 
 class KeyManagementService(ABC):
@@ -87,6 +113,28 @@ class KeyManagementService(ABC):
     def all_keyed_addresses(self) -> Iterator[AddressKeyPair]:
         pass
 
+    def keyed_addresses(
+        self, skip: int = 0, limit: Optional[int] = None, after: Optional[ChecksumAddress] = None
+    ) -> List[AddressKeyPair]:
+        """A page of the keyed addresses, ordered by controller wallet address so the pages don't overlap.
+
+        With `after` the page starts past that controller wallet address.
+        """
+        pairs = sorted(
+            (pair for pair in self.all_keyed_addresses() if after is None or pair.controller_wallet_address > after),
+            key=lambda pair: pair.controller_wallet_address,
+        )
+
+        return pairs[skip : None if limit is None else skip + limit]
+
+    def warm_up(self):
+        """Loads what signing needs ahead of the first trade, if anything."""
+        pass
+
+    def index_key_aliases(self) -> int:
+        """Adds the keys that are missing from the key repository to it, returns how many were added."""
+        return 0
+
 
 class LocalKeyManagementService(KeyManagementService):
     web3_provider: Web3Provider
@@ -123,7 +171,7 @@ class LocalKeyManagementService(KeyManagementService):
     def all_keyed_addresses(self) -> Iterator[AddressKeyPair]:
         yield from [
             AddressKeyPair(controller_wallet_address=controller_wallet_address, key_alias=key_alias)
-            for controller_wallet_address, key_alias in self.keys.items()
+            for key_alias, controller_wallet_address in self.keys.items()
         ]
 
 
@@ -140,6 +188,8 @@ class AWSKeyManagementService(KeyManagementService):
 
     key_repository: KeyRepository
     web3_provider: Web3Provider
+    # Public keys of new keys looked up at once when indexing.
+    index_workers = 10
 
     def __init__(
         self,
@@ -149,16 +199,41 @@ class AWSKeyManagementService(KeyManagementService):
         stage: Stage,
         key_manager_username: str = None,
         key_manager_password: str = None,
+        max_pool_connections: int = 50,
     ):
+        """
+
+        :param max_pool_connections: Connections to KMS kept open, signing beyond that many at once has to wait.
+        """
         self.key_repository = key_repository
         self.web3_provider = web3_provider
         self.stage = stage
         self.key_manager_username = key_manager_username
         self.key_manager_password = key_manager_password
         self.region_name = region_name
+        # An address keeps its key, and a key its public key, so neither mapping is ever invalidated.
+        self.key_aliases: Dict[ChecksumAddress, str] = {}
+        self.key_infos: Dict[str, PublicKey] = {}
+        # Aliases known to be in the key repository, which is the index from address to key alias.
+        self.indexed_aliases: Set[str] = set()
+        # Aliases of disabled or deleted keys, they aren't described again by later passes.
+        self.rejected_aliases: Set[str] = set()
+        self.index_lock = threading.Lock()
+        self.index_passes = 0
+        self.kms_client = KMSClient(region_name, key_manager_username, key_manager_password, max_pool_connections)
 
     def __client(self) -> KMSClient:
-        return KMSClient(self.region_name, self.key_manager_username, self.key_manager_password)
+        return self.kms_client
+
+    def warm_up(self):
+        """Loads the key alias of every controller wallet from the key repository, later ones are added when used."""
+        try:
+            for pair in self.key_repository.all_address_keys():
+                self.key_aliases[pair.controller_wallet_address] = pair.key_alias
+                self.indexed_aliases.add(pair.key_alias)
+            logger.info(f"Loaded the key aliases of {len(self.key_aliases)} controller wallets.")
+        except Exception as e:
+            logger.error(f"error loading the key aliases from the key repository: {e} ({e.__class__})")
 
     def sign_transaction(self, transaction: dict, address: ChecksumAddress, chain: ChainId) -> SignedTransaction:
         try:
@@ -183,20 +258,25 @@ class AWSKeyManagementService(KeyManagementService):
             logger.error(f"failed signing {transaction=} for {address=}: {e} ({e.__class__})")
             raise e
 
-    def all_keyed_addresses(self) -> Iterator[AddressKeyPair]:  # can also be retrieved from DB
-        for key_alias in self.list_key_aliases():
-            address = self.key_repository.get_address_by_key_alias(key_alias=key_alias)
-            if address is not None:
-                yield AddressKeyPair(controller_wallet_address=Web3.toChecksumAddress(address), key_alias=key_alias)
-
-            yield AddressKeyPair(
-                controller_wallet_address=Web3.toChecksumAddress(
-                    self.key_alias_to_key_info(key_alias=key_alias).address
-                ),
-                key_alias=key_alias,
-            )
+    def all_keyed_addresses(self) -> Iterator[AddressKeyPair]:
+        """Lists the keys from the key repository, `index_key_aliases` keeps it complete so KMS isn't listed for it."""
+        if self.index_passes == 0:
+            self.index_key_aliases()
+
+        yield from self.key_repository.all_address_keys()
+
+    def keyed_addresses(
+        self, skip: int = 0, limit: Optional[int] = None, after: Optional[ChecksumAddress] = None
+    ) -> List[AddressKeyPair]:
+        if self.index_passes == 0:
+            self.index_key_aliases()
+
+        return self.key_repository.address_keys(skip, limit, after)
 
     def key_alias_to_key_info(self, key_alias: str) -> PublicKey:
+        if key_alias in self.key_infos:
+            return self.key_infos[key_alias]
+
         try:
             with self.__client() as client:
                 der = client.get_public_key(
@@ -205,12 +285,15 @@ class AWSKeyManagementService(KeyManagementService):
 
                 pub_key = self._decode_der_to_key(der)
                 address = self._key2address(pub_key)
-                return PublicKey(der, address, pub_key)
+                self.key_infos[key_alias] = PublicKey(der, address, pub_key)
+
+                return self.key_infos[key_alias]
         except Exception as e:
             logger.error(f"failed fetching {key_alias=}: {e} ({e.__class__})")
             raise e
 
-    def list_key_aliases(self) -> Iterator[str]:
+    def list_key_aliases(self, exclude: Collection[str] = ()) -> Iterator[str]:
+        """Lists the aliases of the enabled keys of this stage, the ones in `exclude` are skipped without a lookup."""
         try:
             with self.__client() as client:
                 next_marker = None
@@ -219,7 +302,7 @@ class AWSKeyManagementService(KeyManagementService):
                         Limit=100, **({} if next_marker is None else dict(Marker=next_marker))
                     )
 
-                    yield from self._filter_retrieved_aliases(client, response)
+                    yield from self._filter_retrieved_aliases(client, response, exclude)
 
                     if not response["Truncated"]:
                         break
@@ -229,13 +312,14 @@ class AWSKeyManagementService(KeyManagementService):
             logger.error(f"failed fetching keynames: {e} ({e.__class__})")
             raise e
 
-    def _filter_retrieved_aliases(self, client, response):
+    def _filter_retrieved_aliases(self, client, response, exclude: Collection[str] = ()):
 
         # define result set
         results = []
 
         # exclude other stages
         aliases = [item["AliasName"] for item in response["Aliases"] if self.stage.value in item["AliasName"]]
+        aliases = [alias for alias in aliases if alias.replace("alias/", "") not in exclude]
 
         # Exclude all deleted aliases:
         def check_alias(alias_: str):
@@ -243,6 +327,8 @@ class AWSKeyManagementService(KeyManagementService):
                 alias_response = client.describe_key(KeyId=alias_)["KeyMetadata"]
                 if alias_response["Enabled"] and "DeletionDate" not in alias_response:
                     results.append(alias_.replace("alias/", ""))
+                else:
+                    self.rejected_aliases.add(alias_.replace("alias/", ""))
             except Exception as ee:
                 logger.error(f"error in checking aliases concurrently {ee} ({ee.__class__})")
 
@@ -284,6 +370,8 @@ class AWSKeyManagementService(KeyManagementService):
                 self.key_repository.add_address_key(
                     AddressKeyPair(controller_wallet_address=address, key_alias=key_alias)
                 )
+                self.key_aliases[address] = key_alias
+                self.indexed_aliases.add(key_alias)
 
                 logger.info(f"Created KMS key: {id_external=}, {key_alias=}, {address=}")
                 # return values
@@ -296,14 +384,24 @@ class AWSKeyManagementService(KeyManagementService):
         return f"controller-wallet/{self.stage.value}/{str(uuid.uuid4())}"
 
     def address_to_key_alias(self, address: ChecksumAddress) -> str:
+        if address not in self.key_aliases:
+            self.key_aliases[address] = self._address_to_key_alias(address)
+
+        return self.key_aliases[address]
+
+    def _address_to_key_alias(self, address: ChecksumAddress) -> str:
+        if (key := self._address_to_key_alias_via_repository(address)) is not None:
+            return key
+
+        # The key may have been created out of band, or adding it to the repository failed: index the new keys of KMS.
+        logger.warning(f"couldn't find corresponding key for {address=} in keyrepository, indexing the keys in KMS")
+        self.index_key_aliases()
+        if address in self.key_aliases:
+            return self.key_aliases[address]
         if (key := self._address_to_key_alias_via_repository(address)) is not None:
             return key
-        else:
-            logger.warning(
-                f"couldn't find corresponding key for {address=} in keyrepository,"
-                f" will try to look through KMS to find instead (might be slow)"
-            )
-            return self._address_to_aws_key_alias(address)
+
+        raise ValueError(f"key_alias id for {address=} was not found in repository nor in KMS")
 
     def _address_to_key_alias_via_repository(self, address: ChecksumAddress) -> Union[str, None]:
         try:
@@ -312,16 +410,37 @@ class AWSKeyManagementService(KeyManagementService):
             logger.error(f"error finding key for {address=} in keyrepository: {e} ({e.__class__})")
             return None
 
-    def _address_to_aws_key_alias(self, address: ChecksumAddress) -> str:
+    def index_key_aliases(self) -> int:
+        """Adds the keys of this stage that aren't in the key repository yet to it, returns how many were added.
+
+        Aliases that are indexed or were rejected already are skipped before any call per key, so a pass costs a
+        `list_aliases` call per 100 aliases, and a `describe_key` and `get_public_key` call per key that's new since the
+        last pass.
+        """
+        with self.index_lock:
+            if not self.indexed_aliases:
+                self.indexed_aliases.update(pair.key_alias for pair in self.key_repository.all_address_keys())
+
+            new_aliases = list(self.list_key_aliases(exclude=self.indexed_aliases | self.rejected_aliases))
+            with ThreadPoolExecutor(max_workers=self.index_workers) as executor:
+                added = sum(executor.map(self._index_key_alias, new_aliases))
+            self.index_passes += 1
+
+            logger.info(f"Indexed {added} new key aliases, {len(self.indexed_aliases)} in total.")
+            return added
+
+    def _index_key_alias(self, key_alias: str) -> bool:
         try:
-            for key_alias in self.list_key_aliases():
-                if Web3.toChecksumAddress(self.key_alias_to_key_info(key_alias=key_alias).address) == address:
-                    logger.info("found key_alias!")
-                    return key_alias
-            raise KeyError(f"key_alias id for {address=} was not found anywhere in repository or in KMS")
+            address = Web3.toChecksumAddress(self.key_alias_to_key_info(key_alias=key_alias).address)
+            self.key_repository.add_address_key(AddressKeyPair(controller_wallet_address=address, key_alias=key_alias))
         except Exception as e:
-            logger.error(f"error finding key_alias for {address=} in KMS: {e} ({e.__class__})")
-            raise e
+            # Tried again on the next pass.
+            logger.error(f"error indexing {key_alias=}: {e} ({e.__class__})")
+            return False
+
+        self.key_aliases[address] = key_alias
+        self.indexed_aliases.add(key_alias)
+        return True
 
     def sign_message(
         self, chain: ChainId, message: bytes, key_id: str, address: str, needs_hashing=False
@@ -338,9 +457,7 @@ class AWSKeyManagementService(KeyManagementService):
                     KeyId=f"alias/{key_id}", Message=message, MessageType="DIGEST", SigningAlgorithm="ECDSA_SHA_256"
                 )["Signature"]
 
-                recovered_address, rsv = self._recover_rsv_from_transaction(
-                    address, message, signature, self.web3_provider.get_ecr_contract(chain=chain)
-                )
+                recovered_address, rsv = self._recover_rsv_from_transaction(address, message, signature)
                 recovered_address = Web3.toChecksumAddress(recovered_address)
 
                 assert recovered_address == address, f"{recovered_address=} and {address=} don't match"
@@ -369,7 +486,7 @@ class AWSKeyManagementService(KeyManagementService):
             raise e
 
     def _recover_rsv_from_transaction(
-        self, contract_address: str, transaction_hash: bytes, transaction_signature: bytes, ecr_contract: Contract
+        self, contract_address: str, transaction_hash: bytes, transaction_signature: bytes
     ) -> Tuple[HexStr, RSV]:
 
         logger.info(f"TxHash: {transaction_hash=}")
@@ -378,22 +495,22 @@ class AWSKeyManagementService(KeyManagementService):
         r, s = self._find_r_s_from_signature(transaction_signature)
         logger.info(f"Found values: {r=} {s=}")
 
-        recovered_address, v = self._find_right_pubkey((r, s), transaction_hash, contract_address, ecr_contract)
+        recovered_address, v = self._find_right_pubkey((r, s), transaction_hash, contract_address)
         logger.info(f"Found values r,s,v {r=} {s=} {v=}")
 
         return recovered_address, RSV(r, s, v)
 
     def _find_right_pubkey(
-        self, rs: Tuple[int, int], transaction_hash: bytes, contract_address: str, ecr_contract: Contract
+        self, rs: Tuple[int, int], transaction_hash: bytes, contract_address: str
     ) -> Tuple[HexStr, int]:
         v = 27
-        address = self._recover_address((*rs, v), transaction_hash, ecr_contract)
+        address = self._recover_address((*rs, v), transaction_hash)
         if address == contract_address:
             logger.debug(f"adress with v=27 equals original_adress {address=} {contract_address=}")
             return address, v
 
         v = 28
-        address = self._recover_address((*rs, v), transaction_hash, ecr_contract)
+        address = self._recover_address((*rs, v), transaction_hash)
         assert address == contract_address, "original adresss wasn't recovered"
         logger.debug(
             f"adress with v=28 equals original_adress {address=} {contract_address=}",
@@ -401,20 +518,17 @@ class AWSKeyManagementService(KeyManagementService):
 
         return address, v
 
-    def _recover_address(self, rsv: Tuple[int, int, int], transaction_hash: bytes, ecr_contract: Contract) -> HexStr:
-        ec_recover_args = (
-            transaction_hash,
-            rsv[2],
-            self._to_32byte_hex(rsv[0]),
-            self._to_32byte_hex(rsv[1]),
-        )
-
-        result_pub_key: str = ecr_contract.functions.ecr(*ec_recover_args).call()
-        logger.info(f"{ec_recover_args=}")
-        logger.info(f"contract.functions.ecr(*ec_recover_args).call()={result_pub_key} {type(result_pub_key)=}")
-        recovered_address = Web3.toHex(hexstr=result_pub_key)  # type: ignore
-        recovered_address = Web3.toChecksumAddress(recovered_address)
-        logger.info(f"Recovered address={recovered_address} {rsv[2]=}")
+    @staticmethod
+    def _recover_address(rsv: Tuple[int, int, int], transaction_hash: bytes) -> HexStr:
+        """Recovers the address that signed the hash, the way the `ecrecover` precompile does but without a node."""
+        r, s, v = rsv
+        try:
+            signature = keys.Signature(vrs=(v - 27, r, s))
+            recovered_address = signature.recover_public_key_from_msg_hash(transaction_hash).to_checksum_address()
+        except BadSignature:
+            # The precompile returns the zero address for signatures that don't recover.
+            recovered_address = ADDRESS_ZERO
+        logger.info(f"Recovered address={recovered_address} {v=}")
 
         return recovered_address
 
@@ -513,10 +627,6 @@ class AWSKeyManagementService(KeyManagementService):
 
                 input_stream.leave()
 
-    @staticmethod
-    def _to_32byte_hex(val):
-        return Web3.toHex(Web3.toBytes(val).rjust(32, b"\0"))
-
     @staticmethod
     def _decode_signature(input_stream, return_values=None):
         """Decode ASN.1 data and find the values r and s."""
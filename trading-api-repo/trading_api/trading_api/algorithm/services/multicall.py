@@ -0,0 +1,101 @@
+import asyncio
+from typing import Any, Callable, Dict, List, Optional, Sequence, Union
+
+from eth_typing import ChecksumAddress
+from eth_utils import encode_hex, function_signature_to_4byte_selector
+from hexbytes import HexBytes
+from web3 import Web3
+from web3._utils.abi import get_abi_output_types
+from web3.contract import ContractFunction
+
+from trading_api.algorithm.models.crypto import ChainId
+from trading_api.algorithm.services.web3 import Web3Provider, call_contract_function
+
+# Multicall3 is deployed at the same address on most EVM chains, see https://github.com/mds1/multicall.
+MULTICALL3_ADDRESS = "0xcA11bde05977b3631167028862bE2a173976CA11"
+AGGREGATE3_SELECTOR = function_signature_to_4byte_selector("aggregate3((address,bool,bytes)[])")
+
+MulticallResult = Union[Any, Exception]
+
+
+class MulticallError(Exception):
+    """A call in the aggregate that reverted, `return_data` holds the revert reason."""
+
+    def __init__(self, function: ContractFunction, return_data: bytes):
+        super().__init__(f"Call reverted. function={function.fn_name} address={function.address} {return_data=}")
+        self.return_data = return_data
+
+
+class MulticallAggregator:
+    """Packs many contract reads into a single `eth_call` to a Multicall3 aggregator contract.
+
+    Every call may fail on its own (`allowFailure`), its result is then a `MulticallError` in place of the decoded
+    value. Calls are sent in aggregates of at most `batch_size`, to stay below the gas cap of `eth_call`. Chains without
+    an aggregator address make a call per function instead, concurrently.
+    """
+
+    def __init__(
+        self,
+        web3_provider_fn: Callable[[], Optional[Web3Provider]],
+        addresses: Dict[ChainId, str],
+        batch_size: int = 300,
+    ):
+        self.web3_provider_fn = web3_provider_fn
+        self.addresses = {chain: Web3.toChecksumAddress(address) for chain, address in addresses.items() if address}
+        self.batch_size = batch_size
+        self.calls = 0
+        self.aggregates = 0
+        self.failed = 0
+
+    async def call(self, chain: ChainId, functions: Sequence[ContractFunction]) -> List[MulticallResult]:
+        if not functions:
+            return []
+
+        w3 = self.web3_provider_fn().get_async_web3(chain=chain)  # type: ignore
+        address = self.addresses.get(chain)
+        if address is None:
+            results = await self._call_each(w3, functions)
+        else:
+            results = []
+            for i in range(0, len(functions), self.batch_size):
+                results.extend(await self._aggregate(w3, address, functions[i : i + self.batch_size]))
+
+        self.calls += len(functions)
+        self.failed += sum(isinstance(result, Exception) for result in results)
+        return results
+
+    async def _aggregate(
+        self, w3: Web3, address: ChecksumAddress, functions: Sequence[ContractFunction]
+    ) -> List[MulticallResult]:
+        calls = [(function.address, True, HexBytes(function._encode_transaction_data())) for function in functions]
+        data = AGGREGATE3_SELECTOR + w3.codec.encode_abi(["(address,bool,bytes)[]"], [calls])
+        response = await w3.eth.call({"to": address, "data": encode_hex(data)})  # type: ignore
+        self.aggregates += 1
+
+        (returned,) = w3.codec.decode_abi(["(bool,bytes)[]"], response)
+        return [
+            self._decode(w3, function, success, return_data)
+            for function, (success, return_data) in zip(functions, returned)
+        ]
+
+    @staticmethod
+    def _decode(w3: Web3, function: ContractFunction, success: bool, return_data: bytes) -> MulticallResult:
+        if not success:
+            return MulticallError(function, return_data)
+
+        try:
+            decoded = w3.codec.decode_abi(get_abi_output_types(function.abi), return_data)
+        except Exception as e:
+            # Calls to an address without code succeed, with nothing to decode.
+            return e
+
+        return decoded[0] if len(decoded) == 1 else decoded
+
+    @staticmethod
+    async def _call_each(w3: Web3, functions: Sequence[ContractFunction]) -> List[MulticallResult]:
+        return await asyncio.gather(
+            *(call_contract_function(w3, function) for function in functions), return_exceptions=True
+        )
+
+    def get_metrics(self) -> dict:
+        return {"calls": self.calls, "aggregates": self.aggregates, "failed": self.failed}
@@ -0,0 +1,97 @@
+import asyncio
+import logging
+from typing import Callable, Dict, List, Optional, Set
+
+from hexbytes import HexBytes
+from web3.exceptions import TimeExhausted
+from web3.types import TxReceipt
+
+from trading_api.algorithm.models.crypto import ChainId, TransactionHash
+from trading_api.algorithm.services.heads import HeadTracker, get_block_number
+from trading_api.algorithm.services.web3 import Web3Provider, get_transaction_receipts
+
+logger = logging.getLogger(__name__)
+
+
+class ReceiptNotifier:
+    """Lets requests wait for a transaction receipt without each of them polling the node.
+
+    Waiting requests park on a future. Per chain a single task resolves them: every `poll_interval_s` it checks the
+    block number, taken from the `HeadTracker` when there is one, and looks up the receipts of all awaited transactions
+    in batches of `batch_size` when a new block came in. Transactions that started being awaited since the last lookup
+    are checked right away. The task stops when nobody is waiting anymore.
+    """
+
+    def __init__(
+        self,
+        web3_provider_fn: Callable[[], Web3Provider],
+        poll_interval_s: float = 1.0,
+        batch_size: int = 100,
+        head_tracker: Optional[HeadTracker] = None,
+    ):
+        self.web3_provider_fn = web3_provider_fn
+        self.head_tracker = head_tracker
+        self.poll_interval_s = poll_interval_s
+        self.batch_size = batch_size
+        self.waiters: Dict[ChainId, Dict[str, List[asyncio.Future]]] = {}
+        self.unchecked: Dict[ChainId, Set[str]] = {}
+        self.tasks: Dict[ChainId, asyncio.Task] = {}
+
+    async def wait_for_receipt(self, chain: ChainId, transaction: TransactionHash, timeout_s: float) -> TxReceipt:
+        """Wait up to `timeout_s` for the receipt, raises `TimeExhausted` if the transaction wasn't mined by then."""
+        future = asyncio.get_running_loop().create_future()
+        self.waiters.setdefault(chain, {}).setdefault(transaction.value, []).append(future)
+        self.unchecked.setdefault(chain, set()).add(transaction.value)
+        self._ensure_task(chain)
+
+        try:
+            return await asyncio.wait_for(future, timeout=timeout_s)
+        except asyncio.TimeoutError:
+            raise TimeExhausted(f"Transaction {transaction.value} is not in the chain after {timeout_s} seconds")
+        finally:
+            self._remove_waiter(chain, transaction.value, future)
+
+    def _ensure_task(self, chain: ChainId):
+        task = self.tasks.get(chain)
+        if task is not None and not task.done() and task.get_loop() is asyncio.get_running_loop():
+            return
+
+        self.tasks[chain] = asyncio.create_task(self._run(chain))
+
+    def _remove_waiter(self, chain: ChainId, transaction_hash: str, future: asyncio.Future):
+        waiters = self.waiters[chain].get(transaction_hash, [])
+        if future in waiters:
+            waiters.remove(future)
+        if not waiters:
+            self.waiters[chain].pop(transaction_hash, None)
+            self.unchecked[chain].discard(transaction_hash)
+
+    async def _run(self, chain: ChainId):
+        w3 = self.web3_provider_fn().get_async_web3(chain=chain)
+        last_block: Optional[int] = None
+        while self.waiters.get(chain):
+            try:
+                block_number = await get_block_number(w3, chain, self.head_tracker)
+                if block_number != last_block:
+                    last_block = block_number
+                    await self._notify(chain, w3, list(self.waiters[chain]))
+                elif self.unchecked[chain]:
+                    await self._notify(chain, w3, list(self.unchecked[chain]))
+            except Exception as e:
+                logger.warning(f"Error retrieving awaited transaction receipts. {chain=} {e=}", exc_info=True)
+
+            await asyncio.sleep(self.poll_interval_s)
+
+    async def _notify(self, chain: ChainId, w3, transaction_hashes: List[str]):
+        self.unchecked[chain].difference_update(transaction_hashes)
+        for i in range(0, len(transaction_hashes), self.batch_size):
+            batch = transaction_hashes[i : i + self.batch_size]
+            receipts = await get_transaction_receipts(w3, [HexBytes(h) for h in batch])
+
+            for transaction_hash, receipt in zip(batch, receipts):
+                if receipt is None:
+                    continue
+
+                for future in self.waiters[chain].get(transaction_hash, []):
+                    if not future.done():
+                        future.set_result(receipt)
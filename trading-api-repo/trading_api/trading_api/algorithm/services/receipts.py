@@ -0,0 +1,126 @@
+import asyncio
+import json
+import logging
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+
+from hexbytes import HexBytes
+from redis.asyncio import Redis
+from web3 import Web3
+from web3.datastructures import AttributeDict
+from web3.exceptions import TransactionNotFound
+from web3.types import TxReceipt
+
+from trading_api.algorithm.models.crypto import ChainId, TransactionHash
+
+logger = logging.getLogger(__name__)
+
+MISSING = object()
+
+
+class ReceiptCache:
+    """Two tier cache of transaction receipts, an in-process LRU in front of Redis which is shared by all workers.
+
+    A receipt that is `confirmations` blocks deep can't be reorganized away anymore, so it is kept for `final_ttl_s`.
+    Lookups that found no receipt yet, or a receipt that isn't final, are cached for `pending_ttl_s`, about one block
+    interval. Cached receipts are plain JSON, e.g. hashes are hex strings instead of `HexBytes`.
+    """
+
+    def __init__(
+        self,
+        connection_url: Optional[str] = None,
+        max_size: int = 10_000,
+        confirmations: int = 15,
+        final_ttl_s: int = 7 * 24 * 60 * 60,
+        pending_ttl_s: float = 3.0,
+    ):
+        self.redis = Redis.from_url(connection_url) if connection_url else None
+        self.max_size = max_size
+        self.confirmations = confirmations
+        self.final_ttl_s = final_ttl_s
+        self.pending_ttl_s = pending_ttl_s
+        self.local: "OrderedDict[str, Tuple[float, Optional[TxReceipt]]]" = OrderedDict()
+        self.local_hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    async def get_transaction_receipt(
+        self, w3: Web3, chain: ChainId, transaction: TransactionHash
+    ) -> Optional[TxReceipt]:
+        key = get_receipt_key(chain, transaction)
+        receipt = self._get_local(key)
+        if receipt is not MISSING:
+            self.local_hits += 1
+            return receipt  # type: ignore
+
+        if self.redis is not None:
+            cached = await self.redis.get(key)
+            if cached is not None:
+                self.shared_hits += 1
+                entry = json.loads(cached)
+                receipt = None if entry["receipt"] is None else AttributeDict.recursive(entry["receipt"])
+                self._set_local(key, receipt, self.final_ttl_s if entry["final"] else self.pending_ttl_s)
+                return receipt  # type: ignore
+
+        self.misses += 1
+        receipt, block_number = await asyncio.gather(
+            _get_transaction_receipt(w3, transaction), w3.eth.block_number  # type: ignore
+        )
+        final = receipt is not None and block_number - receipt["blockNumber"] >= self.confirmations
+        ttl_s = self.final_ttl_s if final else self.pending_ttl_s
+        self._set_local(key, receipt, ttl_s)
+        if self.redis is not None:
+            entry = json.dumps({"receipt": receipt, "final": final}, default=_encode_receipt)
+            await self.redis.set(key, entry, px=int(ttl_s * 1000))
+
+        return receipt
+
+    def get_metrics(self) -> dict:
+        lookups = self.local_hits + self.shared_hits + self.misses
+
+        return {
+            "local_hits": self.local_hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "hit_rate": (self.local_hits + self.shared_hits) / lookups if lookups else 0.0,
+            "size": len(self.local),
+        }
+
+    def _get_local(self, key: str):
+        if key not in self.local:
+            return MISSING
+
+        expires_at, receipt = self.local[key]
+        if expires_at < time.monotonic():
+            del self.local[key]
+            return MISSING
+
+        self.local.move_to_end(key)
+        return receipt
+
+    def _set_local(self, key: str, receipt: Optional[TxReceipt], ttl_s: float):
+        self.local[key] = (time.monotonic() + ttl_s, receipt)
+        self.local.move_to_end(key)
+        while len(self.local) > self.max_size:
+            self.local.popitem(last=False)
+
+
+async def _get_transaction_receipt(w3: Web3, transaction: TransactionHash) -> Optional[TxReceipt]:
+    try:
+        return await w3.eth.get_transaction_receipt(HexBytes(transaction.value))  # type: ignore
+    except TransactionNotFound:
+        return None
+
+
+def _encode_receipt(value):
+    if isinstance(value, bytes):
+        return HexBytes(value).hex()
+    if isinstance(value, AttributeDict):
+        return dict(value)
+
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def get_receipt_key(chain: ChainId, transaction: TransactionHash) -> str:
+    return f"RECEIPT-{chain.value}-{transaction.value.lower()}"
@@ -0,0 +1,617 @@
+import asyncio
+import json
+import logging
+import math
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent import futures
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Sequence, Set, Tuple, TypeVar
+
+import aiohttp
+import requests
+from aiohttp import ClientTimeout
+from web3 import Web3
+from web3._utils.encoding import Web3JsonEncoder
+from web3._utils.request import async_make_post_request, make_post_request
+from web3.providers.async_base import AsyncJSONBaseProvider
+from web3.providers.base import JSONBaseProvider
+from web3.providers.rpc import HTTPProvider
+from web3.types import RPCEndpoint, RPCResponse
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar("T")
+
+# Errors that say something about the node rather than about the request, the request is sent to the next node.
+FAILOVER_ERRORS = (requests.RequestException, aiohttp.ClientError, asyncio.TimeoutError, json.JSONDecodeError)
+# Requests that can safely be sent to two nodes at once, they are hedged instead of batched.
+HEDGED_METHODS = {"eth_sendRawTransaction", "eth_call", "eth_getTransactionReceipt"}
+KNOWN_TRANSACTION_ERRORS = ("already known", "known transaction")
+
+
+class Endpoint:
+    """A single RPC node, with its latency and error rate tracked as exponentially weighted moving averages."""
+
+    def __init__(self, uri: str, ewma_alpha: float):
+        self.uri = uri
+        self.ewma_alpha = ewma_alpha
+        self.latency_s: Optional[float] = None
+        self.error_rate = 0.0
+        self.failed_at: Optional[float] = None
+        self.requests = 0
+        self.errors = 0
+
+    def observe(self, latency_s: float, ok: bool):
+        self.requests += 1
+        self.error_rate += self.ewma_alpha * ((0.0 if ok else 1.0) - self.error_rate)
+        if ok:
+            self.latency_s = (
+                latency_s if self.latency_s is None else self.latency_s + self.ewma_alpha * (latency_s - self.latency_s)
+            )
+        else:
+            self.errors += 1
+            self.failed_at = time.monotonic()
+
+    def is_healthy(self, cooldown_s: float) -> bool:
+        return self.failed_at is None or time.monotonic() - self.failed_at > cooldown_s
+
+    def expected_latency_s(self) -> float:
+        # Every failed attempt costs another round trip, so flaky nodes are slower than they look.
+        return (self.latency_s or 0.0) / max(1.0 - self.error_rate, 0.01)
+
+
+class EndpointPool:
+    """The RPC nodes of one chain, requests go to the fastest healthy node and fail over to the next one.
+
+    Nodes are ranked by their latency, adjusted for their error rate. Nodes nobody sent a request to yet rank first, so
+    every node gets measured. A node that failed is only tried as a last resort, until `cooldown_s` after the failure.
+
+    Hedged requests are sent to the second best node as well when the best one didn't answer within the
+    `hedge_percentile` of the latencies seen lately, the first answer is taken. Only use them for idempotent requests.
+    """
+
+    def __init__(
+        self,
+        uris: Sequence[str],
+        ewma_alpha: float = 0.2,
+        cooldown_s: float = 5.0,
+        hedge_percentile: float = 0.95,
+        min_hedge_delay_s: float = 0.05,
+        default_hedge_delay_s: float = 1.0,
+    ):
+        if not uris:
+            raise ValueError("An endpoint pool needs at least one endpoint.")
+
+        self.endpoints = [Endpoint(uri, ewma_alpha) for uri in uris]
+        self.cooldown_s = cooldown_s
+        self.hedge_percentile = hedge_percentile
+        self.min_hedge_delay_s = min_hedge_delay_s
+        self.default_hedge_delay_s = default_hedge_delay_s
+        self.latencies: Deque[float] = deque(maxlen=1000)
+        self.hedges = 0
+        self.hedge_wins = 0
+        self.executor: Optional[ThreadPoolExecutor] = None
+
+    def ranked(self) -> List[Endpoint]:
+        healthy = [e for e in self.endpoints if e.is_healthy(self.cooldown_s)]
+        unhealthy = [e for e in self.endpoints if e not in healthy]
+
+        return sorted(healthy, key=Endpoint.expected_latency_s) + sorted(unhealthy, key=lambda e: e.failed_at or 0.0)
+
+    def hedge_delay_s(self) -> float:
+        if len(self.latencies) < 20:
+            return self.default_hedge_delay_s
+
+        latencies = sorted(self.latencies)
+        percentile = latencies[min(int(len(latencies) * self.hedge_percentile), len(latencies) - 1)]
+
+        return max(percentile, self.min_hedge_delay_s)
+
+    def request(self, send: Callable[[Endpoint], T]) -> T:
+        error: Optional[Exception] = None
+        for endpoint in self.ranked():
+            try:
+                return self._attempt(endpoint, send)
+            except FAILOVER_ERRORS as e:
+                error = e
+
+        raise error  # type: ignore
+
+    async def async_request(self, send: Callable[[Endpoint], Awaitable[T]]) -> T:
+        error: Optional[Exception] = None
+        for endpoint in self.ranked():
+            try:
+                return await self._async_attempt(endpoint, send)
+            except FAILOVER_ERRORS as e:
+                error = e
+
+        raise error  # type: ignore
+
+    def hedged_request(self, send: Callable[[Endpoint], RPCResponse]) -> RPCResponse:
+        ranked = self.ranked()
+        if len(ranked) < 2 or not self.hedge_percentile:
+            return self.request(send)
+
+        if self.executor is None:
+            self.executor = ThreadPoolExecutor(max_workers=16, thread_name_prefix="rpc-hedge")
+
+        primary = self.executor.submit(self._attempt, ranked[0], send)
+        done, _ = futures.wait([primary], timeout=self.hedge_delay_s())
+        if not done:
+            self.hedges += 1
+            hedge = self.executor.submit(self._attempt, ranked[1], send)
+            attempts = {primary, hedge}
+            while attempts:
+                done, attempts = futures.wait(attempts, return_when=futures.FIRST_COMPLETED)
+                for attempt in sorted(done, key=lambda a: a is hedge):
+                    # Wait for the other node when this one answered with an error, it may have accepted the request.
+                    if attempt.exception() is None and ("error" not in attempt.result() or not attempts):
+                        self.hedge_wins += attempt is hedge
+                        return attempt.result()
+        elif primary.exception() is None:
+            return primary.result()
+
+        return self.request(send)
+
+    async def async_hedged_request(self, send: Callable[[Endpoint], Awaitable[RPCResponse]]) -> RPCResponse:
+        ranked = self.ranked()
+        if len(ranked) < 2 or not self.hedge_percentile:
+            return await self.async_request(send)
+
+        primary = asyncio.create_task(self._async_attempt(ranked[0], send))
+        done, _ = await asyncio.wait({primary}, timeout=self.hedge_delay_s())
+        if not done:
+            self.hedges += 1
+            hedge = asyncio.create_task(self._async_attempt(ranked[1], send))
+            attempts = {primary, hedge}
+            try:
+                while attempts:
+                    done, attempts = await asyncio.wait(attempts, return_when=asyncio.FIRST_COMPLETED)
+                    for attempt in sorted(done, key=lambda a: a is hedge):
+                        # Wait for the other node when this one answered with an error, it may have accepted the request.
+                        if attempt.exception() is None and ("error" not in attempt.result() or not attempts):
+                            self.hedge_wins += attempt is hedge
+                            return attempt.result()
+            finally:
+                for attempt in attempts:
+                    attempt.cancel()
+        elif primary.exception() is None:
+            return primary.result()
+
+        return await self.async_request(send)
+
+    def get_metrics(self) -> Dict[str, float]:
+        # Endpoints are reported by position, their URIs can contain API keys.
+        metrics: Dict[str, float] = {
+            "hedges": self.hedges,
+            "hedge_wins": self.hedge_wins,
+            "hedge_delay_ms": self.hedge_delay_s() * 1000,
+        }
+        for i, endpoint in enumerate(self.endpoints):
+            metrics[f"{i}.latency_ms"] = (endpoint.latency_s or 0.0) * 1000
+            metrics[f"{i}.error_rate"] = endpoint.error_rate
+            metrics[f"{i}.requests"] = endpoint.requests
+            metrics[f"{i}.errors"] = endpoint.errors
+            metrics[f"{i}.healthy"] = float(endpoint.is_healthy(self.cooldown_s))
+
+        return metrics
+
+    def _attempt(self, endpoint: Endpoint, send: Callable[[Endpoint], T]) -> T:
+        started = time.monotonic()
+        try:
+            response = send(endpoint)
+        except FAILOVER_ERRORS as e:
+            self._failed(endpoint, started, e)
+            raise
+
+        self._succeeded(endpoint, started)
+        return response
+
+    async def _async_attempt(self, endpoint: Endpoint, send: Callable[[Endpoint], Awaitable[T]]) -> T:
+        started = time.monotonic()
+        try:
+            response = await send(endpoint)
+        except FAILOVER_ERRORS as e:
+            self._failed(endpoint, started, e)
+            raise
+        except asyncio.CancelledError:
+            # Lost the race against a hedged request, the node was slow rather than broken.
+            self._succeeded(endpoint, started)
+            raise
+
+        self._succeeded(endpoint, started)
+        return response
+
+    def _succeeded(self, endpoint: Endpoint, started: float):
+        latency_s = time.monotonic() - started
+        endpoint.observe(latency_s, ok=True)
+        self.latencies.append(latency_s)
+
+    @staticmethod
+    def _failed(endpoint: Endpoint, started: float, e: Exception):
+        endpoint.observe(time.monotonic() - started, ok=False)
+        logger.warning(f"RPC endpoint failed, trying the next one. error_rate={endpoint.error_rate:.2f} {e=}")
+
+
+class CallCache:
+    """Results of `eth_call`s against the latest block, they can only change when a new block comes in.
+
+    Calls are keyed by their transaction and the block number, and sent pinned to that block, so the result really
+    belongs to it. The latest block number is taken from `block_number_fn`, e.g. the block heads we track, as long as
+    it knows a recent one. Else from the `eth_blockNumber` responses that pass by, and looked up when we haven't seen
+    one for `block_refresh_s`. All results are dropped once a newer block shows up.
+    """
+
+    def __init__(
+        self,
+        block_refresh_s: float = 1.0,
+        max_size: int = 10_000,
+        block_number_fn: Optional[Callable[[], Optional[int]]] = None,
+    ):
+        self.block_refresh_s = block_refresh_s
+        self.max_size = max_size
+        self.block_number_fn = block_number_fn
+        self.block_number: Optional[int] = None
+        self.block_seen_at = -math.inf
+        self.results: "OrderedDict[Tuple[str, int], RPCResponse]" = OrderedDict()
+        self.calls: Dict[Tuple[str, int], asyncio.Future] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def call(self, transaction: dict, request: Callable[[str, list], RPCResponse]) -> RPCResponse:
+        if not self._track_block() and time.monotonic() - self.block_seen_at > self.block_refresh_s:
+            self.observe_block(request("eth_blockNumber", []))
+        if self.block_number is None:
+            # We couldn't get a block number yet, there is nothing to pin the call to.
+            self.misses += 1
+            return request("eth_call", [transaction, "latest"])
+
+        key = self._key(transaction)
+        if key in self.results:
+            self.hits += 1
+            return self.results[key]
+
+        self.misses += 1
+        response = request("eth_call", [transaction, hex(key[1])])
+        if "error" in response:
+            # E.g. the node isn't at that block yet.
+            return request("eth_call", [transaction, "latest"])
+
+        self._store(key, response)
+        return response
+
+    async def async_call(
+        self, transaction: dict, request: Callable[[str, list], Awaitable[RPCResponse]]
+    ) -> RPCResponse:
+        if not self._track_block() and time.monotonic() - self.block_seen_at > self.block_refresh_s:
+            self.observe_block(await request("eth_blockNumber", []))
+        if self.block_number is None:
+            # We couldn't get a block number yet, there is nothing to pin the call to.
+            self.misses += 1
+            return await request("eth_call", [transaction, "latest"])
+
+        key = self._key(transaction)
+        if key in self.results:
+            self.hits += 1
+            return self.results[key]
+
+        # Identical calls that come in while the first one is on its way wait for its result.
+        call = self.calls.get(key)
+        if call is not None and call.get_loop() is asyncio.get_running_loop():
+            self.hits += 1
+            return await asyncio.shield(call)
+
+        self.misses += 1
+        call = self.calls[key] = asyncio.ensure_future(self._async_call(key, transaction, request))
+        try:
+            return await asyncio.shield(call)
+        finally:
+            if self.calls.get(key) is call:
+                del self.calls[key]
+
+    def observe_block(self, response: RPCResponse):
+        if "result" not in response:
+            return
+
+        self._set_block_number(int(response["result"], 16))
+
+    def get_metrics(self) -> Dict[str, float]:
+        return {"call_hits": self.hits, "call_misses": self.misses, "block_number": self.block_number or 0}
+
+    async def _async_call(
+        self, key: Tuple[str, int], transaction: dict, request: Callable[[str, list], Awaitable[RPCResponse]]
+    ) -> RPCResponse:
+        response = await request("eth_call", [transaction, hex(key[1])])
+        if "error" in response:
+            # E.g. the node isn't at that block yet.
+            return await request("eth_call", [transaction, "latest"])
+
+        self._store(key, response)
+        return response
+
+    def _track_block(self) -> bool:
+        block_number = None if self.block_number_fn is None else self.block_number_fn()
+        if block_number is None:
+            return False
+
+        self._set_block_number(block_number)
+        return True
+
+    def _set_block_number(self, block_number: int):
+        self.block_seen_at = time.monotonic()
+        if self.block_number is None or block_number > self.block_number:
+            self.block_number = block_number
+            self.results.clear()
+
+    def _key(self, transaction: dict) -> Tuple[str, int]:
+        return json.dumps(transaction, sort_keys=True, cls=Web3JsonEncoder), self.block_number  # type: ignore
+
+    def _store(self, key: Tuple[str, int], response: RPCResponse):
+        if key[1] != self.block_number:
+            return  # A newer block came in meanwhile.
+
+        self.results[key] = response
+        while len(self.results) > self.max_size:
+            self.results.popitem(last=False)
+
+
+class Batch:
+    """Requests collected by the thread that opened the batch, the other threads wait until it sent them."""
+
+    def __init__(self):
+        self.requests: List[dict] = []
+        self.responses: List[RPCResponse] = []
+        self.error: Optional[Exception] = None
+        self.sent = threading.Event()
+
+
+class PooledHTTPProvider(JSONBaseProvider):
+    """Synchronous provider sending every request through an `EndpointPool`.
+
+    Like `HTTPProvider` it keeps a keep-alive session per node, and retries requests when all nodes failed. With a
+    `batch_window_s` the requests other threads make within that window go out together as one JSON-RPC batch.
+    Idempotent requests are hedged instead, see `EndpointPool`. Calls against the latest block are served from the
+    `call_cache` if there is one.
+    """
+
+    _middlewares = HTTPProvider._middlewares
+
+    def __init__(
+        self,
+        pool: EndpointPool,
+        timeout_s: float = 10.0,
+        batch_window_s: float = 0.0,
+        max_batch_size: int = 100,
+        call_cache: Optional[CallCache] = None,
+    ):
+        self.pool = pool
+        self.call_cache = call_cache
+        self.timeout_s = timeout_s
+        self.batch_window_s = batch_window_s
+        self.max_batch_size = max_batch_size
+        self.batch: Optional[Batch] = None
+        self.batch_lock = threading.Lock()
+        super().__init__()
+
+    def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        if self.call_cache is None:
+            return self._request(method, params)
+        if method == "eth_call" and list(params[1:]) in ([], ["latest"]):
+            return self.call_cache.call(params[0], self._request)  # type: ignore
+
+        response = self._request(method, params)
+        if method == "eth_blockNumber":
+            self.call_cache.observe_block(response)
+
+        return response
+
+    def _request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        request = make_rpc_request(method, params, next(self.request_counter))
+        if method in HEDGED_METHODS:
+            request_data = encode_rpc_requests([request])
+            # Checked per node, so a node that already knows the transaction doesn't make us wait for the other one.
+            return self.pool.hedged_request(
+                lambda endpoint: accept_known_transaction(request, self._post(endpoint, request_data))
+            )
+        if self.batch_window_s <= 0:
+            return self._send([request])[0]
+
+        with self.batch_lock:
+            batch = self.batch
+            opened = batch is None
+            if batch is None:
+                batch = self.batch = Batch()
+            position = len(batch.requests)
+            batch.requests.append(request)
+            if len(batch.requests) >= self.max_batch_size:
+                self.batch = None
+
+        if opened:
+            time.sleep(self.batch_window_s)
+            with self.batch_lock:
+                if self.batch is batch:
+                    self.batch = None
+            try:
+                batch.responses = self._send(batch.requests)
+            except Exception as e:
+                batch.error = e
+            batch.sent.set()
+        else:
+            batch.sent.wait()
+
+        if batch.error is not None:
+            raise batch.error
+
+        return batch.responses[position]
+
+    def _send(self, requests: List[dict]) -> List[RPCResponse]:
+        request_data = encode_rpc_requests(requests)
+        response = self.pool.request(lambda endpoint: self._post(endpoint, request_data))
+
+        return match_rpc_responses(requests, response)
+
+    def _post(self, endpoint: Endpoint, request_data: bytes) -> Any:
+        raw_response = make_post_request(
+            endpoint.uri, request_data, headers={"Content-Type": "application/json"}, timeout=self.timeout_s
+        )
+
+        # Decoded per node, so a node answering with an error page counts as a failure of that node.
+        return self.decode_rpc_response(raw_response)
+
+
+class PooledAsyncHTTPProvider(AsyncJSONBaseProvider):
+    """Async provider sending every request through an `EndpointPool`, with a keep-alive session per node.
+
+    With a `batch_window_s` the requests made within that window go out together as one JSON-RPC batch, e.g. the
+    nonce, gas price and gas estimate a trade looks up concurrently. Idempotent requests are hedged instead, see
+    `EndpointPool`. Calls against the latest block are served from the `call_cache` if there is one.
+    """
+
+    def __init__(
+        self,
+        pool: EndpointPool,
+        timeout_s: float = 10.0,
+        batch_window_s: float = 0.0,
+        max_batch_size: int = 100,
+        call_cache: Optional[CallCache] = None,
+    ):
+        self.pool = pool
+        self.call_cache = call_cache
+        self.timeout_s = timeout_s
+        self.batch_window_s = batch_window_s
+        self.max_batch_size = max_batch_size
+        self.queued: List[Tuple[dict, asyncio.Future]] = []
+        self.sending: Set[asyncio.Task] = set()
+        self.batches = 0
+        self.batched_requests = 0
+        super().__init__()
+
+    async def make_request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        if self.call_cache is None:
+            return await self._request(method, params)
+        if method == "eth_call" and list(params[1:]) in ([], ["latest"]):
+            return await self.call_cache.async_call(params[0], self._request)  # type: ignore
+
+        response = await self._request(method, params)
+        if method == "eth_blockNumber":
+            self.call_cache.observe_block(response)
+
+        return response
+
+    async def _request(self, method: RPCEndpoint, params: Any) -> RPCResponse:
+        request = make_rpc_request(method, params, next(self.request_counter))
+        if method in HEDGED_METHODS:
+            request_data = encode_rpc_requests([request])
+
+            # Checked per node, so a node that already knows the transaction doesn't make us wait for the other one.
+            async def send(endpoint: Endpoint) -> RPCResponse:
+                return accept_known_transaction(request, await self._post(endpoint, request_data))
+
+            return await self.pool.async_hedged_request(send)
+        if self.batch_window_s <= 0:
+            return (await self._send([request]))[0]
+
+        loop = asyncio.get_running_loop()
+        if self.queued and self.queued[0][1].get_loop() is not loop:
+            self.queued = []  # Left behind by an event loop that is gone.
+
+        future = loop.create_future()
+        self.queued.append((request, future))
+        if len(self.queued) >= self.max_batch_size:
+            self._send_queued()
+        elif len(self.queued) == 1:
+            loop.call_later(self.batch_window_s, self._send_queued)
+
+        return await future
+
+    async def make_batch_request(self, batch: List[dict]) -> List[dict]:
+        """Send many JSON-RPC requests in a single HTTP request, the responses are in the order of the requests."""
+        return await self._send(batch)  # type: ignore
+
+    def get_metrics(self) -> Dict[str, float]:
+        return {
+            "batches": self.batches,
+            "batched_requests": self.batched_requests,
+            "batch_size": self.batched_requests / self.batches if self.batches else 0.0,
+        }
+
+    def _send_queued(self):
+        if not self.queued:
+            return
+
+        queued, self.queued = self.queued, []
+        task = asyncio.create_task(self._send_queued_batch(queued))
+        self.sending.add(task)
+        task.add_done_callback(self.sending.discard)
+
+    async def _send_queued_batch(self, queued: List[Tuple[dict, asyncio.Future]]):
+        try:
+            responses = await self._send([request for request, _ in queued])
+        except Exception as e:
+            for _, future in queued:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), response in zip(queued, responses):
+            if not future.done():
+                future.set_result(response)
+
+    async def _send(self, requests: List[dict]) -> List[RPCResponse]:
+        self.batches += 1
+        self.batched_requests += len(requests)
+        request_data = encode_rpc_requests(requests)
+        response = await self.pool.async_request(lambda endpoint: self._post(endpoint, request_data))
+
+        return match_rpc_responses(requests, response)
+
+    async def _post(self, endpoint: Endpoint, request_data: bytes) -> Any:
+        raw_response = await async_make_post_request(
+            endpoint.uri,
+            request_data,
+            headers={"Content-Type": "application/json"},
+            timeout=ClientTimeout(self.timeout_s),
+        )
+
+        # Decoded per node, so a node answering with an error page counts as a failure of that node.
+        return self.decode_rpc_response(raw_response)
+
+
+def make_rpc_request(method: RPCEndpoint, params: Any, request_id: int) -> dict:
+    return {"jsonrpc": "2.0", "method": method, "params": params or [], "id": request_id}
+
+
+def accept_known_transaction(request: dict, response: RPCResponse) -> RPCResponse:
+    """A transaction a node already has was sent before, e.g. by a hedged request, so that counts as sent."""
+    error = response.get("error")
+    message = str(error.get("message") if isinstance(error, dict) else error).lower()
+    if request["method"] != "eth_sendRawTransaction" or not any(m in message for m in KNOWN_TRANSACTION_ERRORS):
+        return response
+
+    return {"jsonrpc": "2.0", "id": request["id"], "result": Web3.keccak(hexstr=request["params"][0]).hex()}
+
+
+def encode_rpc_requests(requests: List[dict]) -> bytes:
+    """A single request is sent as is, more of them as a batch."""
+    return json.dumps(requests[0] if len(requests) == 1 else requests, cls=Web3JsonEncoder).encode()
+
+
+def match_rpc_responses(requests: List[dict], response: Any) -> List[RPCResponse]:
+    """Put the responses in the order of the requests, nodes can answer a batch in any order."""
+    if isinstance(response, dict):
+        # The response to a single request, or a node rejecting the whole batch.
+        return [response if len(requests) == 1 else {**response, "id": request["id"]} for request in requests]
+
+    responses = {r.get("id"): r for r in response}
+    missing = {"code": -32603, "message": "No response to this request in the batch."}
+
+    return [
+        responses.get(request["id"], {"jsonrpc": "2.0", "id": request["id"], "error": missing}) for request in requests
+    ]
+
+
+def parse_endpoint_uris(uris: str) -> List[str]:
+    """Endpoints are configured as a comma separated list of URIs."""
+    return [uri.strip() for uri in uris.split(",") if uri.strip()]
@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import uuid
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Dict
+
+from eth_typing import ChecksumAddress
+
+from trading_api.algorithm.repositories.wallet import WalletLeaseRepository
+
+logger = logging.getLogger(__name__)
+
+
+class WalletLeaseTimeout(Exception):
+    pass
+
+
+class WalletLease:
+    """Ownership of a wallet, until `expires_at` on the event loop clock unless it gets renewed meanwhile."""
+
+    def __init__(self, wallet: ChecksumAddress, expires_at: float):
+        self.wallet = wallet
+        self.expires_at = expires_at
+
+    def ensure_held(self):
+        """Raises `WalletLeaseTimeout` when the lease expired, another worker may be sending for the wallet then."""
+        if asyncio.get_running_loop().time() >= self.expires_at:
+            raise WalletLeaseTimeout(f"Lease for wallet {self.wallet} expired.")
+
+
+class TransactionSequencer:
+    """Serializes nonce allocation, signing and sending per controller wallet.
+
+    Within a worker, coroutines for the same wallet queue up on an `asyncio.Lock`. Across workers and API nodes the
+    wallet is owned through a lease in the `WalletLeaseRepository`, so only one of them sends for a wallet at any
+    time. The lease is renewed every third of `lease_timeout_ms` while it's held, senders check it didn't expire right
+    before they send. Different wallets never wait on each other.
+    """
+
+    def __init__(
+        self,
+        lease_repository: WalletLeaseRepository,
+        lease_timeout_ms: int = 10_000,
+        acquire_timeout_s: float = 30.0,
+        poll_interval_s: float = 0.01,
+        max_poll_interval_s: float = 0.1,
+    ):
+        self.lease_repository = lease_repository
+        self.lease_timeout_ms = lease_timeout_ms
+        self.acquire_timeout_s = acquire_timeout_s
+        self.poll_interval_s = poll_interval_s
+        self.max_poll_interval_s = max_poll_interval_s
+        self.owner = str(uuid.uuid4())
+        self._locks: Dict[ChecksumAddress, asyncio.Lock] = {}
+        self._waiting: Dict[ChecksumAddress, int] = {}
+
+    @asynccontextmanager
+    async def sequence(self, wallet: ChecksumAddress) -> AsyncIterator[WalletLease]:
+        lock = self._locks.setdefault(wallet, asyncio.Lock())
+        self._waiting[wallet] = self._waiting.get(wallet, 0) + 1
+        try:
+            async with lock:
+                lease = await self._acquire_lease(wallet)
+                renewal = asyncio.create_task(self._renew_lease(lease))
+                try:
+                    yield lease
+                finally:
+                    renewal.cancel()
+                    await asyncio.gather(renewal, return_exceptions=True)
+                    await self.lease_repository.release(wallet, self.owner)
+        finally:
+            self._waiting[wallet] -= 1
+            if self._waiting[wallet] == 0:
+                # Nobody is queued for this wallet anymore, don't keep a lock around for every wallet we've seen.
+                del self._waiting[wallet]
+                del self._locks[wallet]
+
+    async def _acquire_lease(self, wallet: ChecksumAddress) -> WalletLease:
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.acquire_timeout_s
+        poll_interval = self.poll_interval_s
+
+        while True:
+            # The lease runs from before the request, we can't tell when Redis set it.
+            requested_at = loop.time()
+            if await self.lease_repository.acquire(wallet, self.owner, self.lease_timeout_ms):
+                return WalletLease(wallet, expires_at=requested_at + self.lease_timeout_ms / 1000)
+            if loop.time() >= deadline:
+                raise WalletLeaseTimeout(f"Could not acquire lease for wallet {wallet} in {self.acquire_timeout_s}s.")
+
+            await asyncio.sleep(poll_interval)
+            poll_interval = min(poll_interval * 2, self.max_poll_interval_s)
+
+    async def _renew_lease(self, lease: WalletLease):
+        loop = asyncio.get_running_loop()
+        while True:
+            await asyncio.sleep(self.lease_timeout_ms / 3000)
+            requested_at = loop.time()
+            try:
+                extended = await self.lease_repository.extend(lease.wallet, self.owner, self.lease_timeout_ms)
+            except Exception as e:
+                # Try again on the next renewal, the lease is still good until then.
+                logger.warning(f"Error renewing wallet lease. wallet={lease.wallet} {e=}")
+                continue
+
+            if not extended:
+                logger.warning(f"Wallet lease expired while it was held. wallet={lease.wallet}")
+                lease.expires_at = requested_at
+                return
+
+            lease.expires_at = requested_at + self.lease_timeout_ms / 1000
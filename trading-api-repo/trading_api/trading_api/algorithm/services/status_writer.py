@@ -0,0 +1,88 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, Optional, Tuple
+
+from starlette.concurrency import run_in_threadpool
+
+from trading_api.algorithm.models.crypto import TransactionHash
+from trading_api.algorithm.models.trade import TradeStatus
+from trading_api.algorithm.repositories.transaction import TransactionRepository
+
+logger = logging.getLogger(__name__)
+
+
+class TransactionStatusWriter:
+    """Coalesces transaction status updates into bulk writes.
+
+    Only real transitions are written: transactions are persisted as in progress, and a status equal to the last one
+    we wrote is skipped. Updates are buffered, and written in one batch `flush_interval_s` after the first one came in.
+    Callers that release a lock based on the status have to `flush` first, so the terminal status is stored by then.
+    """
+
+    def __init__(
+        self, transaction_repository: TransactionRepository, flush_interval_s: float = 1.0, max_known: int = 100_000
+    ):
+        self.transaction_repository = transaction_repository
+        self.flush_interval_s = flush_interval_s
+        self.max_known = max_known
+        self.known: "OrderedDict[str, TradeStatus]" = OrderedDict()
+        self.buffer: Dict[str, Tuple[TradeStatus, datetime]] = {}
+        self.flush_task: Optional[asyncio.Task] = None
+        self.skipped = 0
+        self.written = 0
+        self.flushes = 0
+
+    async def update_status(self, transaction_hash: TransactionHash, trade_status: TradeStatus, timestamp: datetime):
+        known = self.known.get(transaction_hash.value, TradeStatus.TRADE_IN_PROGRESS_OR_NOT_FOUND)
+        if known == trade_status:
+            self.skipped += 1
+            return
+
+        self._remember(transaction_hash.value, trade_status)
+        self.buffer[transaction_hash.value] = (trade_status, timestamp)
+        self._schedule_flush()
+
+    async def flush(self):
+        if not self.buffer:
+            return
+
+        updates, self.buffer = self.buffer, {}
+        try:
+            await run_in_threadpool(
+                self.transaction_repository.update_transaction_statuses,
+                [(TransactionHash(value=h), status, timestamp) for h, (status, timestamp) in updates.items()],
+            )
+        except Exception:
+            # Put them back, unless a newer update for the same transaction came in meanwhile.
+            self.buffer = {**updates, **self.buffer}
+            raise
+
+        self.written += len(updates)
+        self.flushes += 1
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.flush_interval_s)
+        try:
+            await self.flush()
+        except Exception as e:
+            logger.warning(f"Error writing transaction statuses, retrying later. {e=}", exc_info=True)
+            self.flush_task = None
+            self._schedule_flush()
+
+    def _schedule_flush(self):
+        task = self.flush_task
+        if task is not None and not task.done() and task.get_loop() is asyncio.get_running_loop():
+            return
+
+        self.flush_task = asyncio.create_task(self._flush_later())
+
+    def get_metrics(self) -> dict:
+        return {"skipped": self.skipped, "written": self.written, "flushes": self.flushes, "buffered": len(self.buffer)}
+
+    def _remember(self, transaction_hash: str, trade_status: TradeStatus):
+        self.known[transaction_hash] = trade_status
+        self.known.move_to_end(transaction_hash)
+        while len(self.known) > self.max_known:
+            self.known.popitem(last=False)
@@ -1,19 +1,34 @@
-import json
+import asyncio
 import logging
 from abc import ABC, abstractmethod
 from decimal import Decimal
+from functools import partial
 from pathlib import Path
-from typing import Optional
+from typing import Any, Callable, Dict, List, Optional, Sequence
 
 from eth_account import Account
 from eth_account.signers.local import LocalAccount
 from eth_typing import ChecksumAddress
+from hexbytes import HexBytes
 from web3 import Web3
-from web3.contract import Contract
+from web3._utils.abi import get_abi_output_types
+from web3._utils.method_formatters import receipt_formatter
+from web3.contract import Contract, ContractFunction
+from web3.eth import AsyncEth
+from web3.exceptions import TransactionNotFound
+from web3.types import TxReceipt
 
 from trading_api import EnvVar, get_env_force
 from trading_api.algorithm.models.algorithm import Algorithm
 from trading_api.algorithm.models.crypto import ChainId, ContractDetails
+from trading_api.algorithm.services.contracts import ContractRegistry, load_abi
+from trading_api.algorithm.services.rpc import (
+    CallCache,
+    EndpointPool,
+    PooledAsyncHTTPProvider,
+    PooledHTTPProvider,
+    parse_endpoint_uris,
+)
 
 GAS_AMOUNT = Decimal(100_000 / 1e18)
 GAS_PRICE = Decimal(5e9 / 1e18)
@@ -26,6 +41,11 @@ class Web3Provider(ABC):
     def get_web3(self, chain: ChainId) -> Web3:
         pass
 
+    @abstractmethod
+    def get_async_web3(self, chain: ChainId) -> Web3:
+        """Web3 instance backed by an async provider, all `eth` calls on it have to be awaited."""
+        pass
+
     @abstractmethod
     def get_trading_contract(self, algorithm: Algorithm) -> Contract:
         pass
@@ -42,6 +62,12 @@ class Web3Provider(ABC):
     def get_account(self, algorithm_public_address: ChecksumAddress) -> LocalAccount:
         pass
 
+    async def get_chain_id(self, chain: ChainId) -> int:
+        return int(await self.get_async_web3(chain=chain).eth.chain_id)  # type: ignore
+
+    def get_metrics(self) -> dict:
+        return {}
+
     @staticmethod
     def get_gas_amount() -> Decimal:
         return GAS_AMOUNT
@@ -59,44 +85,68 @@ class HttpWeb3Provider(Web3Provider):
         ecr_contract_bsc: ContractDetails,
         ecr_contract_rtn: ContractDetails,
         private_key: str = None,
+        batch_window_s: float = 0.0,
+        hedge_percentile: float = 0.95,
+        block_refresh_s: float = 1.0,
+        head_number_fn: Optional[Callable[[ChainId], Optional[int]]] = None,
     ):
         """
 
+        :param web3_bsc_uri: Comma separated list of RPC endpoints, requests go to the fastest healthy one.
         :param ecr_contract_bsc:
         :param private_key: Only used for testing purposes, in prod we don't use this and use the KMS instead.
+        :param batch_window_s: Requests made within this window are sent as one JSON-RPC batch, 0 disables batching.
+        :param hedge_percentile: Idempotent requests are sent to a second node when the first one is slower than this
+            percentile of the recent latencies, 0 disables hedging.
+        :param block_refresh_s: Calls against the latest block are cached until a new block comes in, which is checked
+            at least this often. 0 disables caching.
+        :param head_number_fn: The latest block number we know of a chain, if any. The call cache takes it from here
+            instead of asking the node.
         """
         self._http_rtn_web3: Optional[Web3] = None
         self._http_bsc_web3: Optional[Web3] = None
+        self._async_web3: Dict[ChainId, Web3] = {}
+        self._endpoint_pools: Dict[ChainId, EndpointPool] = {}
         self._web3_rtn_uri = web3_rtn_uri
         self._web3_bsc_uri = web3_bsc_uri
         self._ecr_contract_bsc = ecr_contract_bsc
         self._ecr_contract_rtn = ecr_contract_rtn
         self._private_key = private_key
+        self._batch_window_s = batch_window_s
+        self._hedge_percentile = hedge_percentile
+        self._block_refresh_s = block_refresh_s
+        self._head_number_fn = head_number_fn
+        self._call_caches: Dict[ChainId, Optional[CallCache]] = {}
+        self._chain_ids: Dict[ChainId, int] = {}
+        self._ecr_contracts: Dict[ChainId, Contract] = {}
+        self.contracts = ContractRegistry(self.get_web3)
 
     def get_account(self, algorithm_public_address: ChecksumAddress) -> LocalAccount:
         return Account.from_key(self._private_key)
 
     def get_trading_contract(self, algorithm: Algorithm) -> Contract:
-        abi = self.load_abi(Path(algorithm.trading_contract.location))
-
-        return self.get_web3(chain=algorithm.chain_id).eth.contract(
-            address=algorithm.trading_contract_address, abi=abi
-        )  # type: ignore
+        return self.contracts.get_contract(
+            algorithm.chain_id, algorithm.trading_contract_address, Path(algorithm.trading_contract.location)
+        )
 
     def get_trading_contract_tools(self, algorithm: Algorithm) -> Contract:
-        abi = self.load_abi(Path(get_env_force(EnvVar.TRADING_CONTRACT_TOOLS_JSON_PATH)))
+        artifact = Path(get_env_force(EnvVar.TRADING_CONTRACT_TOOLS_JSON_PATH))
 
         if algorithm.chain_id == ChainId.BSC:
             address = get_env_force(EnvVar.TRADING_CONTRACT_TOOLS_ADDRESS_BSC)
         if algorithm.chain_id == ChainId.RTN:
             address = get_env_force(EnvVar.TRADING_CONTRACT_TOOLS_ADDRESS_RTN)
 
-        return self.get_web3(chain=algorithm.chain_id).eth.contract(address=address, abi=abi)  # type: ignore
+        return self.contracts.get_contract(algorithm.chain_id, address, artifact)
 
     def get_ecr_contract(self, chain: ChainId) -> Contract:
-        contract = self._load_ecr_contract_details(chain)
+        if chain not in self._ecr_contracts:
+            contract = self._load_ecr_contract_details(chain)
+            self._ecr_contracts[chain] = self.get_web3(chain=chain).eth.contract(
+                address=contract.address, abi=contract.abi
+            )  # type: ignore
 
-        return self.get_web3(chain=chain).eth.contract(address=contract.address, abi=contract.abi)  # type: ignore
+        return self._ecr_contracts[chain]
 
     def get_web3(self, chain: ChainId) -> Web3:
         if chain == chain.BSC:
@@ -106,24 +156,95 @@ class HttpWeb3Provider(Web3Provider):
 
         raise ValueError(f"ChainId {chain} is not implemented.")
 
-    @staticmethod
-    def load_abi(path: Path) -> dict:
-        with open(path) as f:
-            info_json = json.load(f)
-            abi = info_json["abi"]
+    def get_async_web3(self, chain: ChainId) -> Web3:
+        if chain not in self._async_web3:
+            self._async_web3[chain] = Web3(
+                PooledAsyncHTTPProvider(
+                    self.get_endpoint_pool(chain),
+                    batch_window_s=self._batch_window_s,
+                    call_cache=self.get_call_cache(chain),
+                ),
+                modules={"eth": (AsyncEth,)},
+                middlewares=[],
+            )
+
+        return self._async_web3[chain]
+
+    async def get_chain_id(self, chain: ChainId) -> int:
+        """The chain id of a chain never changes, so the node is only asked for it once."""
+        if chain not in self._chain_ids:
+            self._chain_ids[chain] = await super().get_chain_id(chain)
+
+        return self._chain_ids[chain]
+
+    def get_endpoint_pool(self, chain: ChainId) -> EndpointPool:
+        """The sync and async Web3 instances of a chain share their pool, and so what they learned about the nodes."""
+        if chain not in self._endpoint_pools:
+            self._endpoint_pools[chain] = EndpointPool(
+                parse_endpoint_uris(self._web3_uri(chain)), hedge_percentile=self._hedge_percentile
+            )
+
+        return self._endpoint_pools[chain]
+
+    def get_call_cache(self, chain: ChainId) -> Optional[CallCache]:
+        """The sync and async Web3 instances of a chain share their cache, so v1 and v2 requests hit the same one."""
+        if chain not in self._call_caches:
+            block_number_fn = None if self._head_number_fn is None else partial(self._head_number_fn, chain)
+            self._call_caches[chain] = (
+                CallCache(self._block_refresh_s, block_number_fn=block_number_fn) if self._block_refresh_s > 0 else None
+            )
+
+        return self._call_caches[chain]
+
+    def get_metrics(self) -> dict:
+        metrics = {
+            f"{chain.name}.{name}": value
+            for chain, pool in self._endpoint_pools.items()
+            for name, value in pool.get_metrics().items()
+        }
+        for chain, w3 in self._async_web3.items():
+            metrics.update({f"{chain.name}.{name}": value for name, value in w3.provider.get_metrics().items()})
+        for chain, cache in self._call_caches.items():
+            if cache is not None:
+                metrics.update({f"{chain.name}.{name}": value for name, value in cache.get_metrics().items()})
+        metrics.update({f"contracts.{name}": value for name, value in self.contracts.get_metrics().items()})
+
+        return metrics
+
+    def _web3_uri(self, chain: ChainId) -> str:
+        if chain == chain.BSC:
+            return self._web3_bsc_uri
+        if chain == chain.RTN:
+            return self._web3_rtn_uri
+
+        raise ValueError(f"ChainId {chain} is not implemented.")
 
-        return abi
+    @staticmethod
+    def load_abi(path: Path) -> list:
+        return load_abi(path)
 
     def rtn_web3(self) -> Web3:
         if self._http_rtn_web3 is None:
-            self._http_rtn_web3 = Web3(Web3.HTTPProvider(self._web3_rtn_uri))
+            self._http_rtn_web3 = Web3(
+                PooledHTTPProvider(
+                    self.get_endpoint_pool(ChainId.RTN),
+                    batch_window_s=self._batch_window_s,
+                    call_cache=self.get_call_cache(ChainId.RTN),
+                )
+            )
             return self._http_rtn_web3
 
         return self._http_rtn_web3
 
     def bsc_web3(self) -> Web3:
         if self._http_bsc_web3 is None:
-            self._http_bsc_web3 = Web3(Web3.HTTPProvider(self._web3_bsc_uri))
+            self._http_bsc_web3 = Web3(
+                PooledHTTPProvider(
+                    self.get_endpoint_pool(ChainId.BSC),
+                    batch_window_s=self._batch_window_s,
+                    call_cache=self.get_call_cache(ChainId.BSC),
+                )
+            )
             return self._http_bsc_web3
 
         return self._http_bsc_web3
@@ -158,3 +279,94 @@ class InMemoryWeb3Provider(Web3Provider):
 
     def get_web3(self, chain: ChainId) -> Web3:
         return self._w3
+
+    def get_async_web3(self, chain: ChainId) -> Web3:
+        return InMemoryAsyncWeb3(self._w3)  # type: ignore
+
+
+class InMemoryAsyncEth:
+    """Awaitable facade over a synchronous `Web3.eth`, eth-tester has no async provider in web3 v5."""
+
+    def __init__(self, eth):
+        self._eth = eth
+
+    @property
+    async def chain_id(self) -> int:
+        return self._eth.chain_id
+
+    @property
+    async def gas_price(self) -> int:
+        return self._eth.gas_price
+
+    @property
+    async def block_number(self) -> int:
+        return self._eth.block_number
+
+    def __getattr__(self, name: str):
+        method = getattr(self._eth, name)
+
+        async def call(*args, **kwargs):
+            return await asyncio.to_thread(method, *args, **kwargs)
+
+        return call
+
+
+class InMemoryAsyncWeb3:
+    def __init__(self, w3: Web3):
+        self.eth = InMemoryAsyncEth(w3.eth)
+        self.codec = w3.codec
+
+
+async def call_contract_function(w3: Web3, function: ContractFunction, block_identifier: Any = "latest") -> Any:
+    """Execute a read-only contract call (`eth_call`) through an async Web3 instance.
+
+    Contracts in web3 v5 are synchronous only, so we encode the call data with the (sync) contract function and
+    decode the result ourselves.
+    """
+    transaction = {"to": function.address, "data": function._encode_transaction_data()}
+    result = await w3.eth.call(transaction, block_identifier)  # type: ignore
+    decoded = w3.codec.decode_abi(get_abi_output_types(function.abi), result)
+
+    return decoded[0] if len(decoded) == 1 else decoded
+
+
+async def get_transaction_receipts(w3: Web3, transaction_hashes: Sequence[HexBytes]) -> List[Optional[TxReceipt]]:
+    """Look up the receipts of many transactions, `None` for those that aren't mined yet.
+
+    Over HTTP all lookups go out as a single JSON-RPC batch request, other providers get a request per transaction.
+    """
+    if not transaction_hashes:
+        return []
+
+    provider = getattr(w3, "provider", None)
+    if isinstance(provider, PooledAsyncHTTPProvider):
+        return await _batch_get_transaction_receipts(provider, transaction_hashes)
+
+    async def get_receipt(transaction_hash: HexBytes) -> Optional[TxReceipt]:
+        try:
+            return await w3.eth.get_transaction_receipt(transaction_hash)  # type: ignore
+        except TransactionNotFound:
+            return None
+
+    return list(await asyncio.gather(*(get_receipt(transaction_hash) for transaction_hash in transaction_hashes)))
+
+
+async def _batch_get_transaction_receipts(
+    provider: PooledAsyncHTTPProvider, transaction_hashes: Sequence[HexBytes]
+) -> List[Optional[TxReceipt]]:
+    batch = [
+        {"jsonrpc": "2.0", "method": "eth_getTransactionReceipt", "params": [HexBytes(transaction_hash).hex()], "id": i}
+        for i, transaction_hash in enumerate(transaction_hashes)
+    ]
+    responses = {response["id"]: response for response in await provider.make_batch_request(batch)}
+
+    receipts: List[Optional[TxReceipt]] = []
+    for i, transaction_hash in enumerate(transaction_hashes):
+        response = responses.get(i, {})
+        if "error" in response:
+            raise ValueError(f"Error retrieving receipt for {HexBytes(transaction_hash).hex()}: {response['error']}")
+
+        result = response.get("result")
+        receipts.append(None if result is None else receipt_formatter(result))
+
+    return receipts
@@ -1,19 +1,16 @@
-import asyncio
 import logging
 from datetime import datetime, timezone
-from typing import Tuple
+from typing import Optional
 
 from hexbytes import HexBytes
+from starlette.concurrency import run_in_threadpool
 from web3 import Web3
 from web3.exceptions import TimeExhausted, TransactionNotFound
 from web3.types import TxReceipt
 
-from trading_api import EnvVar, get_env_force
-from trading_api.algorithm.models.algorithm import AlgorithmId
 from trading_api.algorithm.models.crypto import TransactionHash
 from trading_api.algorithm.models.trade import (
     StatusRequest,
-    Trade,
     TradeFailedResponse,
     TradeInProgressOrNotFoundResponse,
     TradeStatus,
@@ -21,10 +18,10 @@ from trading_api.algorithm.models.trade import (
     TradeSuccessfulResponse,
 )
 from trading_api.algorithm.repositories.algorithm import AlgorithmRepository
-from trading_api.algorithm.repositories.nonce import NonceRepository
-from trading_api.algorithm.repositories.transaction import TransactionRepository
+from trading_api.algorithm.services.notifier import ReceiptNotifier
+from trading_api.algorithm.services.receipts import ReceiptCache
+from trading_api.algorithm.services.status_writer import TransactionStatusWriter
 from trading_api.algorithm.services.web3 import Web3Provider
-from trading_api.core.container import Container
 
 logger = logging.getLogger(__name__)
 
@@ -32,13 +29,19 @@ logger = logging.getLogger(__name__)
 async def handle_status_request(
     request: StatusRequest,
     web3_provider: Web3Provider,
-    trading_transaction_repository: TransactionRepository,
+    status_writer: TransactionStatusWriter,
     algorithm_repository: AlgorithmRepository,
+    receipt_notifier: ReceiptNotifier,
+    receipt_cache: ReceiptCache,
 ) -> TradeStatusResponse:
-    trade_status: TradeStatus = check_trade_status(request, web3_provider, algorithm_repository=algorithm_repository)
-    trading_transaction_repository.update_transaction_status(
-        request.transaction_hash, trade_status, datetime.now(timezone.utc)
+    trade_status: TradeStatus = await check_trade_status(
+        request,
+        web3_provider,
+        algorithm_repository=algorithm_repository,
+        receipt_notifier=receipt_notifier,
+        receipt_cache=receipt_cache,
     )
+    await status_writer.update_status(request.transaction_hash, trade_status, datetime.now(timezone.utc))
 
     if trade_status == TradeStatus.TRADE_IN_PROGRESS_OR_NOT_FOUND:
         return TradeInProgressOrNotFoundResponse()
@@ -50,11 +53,21 @@ async def handle_status_request(
         raise ValueError(f"TradeStatus {trade_status=} is not an implemented response.")
 
 
-def check_trade_status(
-    request: StatusRequest, web3_provider: Web3Provider, algorithm_repository: AlgorithmRepository
+async def check_trade_status(
+    request: StatusRequest,
+    web3_provider: Web3Provider,
+    algorithm_repository: AlgorithmRepository,
+    receipt_notifier: Optional[ReceiptNotifier] = None,
+    receipt_cache: Optional[ReceiptCache] = None,
 ) -> TradeStatus:
     try:
-        return retrieve_trade_status(request, web3_provider, algorithm_repository=algorithm_repository)
+        return await retrieve_trade_status(
+            request,
+            web3_provider,
+            algorithm_repository=algorithm_repository,
+            receipt_notifier=receipt_notifier,
+            receipt_cache=receipt_cache,
+        )
     except TransactionNotFound:
         logger.info(f"Couldn't find transaction receipt for {request.transaction_hash=}")
 
@@ -65,11 +78,21 @@ def check_trade_status(
         return TradeStatus.TRADE_IN_PROGRESS_OR_NOT_FOUND
 
 
-def retrieve_trade_status(
-    request: StatusRequest, web3_provider: Web3Provider, algorithm_repository: AlgorithmRepository
+async def retrieve_trade_status(
+    request: StatusRequest,
+    web3_provider: Web3Provider,
+    algorithm_repository: AlgorithmRepository,
+    receipt_notifier: Optional[ReceiptNotifier] = None,
+    receipt_cache: Optional[ReceiptCache] = None,
 ) -> TradeStatus:
     logger.info(f"Retrieving transaction status for {request.transaction_hash=}")
-    receipt = _get_receipt(request, web3_provider, algorithm_repository=algorithm_repository)
+    receipt = await _get_receipt(
+        request,
+        web3_provider,
+        algorithm_repository=algorithm_repository,
+        receipt_notifier=receipt_notifier,
+        receipt_cache=receipt_cache,
+    )
     logger.info(f"Retrieved transaction receipt. {request.transaction_hash=} {receipt=}")
 
     if receipt["status"] == 1:
@@ -78,74 +101,38 @@ def retrieve_trade_status(
     return TradeStatus.TRADE_FAILED
 
 
-def _get_receipt(
-    request: StatusRequest, web3_provider: Web3Provider, algorithm_repository: AlgorithmRepository
+async def _get_receipt(
+    request: StatusRequest,
+    web3_provider: Web3Provider,
+    algorithm_repository: AlgorithmRepository,
+    receipt_notifier: Optional[ReceiptNotifier] = None,
+    receipt_cache: Optional[ReceiptCache] = None,
 ) -> TxReceipt:
-    algorithm = algorithm_repository.get_algorithm(request.algorithm_id.public_address)
+    algorithm = await run_in_threadpool(algorithm_repository.get_algorithm, request.algorithm_id.public_address)
     if algorithm is None:
         raise ValueError(f"Failed to retrieve algorithm for request, algorithm-id:[{request.algorithm_id}].")
 
-    if request.timeout_in_seconds == 0:
-        return _get_transaction_receipt(request.transaction_hash, web3_provider.get_web3(algorithm.chain_id))
-
-    return _wait_for_transaction_receipt(
-        request.transaction_hash, request.timeout_in_seconds, web3_provider.get_web3(algorithm.chain_id)
-    )
-
-
-def _wait_for_transaction_receipt(transaction: TransactionHash, timeout_in_seconds: int, w3: Web3) -> TxReceipt:
-    return w3.eth.wait_for_transaction_receipt(HexBytes(transaction.value), timeout=timeout_in_seconds)
+    if request.timeout_in_seconds == 0 and receipt_cache is not None:
+        receipt = await receipt_cache.get_transaction_receipt(
+            web3_provider.get_async_web3(algorithm.chain_id), algorithm.chain_id, request.transaction_hash
+        )
+        if receipt is None:
+            raise TransactionNotFound(f"Transaction with hash: {request.transaction_hash.value} not found.")
 
+        return receipt
 
-def _get_transaction_receipt(transaction: TransactionHash, w3: Web3) -> TxReceipt:
-    return w3.eth.get_transaction_receipt(HexBytes(transaction.value))
+    if request.timeout_in_seconds == 0:
+        return await _get_transaction_receipt(
+            request.transaction_hash, web3_provider.get_async_web3(algorithm.chain_id)
+        )
 
+    if receipt_notifier is None:
+        raise ValueError("Waiting for a transaction receipt requires a receipt notifier.")
 
-async def background_task_check_tx_status(
-    trade: Trade, algorithm_id: AlgorithmId, transaction_hash: TransactionHash, container: Container
-):
-    response = None
-    try:
-        for attempt_nr in range(7):
-            try:
-                done, response = await retrieve_status_attempt(algorithm_id, attempt_nr, container, transaction_hash)
-                if done:
-                    logger.info(f"Successfully retrieved trade status. {algorithm_id=} {transaction_hash=} {response=}")
-                    return
-            except Exception as e:
-                logger.warning(
-                    f"Error retrieving trade status. {algorithm_id=} {transaction_hash=} {e=}", exc_info=True
-                )
-
-        logger.critical(f"Was not successful in retrieving trade status. {algorithm_id=} {transaction_hash=}")
-    finally:
-        # Reset the algorithm_nonce if the tx was not successful
-        if not isinstance(response, TradeSuccessfulResponse):
-            await reset_algorithm_nonce(trade=trade, container=container)
-
-
-async def reset_algorithm_nonce(trade: Trade, container: Container):
-    nonce_repository: NonceRepository = container[NonceRepository]
-    nonce_repository.reset_nonce(trade=trade)
-
-
-async def retrieve_status_attempt(
-    algorithm_id: AlgorithmId, attempt_nr: int, container: Container, transaction_hash: TransactionHash
-) -> Tuple[bool, TradeStatusResponse]:
-    response = await handle_status_request(
-        request=StatusRequest(algorithm_id=algorithm_id, transaction_hash=transaction_hash, timeout_in_seconds=0),
-        web3_provider=container[Web3Provider],
-        trading_transaction_repository=container[TransactionRepository],
-        algorithm_repository=container[AlgorithmRepository],
+    return await receipt_notifier.wait_for_receipt(
+        algorithm.chain_id, request.transaction_hash, timeout_s=request.timeout_in_seconds
     )
 
-    if isinstance(response, TradeInProgressOrNotFoundResponse):
-        sleep_time = int(get_env_force(EnvVar.TASK_CHECK_TX_STATUS_SLEEP_TIME, "5"))
-        wait_time_it = sleep_time * pow(2, attempt_nr)  # exponential back off
-        logger.info(
-            f"Tried to retrieve trade status, sleeping for {wait_time_it} seconds and trying again. {algorithm_id=} {transaction_hash=}"
-        )
-        await asyncio.sleep(wait_time_it)
-        return False, response
 
-    return True, response
+async def _get_transaction_receipt(transaction: TransactionHash, w3: Web3) -> TxReceipt:
+    return await w3.eth.get_transaction_receipt(HexBytes(transaction.value))  # type: ignore
@@ -1,12 +1,15 @@
+import asyncio
 import logging
-import time
 import typing
 from datetime import datetime, timezone
 from decimal import Decimal
 from functools import partial
-from typing import Callable, Optional, Tuple, Union
+from typing import Awaitable, Callable, Optional, Tuple, Union
 
 from hexbytes import HexBytes
+from starlette.concurrency import run_in_threadpool
+from web3 import Web3
+from web3.contract import ContractFunction
 
 from trading_api import EnvVar, get_env, get_env_force
 from trading_api.algorithm.lock import create_algorithm_transaction, get_lock_symbol
@@ -23,8 +26,10 @@ from trading_api.algorithm.models.trade import (
     BlockChainError,
     BuyTrade,
     BuyTradeV2,
+    GasUrgency,
     InsufficientFunds,
     MultiTokenTrade,
+    PreFlight,
     SellTradeV2,
     StatusRequest,
     Trade,
@@ -37,8 +42,12 @@ from trading_api.algorithm.repositories.algorithm import AlgorithmRepository
 from trading_api.algorithm.repositories.lock import AlgorithmLockRepository
 from trading_api.algorithm.repositories.nonce import NonceRepository
 from trading_api.algorithm.repositories.transaction import TransactionRepository
+from trading_api.algorithm.services.calldata import build_transaction, encode_call
+from trading_api.algorithm.services.gas import GasOracle
+from trading_api.algorithm.services.gas_limit import GasLimitModel, get_gas_shape
 from trading_api.algorithm.services.kms import KeyManagementService
-from trading_api.algorithm.services.web3 import Web3Provider
+from trading_api.algorithm.services.sequencer import TransactionSequencer, WalletLease, WalletLeaseTimeout
+from trading_api.algorithm.services.web3 import Web3Provider, call_contract_function
 from trading_api.algorithm.status import check_trade_status
 
 logger = logging.getLogger(__name__)
@@ -46,7 +55,7 @@ logger = logging.getLogger(__name__)
 MAX_TRIES = 3
 
 
-def handle_trade_request(
+async def handle_trade_request(
     trade_request: Trade,
     algorithm: Algorithm,
     lock_repository: AlgorithmLockRepository,
@@ -55,8 +64,11 @@ def handle_trade_request(
     trading_transaction_repository: TransactionRepository,
     algorithm_repository: AlgorithmRepository,
     nonce_repository: NonceRepository,
+    sequencer: TransactionSequencer,
+    gas_oracle: Optional[GasOracle] = None,
+    gas_limit_model: Optional[GasLimitModel] = None,
 ) -> TradeRequestResponse:
-    algorithm_lock = retrieve_lock(
+    algorithm_lock = await retrieve_lock(
         lock_repository,
         trade_request,
         web3_provider,
@@ -69,49 +81,177 @@ def handle_trade_request(
     trade_type = get_trade_type(trade_request)
 
     try:
-        if not is_trade_possible(trade_request, algorithm, web3_provider):
-            return handle_blockchain_error(
-                ValueError("Trade is not possible with the values provided."), lock_repository, trade_request
-            )
+        pre_flight = await fetch_pre_flight(trade_request, algorithm, web3_provider, gas_oracle, gas_limit_model)
     except ValueError as error:
-        return handle_blockchain_error(error, lock_repository, trade_request)
+        return await handle_blockchain_error(error, lock_repository, trade_request)
 
-    web3_nonce = get_web3_nonce(algorithm, web3_provider)
-    nonce_counter = nonce_repository.get_nonce(trade=trade_request, web3_nonce=web3_nonce)
+    if not pre_flight.trade_possible:
+        return await handle_blockchain_error(
+            ValueError("Trade is not possible with the values provided."), lock_repository, trade_request
+        )
 
     make_trade_callable = partial(
-        send_trade_to_blockchain,
+        send_sequenced_trade,
         algorithm=algorithm,
         web3_provider=web3_provider,
         km_service=km_service,
-        nonce_counter=nonce_counter,
+        nonce_repository=nonce_repository,
+        sequencer=sequencer,
+        pre_flight=pre_flight,
     )
 
     try:
-        lock, nonce = make_trade(trade_request, make_trade_callable, lock_repository, trading_transaction_repository)
+        lock, nonce = await make_trade(
+            trade_request, make_trade_callable, lock_repository, trading_transaction_repository
+        )
 
         return lock
-    except ValueError as error:
+    except (ValueError, WalletLeaseTimeout) as error:
         logger.warning(
             f"Error sending trade to blockchain. trade-type:{trade_type.value} {trade_request.json()=}  {error=}",
             exc_info=True,
         )
 
-        nonce_repository.reset_nonce(trade=trade_request)
+        return await handle_blockchain_error(error, lock_repository, trade_request)
+
+
+async def send_sequenced_trade(
+    trade: Trade,
+    algorithm: Algorithm,
+    web3_provider: Web3Provider,
+    km_service: KeyManagementService,
+    nonce_repository: NonceRepository,
+    sequencer: TransactionSequencer,
+    pre_flight: PreFlight,
+) -> Tuple[AlgorithmTransaction, int]:
+    """Read the chain nonce, allocate the nonce, sign and send while owning the controller wallet.
+
+    Nobody else sends for the wallet in the meantime, as long as the lease holds: the trade isn't sent once it expired.
+    The chain nonce can still lag behind transactions that were sent but aren't mined yet, the nonce counter of the
+    wallet covers those, and sending retries with a fresh chain nonce and counter nonce when the node refuses the nonce.
+    """
+    wallet = algorithm.controller_wallet_address
+    async with sequencer.sequence(wallet) as lease:
+        pre_flight = pre_flight.copy(update={"web3_nonce": await get_web3_nonce(algorithm, web3_provider)})
+        nonce_counter = await nonce_repository.get_nonce(wallet=wallet, web3_nonce=pre_flight.web3_nonce)
+        try:
+            return await send_trade_to_blockchain(
+                trade,
+                algorithm=algorithm,
+                web3_provider=web3_provider,
+                km_service=km_service,
+                nonce_counter=nonce_counter,
+                pre_flight=pre_flight,
+                lease=lease,
+                nonce_repository=nonce_repository,
+            )
+        except (ValueError, WalletLeaseTimeout):
+            # The nonce wasn't used, start again from the chain nonce for the next trade.
+            await nonce_repository.reset_nonce(wallet=wallet)
+            raise
+
+
+async def fetch_pre_flight(
+    trade: Trade,
+    algorithm: Algorithm,
+    web3_provider: Web3Provider,
+    gas_oracle: Optional[GasOracle] = None,
+    gas_limit_model: Optional[GasLimitModel] = None,
+) -> PreFlight:
+    """Run all chain reads a trade depends on concurrently, so the latency is that of the slowest call.
+
+    The chain nonce is left out, it's only read once the wallet is owned, see `send_sequenced_trade`. The outcome of
+    the trade check takes precedence: if the trade isn't possible the other reads are irrelevant and their errors are
+    ignored.
+    """
+    trade_possible, gas_parameters = await asyncio.gather(
+        is_trade_possible(trade, algorithm, web3_provider),
+        get_gas_parameters(trade, algorithm, web3_provider, gas_oracle, gas_limit_model),
+        return_exceptions=True,
+    )
+    if isinstance(trade_possible, BaseException):
+        raise trade_possible
+    if not trade_possible:
+        return PreFlight(trade_possible=False, gas_limit=0, gas_price=0, chain_id=0)
+    if isinstance(gas_parameters, BaseException):
+        raise gas_parameters
+
+    gas_limit, gas_price, chain_id = gas_parameters
+
+    return PreFlight(
+        trade_possible=True,
+        gas_limit=gas_limit,
+        gas_price=gas_price,
+        chain_id=chain_id,
+    )
+
+
+async def get_gas_parameters(
+    trade: Trade,
+    algorithm: Algorithm,
+    web3_provider: Web3Provider,
+    gas_oracle: Optional[GasOracle] = None,
+    gas_limit_model: Optional[GasLimitModel] = None,
+) -> Tuple[int, int, int]:
+    """Returns the gas limit, gas price and chain id.
+
+    The gas price comes from the gas oracle when there is one, which usually doesn't need the node. The chain id is
+    cached by the web3 provider.
+    """
+    w3 = web3_provider.get_async_web3(chain=algorithm.chain_id)
+    urgency = get_gas_urgency(trade)
+    gas_price = w3.eth.gas_price if gas_oracle is None else gas_oracle.get_gas_price(algorithm.chain_id, urgency)
+    gas_limit, gas_price, chain_id = await asyncio.gather(
+        get_gas_limit(trade, algorithm, web3_provider, gas_limit_model),
+        gas_price,
+        web3_provider.get_chain_id(algorithm.chain_id),
+    )
+
+    return int(gas_limit), int(gas_price), int(chain_id)
+
+
+async def get_gas_limit(
+    trade: Trade, algorithm: Algorithm, web3_provider: Web3Provider, gas_limit_model: Optional[GasLimitModel] = None
+) -> int:
+    """Returns the gas limit for the trade.
+
+    With a gas limit model, a trade of a shape that was traded before gets the learned limit without asking the node.
+    For other trades the gas of the actual call is estimated. When that fails, or without a model, the limit is a
+    multiple of the gas of an empty transaction.
+    """
+    w3 = web3_provider.get_async_web3(chain=algorithm.chain_id)
+    if gas_limit_model is not None:
+        gas_limit = await gas_limit_model.get_gas_limit(get_gas_shape(trade, algorithm))
+        if gas_limit is not None:
+            return gas_limit
+
+        try:
+            transaction = {
+                "from": algorithm.controller_wallet_address,
+                "to": web3_provider.get_trading_contract(algorithm=algorithm).address,
+                "data": get_trade_call_data(trade, algorithm, web3_provider),
+            }
+            return int(gas_limit_model.margin * await w3.eth.estimate_gas(transaction))  # type: ignore
+        except Exception as e:
+            logger.warning(f"Error estimating the gas of a trade. {trade=} {e=}")
 
-        return handle_blockchain_error(error, lock_repository, trade_request)
+    return int(estimated_gas_factor_for_chain(algorithm.chain_id) * await w3.eth.estimate_gas({}))  # type: ignore
 
 
-def get_web3_nonce(algorithm: Algorithm, web3_provider: Web3Provider):
-    w3 = web3_provider.get_web3(chain=algorithm.chain_id)
-    return int(w3.eth.get_transaction_count(algorithm.controller_wallet_address))
+async def get_web3_nonce(algorithm: Algorithm, web3_provider: Web3Provider):
+    w3 = web3_provider.get_async_web3(chain=algorithm.chain_id)
+    return int(await w3.eth.get_transaction_count(algorithm.controller_wallet_address))  # type: ignore
+
+
+def get_gas_urgency(trade: Trade) -> GasUrgency:
+    return trade.urgency if is_multi_token_trade(trade) else GasUrgency.STANDARD  # type: ignore
 
 
 def is_multi_token_trade(trade: Trade) -> bool:
     return isinstance(trade, (BuyTradeV2, SellTradeV2))
 
 
-def is_trade_possible(trade: Trade, algorithm: Algorithm, web3_provider: Web3Provider) -> bool:
+async def is_trade_possible(trade: Trade, algorithm: Algorithm, web3_provider: Web3Provider) -> bool:
     if not is_multi_token_trade(trade):
         return True
 
@@ -119,7 +259,10 @@ def is_trade_possible(trade: Trade, algorithm: Algorithm, web3_provider: Web3Pro
     trading_check_function = get_trading_check_function(trade, trading_contract_tools)
 
     try:
-        check_result = trading_check_function(algorithm.trading_contract_address, trade.symbol).call()  # type: ignore
+        check_result = await call_contract_function(
+            web3_provider.get_async_web3(chain=algorithm.chain_id),
+            trading_check_function(algorithm.trading_contract_address, trade.symbol),  # type: ignore
+        )
         logger.info(f"is_trade_possible: {check_result=} {trade=} {algorithm.trading_contract_address=}")
         return bool(check_result)
     except Exception as e:
@@ -130,15 +273,15 @@ def is_trade_possible(trade: Trade, algorithm: Algorithm, web3_provider: Web3Pro
         raise ValueError from e
 
 
-def make_trade(
+async def make_trade(
     trade: Trade,
-    make_trade_callable: Callable[[Trade], Tuple[AlgorithmTransaction, int]],
+    make_trade_callable: Callable[[Trade], Awaitable[Tuple[AlgorithmTransaction, int]]],
     lock_repository: AlgorithmLockRepository,
     trading_transaction_repository: TransactionRepository,
 ) -> Tuple[AlgorithmIsLocked, int]:
-    algorithm_transaction, nonce = make_trade_callable(trade)
-    algorithm_is_locked = lock_repository.persist_algorithm_transaction(
-        algorithm_transaction, symbol=get_lock_symbol(trade)
+    algorithm_transaction, nonce = await make_trade_callable(trade)
+    algorithm_is_locked = await run_in_threadpool(
+        lock_repository.persist_algorithm_transaction, algorithm_transaction, symbol=get_lock_symbol(trade)
     )
 
     trading_transaction = TradingTransaction(
@@ -152,32 +295,36 @@ def make_trade(
         status=TradeStatus.TRADE_IN_PROGRESS_OR_NOT_FOUND,
         trade_type=get_trade_type(trade),
     )
-    trading_transaction_repository.persist_transaction(trading_transaction)
+    await run_in_threadpool(trading_transaction_repository.persist_transaction, trading_transaction)
 
     return algorithm_is_locked, nonce
 
 
-def handle_blockchain_error(error: ValueError, lock_repository: AlgorithmLockRepository, trade: Trade):
+async def handle_blockchain_error(error: Exception, lock_repository: AlgorithmLockRepository, trade: Trade):
     error_str = str(error)
-    lock_repository.remove_algorithm_lock(algorithm_id=trade.algorithm_id, symbol=get_lock_symbol(trade))
+    await run_in_threadpool(
+        lock_repository.remove_algorithm_lock, algorithm_id=trade.algorithm_id, symbol=get_lock_symbol(trade)
+    )
     if "Not enough funds to trade" in error_str:
         return InsufficientFunds(algorithm_id=trade.algorithm_id)
 
     return BlockChainError(algorithm_id=trade.algorithm_id, error=error_str)
 
 
-def retrieve_lock(
+async def retrieve_lock(
     lock_repository: AlgorithmLockRepository,
     trade: Trade,
     web3_provider: Web3Provider,
     trading_transaction_repository: TransactionRepository,
     algorithm_repository: AlgorithmRepository,
 ) -> Union[NewAlgorithmLock, AlgorithmWasLocked]:
-    algorithm_lock = lock_repository.get_algorithm_lock(trade.algorithm_id, get_lock_symbol(trade))
+    algorithm_lock = await run_in_threadpool(
+        lock_repository.get_algorithm_lock, trade.algorithm_id, get_lock_symbol(trade)
+    )
 
     # There is already a lock on this algorithm.
     if isinstance(algorithm_lock, AlgorithmWasLocked):
-        algorithm_lock = check_transaction_status_for_lock(
+        algorithm_lock = await check_transaction_status_for_lock(
             algorithm_lock=algorithm_lock,
             lock_repository=lock_repository,
             trade=trade,
@@ -192,7 +339,7 @@ def retrieve_lock(
     return algorithm_lock
 
 
-def check_transaction_status_for_lock(
+async def check_transaction_status_for_lock(
     algorithm_lock: AlgorithmWasLocked,
     lock_repository: AlgorithmLockRepository,
     trade: Trade,
@@ -209,7 +356,7 @@ def check_transaction_status_for_lock(
         transaction_hash=algorithm_lock.transaction_hash,
         timeout_in_seconds=0,
     )
-    trade_status = check_trade_status(
+    trade_status = await check_trade_status(
         request=status_request, web3_provider=web3_provider, algorithm_repository=algorithm_repository
     )
 
@@ -220,17 +367,22 @@ def check_transaction_status_for_lock(
     assert trade_status in (trade_status.TRADE_FAILED, trade_status.TRADE_SUCCESSFUL)
 
     # Update our trading transaction record
-    trading_transaction_repository.update_transaction_status(
+    await run_in_threadpool(
+        trading_transaction_repository.update_transaction_status,
         transaction_hash=algorithm_lock.transaction_hash,
         trade_status=trade_status,
         timestamp=datetime.now(timezone.utc),
     )
 
-    lock_repository.remove_algorithm_lock(algorithm_id=trade.algorithm_id, symbol=get_lock_symbol(trade))
+    await run_in_threadpool(
+        lock_repository.remove_algorithm_lock, algorithm_id=trade.algorithm_id, symbol=get_lock_symbol(trade)
+    )
 
     # Try to retrieve a new lock, this could still be an AlgorithmWasLocked,
     # if we have a concurrent request, this is very much an edge case.
-    return lock_repository.get_algorithm_lock(algorithm_id=trade.algorithm_id, symbol=get_lock_symbol(trade))
+    return await run_in_threadpool(
+        lock_repository.get_algorithm_lock, algorithm_id=trade.algorithm_id, symbol=get_lock_symbol(trade)
+    )
 
 
 def get_trading_check_function(trade: Trade, trading_contract_tools):
@@ -247,6 +399,42 @@ def get_trading_function(trade: Trade, trading_contract):
     return trading_contract.functions.sell
 
 
+@typing.no_type_check
+def get_trade_call(trade: Trade, algorithm: Algorithm, web3_provider: Web3Provider) -> ContractFunction:
+    trading_function = get_trading_function(trade, web3_provider.get_trading_contract(algorithm=algorithm))
+
+    return trading_function(*get_trade_args(trade, algorithm))
+
+
+@typing.no_type_check
+def get_trade_args(trade: Trade, algorithm: Algorithm) -> tuple:
+    amount = Web3.toWei(trade.relative_amount, unit=get_env(EnvVar.UNIT, "ether"))
+
+    if Decimal(algorithm.trading_contract.version.value) >= Decimal(TradingContractVersion.V2_0):
+        return amount, int(trade.slippage.raw_amount), trade.symbol
+
+    return amount, int(trade.slippage.raw_amount)
+
+
+def get_trade_call_data(trade: Trade, algorithm: Algorithm, web3_provider: Web3Provider) -> str:
+    """Same as `get_trade_call(...)._encode_transaction_data()`, encoded by a precompiled encoder."""
+    return encode_call(
+        web3_provider.get_trading_contract(algorithm=algorithm),
+        get_trade_type(trade).value.lower(),
+        get_trade_args(trade, algorithm),
+    )
+
+
+def build_trade_transaction(trade: Trade, algorithm: Algorithm, web3_provider: Web3Provider, transaction: dict) -> dict:
+    """Same as `get_trade_call(...).buildTransaction(transaction)`, with the call data encoded by a precompiled encoder."""
+    return build_transaction(
+        web3_provider.get_trading_contract(algorithm=algorithm),
+        get_trade_type(trade).value.lower(),
+        get_trade_args(trade, algorithm),
+        transaction,
+    )
+
+
 def get_trade_type(trade: Trade) -> TradeType:
     if isinstance(trade, (BuyTrade, BuyTradeV2)):
         return TradeType.BUY
@@ -273,55 +461,61 @@ def estimated_gas_price_factor_for_chain(chain_id: ChainId) -> Decimal:
 
 
 @typing.no_type_check
-def send_trade_to_blockchain(
+async def send_trade_to_blockchain(
     trade: Trade,
     algorithm: Algorithm,
     web3_provider: Web3Provider,
     km_service: KeyManagementService,
     nonce_counter: Optional[int],
+    pre_flight: Optional[PreFlight] = None,
     try_number: int = 1,
-    estimated_gas_factor: Optional[Decimal] = None,
     estimated_gas_price_factor: Optional[Decimal] = None,
+    lease: Optional[WalletLease] = None,
+    nonce_repository: Optional[NonceRepository] = None,
 ) -> Tuple[AlgorithmTransaction, int]:
-    if estimated_gas_factor is None:
-        estimated_gas_factor = estimated_gas_factor_for_chain(algorithm.chain_id)
     if estimated_gas_price_factor is None:
         estimated_gas_price_factor = estimated_gas_price_factor_for_chain(algorithm.chain_id)
+    if pre_flight is None:
+        web3_nonce, (gas_limit, gas_price, chain_id) = await asyncio.gather(
+            get_web3_nonce(algorithm, web3_provider), get_gas_parameters(trade, algorithm, web3_provider)
+        )
+        pre_flight = PreFlight(
+            trade_possible=True,
+            web3_nonce=web3_nonce,
+            gas_limit=gas_limit,
+            gas_price=gas_price,
+            chain_id=chain_id,
+        )
 
-    w3 = web3_provider.get_web3(chain=algorithm.chain_id)
-    unit = get_env(EnvVar.UNIT, "ether")
+    if pre_flight.web3_nonce is None:
+        pre_flight = pre_flight.copy(update={"web3_nonce": await get_web3_nonce(algorithm, web3_provider)})
 
-    nonce = int(w3.eth.get_transaction_count(algorithm.controller_wallet_address))
+    aw3 = web3_provider.get_async_web3(chain=algorithm.chain_id)
+
+    nonce = pre_flight.web3_nonce
     if nonce_counter is not None and nonce_counter > nonce:
         nonce = nonce_counter
 
     transaction = {
-        "gas": int(estimated_gas_factor * w3.eth.estimate_gas({})),
-        "gasPrice": int(estimated_gas_price_factor * w3.eth.gas_price),
+        "gas": pre_flight.gas_limit,
+        "gasPrice": int(estimated_gas_price_factor * pre_flight.gas_price),
+        "chainId": pre_flight.chain_id,
         "nonce": nonce,
     }
 
-    trading_contract = web3_provider.get_trading_contract(algorithm=algorithm)
-    trading_function = get_trading_function(trade, trading_contract)
+    txn = build_trade_transaction(trade, algorithm, web3_provider, transaction)
 
-    if Decimal(algorithm.trading_contract.version.value) >= Decimal(TradingContractVersion.V2_0):
-        txn = trading_function(
-            w3.toWei(trade.relative_amount, unit=unit),
-            int(trade.slippage.raw_amount),
-            trade.symbol,
-        ).buildTransaction(transaction)
-    else:
-        txn = trading_function(
-            w3.toWei(trade.relative_amount, unit=unit),
-            int(trade.slippage.raw_amount),
-        ).buildTransaction(transaction)
-
-    signed_txn = km_service.sign_transaction(
-        transaction=txn, address=algorithm.controller_wallet_address, chain=algorithm.chain_id
+    signed_txn = await run_in_threadpool(
+        km_service.sign_transaction,
+        transaction=txn,
+        address=algorithm.controller_wallet_address,
+        chain=algorithm.chain_id,
     )
+    if lease is not None:
+        lease.ensure_held()
     logger.info(f"Sending trade to blockchain, trade-type:{get_trade_type(trade).value} {trade=} {txn=}.")
     try:
-        transaction_hash: str = w3.eth.send_raw_transaction(signed_txn.rawTransaction).hex()
+        transaction_hash: str = (await aw3.eth.send_raw_transaction(signed_txn.rawTransaction)).hex()
     except ValueError as e:
         error_str = str(e)
         if try_number >= MAX_TRIES:
@@ -333,19 +527,26 @@ def send_trade_to_blockchain(
             f"[RETRYING] Error sending trade to blockchain. {try_number=} {nonce=} trade-type:{get_trade_type(trade).value} {trade.json()=} {transaction=} {e=}",
             exc_info=True,
         )
-        # if try_number == 1:
-        #     estimated_gas_factor = estimated_gas_factor * Decimal("1.50")  # Add 50%.
-
         # Trying again
         # We don't make a replacement transaction, instead we try to make another transaction
-        return send_trade_to_blockchain(
+        # with the latest on-chain nonce, the rest of the pre-flight values are still good.
+        # The refused nonce is taken already, so the counter hands out the next one.
+        web3_nonce = await get_web3_nonce(algorithm, web3_provider)
+        if nonce_repository is not None:
+            nonce_counter = await nonce_repository.get_nonce(
+                wallet=algorithm.controller_wallet_address, web3_nonce=web3_nonce
+            )
+
+        return await send_trade_to_blockchain(
             trade=trade,
             algorithm=algorithm,
             web3_provider=web3_provider,
             km_service=km_service,
             try_number=try_number + 1,
             nonce_counter=nonce_counter,
-            estimated_gas_factor=estimated_gas_factor,
+            pre_flight=pre_flight.copy(update={"web3_nonce": web3_nonce}),
+            lease=lease,
+            nonce_repository=nonce_repository,
         )
 
     logger.info(
@@ -0,0 +1,281 @@
+import asyncio
+import logging
+import uuid
+from datetime import datetime, timezone
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from hexbytes import HexBytes
+from starlette.concurrency import run_in_threadpool
+from web3.types import TxReceipt
+
+from trading_api.algorithm.events import publish_trade_event
+from trading_api.algorithm.lock import get_lock_symbol
+from trading_api.algorithm.models.algorithm import Algorithm
+from trading_api.algorithm.models.crypto import ChainId, TransactionHash
+from trading_api.algorithm.models.trade import PendingTransaction, Trade, TradeEventType, TradeStatus
+from trading_api.algorithm.repositories.lock import AlgorithmLockRepository
+from trading_api.algorithm.repositories.nonce import NonceRepository
+from trading_api.algorithm.repositories.pending import EntryId, PendingTransactionRepository
+from trading_api.algorithm.services.events import TradeEventBroker
+from trading_api.algorithm.services.gas_limit import GasLimitModel, get_gas_shape
+from trading_api.algorithm.services.heads import HeadTracker, get_block_number
+from trading_api.algorithm.services.status_writer import TransactionStatusWriter
+from trading_api.algorithm.services.web3 import Web3Provider, get_transaction_receipts
+
+logger = logging.getLogger(__name__)
+
+Finalize = Callable[[PendingTransaction, TradeStatus], Awaitable[None]]
+
+
+async def finalize_trade(
+    pending: PendingTransaction,
+    trade_status: TradeStatus,
+    status_writer: TransactionStatusWriter,
+    lock_repository: AlgorithmLockRepository,
+    nonce_repository: NonceRepository,
+    trade_event_broker: TradeEventBroker,
+):
+    """End the lifecycle of a sent trade.
+
+    A mined trade gets its status stored and releases the algorithm lock, if it still holds it: the next trade request
+    may have released it already and locked it for a new trade. The nonce counter of the wallet is reset for every trade
+    that didn't succeed, so the next trade starts again from the chain nonce. Trades we gave up on keep their lock, it
+    expires by itself, or is released by the next trade request once the transaction shows up.
+    """
+    if trade_status != TradeStatus.TRADE_IN_PROGRESS_OR_NOT_FOUND:
+        await status_writer.update_status(pending.transaction_hash, trade_status, datetime.now(timezone.utc))
+        await status_writer.flush()
+        released = await run_in_threadpool(
+            lock_repository.remove_algorithm_lock_for_transaction,
+            algorithm_id=pending.trade.algorithm_id,
+            transaction_hash=pending.transaction_hash,
+            symbol=get_lock_symbol(pending.trade),
+        )
+        event = (
+            TradeEventType.TRADE_MINED if trade_status == TradeStatus.TRADE_SUCCESSFUL else TradeEventType.TRADE_FAILED
+        )
+        await publish_trade_event(trade_event_broker, event, pending.trade, pending.transaction_hash)
+        if released:
+            await publish_trade_event(
+                trade_event_broker, TradeEventType.LOCK_RELEASED, pending.trade, pending.transaction_hash
+            )
+
+    if trade_status != TradeStatus.TRADE_SUCCESSFUL and pending.controller_wallet_address is not None:
+        await nonce_repository.reset_nonce(wallet=pending.controller_wallet_address)
+
+    logger.info(f"Finalized trade. {pending.transaction_hash=} {trade_status=}")
+
+
+async def watch_trade(
+    receipt_watcher: "ReceiptWatcher",
+    trade_event_broker: TradeEventBroker,
+    trade: Trade,
+    algorithm: Algorithm,
+    transaction_hash: TransactionHash,
+):
+    """Queue a sent trade for the `ReceiptWatcher`.
+
+    The trade is out already, so a failure here must not fail the request. Without a watcher the trade isn't finalized,
+    its algorithm lock expires by itself.
+    """
+    await publish_trade_event(trade_event_broker, TradeEventType.TRADE_SUBMITTED, trade, transaction_hash)
+    try:
+        await receipt_watcher.watch(
+            PendingTransaction(
+                trade=trade,
+                transaction_hash=transaction_hash,
+                chain_id=algorithm.chain_id,
+                submitted_at=datetime.now(timezone.utc),
+                gas_shape=get_gas_shape(trade, algorithm),
+                controller_wallet_address=algorithm.controller_wallet_address,
+            )
+        )
+    except Exception as e:
+        logger.error(f"Error queueing sent trade, it won't be finalized. {transaction_hash=} {e=}", exc_info=True)
+
+
+class ChainReceiptWatcher:
+    """Resolves the pending transactions of one chain.
+
+    Pending transactions are claimed from the `PendingTransactionRepository`, together with the ones other consumers
+    stopped keeping alive for `claim_timeout_ms`. Every `poll_interval_s` the block number is checked, taken from the
+    `HeadTracker` when there is one, when a new block came in the receipts of all claimed transactions are looked up
+    in batches of `batch_size`. Once a trade is finalized the gas used by it is recorded in the `GasLimitModel`, or
+    when it ran out of gas, its learned gas limit is dropped.
+    """
+
+    def __init__(
+        self,
+        chain: ChainId,
+        web3_provider: Web3Provider,
+        finalize: Finalize,
+        pending_repository: PendingTransactionRepository,
+        consumer: str,
+        poll_interval_s: float = 3.0,
+        pending_timeout_s: float = 600.0,
+        claim_timeout_ms: int = 60_000,
+        batch_size: int = 100,
+        gas_limit_model: Optional[GasLimitModel] = None,
+        head_tracker: Optional[HeadTracker] = None,
+    ):
+        self.chain = chain
+        self.web3_provider = web3_provider
+        self.finalize = finalize
+        self.pending_repository = pending_repository
+        self.consumer = consumer
+        self.poll_interval_s = poll_interval_s
+        self.pending_timeout_s = pending_timeout_s
+        self.claim_timeout_ms = claim_timeout_ms
+        self.batch_size = batch_size
+        self.gas_limit_model = gas_limit_model
+        self.head_tracker = head_tracker
+        self.pending: Dict[EntryId, PendingTransaction] = {}
+        self.last_block: Optional[int] = None
+
+    async def run(self):
+        while True:
+            try:
+                await self.poll()
+            except Exception as e:
+                logger.warning(f"Error checking pending transactions. chain={self.chain} {e=}", exc_info=True)
+
+            await asyncio.sleep(self.poll_interval_s)
+
+    async def poll(self):
+        await self._claim()
+        if not self.pending:
+            return
+
+        # Let the other consumers know we are still working on these, and drop the ones another consumer reclaimed.
+        owned = set(await self.pending_repository.keep_alive(self.chain, self.consumer, list(self.pending)))
+        for entry_id in [entry_id for entry_id in self.pending if entry_id not in owned]:
+            logger.warning(f"Pending transaction was reclaimed by another consumer. chain={self.chain} {entry_id=}")
+            del self.pending[entry_id]
+        if not self.pending:
+            return
+
+        w3 = self.web3_provider.get_async_web3(chain=self.chain)
+        block_number = await get_block_number(w3, self.chain, self.head_tracker)
+        if block_number == self.last_block:
+            return
+        self.last_block = block_number
+
+        pending = list(self.pending.items())
+        for i in range(0, len(pending), self.batch_size):
+            await self._resolve(w3, pending[i : i + self.batch_size])
+
+        await self._expire()
+
+    async def _claim(self):
+        while True:
+            claimed = await self.pending_repository.claim(
+                self.chain, self.consumer, min_idle_ms=self.claim_timeout_ms, count=self.batch_size
+            )
+            self.pending.update(claimed)
+            if len(claimed) < self.batch_size:
+                return
+
+    async def _resolve(self, w3, batch: List[Tuple[EntryId, PendingTransaction]]):
+        receipts = await get_transaction_receipts(w3, [HexBytes(p.transaction_hash.value) for _, p in batch])
+
+        for (entry_id, pending), receipt in zip(batch, receipts):
+            if receipt is None:
+                continue
+
+            trade_status = TradeStatus.TRADE_SUCCESSFUL if receipt["status"] == 1 else TradeStatus.TRADE_FAILED
+            # Finalizing is retried with the next block when it fails, only learn from the gas used once.
+            if await self._finalize(entry_id, pending, trade_status):
+                await self._record_gas_used(w3, pending, receipt)
+
+    async def _record_gas_used(self, w3, pending: PendingTransaction, receipt: TxReceipt):
+        # Trades sent by an older version have no shape.
+        if self.gas_limit_model is None or pending.gas_shape is None:
+            return
+
+        try:
+            if receipt["status"] == 1:
+                await self.gas_limit_model.record(pending.gas_shape, receipt["gasUsed"])
+                return
+
+            # A revert refunds the gas that's left, a trade that used all of its gas ran out of it.
+            transaction = await w3.eth.get_transaction(HexBytes(pending.transaction_hash.value))
+            if receipt["gasUsed"] >= transaction["gas"]:
+                logger.warning(f"Trade ran out of gas, dropping its learned gas limit. {pending=}")
+                await self.gas_limit_model.record_out_of_gas(pending.gas_shape)
+        except Exception as e:
+            logger.warning(f"Error recording gas used. {pending=} {e=}")
+
+    async def _expire(self):
+        now = datetime.now(timezone.utc)
+        for entry_id, pending in list(self.pending.items()):
+            if (now - pending.submitted_at).total_seconds() > self.pending_timeout_s:
+                logger.critical(f"Was not successful in retrieving trade status. {pending=}")
+                await self._finalize(entry_id, pending, TradeStatus.TRADE_IN_PROGRESS_OR_NOT_FOUND)
+
+    async def _finalize(self, entry_id: EntryId, pending: PendingTransaction, trade_status: TradeStatus) -> bool:
+        try:
+            await self.finalize(pending, trade_status)
+            await self.pending_repository.ack(self.chain, entry_id)
+        except Exception as e:
+            # Keep it pending, we try again with the next block.
+            logger.warning(f"Error finalizing trade. {pending=} {trade_status=} {e=}", exc_info=True)
+            return False
+
+        del self.pending[entry_id]
+        return True
+
+
+class ReceiptWatcher:
+    """Keeps a `ChainReceiptWatcher` per chain, running as a task on the event loop once started.
+
+    Sent transactions are queued in the `PendingTransactionRepository`, so they are resolved by any worker that runs a
+    watcher, also when the worker that sent them went down.
+    """
+
+    def __init__(
+        self,
+        web3_provider_fn: Callable[[], Web3Provider],
+        finalize: Finalize,
+        pending_repository: PendingTransactionRepository,
+        **watcher_kwargs,
+    ):
+        self.web3_provider_fn = web3_provider_fn
+        self.finalize = finalize
+        self.pending_repository = pending_repository
+        self.watcher_kwargs = watcher_kwargs
+        self.consumer = str(uuid.uuid4())
+        self.watchers: Dict[ChainId, ChainReceiptWatcher] = {}
+        self.tasks: Dict[ChainId, asyncio.Task] = {}
+        self.started = False
+
+    async def watch(self, pending: PendingTransaction):
+        await self.pending_repository.add(pending)
+        if self.started and pending.chain_id not in self.tasks:
+            self.tasks[pending.chain_id] = asyncio.create_task(self.get_watcher(pending.chain_id).run())
+
+    def get_watcher(self, chain: ChainId) -> ChainReceiptWatcher:
+        if chain not in self.watchers:
+            self.watchers[chain] = ChainReceiptWatcher(
+                chain,
+                self.web3_provider_fn(),
+                finalize=self.finalize,
+                pending_repository=self.pending_repository,
+                consumer=self.consumer,
+                **self.watcher_kwargs,
+            )
+
+        return self.watchers[chain]
+
+    def start(self):
+        # Watch every chain right away, there can be transactions left behind by workers that went down.
+        self.started = True
+        for chain in ChainId:
+            if chain not in self.tasks:
+                self.tasks[chain] = asyncio.create_task(self.get_watcher(chain).run())
+
+    async def stop(self):
+        self.started = False
+        for task in self.tasks.values():
+            task.cancel()
+        await asyncio.gather(*self.tasks.values(), return_exceptions=True)
+        self.tasks = {}
@@ -8,6 +8,7 @@ from trading_api.algorithm.models.algorithm import AlgorithmId
 from trading_api.algorithm.models.trade import (
     BuyTrade,
     BuyTradeV2,
+    GasUrgency,
     SellTrade,
     SellTradeV2,
     Slippage,
@@ -36,6 +37,7 @@ class TradeRequestV2(BaseModel):
     slippage_amount: Decimal = Decimal("0.005")
     relative_amount: Decimal = Decimal("1")
     symbol: str
+    urgency: GasUrgency = GasUrgency.STANDARD
 
     def to_buy(self, algorithm_id: ChecksumAddress) -> BuyTradeV2:
         return BuyTradeV2(
@@ -43,6 +45,7 @@ class TradeRequestV2(BaseModel):
             slippage=Slippage(amount=self.slippage_amount),
             relative_amount=self.relative_amount,
             symbol=self.symbol,
+            urgency=self.urgency,
         )
 
     def to_sell(self, algorithm_id: ChecksumAddress) -> SellTradeV2:
@@ -51,6 +54,7 @@ class TradeRequestV2(BaseModel):
             slippage=Slippage(amount=self.slippage_amount),
             relative_amount=self.relative_amount,
             symbol=self.symbol,
+            urgency=self.urgency,
         )
 
 
@@ -58,6 +62,7 @@ class BuyRequestV2(BaseModel):
     slippage_amount: Decimal = Decimal("0.005")
     relative_amount: Decimal = Decimal("1")
     symbol: str
+    urgency: GasUrgency = GasUrgency.STANDARD
 
     def to_buy(self, algorithm_id: ChecksumAddress) -> BuyTradeV2:
         return BuyTradeV2(
@@ -65,6 +70,7 @@ class BuyRequestV2(BaseModel):
             slippage=Slippage(amount=self.slippage_amount),
             relative_amount=self.relative_amount,
             symbol=self.symbol,
+            urgency=self.urgency,
         )
 
 
@@ -72,6 +78,7 @@ class SellRequestV2(BaseModel):
     slippage_amount: Decimal = Decimal("0.005")
     relative_amount: Decimal = Decimal("1")
     symbol: str
+    urgency: GasUrgency = GasUrgency.STANDARD
 
     def to_sell(self, algorithm_id: ChecksumAddress) -> SellTradeV2:
         return SellTradeV2(
@@ -79,6 +86,7 @@ class SellRequestV2(BaseModel):
             slippage=Slippage(amount=self.slippage_amount),
             relative_amount=self.relative_amount,
             symbol=self.symbol,
+            urgency=self.urgency,
         )
 
 
@@ -1,7 +1,7 @@
 import logging
 
 from eth_typing import ChecksumAddress
-from fastapi import BackgroundTasks, Depends, FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException
 from starlette import status
 from starlette.responses import JSONResponse
 
@@ -28,9 +28,16 @@ from trading_api.algorithm.repositories.algorithm import AlgorithmRepository
 from trading_api.algorithm.repositories.lock import AlgorithmLockRepository
 from trading_api.algorithm.repositories.nonce import NonceRepository
 from trading_api.algorithm.repositories.transaction import TransactionRepository
+from trading_api.algorithm.services.events import TradeEventBroker
+from trading_api.algorithm.services.gas import GasOracle
+from trading_api.algorithm.services.gas_limit import GasLimitModel
 from trading_api.algorithm.services.kms import KeyManagementService
+from trading_api.algorithm.services.notifier import ReceiptNotifier
+from trading_api.algorithm.services.receipts import ReceiptCache
+from trading_api.algorithm.services.sequencer import TransactionSequencer
+from trading_api.algorithm.services.status_writer import TransactionStatusWriter
 from trading_api.algorithm.services.web3 import Web3Provider
-from trading_api.algorithm.status import background_task_check_tx_status, handle_status_request
+from trading_api.algorithm.status import handle_status_request
 from trading_api.algorithm.ticker import (
     CryptoToken,
     PancakeSwapService,
@@ -40,6 +47,7 @@ from trading_api.algorithm.ticker import (
     handle_ticker_request,
 )
 from trading_api.algorithm.trade import handle_trade_request
+from trading_api.algorithm.watcher import ReceiptWatcher, watch_trade
 from trading_api.algorithm_acl import BuyRequest, SellRequest
 from trading_api.core.container import Container, di_container
 from trading_api.core.login import get_current_active_algorithm
@@ -91,7 +99,6 @@ async def root(
 )
 async def buy(
     request: BuyRequest,
-    background_tasks: BackgroundTasks,
     container: Container = Depends(di_container),
     current_algorithm: Algorithm = Depends(get_current_active_algorithm),
 ):
@@ -114,7 +121,7 @@ async def buy(
 
     buy = request.to_buy()
 
-    response: TradeRequestResponse = handle_trade_request(
+    response: TradeRequestResponse = await handle_trade_request(
         trade_request=buy,
         algorithm=current_algorithm,
         lock_repository=container[AlgorithmLockRepository],
@@ -123,6 +130,9 @@ async def buy(
         trading_transaction_repository=container[TransactionRepository],
         algorithm_repository=container[AlgorithmRepository],
         nonce_repository=container[NonceRepository],
+        sequencer=container[TransactionSequencer],
+        gas_oracle=container[GasOracle],
+        gas_limit_model=container[GasLimitModel],
     )
     if isinstance(response, AlgorithmWasLocked):
         return JSONResponse(status_code=status.HTTP_423_LOCKED, content=response.dict())
@@ -130,12 +140,8 @@ async def buy(
         return JSONResponse(status_code=status.HTTP_406_NOT_ACCEPTABLE, content=response.dict())
     if isinstance(response, BlockChainError):
         return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content=response.dict())
-    background_tasks.add_task(
-        background_task_check_tx_status,
-        trade=buy,
-        algorithm_id=request.trade.algorithm_id,
-        transaction_hash=response.transaction_hash,
-        container=container,
+    await watch_trade(
+        container[ReceiptWatcher], container[TradeEventBroker], buy, current_algorithm, response.transaction_hash
     )
 
     return response
@@ -153,7 +159,6 @@ async def buy(
 )
 async def sell(
     request: SellRequest,
-    background_tasks: BackgroundTasks,
     container: Container = Depends(di_container),
     current_algorithm: Algorithm = Depends(get_current_active_algorithm),
 ):
@@ -176,7 +181,7 @@ async def sell(
 
     sell = request.to_sell()
 
-    response: TradeRequestResponse = handle_trade_request(
+    response: TradeRequestResponse = await handle_trade_request(
         trade_request=sell,
         algorithm=current_algorithm,
         lock_repository=container[AlgorithmLockRepository],
@@ -185,6 +190,9 @@ async def sell(
         trading_transaction_repository=container[TransactionRepository],
         algorithm_repository=container[AlgorithmRepository],
         nonce_repository=container[NonceRepository],
+        sequencer=container[TransactionSequencer],
+        gas_oracle=container[GasOracle],
+        gas_limit_model=container[GasLimitModel],
     )
     if isinstance(response, AlgorithmWasLocked):
         return JSONResponse(status_code=status.HTTP_423_LOCKED, content=response.dict())
@@ -192,12 +200,8 @@ async def sell(
         return JSONResponse(status_code=status.HTTP_406_NOT_ACCEPTABLE, content=response.dict())
     if isinstance(response, BlockChainError):
         return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content=response.dict())
-    background_tasks.add_task(
-        background_task_check_tx_status,
-        trade=sell,
-        algorithm_id=request.trade.algorithm_id,
-        transaction_hash=response.transaction_hash,
-        container=container,
+    await watch_trade(
+        container[ReceiptWatcher], container[TradeEventBroker], sell, current_algorithm, response.transaction_hash
     )
 
     return response
@@ -226,7 +230,12 @@ async def trade_status(
     _verify_trading_contract_version(current_algorithm)
 
     response: TradeStatusResponse = await handle_status_request(
-        request, container[Web3Provider], container[TransactionRepository], container[AlgorithmRepository]
+        request,
+        container[Web3Provider],
+        container[TransactionStatusWriter],
+        container[AlgorithmRepository],
+        container[ReceiptNotifier],
+        container[ReceiptCache],
     )
     if isinstance(response, TradeInProgressOrNotFoundResponse):
         return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=response.dict())
@@ -1,22 +1,21 @@
 import logging
-from typing import Union
+from typing import List, Union
 
 from eth_typing import ChecksumAddress
-from fastapi import BackgroundTasks, Depends, FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Query
 from starlette import status
 from starlette.requests import Request
-from starlette.responses import JSONResponse
+from starlette.responses import JSONResponse, StreamingResponse
 
 from trading_api import core_routes, system_routes_v2
 from trading_api.algorithm.balance import handle_balance_request_v2
-from trading_api.algorithm.models.algorithm import Algorithm, AlgorithmId, AlgorithmWasLocked
+from trading_api.algorithm.events import stream_trade_events
+from trading_api.algorithm.models.algorithm import Algorithm, AlgorithmWasLocked
 from trading_api.algorithm.models.balance import AlgorithmBalanceResponse
-from trading_api.algorithm.models.crypto import TransactionHash
-from trading_api.algorithm.models.quote import PriceQuoteResponse
+from trading_api.algorithm.models.quote import PriceQuoteListResponse, PriceQuoteResponse
 from trading_api.algorithm.models.trade import (
     BlockChainError,
     InsufficientFunds,
-    Trade,
     TradeFailedResponse,
     TradeInProgressOrNotFoundResponse,
     TradeRequestResponse,
@@ -24,14 +23,22 @@ from trading_api.algorithm.models.trade import (
     TradeType,
     TradeTypeLower,
 )
-from trading_api.algorithm.quote import handle_price_quote_request
+from trading_api.algorithm.quote import handle_price_quote_list_request, handle_price_quote_request
 from trading_api.algorithm.repositories.algorithm import AlgorithmRepository
 from trading_api.algorithm.repositories.lock import AlgorithmLockRepository
 from trading_api.algorithm.repositories.nonce import NonceRepository
 from trading_api.algorithm.repositories.transaction import TransactionRepository
+from trading_api.algorithm.services.events import TradeEventBroker
+from trading_api.algorithm.services.gas import GasOracle
+from trading_api.algorithm.services.gas_limit import GasLimitModel
 from trading_api.algorithm.services.kms import KeyManagementService
+from trading_api.algorithm.services.multicall import MulticallAggregator
+from trading_api.algorithm.services.notifier import ReceiptNotifier
+from trading_api.algorithm.services.receipts import ReceiptCache
+from trading_api.algorithm.services.sequencer import TransactionSequencer
+from trading_api.algorithm.services.status_writer import TransactionStatusWriter
 from trading_api.algorithm.services.web3 import Web3Provider
-from trading_api.algorithm.status import background_task_check_tx_status, handle_status_request
+from trading_api.algorithm.status import handle_status_request
 from trading_api.algorithm.ticker import (
     CryptoToken,
     PancakeSwapService,
@@ -41,6 +48,7 @@ from trading_api.algorithm.ticker import (
     handle_ticker_request,
 )
 from trading_api.algorithm.trade import TradingContractVersion, handle_trade_request
+from trading_api.algorithm.watcher import ReceiptWatcher, watch_trade
 from trading_api.algorithm_acl import StatusRequestV2, TradeRequestV2
 from trading_api.core.container import Container, di_container
 from trading_api.core.login import get_current_active_algorithm
@@ -94,7 +102,6 @@ async def trade(
     request: TradeRequestV2,
     raw_request: Request,
     address: ChecksumAddress,
-    background_tasks: BackgroundTasks,
     container: Container = Depends(di_container),
     current_algorithm: Algorithm = Depends(get_current_active_algorithm),
 ):
@@ -108,6 +115,8 @@ async def trade(
       example, _0.75_ means 75 percent of the base token will be converted into **symbol**. Default: _1_;
     - **symbol** is the token symbol to buy or sell. Can be any token linked to the trading contract. For example:
       _BTC_;
+    - **urgency** is how fast the trade should be included in a block, it sets the gas price. Can be _LOW_, _STANDARD_,
+      _FAST_ or _URGENT_. Default: _STANDARD_;
     - **transaction_hash** is the returned hash that can be used to check the trade status.
     """
     _verify_trading_contract_address(current_algorithm, address)
@@ -121,7 +130,7 @@ async def trade(
     else:
         trade_request = request.to_sell(address)  # type: ignore
 
-    response: TradeRequestResponse = handle_trade_request(
+    response: TradeRequestResponse = await handle_trade_request(
         trade_request=trade_request,
         algorithm=current_algorithm,
         lock_repository=container[AlgorithmLockRepository],
@@ -130,6 +139,9 @@ async def trade(
         trading_transaction_repository=container[TransactionRepository],
         algorithm_repository=container[AlgorithmRepository],
         nonce_repository=container[NonceRepository],
+        sequencer=container[TransactionSequencer],
+        gas_oracle=container[GasOracle],
+        gas_limit_model=container[GasLimitModel],
     )
     if isinstance(response, AlgorithmWasLocked):
         return JSONResponse(status_code=status.HTTP_423_LOCKED, content=response.dict())
@@ -138,12 +150,12 @@ async def trade(
     if isinstance(response, BlockChainError):
         return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content=response.dict())
 
-    dispatch_check_tx_status(
-        trade=trade_request,
-        background_tasks=background_tasks,
-        algorithm_id=AlgorithmId(public_address=address),
-        transaction_hash=response.transaction_hash,
-        container=container,
+    await watch_trade(
+        container[ReceiptWatcher],
+        container[TradeEventBroker],
+        trade_request,
+        current_algorithm,
+        response.transaction_hash,
     )
 
     return response
@@ -175,8 +187,10 @@ async def trade_status(
     response: TradeStatusResponse = await handle_status_request(
         request=request.to_status(address),
         web3_provider=container[Web3Provider],
-        trading_transaction_repository=container[TransactionRepository],
+        status_writer=container[TransactionStatusWriter],
         algorithm_repository=container[AlgorithmRepository],
+        receipt_notifier=container[ReceiptNotifier],
+        receipt_cache=container[ReceiptCache],
     )
     if isinstance(response, TradeInProgressOrNotFoundResponse):
         return JSONResponse(status_code=status.HTTP_202_ACCEPTED, content=response.dict())
@@ -186,6 +200,36 @@ async def trade_status(
     return response
 
 
+@app.get(
+    path="/algorithms/{address}/events",
+    summary="Stream trade events",
+    response_class=StreamingResponse,
+    responses={status.HTTP_200_OK: {"content": {"text/event-stream": {}}}},
+)
+async def trade_events(
+    address: ChecksumAddress,
+    container: Container = Depends(di_container),
+    current_algorithm: Algorithm = Depends(get_current_active_algorithm),
+):
+    """Stream the lifecycle of the algorithm's trades as server-sent events, instead of polling the trade status.
+
+    - **TRADE_SUBMITTED** the trade was sent to the blockchain;
+    - **TRADE_MINED** the trade was successful;
+    - **TRADE_FAILED** the trade failed;
+    - **LOCK_RELEASED** the algorithm can place a new trade for the symbol.
+
+    Every event holds the **transaction_hash** and **symbol** of the trade.
+    """
+    _verify_trading_contract_address(current_algorithm, address)
+    _verify_trading_contract_version(current_algorithm)
+
+    return StreamingResponse(
+        stream_trade_events(container[TradeEventBroker], address),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.get(
     path="/algorithms/{address}/balance",
     response_model=AlgorithmBalanceResponse,  # type: ignore
@@ -243,6 +287,38 @@ async def get_price_quote(
     return response
 
 
+@app.get(
+    path="/algorithms/{address}/quotes",
+    response_model=PriceQuoteListResponse,  # type: ignore
+    summary="Show price quotes",
+    responses={
+        status.HTTP_400_BAD_REQUEST: {"model": BlockChainError},
+    },
+)
+async def get_price_quotes(
+    address: ChecksumAddress,
+    symbols: List[str] = Query(...),
+    container: Container = Depends(di_container),
+    current_algorithm: Algorithm = Depends(get_current_active_algorithm),
+):
+    """Show price quotes for many paired tokens at once, where:
+
+    - **address** is the address of the algorithm, equal to the address of the trading contract;
+    - **symbols** are the symbols of the paired tokens, repeated per token. For example: _?symbols=BTC&symbols=ETH_;
+    - **quotes** are the symbols with their token price;
+    - **failed** are the symbols that could not be quoted.
+    """
+    _verify_trading_contract_version(current_algorithm)
+
+    response: PriceQuoteListResponse = await handle_price_quote_list_request(
+        symbols, current_algorithm, container[Web3Provider], container[MulticallAggregator]
+    )
+    if isinstance(response, BlockChainError):
+        return JSONResponse(status_code=status.HTTP_400_BAD_REQUEST, content=response.dict())
+
+    return response
+
+
 @app.get(
     path="/ticker/",
     response_model=TickerListResponse,
@@ -307,21 +383,5 @@ def _verify_trading_contract_version(algorithm: Algorithm):
         )
 
 
-def dispatch_check_tx_status(
-    background_tasks: BackgroundTasks,
-    trade: Trade,
-    algorithm_id: AlgorithmId,
-    transaction_hash: TransactionHash,
-    container: Container,
-):
-    background_tasks.add_task(
-        background_task_check_tx_status,
-        trade=trade,
-        algorithm_id=algorithm_id,
-        transaction_hash=transaction_hash,
-        container=container,
-    )
-
-
 def is_buy_trade_type(trade_type: Union[TradeType, TradeTypeLower]):
     return trade_type in (TradeType.BUY, TradeTypeLower.BUY)
@@ -14,6 +14,13 @@ from trading_api.algorithm.repositories.algorithm import (
     InMemoryAlgorithmRepository,
     MongoAlgorithmRepository,
 )
+from trading_api.algorithm.repositories.gas import (
+    InMemoryGasPriceRepository,
+    InMemoryGasUsageRepository,
+    RedisGasPriceRepository,
+    RedisGasUsageRepository,
+)
+from trading_api.algorithm.repositories.head import InMemoryBlockHeadRepository, RedisBlockHeadRepository
 from trading_api.algorithm.repositories.key import InMemoryKeyRepository, KeyRepository, MongoKeyRepository
 from trading_api.algorithm.repositories.lock import (
     AlgorithmLockRepository,
@@ -21,14 +28,31 @@ from trading_api.algorithm.repositories.lock import (
     RedisLockRepository,
 )
 from trading_api.algorithm.repositories.nonce import InMemoryNonceRepository, NonceRepository, RedisNonceRepository
+from trading_api.algorithm.repositories.pending import (
+    InMemoryPendingTransactionRepository,
+    PendingTransactionRepository,
+    RedisPendingTransactionRepository,
+)
 from trading_api.algorithm.repositories.transaction import (
     InMemoryTransactionRepository,
     MongoTransactionRepository,
     TransactionRepository,
 )
+from trading_api.algorithm.repositories.wallet import InMemoryWalletLeaseRepository, RedisWalletLeaseRepository
+from trading_api.algorithm.services.events import InMemoryTradeEventBroker, RedisTradeEventBroker, TradeEventBroker
+from trading_api.algorithm.services.gas import GasOracle, parse_percentiles
+from trading_api.algorithm.services.gas_limit import GasLimitModel
+from trading_api.algorithm.services.heads import HeadTracker
+from trading_api.algorithm.services.key_index import KeyAliasIndexer
 from trading_api.algorithm.services.kms import AWSKeyManagementService, KeyManagementService, LocalKeyManagementService
+from trading_api.algorithm.services.multicall import MULTICALL3_ADDRESS, MulticallAggregator
+from trading_api.algorithm.services.notifier import ReceiptNotifier
+from trading_api.algorithm.services.receipts import ReceiptCache
+from trading_api.algorithm.services.sequencer import TransactionSequencer
+from trading_api.algorithm.services.status_writer import TransactionStatusWriter
 from trading_api.algorithm.services.web3 import HttpWeb3Provider, Web3Provider
 from trading_api.algorithm.ticker import InMemoryPancakeSwapService, PancakeSwapAPIService, PancakeSwapService
+from trading_api.algorithm.watcher import ReceiptWatcher, finalize_trade
 from trading_api.core.repositories.mongo import connect_mongo
 from trading_api.core.security import encode_password
 from trading_api.system.repositories.system import InMemorySystemAuthRepository, SystemAuthRepository, SystemUser
@@ -44,6 +68,7 @@ def build_kms(
         region_name=get_env(EnvVar.REGION_NAME, ""),  # type: ignore
         key_repository=key_repository_fn(),
         stage=Stage(get_env_force(EnvVar.STAGE, Stage.Local.value)),
+        max_pool_connections=int(get_env_force(EnvVar.KMS_MAX_CONNECTIONS, "50")),
     )
 
 
@@ -81,6 +106,18 @@ class Container(dict):
                 ),
                 TransactionRepository: self.build_transaction_repository,
                 NonceRepository: self.build_nonce_repository,
+                TransactionSequencer: self.build_transaction_sequencer,
+                PendingTransactionRepository: self.build_pending_transaction_repository,
+                TradeEventBroker: self.build_trade_event_broker,
+                TransactionStatusWriter: self.build_transaction_status_writer,
+                ReceiptWatcher: self.build_receipt_watcher,
+                ReceiptNotifier: self.build_receipt_notifier,
+                ReceiptCache: self.build_receipt_cache,
+                MulticallAggregator: self.build_multicall_aggregator,
+                HeadTracker: self.build_head_tracker,
+                GasOracle: self.build_gas_oracle,
+                GasLimitModel: self.build_gas_limit_model,
+                KeyAliasIndexer: self.build_key_alias_indexer,
             }
         )
 
@@ -126,6 +163,14 @@ class Container(dict):
             ecr_contract_bsc=ContractDetails(address=ecr_address_bsc, abi=ecr_abi),
             ecr_contract_rtn=ContractDetails(address=ecr_address_rtn, abi=ecr_abi),
             private_key=private_key,
+            batch_window_s=int(get_env_force(EnvVar.WEB3_BATCH_WINDOW_MS, "2")) / 1000,
+            hedge_percentile=float(get_env_force(EnvVar.WEB3_HEDGE_PERCENTILE, "95")) / 100,
+            block_refresh_s=int(get_env_force(EnvVar.WEB3_BLOCK_REFRESH_MS, "1000")) / 1000,
+            head_number_fn=lambda chain: self[HeadTracker].latest_number(chain),
+        )
+        self.web3_provider.contracts.preload(
+            [Path(get_env_force(EnvVar.TRADING_CONTRACT_TOOLS_JSON_PATH))]
+            + [TradingContract(version=version).location for version in TradingContractVersion]
         )
 
         return self.web3_provider
@@ -142,6 +187,98 @@ class Container(dict):
     def build_nonce_repository(self):
         return RedisNonceRepository(connection_url=self.redis_url)
 
+    def build_transaction_sequencer(self) -> TransactionSequencer:
+        return TransactionSequencer(
+            lease_repository=RedisWalletLeaseRepository(connection_url=self.redis_url),
+            lease_timeout_ms=int(get_env_force(EnvVar.WALLET_LEASE_TIMEOUT_MS, "10000")),
+        )
+
+    def build_pending_transaction_repository(self) -> RedisPendingTransactionRepository:
+        return RedisPendingTransactionRepository(connection_url=self.redis_url)
+
+    def build_trade_event_broker(self) -> RedisTradeEventBroker:
+        return RedisTradeEventBroker(connection_url=self.redis_url)
+
+    def build_transaction_status_writer(self) -> TransactionStatusWriter:
+        return TransactionStatusWriter(
+            transaction_repository=self[TransactionRepository],
+            flush_interval_s=float(get_env_force(EnvVar.TRANSACTION_STATUS_FLUSH_INTERVAL, "1")),
+        )
+
+    def build_receipt_watcher(self) -> ReceiptWatcher:
+        return ReceiptWatcher(
+            web3_provider_fn=self.build_web3_provider,
+            finalize=partial(
+                finalize_trade,
+                status_writer=self[TransactionStatusWriter],
+                lock_repository=self[AlgorithmLockRepository],
+                nonce_repository=self[NonceRepository],
+                trade_event_broker=self[TradeEventBroker],
+            ),
+            pending_repository=self[PendingTransactionRepository],
+            poll_interval_s=float(get_env_force(EnvVar.RECEIPT_WATCHER_POLL_INTERVAL, "3")),
+            pending_timeout_s=float(get_env_force(EnvVar.RECEIPT_WATCHER_TIMEOUT, "600")),
+            claim_timeout_ms=int(get_env_force(EnvVar.PENDING_TRANSACTION_CLAIM_TIMEOUT_MS, "60000")),
+            gas_limit_model=self[GasLimitModel],
+            head_tracker=self[HeadTracker],
+        )
+
+    def build_receipt_notifier(self) -> ReceiptNotifier:
+        return ReceiptNotifier(
+            web3_provider_fn=self.build_web3_provider,
+            poll_interval_s=float(get_env_force(EnvVar.RECEIPT_NOTIFIER_POLL_INTERVAL, "1")),
+            head_tracker=self[HeadTracker],
+        )
+
+    def build_receipt_cache(self) -> ReceiptCache:
+        return ReceiptCache(connection_url=self.redis_url)
+
+    def build_multicall_aggregator(self) -> MulticallAggregator:
+        return MulticallAggregator(
+            web3_provider_fn=self.build_web3_provider,
+            addresses={
+                ChainId.BSC: get_env_force(EnvVar.MULTICALL_ADDRESS_BSC, MULTICALL3_ADDRESS),
+                ChainId.RTN: get_env_force(EnvVar.MULTICALL_ADDRESS_RTN, MULTICALL3_ADDRESS),
+            },
+        )
+
+    def build_head_tracker(self) -> HeadTracker:
+        return HeadTracker(
+            web3_provider_fn=self.build_web3_provider,
+            head_repository=RedisBlockHeadRepository(connection_url=self.redis_url),
+            ws_uris={
+                ChainId.BSC: get_env(EnvVar.WEB3_WEBSOCKET_ENDPOINT_BSC, ""),
+                ChainId.RTN: get_env(EnvVar.WEB3_WEBSOCKET_ENDPOINT_RTN, ""),
+            },
+            poll_interval_s=int(get_env_force(EnvVar.BLOCK_HEAD_POLL_INTERVAL_MS, "1000")) / 1000,
+            lease_timeout_ms=int(get_env_force(EnvVar.BLOCK_HEAD_LEASE_TIMEOUT_MS, "5000")),
+            max_head_age_s=int(get_env_force(EnvVar.BLOCK_HEAD_MAX_AGE_MS, "15000")) / 1000,
+        )
+
+    def build_gas_oracle(self) -> GasOracle:
+        return GasOracle(
+            web3_provider_fn=self.build_web3_provider,
+            head_tracker=self[HeadTracker],
+            price_repository=RedisGasPriceRepository(connection_url=self.redis_url),
+            percentiles=parse_percentiles(get_env_force(EnvVar.GAS_ORACLE_PERCENTILES, "")),
+            block_count=int(get_env_force(EnvVar.GAS_ORACLE_BLOCK_COUNT, "20")),
+            max_price_age_s=int(get_env_force(EnvVar.GAS_ORACLE_MAX_PRICE_AGE_MS, "30000")) / 1000,
+        )
+
+    def build_gas_limit_model(self) -> GasLimitModel:
+        return GasLimitModel(
+            usage_repository=RedisGasUsageRepository(connection_url=self.redis_url),
+            percentile=float(get_env_force(EnvVar.GAS_LIMIT_PERCENTILE, "99")) / 100,
+            margin=float(get_env_force(EnvVar.GAS_LIMIT_MARGIN, "1.1")),
+            min_samples=int(get_env_force(EnvVar.GAS_LIMIT_MIN_SAMPLES, "5")),
+        )
+
+    def build_key_alias_indexer(self) -> KeyAliasIndexer:
+        return KeyAliasIndexer(
+            kms_fn=lambda: self[KeyManagementService],
+            interval_s=float(get_env_force(EnvVar.KEY_INDEX_INTERVAL_S, "300")),
+        )
+
     @staticmethod
     def read_contract_abi(contract_path: Path) -> dict:
         with open(contract_path) as f:  # type: ignore
@@ -156,17 +293,60 @@ class FakeContainer(dict):
         super().__init__()
 
         system_user = SystemUser(username="System John Doe", hashed_password=encode_password("secret"))
+        lock_repository = InMemoryAlgorithmLockRepository()
+        transaction_repository = InMemoryTransactionRepository()
+        nonce_repository = InMemoryNonceRepository()
+        pending_repository = InMemoryPendingTransactionRepository()
+        trade_event_broker = InMemoryTradeEventBroker()
+        status_writer = TransactionStatusWriter(transaction_repository=transaction_repository)
+        head_tracker = HeadTracker(
+            web3_provider_fn=lambda: self[Web3Provider],
+            head_repository=InMemoryBlockHeadRepository(),
+            ws_uris={},
+            poll_interval_s=0.1,
+        )
+        gas_limit_model = GasLimitModel(usage_repository=InMemoryGasUsageRepository())
         self.update(
             {
-                AlgorithmLockRepository: InMemoryAlgorithmLockRepository(),
+                AlgorithmLockRepository: lock_repository,
                 AlgorithmRepository: InMemoryAlgorithmRepository(),
                 KeyManagementService: LocalKeyManagementService(web3_provider=None),  # type: ignore
                 KeyRepository: InMemoryKeyRepository(),
                 PancakeSwapService: InMemoryPancakeSwapService(),
                 SystemAuthRepository: InMemorySystemAuthRepository(system_user),
-                TransactionRepository: InMemoryTransactionRepository(),
+                TransactionRepository: transaction_repository,
                 Web3Provider: None,
-                NonceRepository: InMemoryNonceRepository(),
+                NonceRepository: nonce_repository,
+                TransactionSequencer: TransactionSequencer(lease_repository=InMemoryWalletLeaseRepository()),
+                PendingTransactionRepository: pending_repository,
+                TradeEventBroker: trade_event_broker,
+                TransactionStatusWriter: status_writer,
+                ReceiptWatcher: ReceiptWatcher(
+                    web3_provider_fn=lambda: self[Web3Provider],
+                    finalize=partial(
+                        finalize_trade,
+                        status_writer=status_writer,
+                        lock_repository=lock_repository,
+                        nonce_repository=nonce_repository,
+                        trade_event_broker=trade_event_broker,
+                    ),
+                    pending_repository=pending_repository,
+                    gas_limit_model=gas_limit_model,
+                    head_tracker=head_tracker,
+                ),
+                ReceiptNotifier: ReceiptNotifier(
+                    web3_provider_fn=lambda: self[Web3Provider], poll_interval_s=0.1, head_tracker=head_tracker
+                ),
+                ReceiptCache: ReceiptCache(),
+                MulticallAggregator: MulticallAggregator(web3_provider_fn=lambda: self[Web3Provider], addresses={}),
+                HeadTracker: head_tracker,
+                GasOracle: GasOracle(
+                    web3_provider_fn=lambda: self[Web3Provider],
+                    head_tracker=head_tracker,
+                    price_repository=InMemoryGasPriceRepository(),
+                ),
+                GasLimitModel: gas_limit_model,
+                KeyAliasIndexer: KeyAliasIndexer(kms_fn=lambda: self[KeyManagementService]),
             }
         )
 
@@ -128,6 +128,14 @@ class BaseRepository(BaseRepositoryInterface, ABC):
         for item in self.collection.find({}, batch_size=100):
             yield self.dto_class.parse_obj(item)
 
+    def _all_models_paginated(
+        self, skip: int, limit: Optional[int], sort_query: List[Tuple], filter_query: Optional[dict] = None
+    ) -> Iterator[object]:
+        # A limit of 0 means no limit to Mongo.
+        cursor = self.collection.find(filter_query or {}, batch_size=100, skip=skip, limit=limit or 0)
+        for item in cursor.sort(sort_query):
+            yield self.dto_class.parse_obj(item)
+
     def delete_all(self):
         deleted = self.collection.delete_many({})
         logger.debug(f"Mongodb cleaned up [{deleted}] items.")
@@ -1,4 +1,4 @@
-from typing import Iterator, List
+from typing import Iterable, Iterator, List, Optional
 
 from eth_typing import ChecksumAddress
 
@@ -29,16 +29,51 @@ def new_address(key_management_service) -> KeyedAddressPair:
 
 
 def handle_address_list_request(
-    key_management_service: KeyManagementService, algorithm_repository: AlgorithmRepository
+    key_management_service: KeyManagementService,
+    algorithm_repository: AlgorithmRepository,
+    skip: int = 0,
+    limit: Optional[int] = None,
 ) -> AddressListResponse:
-    all_keyed_addresses = key_management_service.all_keyed_addresses()
-    all_algorithms = algorithm_repository.all_algorithms()
+    keyed_addresses = key_management_service.keyed_addresses(skip, limit)
 
-    address_pairs = create_keyed_address_pairs(all_keyed_addresses, all_algorithms)
+    address_pairs = pair_with_algorithms(keyed_addresses, algorithm_repository)
 
     return AddressListResponse(address_pairs=address_pairs)
 
 
+def stream_address_list(
+    key_management_service: KeyManagementService,
+    algorithm_repository: AlgorithmRepository,
+    skip: int = 0,
+    batch_size: int = 100,
+) -> Iterator[str]:
+    """Streams the `AddressListResponse` as JSON, a page of `batch_size` controller wallets at a time.
+
+    Only the first page skips, the next ones start past the last controller wallet streamed, so each page is read in
+    one step and wallets added while streaming don't shift the pages.
+    """
+    yield '{"address_pairs": ['
+    separator = ""
+    after: Optional[ChecksumAddress] = None
+    while batch := key_management_service.keyed_addresses(skip, batch_size, after):
+        yield separator + ",".join(pair.json() for pair in pair_with_algorithms(batch, algorithm_repository))
+        separator = ","
+        skip, after = 0, batch[-1].controller_wallet_address
+    yield "]}"
+
+
+def pair_with_algorithms(
+    keyed_addresses: Iterable[AddressKeyPair], algorithm_repository: AlgorithmRepository
+) -> List[KeyedAddressPair]:
+    """Pairs the controller wallets with their algorithms, only the algorithms of these wallets are read."""
+    keyed_addresses = list(keyed_addresses)
+    algorithms = algorithm_repository.get_algorithms_by_controller_wallets(
+        [keyed_address.controller_wallet_address for keyed_address in keyed_addresses]
+    )
+
+    return create_keyed_address_pairs(iter(keyed_addresses), algorithms)
+
+
 def create_keyed_address_pairs(
     all_keyed_addresses: Iterator[AddressKeyPair], all_algorithms: Iterator[AlgorithmInDB]
 ) -> List[KeyedAddressPair]:
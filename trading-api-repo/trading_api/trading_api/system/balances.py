@@ -0,0 +1,60 @@
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Dict, List
+
+from starlette.concurrency import run_in_threadpool
+
+from trading_api.algorithm.models.algorithm import Algorithm, AlgorithmId
+from trading_api.algorithm.models.balance import TotalSupply
+from trading_api.algorithm.models.crypto import ChainId
+from trading_api.algorithm.repositories.algorithm import AlgorithmRepository
+from trading_api.algorithm.services.multicall import MulticallAggregator
+from trading_api.algorithm.services.web3 import Web3Provider
+from trading_api.system.models.balance import AlgorithmSupply, AlgorithmSupplyList
+
+logger = logging.getLogger(__name__)
+
+
+async def handle_balance_list_request(
+    algorithm_repository: AlgorithmRepository, web3_provider: Web3Provider, multicall: MulticallAggregator
+) -> AlgorithmSupplyList:
+    """Read the total supply of every enabled algorithm, with one `eth_call` per chain."""
+    algorithms = await run_in_threadpool(lambda: list(algorithm_repository.all_algorithms()))
+
+    per_chain: Dict[ChainId, List[Algorithm]] = defaultdict(list)
+    for algorithm in algorithms:
+        if algorithm.disabled or algorithm.trading_contract is None:
+            continue
+        per_chain[algorithm.chain_id].append(Algorithm(**algorithm.dict()))
+
+    supplies = await asyncio.gather(
+        *(
+            _get_total_supplies(chain, chain_algorithms, web3_provider, multicall)
+            for chain, chain_algorithms in per_chain.items()
+        )
+    )
+
+    return AlgorithmSupplyList(balances=[supply for chain_supplies in supplies for supply in chain_supplies])
+
+
+async def _get_total_supplies(
+    chain: ChainId, algorithms: List[Algorithm], web3_provider: Web3Provider, multicall: MulticallAggregator
+) -> List[AlgorithmSupply]:
+    functions = [web3_provider.get_trading_contract(algorithm).functions.getTotalSupply() for algorithm in algorithms]
+    try:
+        amounts = await multicall.call(chain, functions)
+    except Exception as e:
+        logger.error(f"Error requesting balances. {chain=} {e=}")
+        amounts = [e] * len(algorithms)
+
+    balances = []
+    for algorithm, amount in zip(algorithms, amounts):
+        algorithm_id = AlgorithmId(public_address=algorithm.trading_contract_address)
+        if isinstance(amount, Exception):
+            logger.warning(f"Error requesting balance. {algorithm.trading_contract_address=} {amount=}")
+            balances.append(AlgorithmSupply(algorithm_id=algorithm_id))
+        else:
+            balances.append(AlgorithmSupply(algorithm_id=algorithm_id, supply=TotalSupply(amount=amount)))
+
+    return balances
@@ -0,0 +1,21 @@
+import logging
+from typing import Dict
+
+from trading_api.core.container import Container
+
+logger = logging.getLogger(__name__)
+
+
+def handle_metrics_request(container: Container) -> Dict[str, dict]:
+    metrics = {}
+    for service in container.keys():
+        if not hasattr(service, "get_metrics"):
+            continue
+        try:
+            dependency = container[service]
+            if dependency is not None:
+                metrics[service.__name__] = dependency.get_metrics()
+        except Exception as e:
+            logger.error(f"[METRICS] Failed to collect metrics of {service.__name__}. {e=}")
+
+    return metrics
@@ -0,0 +1,15 @@
+from typing import List, Optional
+
+from pydantic import BaseModel
+
+from trading_api.algorithm.models.algorithm import AlgorithmId
+from trading_api.algorithm.models.balance import TotalSupply
+
+
+class AlgorithmSupply(BaseModel):
+    algorithm_id: AlgorithmId
+    supply: Optional[TotalSupply] = None
+
+
+class AlgorithmSupplyList(BaseModel):
+    balances: List[AlgorithmSupply]
@@ -2,6 +2,7 @@ from typing import Union
 
 from eth_typing import ChecksumAddress
 from fastapi import APIRouter, Depends, Security
+from starlette.concurrency import run_in_threadpool
 
 from trading_api import EnvVar, get_env_force
 from trading_api.algorithm.models.address import AddressListResponse, CreateAddressesRequest
@@ -40,7 +41,7 @@ router = APIRouter(
     summary="Show controller wallets",
 )
 async def get_controller_wallet_addresses(
-    container: Container = Depends(Container),
+    container: Container = Depends(di_container),
     current_system_user=Security(get_current_system_user, scopes=["system"]),
 ):
     """List pairs of controller wallet address and trading contract address, where **output**:
@@ -51,8 +52,10 @@ async def get_controller_wallet_addresses(
 
     Note: If the `trading_contract_address` is `None`, the controller wallet is not yet paired.
     """
-    return handle_address_list_request(
-        key_management_service=container[KeyManagementService], algorithm_repository=container[AlgorithmRepository]
+    return await run_in_threadpool(
+        handle_address_list_request,
+        key_management_service=container[KeyManagementService],
+        algorithm_repository=container[AlgorithmRepository],
     )
 
 
@@ -1,7 +1,9 @@
-from typing import Union
+from typing import Dict, Optional, Union
 
 from eth_typing import ChecksumAddress
-from fastapi import APIRouter, Depends, Security
+from fastapi import APIRouter, Depends, Query, Security
+from starlette.concurrency import run_in_threadpool
+from starlette.responses import StreamingResponse
 
 from trading_api import EnvVar, get_env_force
 from trading_api.algorithm.models.address import AddressListResponse, CreateAddressesRequest
@@ -18,11 +20,19 @@ from trading_api.algorithm.models.trade import TransactionPage
 from trading_api.algorithm.repositories.algorithm import AlgorithmRepository
 from trading_api.algorithm.repositories.transaction import TransactionRepository
 from trading_api.algorithm.services.kms import KeyManagementService
+from trading_api.algorithm.services.multicall import MulticallAggregator
 from trading_api.algorithm.services.web3 import Web3Provider
 from trading_api.core.container import Container, di_container
 from trading_api.core.login import get_current_system_user
-from trading_api.system.address import handle_address_create_request, handle_address_list_request
+from trading_api.system.address import (
+    handle_address_create_request,
+    handle_address_list_request,
+    stream_address_list,
+)
+from trading_api.system.balances import handle_balance_list_request
 from trading_api.system.disable import handle_disable_algorithm
+from trading_api.system.metrics import handle_metrics_request
+from trading_api.system.models.balance import AlgorithmSupplyList
 from trading_api.system.models.withdraw import WithdrawFundsRequest, WithdrawFundsResponse
 from trading_api.system.register import handle_register_algorithm
 from trading_api.system.transactions import handle_transaction_list_request
@@ -40,7 +50,9 @@ router = APIRouter(
     summary="Show controller wallets",
 )
 async def get_controller_wallet_addresses(
-    container: Container = Depends(Container),
+    skip: int = Query(0, ge=0),
+    limit: Optional[int] = Query(None, ge=1),
+    container: Container = Depends(di_container),
     current_system_user=Security(get_current_system_user, scopes=["system"]),
 ):
     """Show controller wallet and trading contract pairs, where:
@@ -49,9 +61,24 @@ async def get_controller_wallet_addresses(
     - **controller_wallet_address** is the address of the controller wallet;
     - **trading_contract_address** is the address of the trading contract, equal to the address of an algorithm. If it
       is _None_, it is not yet paired with an algorithm.
+
+    Pairs are ordered by controller wallet address, and can be paginated, where:
+
+    - **skip** is the number of pairs to skip;
+    - **limit** is the number of pairs per page, without it all pairs are streamed.
     """
-    return handle_address_list_request(
-        key_management_service=container[KeyManagementService], algorithm_repository=container[AlgorithmRepository]
+    if limit is None:
+        return StreamingResponse(
+            stream_address_list(container[KeyManagementService], container[AlgorithmRepository], skip=skip),
+            media_type="application/json",
+        )
+
+    return await run_in_threadpool(
+        handle_address_list_request,
+        key_management_service=container[KeyManagementService],
+        algorithm_repository=container[AlgorithmRepository],
+        skip=skip,
+        limit=limit,
     )
 
 
@@ -162,3 +189,35 @@ async def withdraw_algorithm_funds(
         key_management_service=container[KeyManagementService],
         algorithm_repository=container[AlgorithmRepository],
     )
+
+
+@router.get(
+    path="/balances",
+    response_model=AlgorithmSupplyList,
+    summary="Show algorithm balances",
+)
+async def get_algorithm_balances(
+    container: Container = Depends(di_container),
+    current_system_user=Security(get_current_system_user, scopes=["system"]),
+):
+    """Show the balances of all enabled algorithms, where:
+
+    - **algorithm_id** is the address of the algorithm, equal to the address of the trading contract;
+    - **supply** is the total supply of the algorithm in BNB. If it is _None_, the balance could not be read.
+    """
+    return await handle_balance_list_request(
+        container[AlgorithmRepository], container[Web3Provider], container[MulticallAggregator]
+    )
+
+
+@router.get(
+    path="/metrics",
+    response_model=Dict[str, Dict[str, float]],
+    summary="Show service metrics",
+)
+async def get_metrics(
+    container: Container = Depends(di_container),
+    current_system_user=Security(get_current_system_user, scopes=["system"]),
+):
+    """Show the metrics of this API worker, per service. For example the hit rate of the receipt cache."""
+    return handle_metrics_request(container)